@@ -98,15 +98,8 @@ export class EnsemblePredictionController {
 
       logger.info(`📊 Predição ensemble em lote: ${predictions.length} itens`);
 
-      // Processar predições em paralelo
-      const results = await Promise.all(
-        predictions.map((pred) =>
-          ensemblePredictionService.predict(pred).catch((error) => ({
-            error: error.message,
-            input: pred,
-          }))
-        )
-      );
+      // Processar predições (API unificada em uma chamada, ou item a item)
+      const results = await ensemblePredictionService.predictBatch(predictions);
 
       const successful = results.filter((r: any) => !r.error).length;
       const failed = results.filter((r: any) => r.error).length;
@@ -102,6 +102,9 @@ export const riskPredictionController = {
           km,
           hour,
           dayOfWeek,
+          month,
+          dayPhase,
+          roadType,
           weatherCondition: finalWeatherCondition,
         }, {
           source: weatherSource,
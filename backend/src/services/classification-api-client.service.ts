@@ -62,7 +62,7 @@ export class ClassificationApiClient {
   private isAvailable: boolean = false;
   private lastHealthCheck: Date | null = null;
 
-  constructor(baseURL: string = 'http://localhost:5001') {
+  constructor(baseURL: string = process.env.CLASSIFICATION_API_URL || 'http://localhost:5001') {
     this.baseURL = baseURL;
     this.client = axios.create({
       baseURL,
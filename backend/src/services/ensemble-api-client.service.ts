@@ -0,0 +1,121 @@
+/**
+ * Cliente para API Unificada de Inferência (Ensemble)
+ *
+ * Comunica-se com a API Python Flask (ensemble_api.py), que roda o modelo
+ * de risco e o de classificação no mesmo processo e devolve o ensemble
+ * completo em uma única chamada HTTP.
+ */
+
+import axios, { AxiosInstance } from 'axios';
+import { logger } from '../utils/logger';
+
+export interface EnsembleApiRequest {
+  uf: string;
+  br: string | number;
+  km: number;
+  hour?: number;
+  weatherCondition?: string;
+  dayOfWeek?: number;
+  month?: number;
+  dayPhase?: string;
+  roadType?: string;
+}
+
+export interface EnsembleApiBatchResponse {
+  total: number;
+  successful: number;
+  failed: number;
+  results: any[];
+}
+
+export class EnsembleApiClient {
+  private client: AxiosInstance;
+  private baseURL: string;
+  private isAvailable: boolean = false;
+
+  constructor(baseURL: string = process.env.ENSEMBLE_API_URL || 'http://localhost:5002') {
+    this.baseURL = baseURL;
+    this.client = axios.create({
+      baseURL,
+      timeout: 10000,
+      headers: {
+        'Content-Type': 'application/json',
+      },
+    });
+  }
+
+  /**
+   * Verifica se a API está disponível
+   */
+  async checkHealth(): Promise<boolean> {
+    try {
+      const response = await this.client.get('/health');
+      this.isAvailable = response.data.status === 'healthy' && response.data.model_loaded;
+
+      if (this.isAvailable) {
+        logger.info('✅ API Unificada de Ensemble está disponível e pronta');
+      }
+
+      return this.isAvailable;
+    } catch (error) {
+      this.isAvailable = false;
+      return false;
+    }
+  }
+
+  /**
+   * Predição ensemble para um segmento (uma chamada, dois modelos)
+   */
+  async predict(request: EnsembleApiRequest): Promise<any | null> {
+    if (!this.isAvailable) {
+      return null;
+    }
+
+    try {
+      const response = await this.client.post('/ensemble', request);
+      return response.data.success ? response.data.data : null;
+    } catch (error) {
+      if (axios.isAxiosError(error) && (error.code === 'ECONNREFUSED' || error.response?.status === 503)) {
+        logger.warn('API Unificada de Ensemble indisponível');
+        this.isAvailable = false;
+      } else {
+        logger.error('Erro na predição ensemble unificada:', error);
+      }
+      return null;
+    }
+  }
+
+  /**
+   * Predição ensemble em lote (uma chamada a cada modelo para o lote inteiro)
+   */
+  async predictBatch(requests: EnsembleApiRequest[]): Promise<EnsembleApiBatchResponse | null> {
+    if (!this.isAvailable) {
+      return null;
+    }
+
+    try {
+      const response = await this.client.post('/ensemble-batch', { predictions: requests });
+      return response.data.success ? response.data.data : null;
+    } catch (error) {
+      logger.error('Erro na predição ensemble unificada em lote:', error);
+      return null;
+    }
+  }
+
+  /**
+   * Retorna se a API está disponível (sem fazer nova requisição)
+   */
+  isApiAvailable(): boolean {
+    return this.isAvailable;
+  }
+
+  /**
+   * Retorna a URL base da API
+   */
+  getBaseURL(): string {
+    return this.baseURL;
+  }
+}
+
+// Exporta instância singleton
+export const ensembleApiClient = new EnsembleApiClient();
@@ -6,6 +6,10 @@
  * 1. risk_model.joblib - Predição de gravidade (LightGBM)
  * 2. modeloClassificacao.joblib - Classificação de acidentes
  * 
+ * Quando a API unificada (ensemble_api.py) está disponível, o ensemble
+ * inteiro é calculado em Python em uma única chamada HTTP; caso contrário
+ * as duas APIs são chamadas separadamente e combinadas aqui.
+ * 
  * Estratégias de ensemble:
  * - Validação cruzada entre modelos
  * - Agregação de confiança
@@ -19,6 +23,7 @@
 import { logger } from '../utils/logger';
 import mlApiClient from './ml-api-client.service';
 import { classificationApiClient, ClassificationResponse } from './classification-api-client.service';
+import { ensembleApiClient } from './ensemble-api-client.service';
 import riskLookupService from './risk-lookup.service';
 
 export interface EnsemblePredictionInput {
@@ -86,6 +91,7 @@ export interface EnsemblePredictionResult {
 export class EnsemblePredictionService {
   private riskApiAvailable: boolean = false;
   private classificationApiAvailable: boolean = false;
+  private unifiedApiAvailable: boolean = false;
 
   constructor() {
     this.checkModelsAvailability();
@@ -102,9 +108,13 @@ export class EnsemblePredictionService {
       // Verificar API de classificação
       this.classificationApiAvailable = await classificationApiClient.checkHealth();
       
+      // Verificar API unificada (ensemble em uma chamada)
+      this.unifiedApiAvailable = await ensembleApiClient.checkHealth();
+      
       logger.info('📊 Status dos Modelos:');
       logger.info(`   - API de Risco: ${this.riskApiAvailable ? '✅' : '❌'}`);
       logger.info(`   - API de Classificação: ${this.classificationApiAvailable ? '✅' : '❌'}`);
+      logger.info(`   - API Unificada (Ensemble): ${this.unifiedApiAvailable ? '✅' : '❌'}`);
       
     } catch (error) {
       logger.error('Erro ao verificar disponibilidade dos modelos:', error);
@@ -122,6 +132,16 @@ export class EnsemblePredictionService {
     // Preparar input padrão
     const standardInput = this.standardizeInput(input);
 
+    // API unificada: ensemble completo em uma única chamada
+    if (this.unifiedApiAvailable) {
+      const unifiedResult = await ensembleApiClient.predict(standardInput);
+      if (unifiedResult) {
+        const elapsed = Date.now() - startTime;
+        logger.info(`✅ Predição ensemble (API unificada) concluída em ${elapsed}ms`);
+        return unifiedResult;
+      }
+    }
+
     // Executar predições em paralelo
     const [riskPrediction, classificationPrediction] = await Promise.all([
       this.getRiskPrediction(standardInput),
@@ -141,6 +161,32 @@ export class EnsemblePredictionService {
     return result;
   }
 
+  /**
+   * Realiza predições ensemble em lote
+   *
+   * Com a API unificada, o lote inteiro é resolvido em uma chamada HTTP
+   * (uma passada de cada modelo); sem ela, cada item segue o fluxo de predict().
+   */
+  async predictBatch(inputs: EnsemblePredictionInput[]): Promise<any[]> {
+    if (this.unifiedApiAvailable) {
+      const batch = await ensembleApiClient.predictBatch(
+        inputs.map((input) => this.standardizeInput(input))
+      );
+      if (batch) {
+        return batch.results;
+      }
+    }
+
+    return Promise.all(
+      inputs.map((input) =>
+        this.predict(input).catch((error) => ({
+          error: error.message,
+          input,
+        }))
+      )
+    );
+  }
+
   /**
    * Padroniza o input para todos os modelos
    */
@@ -41,6 +41,26 @@ interface MLPredictionResponse {
   };
 }
 
+interface MLRouteLeg {
+  uf: string;
+  br: number | string;
+  kmStart: number;
+  kmEnd: number;
+  weatherCondition?: string;
+  roadType?: string;
+}
+
+interface MLRouteInput {
+  legs: MLRouteLeg[];
+  departureTime?: string;
+  averageSpeedKmh?: number;
+  weatherCondition?: string;
+  roadType?: string;
+  segmentKm?: number;
+  windowKm?: number;
+  includeSegments?: boolean;
+}
+
 interface MLHealthResponse {
   status: string;
   service: string;
@@ -135,6 +155,28 @@ class MLApiClientService {
     }
   }
 
+  /**
+   * Risco de uma rota inteira (horário de passagem projetado em cada segmento)
+   */
+  async predictRoute(input: MLRouteInput): Promise<any | null> {
+    if (!this.isAvailable) {
+      return null;
+    }
+
+    try {
+      const response = await this.client.post('/predict-route', input);
+
+      if (response.data.success) {
+        return response.data.data;
+      }
+
+      return null;
+    } catch (error: any) {
+      console.error('Erro ao fazer predição de rota:', error.message);
+      return null;
+    }
+  }
+
   /**
    * Obtém informações sobre o modelo
    */
@@ -9,6 +9,10 @@
  * 1. API de Risco (ml_prediction_api.py) - porta 5000
  * 2. API de Classificação (classification_api.py) - porta 5001
  *
+ * Com ML_UNIFIED_API=true, sobe apenas a API Unificada (ensemble_api.py,
+ * porta 5002), que serve os dois modelos em um único processo. Nesse modo,
+ * aponte ML_API_URL e CLASSIFICATION_API_URL para http://localhost:5002.
+ *
  * Autor: Sistema Sompo
  * Data: 2025-10-14
  */
@@ -28,6 +32,12 @@ class MLProcessManager {
   private isClassificationApiRunning: boolean = false;
   private classificationApiUrl: string = 'http://localhost:5001';
   
+  // API Unificada (substitui as duas acima quando ML_UNIFIED_API=true)
+  private ensembleProcess: ChildProcess | null = null;
+  private isEnsembleApiRunning: boolean = false;
+  private ensembleApiUrl: string = 'http://localhost:5002';
+  private unifiedMode: boolean = process.env.ML_UNIFIED_API === 'true';
+  
   // Configurações
   private maxStartupTime: number = 30000; // 30 segundos
   private healthCheckInterval: number = 2000; // 2 segundos
@@ -39,6 +49,13 @@ class MLProcessManager {
     console.log('🤖 Iniciando APIs Python de ML...');
     console.log('');
     
+    if (this.unifiedMode) {
+      await this.startEnsembleApi();
+      console.log('');
+      console.log('✅ Sistema de Ensemble ML (processo unificado) operacional!');
+      return;
+    }
+    
     // Iniciar ambas as APIs em paralelo
     await Promise.all([
       this.startRiskApi(),
@@ -155,13 +172,76 @@ class MLProcessManager {
     await this.waitForAPIReady('classification');
   }
 
+  /**
+   * Inicia a API Unificada de Ensemble (porta 5002)
+   */
+  private async startEnsembleApi(): Promise<void> {
+    console.log('🧩 Iniciando API Unificada (risco + classificação)...');
+
+    if (this.ensembleProcess) {
+      console.log('⚠️  API Unificada já está rodando');
+      return;
+    }
+
+    const scriptPath = path.join(__dirname, '../../../scripts/ensemble_api.py');
+    const projectRoot = path.join(__dirname, '../../..');
+
+    this.ensembleProcess = spawn('python', [scriptPath], {
+      cwd: projectRoot,
+      stdio: ['ignore', 'pipe', 'pipe'],
+      windowsHide: false,
+      env: {
+        ...process.env,
+        PYTHONIOENCODING: 'utf-8',
+      },
+    });
+
+    this.ensembleProcess.stdout?.on('data', (data) => {
+      const output = data.toString().trim();
+      if (output) {
+        console.log(`   [Ensemble API] ${output}`);
+      }
+    });
+
+    this.ensembleProcess.stderr?.on('data', (data) => {
+      const output = data.toString().trim();
+      if (output && !output.includes('WARNING')) {
+        console.error(`   [Ensemble API ERROR] ${output}`);
+      }
+    });
+
+    this.ensembleProcess.on('exit', (code, signal) => {
+      console.log(`🔴 API Unificada encerrada (code: ${code}, signal: ${signal})`);
+      this.isEnsembleApiRunning = false;
+      this.ensembleProcess = null;
+    });
+
+    this.ensembleProcess.on('error', (error) => {
+      console.error('❌ Erro ao iniciar API Unificada:', error.message);
+      this.isEnsembleApiRunning = false;
+      this.ensembleProcess = null;
+    });
+
+    await this.waitForAPIReady('ensemble');
+  }
+
   /**
    * Aguarda uma API ML ficar disponível
    */
-  private async waitForAPIReady(apiType: 'risk' | 'classification'): Promise<void> {
+  private async waitForAPIReady(apiType: 'risk' | 'classification' | 'ensemble'): Promise<void> {
     const startTime = Date.now();
-    const apiUrl = apiType === 'risk' ? this.riskApiUrl : this.classificationApiUrl;
-    const apiName = apiType === 'risk' ? 'Risk API' : 'Classification API';
+    const apiUrls = {
+      risk: this.riskApiUrl,
+      classification: this.classificationApiUrl,
+      ensemble: this.ensembleApiUrl,
+    };
+    const apiNames = {
+      risk: 'Risk API',
+      classification: 'Classification API',
+      ensemble: 'Ensemble API',
+    };
+    const apiUrl = apiUrls[apiType];
+    const apiName = apiNames[apiType];
 
     while (Date.now() - startTime < this.maxStartupTime) {
       try {
@@ -172,8 +252,10 @@ class MLProcessManager {
         if (response.data.model_loaded === true || response.data.status === 'healthy') {
           if (apiType === 'risk') {
             this.isRiskApiRunning = true;
-          } else {
+          } else if (apiType === 'classification') {
             this.isClassificationApiRunning = true;
+          } else {
+            this.isEnsembleApiRunning = true;
           }
           
           console.log(`   ✅ ${apiName} operacional!`);
@@ -224,21 +306,33 @@ class MLProcessManager {
       this.classificationProcess = null;
       this.isClassificationApiRunning = false;
     }
+    
+    // Parar API Unificada
+    if (this.ensembleProcess) {
+      console.log('   Encerrando Ensemble API...');
+      if (process.platform === 'win32') {
+        spawn('taskkill', ['/pid', this.ensembleProcess.pid!.toString(), '/f', '/t']);
+      } else {
+        this.ensembleProcess.kill('SIGTERM');
+      }
+      this.ensembleProcess = null;
+      this.isEnsembleApiRunning = false;
+    }
   }
 
   /**
    * Verifica se as APIs estão rodando
    */
   isMLRunning(): boolean {
-    return this.isRiskApiRunning || this.isClassificationApiRunning;
+    return this.isRiskApiRunning || this.isClassificationApiRunning || this.isEnsembleApiRunning;
   }
   
   isRiskApiActive(): boolean {
-    return this.isRiskApiRunning;
+    return this.isRiskApiRunning || this.isEnsembleApiRunning;
   }
   
   isClassificationApiActive(): boolean {
-    return this.isClassificationApiRunning;
+    return this.isClassificationApiRunning || this.isEnsembleApiRunning;
   }
 
   /**
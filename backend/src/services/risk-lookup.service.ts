@@ -3,36 +3,24 @@
  * ============================
  *
  * Serviço para consulta rápida de scores de risco pré-calculados.
- * Carrega o arquivo risk_scores.json gerado pelo modelo ML em memória
- * e fornece lookups instantâneos de risco por segmento e contexto.
+ * Carrega o artefato risk_scores.bin (ou, na falta dele, risk_scores.json)
+ * gerado pelo modelo ML e fornece lookups instantâneos de risco por
+ * segmento e contexto. Se existir o cubo de contextos risk_cube.bin
+ * (hora × dia × mês × clima × pista), ele é consultado primeiro.
  *
  * Autor: Sistema Sompo
  * Data: 2025-10-14
  */
 
-import * as fs from 'fs';
 import * as path from 'path';
-
-interface RiskScoreMetadata {
-  generated_at: string;
-  total_segments: number;
-  total_accidents_analyzed: number;
-  model_type: string;
-  accuracy: string;
-  contexts: string[];
-  score_range: string;
-}
-
-interface SegmentScores {
-  [context: string]: number;
-}
-
-interface RiskScoresData {
-  metadata: RiskScoreMetadata;
-  scores: {
-    [segmentKey: string]: SegmentScores;
-  };
-}
+import * as fs from 'fs';
+import {
+  BinaryRiskScoreStore,
+  GridContext,
+  RiskScoreMetadata,
+  RiskScoreStore,
+  openRiskScoreStore,
+} from './risk-score-store';
 
 interface RiskPredictionInput {
   uf: string;
@@ -40,6 +28,9 @@ interface RiskPredictionInput {
   km: number;
   hour?: number;
   dayOfWeek?: number;
+  month?: number;
+  dayPhase?: string;
+  roadType?: string;
   weatherCondition?: string;
 }
 
@@ -59,12 +50,18 @@ interface RiskPredictionResult {
 }
 
 class RiskLookupService {
-  private riskData: RiskScoresData | null = null;
+  private riskData: RiskScoreStore | null = null;
+  private riskCube: BinaryRiskScoreStore | null = null;
+  private highwayIndex: Map<string, number[]> = new Map();
   private isLoaded: boolean = false;
   private riskScoresPath: string;
+  private riskArtifactPath: string;
+  private riskCubePath: string;
 
   constructor() {
     this.riskScoresPath = path.join(__dirname, '..', '..', 'risk_scores.json');
+    this.riskArtifactPath = path.join(__dirname, '..', '..', 'risk_scores.bin');
+    this.riskCubePath = path.join(__dirname, '..', '..', 'risk_cube.bin');
   }
 
   /**
@@ -73,31 +70,52 @@ class RiskLookupService {
   async initialize(): Promise<void> {
     try {
       console.log('📊 Carregando scores de risco pré-calculados...');
-      console.log(`   Arquivo: ${this.riskScoresPath}`);
 
-      if (!fs.existsSync(this.riskScoresPath)) {
-        console.warn('⚠️  Arquivo risk_scores.json não encontrado.');
+      const startTime = Date.now();
+      this.riskData = openRiskScoreStore(this.riskArtifactPath, this.riskScoresPath);
+
+      if (!this.riskData) {
+        console.warn('⚠️  Arquivos risk_scores.bin / risk_scores.json não encontrados.');
         console.warn('   Execute: python train_risk_model.py');
         this.isLoaded = false;
         return;
       }
 
-      const rawData = fs.readFileSync(this.riskScoresPath, 'utf-8');
-      this.riskData = JSON.parse(rawData);
+      this.highwayIndex = this.buildHighwayIndex(this.riskData);
+      this.isLoaded = true;
+      const file = this.riskData.format === 'binary' ? this.riskArtifactPath : this.riskScoresPath;
+      console.log('✅ Scores de risco carregados com sucesso!');
+      console.log(`   Arquivo: ${file} (${Date.now() - startTime} ms)`);
+      console.log(`   📍 ${this.riskData.metadata.total_segments} segmentos (${this.highwayIndex.size} rodovias)`);
+      console.log(`   🎯 Modelo: ${this.riskData.metadata.model_type}`);
+      console.log(`   📊 Acurácia: ${this.riskData.metadata.accuracy}`);
+    } catch (error: any) {
+      console.error('❌ Erro ao carregar scores de risco:', error.message);
+      this.riskData = null;
+      this.isLoaded = false;
+    }
 
-      if (this.riskData && this.riskData.scores) {
-        this.isLoaded = true;
-        console.log('✅ Scores de risco carregados com sucesso!');
-        console.log(`   📍 ${this.riskData.metadata.total_segments} segmentos`);
-        console.log(`   🎯 Modelo: ${this.riskData.metadata.model_type}`);
-        console.log(`   📊 Acurácia: ${this.riskData.metadata.accuracy}`);
-      } else {
-        console.error('❌ Formato inválido do arquivo risk_scores.json');
-        this.isLoaded = false;
+    this.loadRiskCube();
+  }
+
+  /**
+   * Carrega o cubo de contextos (opcional, gerado com RISK_CONTEXT_GRID)
+   */
+  private loadRiskCube(): void {
+    this.riskCube = null;
+    if (!fs.existsSync(this.riskCubePath)) return;
+
+    try {
+      const startTime = Date.now();
+      const cube = new BinaryRiskScoreStore(this.riskCubePath);
+      if (!cube.grid) {
+        console.warn(`⚠️  ${this.riskCubePath} não tem grid de contextos; ignorado`);
+        return;
       }
+      this.riskCube = cube;
+      console.log(`🧊 Cubo de contextos carregado: ${this.riskCubePath} (${Date.now() - startTime} ms)`);
     } catch (error: any) {
-      console.error('❌ Erro ao carregar risk_scores.json:', error.message);
-      this.isLoaded = false;
+      console.error('❌ Erro ao carregar cubo de contextos:', error.message);
     }
   }
 
@@ -122,19 +140,28 @@ class RiskLookupService {
     const segment_key = `${uf}_${br}_${km_segment}`;
 
     // Buscar score
-    const segmentScores = this.riskData.scores[segment_key];
+    const contextScore = this.riskData.getScore(segment_key, context);
 
     let risk_score: number;
     let found = false;
+    let context_used = context;
 
-    if (segmentScores && segmentScores[context]) {
-      risk_score = segmentScores[context];
+    // Cubo de contextos: score do contexto exato da requisição
+    const cubeScore = this.riskCube?.getGridScore(segment_key, this.determineGridContext(input));
+
+    if (cubeScore) {
+      risk_score = cubeScore.score;
+      context_used = cubeScore.context;
+      found = true;
+    } else if (contextScore) {
+      risk_score = contextScore;
       found = true;
     } else {
       // Tentar contexto default
       const defaultContext = 'dia_claro';
-      if (segmentScores && segmentScores[defaultContext]) {
-        risk_score = segmentScores[defaultContext];
+      const defaultScore = this.riskData.getScore(segment_key, defaultContext);
+      if (defaultScore) {
+        risk_score = defaultScore;
         found = true;
       } else {
         // Buscar segmentos próximos
@@ -162,7 +189,7 @@ class RiskLookupService {
       segment_key,
       risk_score: Math.round(risk_score * 100) / 100,
       risk_level,
-      context_used: context,
+      context_used,
       recommendations,
       weather_source: weatherInfo?.source as any,
       weather_used: weatherInfo?.condition,
@@ -202,6 +229,105 @@ class RiskLookupService {
     return `${phase}_${clima}`;
   }
 
+  /**
+   * Indexa os KMs de cada rodovia ("UF_BR"), em ordem crescente
+   */
+  private buildHighwayIndex(store: RiskScoreStore): Map<string, number[]> {
+    const index = new Map<string, number[]>();
+
+    store.forEachSegment((segment_key) => {
+      const [uf, br, km_str] = segment_key.split('_');
+      const highway = `${uf}_${br}`;
+      const kms = index.get(highway);
+      if (kms) {
+        kms.push(parseInt(km_str, 10));
+      } else {
+        index.set(highway, [parseInt(km_str, 10)]);
+      }
+    });
+
+    for (const kms of index.values()) {
+      kms.sort((a, b) => a - b);
+    }
+    return index;
+  }
+
+  /**
+   * Segmentos da mesma rodovia até maxDistance km do segmento (excluindo ele
+   * próprio), do mais próximo ao mais distante; em empates, o km anterior
+   * vem primeiro. Busca binária no índice da rodovia.
+   */
+  private findNearbyKms(
+    uf: string,
+    br: string,
+    km: number,
+    maxDistance: number,
+    limit: number
+  ): Array<{ km: number; distance_km: number }> {
+    const kms = this.highwayIndex.get(`${uf}_${br}`);
+    if (!kms) return [];
+
+    // Primeiro km >= km consultado
+    let low = 0;
+    let high = kms.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (kms[mid] < km) low = mid + 1;
+      else high = mid;
+    }
+
+    let left = low - 1;
+    let right = low < kms.length && kms[low] === km ? low + 1 : low;
+    const nearby: Array<{ km: number; distance_km: number }> = [];
+
+    while (nearby.length < limit) {
+      const leftDistance = left >= 0 ? km - kms[left] : Infinity;
+      const rightDistance = right < kms.length ? kms[right] - km : Infinity;
+      if (Math.min(leftDistance, rightDistance) > maxDistance) break;
+
+      if (leftDistance <= rightDistance) {
+        nearby.push({ km: kms[left], distance_km: leftDistance });
+        left--;
+      } else {
+        nearby.push({ km: kms[right], distance_km: rightDistance });
+        right++;
+      }
+    }
+
+    return nearby;
+  }
+
+  /**
+   * Contexto completo da requisição para o cubo (mesmos padrões e
+   * mapeamentos da API de predição: mês 6, pista simples, fase 'dia')
+   */
+  private determineGridContext(input: RiskPredictionInput): GridContext {
+    const weather = (input.weatherCondition || '').toLowerCase();
+
+    let clima: string;
+    if (weather.includes('chuva') || weather.includes('garoa')) {
+      clima = 'chuvoso';
+    } else if (weather.includes('nublado')) {
+      clima = 'nublado';
+    } else if (weather.includes('neblina') || weather.includes('nevoeiro')) {
+      clima = 'neblina';
+    } else {
+      clima = 'claro';
+    }
+
+    const roadType = (input.roadType || 'simples').toLowerCase();
+    const tipo_pista = ['simples', 'dupla', 'multipla'].includes(roadType) ? roadType : 'simples';
+
+    return {
+      hora: input.hour ?? 12,
+      dia_semana: input.dayOfWeek ?? 2,
+      mes: input.month ?? 6,
+      clima,
+      tipo_pista,
+      fase: (input.dayPhase || 'dia').toLowerCase(),
+    };
+  }
+
   /**
    * Busca score de segmentos próximos (±20km)
    */
@@ -215,19 +341,10 @@ class RiskLookupService {
 
     const searchRange = 20; // Buscar em ±20km
 
-    for (let offset = 10; offset <= searchRange; offset += 10) {
-      // Tentar km anterior
-      const prev_km = km - offset;
-      const prev_key = `${uf}_${br}_${prev_km}`;
-      if (this.riskData.scores[prev_key] && this.riskData.scores[prev_key][context] !== undefined) {
-        return { score: this.riskData.scores[prev_key][context], found: true };
-      }
-
-      // Tentar km posterior
-      const next_km = km + offset;
-      const next_key = `${uf}_${br}_${next_km}`;
-      if (this.riskData.scores[next_key] && this.riskData.scores[next_key][context] !== undefined) {
-        return { score: this.riskData.scores[next_key][context], found: true };
+    for (const nearby of this.findNearbyKms(uf, br, km, searchRange, Infinity)) {
+      const score = this.riskData.getScore(`${uf}_${br}_${nearby.km}`, context);
+      if (score !== undefined) {
+        return { score, found: true };
       }
     }
 
@@ -249,35 +366,17 @@ class RiskLookupService {
     const nearby: Array<{ segment_key: string; risk_score: number; distance_km: number }> = [];
 
     // Buscar em ±50km
-    for (let offset = 10; offset <= 50; offset += 10) {
+    for (const segment of this.findNearbyKms(uf, br, km, 50, Infinity)) {
       if (nearby.length >= limit) break;
 
-      // Anterior
-      const prev_km = km - offset;
-      const prev_key = `${uf}_${br}_${prev_km}`;
-      if (this.riskData.scores[prev_key] && this.riskData.scores[prev_key][context] !== undefined) {
-        nearby.push({
-          segment_key: prev_key,
-          risk_score: this.riskData.scores[prev_key][context],
-          distance_km: offset,
-        });
-      }
-
-      if (nearby.length >= limit) break;
-
-      // Posterior
-      const next_km = km + offset;
-      const next_key = `${uf}_${br}_${next_km}`;
-      if (this.riskData.scores[next_key] && this.riskData.scores[next_key][context] !== undefined) {
-        nearby.push({
-          segment_key: next_key,
-          risk_score: this.riskData.scores[next_key][context],
-          distance_km: offset,
-        });
+      const segment_key = `${uf}_${br}_${segment.km}`;
+      const risk_score = this.riskData.getScore(segment_key, context);
+      if (risk_score !== undefined) {
+        nearby.push({ segment_key, risk_score, distance_km: segment.distance_km });
       }
     }
 
-    return nearby.sort((a, b) => a.distance_km - b.distance_km).slice(0, limit);
+    return nearby;
   }
 
   /**
@@ -376,8 +475,7 @@ class RiskLookupService {
       max_risk_score: number;
     }> = [];
 
-    for (const [segment_key, scores] of Object.entries(this.riskData.scores)) {
-      const scoreValues = Object.values(scores);
+    this.riskData.forEachSegment((segment_key, scoreValues) => {
       const avg_risk_score = scoreValues.reduce((a, b) => a + b, 0) / scoreValues.length;
       const max_risk_score = Math.max(...scoreValues);
 
@@ -392,7 +490,7 @@ class RiskLookupService {
           max_risk_score: Math.round(max_risk_score * 100) / 100,
         });
       }
-    }
+    });
 
     return segments.sort((a, b) => b.avg_risk_score - a.avg_risk_score).slice(0, limit);
   }
@@ -414,15 +512,14 @@ class RiskLookupService {
 
     const distribution = { baixo: 0, moderado: 0, alto: 0, critico: 0 };
 
-    for (const scores of Object.values(this.riskData.scores)) {
-      const scoreValues = Object.values(scores);
+    this.riskData.forEachSegment((_segment_key, scoreValues) => {
       const avg = scoreValues.reduce((a, b) => a + b, 0) / scoreValues.length;
 
       if (avg >= 80) distribution.critico++;
       else if (avg >= 60) distribution.alto++;
       else if (avg >= 40) distribution.moderado++;
       else distribution.baixo++;
-    }
+    });
 
     return {
       total_segments: this.riskData.metadata.total_segments,
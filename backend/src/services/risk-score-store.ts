@@ -0,0 +1,279 @@
+/**
+ * Risk Score Store - Sompo
+ * ========================
+ *
+ * Armazenamento dos scores pré-calculados usados por RiskLookupService.
+ *
+ * - BinaryRiskScoreStore: lê backend/risk_scores.bin (scripts/risk_artifact.py).
+ *   O índice de segmentos e a matriz de scores são views tipadas sobre o
+ *   buffer do arquivo, sem parse por segmento; a busca é binária no índice.
+ *   Também lê o cubo de contextos quantizado backend/risk_cube.bin
+ *   (scripts/context_grid.py), consultado com getGridScore.
+ * - JsonRiskScoreStore: lê o formato antigo backend/risk_scores.json.
+ *
+ * Autor: Sistema Sompo
+ * Data: 2025-10-14
+ */
+
+import * as fs from 'fs';
+
+export interface RiskScoreMetadata {
+  generated_at: string;
+  total_segments: number;
+  total_accidents_analyzed: number;
+  model_type: string;
+  accuracy: string;
+  contexts: string[];
+  score_range: string;
+}
+
+export interface RiskScoreStore {
+  readonly format: 'binary' | 'json';
+  readonly metadata: RiskScoreMetadata;
+  /** Score do segmento ("UF_BR_KM") no contexto, ou undefined */
+  getScore(segmentKey: string, context: string): number | undefined;
+  /** Percorre todos os segmentos com os scores de cada contexto */
+  forEachSegment(callback: (segmentKey: string, scores: number[]) => void): void;
+}
+
+/** Contexto de uma consulta ao cubo (mesmas features da API de predição) */
+export interface GridContext {
+  hora: number;
+  dia_semana: number;
+  mes: number;
+  clima: string;
+  tipo_pista: string;
+  fase?: string;
+}
+
+/** Eixos do grid de contextos; fase 'auto' = derivada da hora */
+interface GridAxes {
+  hora: number[];
+  dia_semana: number[];
+  mes: number[];
+  clima: string[];
+  fase: string[] | 'auto';
+  tipo_pista: string[];
+}
+
+// Ordem das dimensões do cubo (ver GRID_AXES em scripts/context_grid.py)
+const GRID_AXES: Array<keyof GridAxes> = ['hora', 'dia_semana', 'mes', 'clima', 'fase', 'tipo_pista'];
+
+interface RiskScoresJson {
+  metadata: RiskScoreMetadata;
+  scores: {
+    [segmentKey: string]: { [context: string]: number };
+  };
+}
+
+export class JsonRiskScoreStore implements RiskScoreStore {
+  readonly format = 'json' as const;
+  readonly metadata: RiskScoreMetadata;
+  private scores: RiskScoresJson['scores'];
+
+  constructor(filePath: string) {
+    const data: RiskScoresJson = JSON.parse(fs.readFileSync(filePath, 'utf-8'));
+    if (!data || !data.scores) {
+      throw new Error('Formato inválido do arquivo risk_scores.json');
+    }
+    this.metadata = data.metadata;
+    this.scores = data.scores;
+  }
+
+  getScore(segmentKey: string, context: string): number | undefined {
+    const segmentScores = this.scores[segmentKey];
+    return segmentScores ? segmentScores[context] : undefined;
+  }
+
+  forEachSegment(callback: (segmentKey: string, scores: number[]) => void): void {
+    for (const [segmentKey, scores] of Object.entries(this.scores)) {
+      callback(segmentKey, Object.values(scores));
+    }
+  }
+}
+
+// Layout do cabeçalho (ver scripts/risk_artifact.py)
+const ARTIFACT_MAGIC = 'SOMPORSK';
+const SUPPORTED_VERSIONS = [1, 2];
+const FIXED_HEADER_SIZE = 40;
+const BR_SHIFT = 20n;
+const UF_SHIFT = 32n;
+const MAX_BR = (1 << 12) - 1;
+const MAX_KM = (1 << 20) - 1;
+
+export class BinaryRiskScoreStore implements RiskScoreStore {
+  readonly format = 'binary' as const;
+  readonly metadata: RiskScoreMetadata;
+  private contexts: string[];
+  private ufs: string[];
+  private ufIndex: Map<string, number>;
+  private contextIndex: Map<string, number>;
+  private keys: BigUint64Array;
+  private scores: Float32Array | Uint8Array;
+  private scoreScale: number | null;
+  readonly grid: GridAxes | null;
+
+  constructor(filePath: string) {
+    let buffer = fs.readFileSync(filePath);
+
+    if (buffer.toString('latin1', 0, 8) !== ARTIFACT_MAGIC) {
+      throw new Error(`Arquivo não é um artefato de risco: ${filePath}`);
+    }
+    const version = buffer.readUInt32LE(8);
+    if (!SUPPORTED_VERSIONS.includes(version)) {
+      throw new Error(`Versão de artefato não suportada: ${version}`);
+    }
+
+    const nSegments = buffer.readUInt32LE(12);
+    const nContexts = buffer.readUInt32LE(16);
+    const headerLength = buffer.readUInt32LE(20);
+    const keysOffset = Number(buffer.readBigUInt64LE(24));
+    const scoresOffset = Number(buffer.readBigUInt64LE(32));
+
+    const header = JSON.parse(
+      buffer.toString('utf-8', FIXED_HEADER_SIZE, FIXED_HEADER_SIZE + headerLength)
+    );
+    this.metadata = header.metadata;
+    this.contexts = header.contexts;
+    this.ufs = header.ufs;
+    this.ufIndex = new Map(this.ufs.map((uf, i) => [uf, i]));
+    this.contextIndex = new Map(this.contexts.map((context, i) => [context, i]));
+    this.scoreScale = header.score_scale ?? null;
+    this.grid = header.grid ?? null;
+
+    // Typed arrays exigem offset alinhado; buffers pequenos podem vir do pool do Node
+    if (buffer.byteOffset % 8 !== 0) {
+      const copy = Buffer.alloc(buffer.length);
+      buffer.copy(copy);
+      buffer = copy;
+    }
+
+    // O arquivo é little-endian, assim como as plataformas suportadas (x86/ARM)
+    this.keys = new BigUint64Array(buffer.buffer, buffer.byteOffset + keysOffset, nSegments);
+    const ScoreArray = header.score_dtype === 'uint8' ? Uint8Array : Float32Array;
+    this.scores = new ScoreArray(
+      buffer.buffer,
+      buffer.byteOffset + scoresOffset,
+      nSegments * nContexts
+    );
+  }
+
+  /**
+   * Score 0-100 com 2 casas, desfazendo a quantização uint8 (cubos)
+   */
+  private decode(value: number): number {
+    const score = this.scoreScale ? value / this.scoreScale : value;
+    return Math.round(score * 100) / 100;
+  }
+
+  private findRow(segmentKey: string): number {
+    const [uf, brText, kmText] = segmentKey.split('_');
+    const ufIdx = this.ufIndex.get(uf);
+    const br = parseInt(brText, 10);
+    const km = parseInt(kmText, 10);
+
+    if (ufIdx === undefined || !(br >= 0 && br <= MAX_BR) || !(km >= 0 && km <= MAX_KM)) {
+      return -1;
+    }
+
+    const key = (BigInt(ufIdx) << UF_SHIFT) | (BigInt(br) << BR_SHIFT) | BigInt(km);
+
+    let low = 0;
+    let high = this.keys.length - 1;
+    while (low <= high) {
+      const mid = (low + high) >>> 1;
+      const value = this.keys[mid];
+      if (value === key) return mid;
+      if (value < key) low = mid + 1;
+      else high = mid - 1;
+    }
+    return -1;
+  }
+
+  getScore(segmentKey: string, context: string): number | undefined {
+    const column = this.contextIndex.get(context);
+    if (column === undefined) return undefined;
+
+    const row = this.findRow(segmentKey);
+    if (row < 0) return undefined;
+
+    // float32 -> 2 casas decimais, como no JSON
+    return this.decode(this.scores[row * this.contexts.length + column]);
+  }
+
+  /**
+   * Coluna do cubo para o contexto, ou -1 se um valor categórico não
+   * estiver no grid. Valores numéricos fora do grid usam o mais próximo.
+   */
+  gridColumn(context: GridContext): number {
+    if (!this.grid) return -1;
+
+    let column = 0;
+    for (const axis of GRID_AXES) {
+      const values = this.grid[axis];
+      if (values === 'auto') continue;
+
+      const value = context[axis];
+      let position: number;
+      if (typeof value === 'number') {
+        const numbers = values as number[];
+        position = 0;
+        for (let i = 1; i < numbers.length; i++) {
+          if (Math.abs(numbers[i] - value) < Math.abs(numbers[position] - value)) position = i;
+        }
+      } else {
+        position = (values as string[]).indexOf(value ?? '');
+        if (position < 0) return -1;
+      }
+      column = column * values.length + position;
+    }
+    return column;
+  }
+
+  /**
+   * Score do segmento no contexto do cubo, com o nome da coluna usada
+   */
+  getGridScore(segmentKey: string, context: GridContext): { score: number; context: string } | undefined {
+    const column = this.gridColumn(context);
+    if (column < 0) return undefined;
+
+    const row = this.findRow(segmentKey);
+    if (row < 0) return undefined;
+
+    return {
+      score: this.decode(this.scores[row * this.contexts.length + column]),
+      context: this.contexts[column],
+    };
+  }
+
+  private segmentKey(key: bigint): string {
+    const uf = this.ufs[Number(key >> UF_SHIFT)];
+    const br = Number((key >> BR_SHIFT) & BigInt(MAX_BR));
+    const km = Number(key & BigInt(MAX_KM));
+    return `${uf}_${String(br).padStart(3, '0')}_${km}`;
+  }
+
+  forEachSegment(callback: (segmentKey: string, scores: number[]) => void): void {
+    const nContexts = this.contexts.length;
+    for (let row = 0; row < this.keys.length; row++) {
+      const scores: number[] = [];
+      for (let column = 0; column < nContexts; column++) {
+        scores.push(this.decode(this.scores[row * nContexts + column]));
+      }
+      callback(this.segmentKey(this.keys[row]), scores);
+    }
+  }
+}
+
+/**
+ * Abre o artefato binário se existir; senão o JSON
+ */
+export function openRiskScoreStore(binaryPath: string, jsonPath: string): RiskScoreStore | null {
+  if (fs.existsSync(binaryPath)) {
+    return new BinaryRiskScoreStore(binaryPath);
+  }
+  if (fs.existsSync(jsonPath)) {
+    return new JsonRiskScoreStore(jsonPath);
+  }
+  return null;
+}
@@ -1,10 +1,10 @@
 """
 Análise rápida da estrutura do Excel
 """
-import pandas as pd
+from data_cache import load_dataset
 
 print("Analisando estrutura do Excel...")
-df = pd.read_excel("DadosReais/dados_acidentes.xlsx")
+df = load_dataset("DadosReais/dados_acidentes.xlsx")
 
 print(f"\n📊 Total de registros: {len(df):,}")
 print(f"\n📋 Colunas ({len(df.columns)}):")
@@ -2,129 +2,225 @@
 """
 Script para analisar dados do DATATRAN e extrair informações sobre rodovias por UF
 com nomes conhecidos e limites de quilometragem
+
+Os CSVs são lidos em blocos (apenas uf, br e km) e cada bloco é agregado
+por (uf, br) e somado aos totais acumulados, então a memória usada depende
+do número de rodovias e não do tamanho dos arquivos. Aceita vários
+arquivos (um por ano) de uma vez.
+
+Uso (a partir de scripts/):
+    python analyze_highways.py
+    python analyze_highways.py ../datatran2023/datatran2023.csv ../datatran2024/datatran2024.csv
 """
 
-import pandas as pd
+import argparse
 import json
-from collections import defaultdict
+import os
+import time
 
-def analyze_highways():
-    print("Analisando dados do DATATRAN para extrair informacoes de rodovias...")
-    
-    # Carregar dados do CSV
-    df = pd.read_csv('../datatran2025/datatran2025.csv', sep=';', encoding='latin-1')
-    
-    print(f"Total de registros: {len(df):,}")
-    
-    # Nomes conhecidos das rodovias (baseado em conhecimento público)
-    highway_names = {
-        '101': 'BR-101 (Rio-Santos)',
-        '116': 'BR-116 (Régis Bittencourt)',
-        '153': 'BR-153 (Transbrasiliana)',
-        '163': 'BR-163 (Santarém-Cuiabá)',
-        '230': 'BR-230 (Transamazônica)',
-        '251': 'BR-251 (Conectividade Regional)',
-        '262': 'BR-262 (Litoral Sudeste)',
-        '277': 'BR-277 (Paraná)',
-        '282': 'BR-282 (Santa Catarina)',
-        '287': 'BR-287 (Rio Grande do Sul)',
-        '290': 'BR-290 (Transbrasiliana Sul)',
-        '364': 'BR-364 (Cuiabá-Porto Velho)',
-        '365': 'BR-365 (Minas Gerais)',
-        '369': 'BR-369 (Paraná Interior)',
-        '376': 'BR-376 (Paraná)',
-        '381': 'BR-381 (Fernão Dias)',
-        '386': 'BR-386 (Rio Grande do Sul)',
-        '393': 'BR-393 (Rio de Janeiro)',
-        '405': 'BR-405 (Paraíba)',
-        '407': 'BR-407 (Pernambuco)',
-        '429': 'BR-429 (Rondônia)',
-        '040': 'BR-040 (Rio-Brasília)',
-        '020': 'BR-020 (Brasília-Fortaleza)',
-        '010': 'BR-010 (Belém-Brasília)',
-        '070': 'BR-070 (Mato Grosso)',
-        '135': 'BR-135 (Maranhão)',
-        '222': 'BR-222 (Maranhão-Piauí)',
-        '232': 'BR-232 (Pernambuco)',
-        '356': 'BR-356 (Rio de Janeiro)'
-    }
-    
-    # Analisar rodovias por UF
-    highways_by_uf = defaultdict(lambda: defaultdict(lambda: {'min_km': float('inf'), 'max_km': 0, 'accidents': 0}))
-    
-    for _, row in df.iterrows():
-        uf = row['uf']
-        br = str(row['br']) if pd.notna(row['br']) else '0'
-        # Converter vírgula para ponto e depois para float
-        km_str = str(row['km']) if pd.notna(row['km']) else '0'
-        km_str = km_str.replace(',', '.')
-        try:
-            km = float(km_str)
-        except ValueError:
-            km = 0
-        
-        if uf and br != '0' and km > 0:
-            highways_by_uf[uf][br]['min_km'] = min(highways_by_uf[uf][br]['min_km'], km)
-            highways_by_uf[uf][br]['max_km'] = max(highways_by_uf[uf][br]['max_km'], km)
-            highways_by_uf[uf][br]['accidents'] += 1
-    
-    # Criar estrutura final
+import numpy as np
+import pandas as pd
+
+DEFAULT_INPUTS = ['../datatran2025/datatran2025.csv']
+OUTPUT_PATH = '../backend/data/highways_by_uf.json'
+
+# Linhas lidas por bloco
+CHUNK_ROWS = 200_000
+
+# Apenas rodovias com pelo menos este número de acidentes
+MIN_ACCIDENTS = 5
+
+# Nomes conhecidos das rodovias (baseado em conhecimento público)
+HIGHWAY_NAMES = {
+    '101': 'BR-101 (Rio-Santos)',
+    '116': 'BR-116 (Régis Bittencourt)',
+    '153': 'BR-153 (Transbrasiliana)',
+    '163': 'BR-163 (Santarém-Cuiabá)',
+    '230': 'BR-230 (Transamazônica)',
+    '251': 'BR-251 (Conectividade Regional)',
+    '262': 'BR-262 (Litoral Sudeste)',
+    '277': 'BR-277 (Paraná)',
+    '282': 'BR-282 (Santa Catarina)',
+    '287': 'BR-287 (Rio Grande do Sul)',
+    '290': 'BR-290 (Transbrasiliana Sul)',
+    '364': 'BR-364 (Cuiabá-Porto Velho)',
+    '365': 'BR-365 (Minas Gerais)',
+    '369': 'BR-369 (Paraná Interior)',
+    '376': 'BR-376 (Paraná)',
+    '381': 'BR-381 (Fernão Dias)',
+    '386': 'BR-386 (Rio Grande do Sul)',
+    '393': 'BR-393 (Rio de Janeiro)',
+    '405': 'BR-405 (Paraíba)',
+    '407': 'BR-407 (Pernambuco)',
+    '429': 'BR-429 (Rondônia)',
+    '040': 'BR-040 (Rio-Brasília)',
+    '020': 'BR-020 (Brasília-Fortaleza)',
+    '010': 'BR-010 (Belém-Brasília)',
+    '070': 'BR-070 (Mato Grosso)',
+    '135': 'BR-135 (Maranhão)',
+    '222': 'BR-222 (Maranhão-Piauí)',
+    '232': 'BR-232 (Pernambuco)',
+    '356': 'BR-356 (Rio de Janeiro)'
+}
+
+
+def read_chunks(path, chunksize=CHUNK_ROWS):
+    """Lê um CSV do DATATRAN em blocos, só com as colunas uf, br e km"""
+    return pd.read_csv(
+        path,
+        sep=';',
+        encoding='latin-1',
+        decimal=',',
+        usecols=['uf', 'br', 'km'],
+        dtype={'uf': str},
+        chunksize=chunksize,
+    )
+
+
+def aggregate_chunk(chunk, row_offset):
+    """
+    Agrega um bloco por (uf, br): km mínimo, km máximo, acidentes e a
+    posição da primeira ocorrência (para manter a ordem do arquivo)
+    """
+    km = chunk['km']
+    if not pd.api.types.is_numeric_dtype(km):
+        # Bloco com valores de km não numéricos: converte o resto e descarta esses
+        km = pd.to_numeric(km.str.replace(',', '.', regex=False), errors='coerce')
+
+    br = pd.to_numeric(chunk['br'], errors='coerce')
+
+    valid = chunk['uf'].notna() & (chunk['uf'] != '') & br.notna() & (br != 0) & (km > 0)
+    rows = pd.DataFrame({
+        'uf': chunk['uf'][valid],
+        'br': br[valid].astype(np.int64).astype(str),
+        'km': km[valid],
+        'first_seen': np.flatnonzero(valid.to_numpy()) + row_offset,
+    })
+
+    return rows.groupby(['uf', 'br'], sort=False).agg(
+        min_km=('km', 'min'),
+        max_km=('km', 'max'),
+        accidents=('km', 'size'),
+        first_seen=('first_seen', 'min'),
+    )
+
+
+def merge_totals(totals, partial):
+    """Soma um agregado parcial aos totais acumulados"""
+    if totals is None:
+        return partial
+    combined = pd.concat([totals, partial])
+    return combined.groupby(level=['uf', 'br'], sort=False).agg(
+        min_km=('min_km', 'min'),
+        max_km=('max_km', 'max'),
+        accidents=('accidents', 'sum'),
+        first_seen=('first_seen', 'min'),
+    )
+
+
+def aggregate_files(paths, chunksize=CHUNK_ROWS):
+    """
+    Agrega todos os arquivos em blocos
+
+    Returns:
+        Tupla (DataFrame indexado por (uf, br), total de registros lidos)
+    """
+    totals = None
+    total_rows = 0
+
+    for path in paths:
+        file_rows = 0
+        for chunk in read_chunks(path, chunksize):
+            totals = merge_totals(totals, aggregate_chunk(chunk, total_rows))
+            total_rows += len(chunk)
+            file_rows += len(chunk)
+        print(f"  {path}: {file_rows:,} registros")
+
+    return totals, total_rows
+
+
+def build_result(totals):
+    """Monta o JSON por UF, rodovias ordenadas por número de acidentes"""
     result = {}
-    
-    for uf, highways in highways_by_uf.items():
-        result[uf] = []
-        
-        for br, data in highways.items():
-            if data['accidents'] >= 5:  # Apenas rodovias com pelo menos 5 acidentes
-                highway_info = {
-                    'br': br,
-                    'name': highway_names.get(br, f'BR-{br}'),
-                    'min_km': round(data['min_km'], 1),
-                    'max_km': round(data['max_km'], 1),
-                    'accidents': data['accidents'],
-                    'length_km': round(data['max_km'] - data['min_km'], 1)
-                }
-                result[uf].append(highway_info)
-        
-        # Ordenar por número de acidentes (mais perigosas primeiro)
-        result[uf].sort(key=lambda x: x['accidents'], reverse=True)
-    
+    if totals is None:
+        return result
+
+    # UFs na ordem em que aparecem nos arquivos; empates na ordem de aparição
+    uf_order = totals.groupby(level='uf', sort=False)['first_seen'].min().sort_values()
+    totals = totals[totals['accidents'] >= MIN_ACCIDENTS].sort_values('first_seen')
+
+    for uf in uf_order.index:
+        highways = totals[totals.index.get_level_values('uf') == uf].droplevel('uf')
+        highways = highways.sort_values('accidents', ascending=False, kind='stable')
+        result[uf] = [
+            {
+                'br': data.Index,
+                'name': HIGHWAY_NAMES.get(data.Index, f'BR-{data.Index}'),
+                'min_km': round(float(data.min_km), 1),
+                'max_km': round(float(data.max_km), 1),
+                'accidents': int(data.accidents),
+                'length_km': round(float(data.max_km - data.min_km), 1)
+            }
+            for data in highways.itertuples()
+        ]
+
+    return result
+
+
+def analyze_highways(paths=None, output_path=OUTPUT_PATH, chunksize=CHUNK_ROWS):
+    print("Analisando dados do DATATRAN para extrair informacoes de rodovias...")
+
+    paths = paths or DEFAULT_INPUTS
+    start = time.perf_counter()
+
+    totals, total_rows = aggregate_files(paths, chunksize)
+
+    print(f"Total de registros: {total_rows:,} ({time.perf_counter() - start:.2f}s)")
+
+    result = build_result(totals)
+
     # Criar diretório se não existir
-    import os
-    os.makedirs('../backend/data', exist_ok=True)
-    
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
     # Salvar resultado
-    with open('../backend/data/highways_by_uf.json', 'w', encoding='utf-8') as f:
+    with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
-    
-    print("Dados salvos em backend/data/highways_by_uf.json")
-    
+
+    print(f"Dados salvos em {output_path}")
+
     # Estatísticas
     total_ufs = len(result)
     total_highways = sum(len(highways) for highways in result.values())
-    
+
     print(f"\nEstatisticas:")
     print(f"  - UFs com dados: {total_ufs}")
     print(f"  - Total de rodovias: {total_highways}")
-    
+
     # Top 10 UFs com mais rodovias
     top_ufs = sorted(result.items(), key=lambda x: len(x[1]), reverse=True)[:10]
     print(f"\nTop 10 UFs com mais rodovias:")
     for uf, highways in top_ufs:
         print(f"  {uf}: {len(highways)} rodovias")
-    
+
     # Top 10 rodovias mais perigosas
     all_highways = []
     for uf, highways in result.items():
         for hw in highways:
             all_highways.append((uf, hw))
-    
+
     top_dangerous = sorted(all_highways, key=lambda x: x[1]['accidents'], reverse=True)[:10]
     print(f"\nTop 10 rodovias mais perigosas:")
     for uf, hw in top_dangerous:
         print(f"  {hw['name']} ({uf}): {hw['accidents']} acidentes (KM {hw['min_km']}-{hw['max_km']})")
-    
+
     return result
 
+
 if __name__ == "__main__":
-    analyze_highways()
+    parser = argparse.ArgumentParser(description='Extrai rodovias por UF dos CSVs do DATATRAN')
+    parser.add_argument('paths', nargs='*', help=f'CSVs do DATATRAN (padrão: {DEFAULT_INPUTS[0]})')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='Arquivo JSON de saída')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_ROWS, help='Linhas por bloco')
+    args = parser.parse_args()
+
+    analyze_highways(args.paths, args.output, args.chunksize)
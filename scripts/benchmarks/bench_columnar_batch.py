@@ -0,0 +1,181 @@
+"""
+Benchmark do transporte colunar dos lotes - Sompo
+=================================================
+
+Compara, em lotes de 10k e 100k linhas (cliente de teste do Flask, sem
+rede), o JSON atual (lista de objetos; resposta com eco da entrada e
+recomendações) com os formatos colunares de columnar_batch.py (Arrow IPC,
+.npz e msgpack, quando instalados; resposta enxuta):
+
+- bytes da requisição e da resposta
+- tempo do cliente para montar o corpo e ler a resposta
+- tempo da requisição (POST no cliente de teste) e total de ponta a ponta
+
+em /predict-batch e, com o modelo de classificação treinado, em
+/batch-classify.
+
+Paridade: score, nível e classe de cada linha iguais aos do lote JSON
+(classe e confiança em /batch-classify); sai com código 1 se houver
+divergência.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_columnar_batch.py
+    python scripts/benchmarks/bench_columnar_batch.py --sizes 10000 --repeat 5
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import io
+import logging
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import classification_api  # noqa: E402
+import columnar_batch  # noqa: E402
+import ml_prediction_api as api  # noqa: E402
+from columnar_batch import MIMETYPES, msgpack, pa  # noqa: E402
+
+UFS = ['SP', 'RJ', 'MG', 'PR', 'SC', 'RS', 'BA', 'GO']
+WEATHERS = ['claro', 'nublado', 'chuva', 'neblina']
+PHASES = ['dia', 'noite', 'amanhecer', 'anoitecer']
+ROADS = ['simples', 'dupla', 'multipla']
+
+
+def build_columns(n, seed=42):
+    """Lote sintético em colunas NumPy (mesmos campos de /predict)"""
+    rng = np.random.default_rng(seed)
+    return {
+        'uf': np.array(UFS)[rng.integers(len(UFS), size=n)],
+        'br': rng.choice([101, 116, 381, 40], n).astype(np.int32),
+        'km': rng.uniform(0, 600, n).round(1),
+        'hour': rng.integers(24, size=n).astype(np.int8),
+        'dayOfWeek': rng.integers(7, size=n).astype(np.int8),
+        'month': rng.integers(1, 13, size=n).astype(np.int8),
+        'weatherCondition': np.array(WEATHERS)[rng.integers(len(WEATHERS), size=n)],
+        'dayPhase': np.array(PHASES)[rng.integers(len(PHASES), size=n)],
+        'roadType': np.array(ROADS)[rng.integers(len(ROADS), size=n)],
+    }
+
+
+def encode_request(columns, fmt):
+    """Corpo da requisição no formato do cliente"""
+    if fmt == 'json':
+        names = list(columns)
+        rows = zip(*(columns[name].tolist() for name in names))
+        return api.app.json.dumps({'predictions': [dict(zip(names, row)) for row in rows]}).encode()
+    if fmt == 'arrow':
+        table = pa.table({
+            name: pa.array(values).dictionary_encode() if values.dtype.kind == 'U' else pa.array(values)
+            for name, values in columns.items()
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if fmt == 'npz':
+        buffer = io.BytesIO()
+        np.savez(buffer, **columns)
+        return buffer.getvalue()
+    return msgpack.packb({name: values.tolist() for name, values in columns.items()})
+
+
+def decode_response(response, fmt, endpoint):
+    """Lê a resposta e devolve (valor principal, classe) por linha"""
+    if fmt == 'json':
+        body = response.get_json()
+        if endpoint == '/predict-batch':
+            rows = body['data']['predictions']
+            return ([r['data']['risk_score'] for r in rows], [r['data']['risk_level'] for r in rows])
+        return [r['confidence'] for r in body['results']], [r['classification'] for r in body['results']]
+
+    columns, _ = columnar_batch.decode_columns(response.get_data(), fmt)
+    if fmt == 'arrow':
+        columns = {name: values.to_numpy(zero_copy_only=False) for name, values in columns.items()}
+    if endpoint == '/predict-batch':
+        return list(columns['risk_score']), list(columns['risk_level'])
+    return list(columns['confidence']), list(columns['classification'])
+
+
+def run(client, endpoint, columns, fmt, repeat):
+    """Medianas (ms) de montar o corpo, da requisição e da leitura; bytes e resultado"""
+    headers = {'Content-Type': MIMETYPES[fmt]}
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = encode_request(columns, fmt)
+        encoded = time.perf_counter()
+        response = client.post(endpoint, data=body, headers=headers)
+        served = time.perf_counter()
+        result = decode_response(response, fmt, endpoint)
+        decoded = time.perf_counter()
+        samples.append([(encoded - start) * 1000, (served - encoded) * 1000, (decoded - served) * 1000])
+    encode_ms, request_ms, decode_ms = np.median(samples, axis=0)
+    return {
+        'request_bytes': len(body),
+        'response_bytes': len(response.get_data()),
+        'encode_ms': encode_ms,
+        'request_ms': request_ms,
+        'decode_ms': decode_ms,
+        'result': result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='Linhas por lote')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições por medida (mediana)')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.INFO)
+
+    if not api.load_model():
+        sys.exit(1)
+    endpoints = [('/predict-batch', api.app.test_client())]
+    if classification_api.MODEL_PATH.exists() and classification_api.load_model():
+        endpoints.append(('/batch-classify', classification_api.app.test_client()))
+    else:
+        print("⚠️  Modelo de classificação não encontrado: só /predict-batch")
+
+    formats = ['json'] + [fmt for fmt in ('arrow', 'npz', 'msgpack') if columnar_batch.available(fmt)]
+    missing = [fmt for fmt in ('arrow', 'msgpack') if fmt not in formats]
+    print(f"📦 Transporte colunar: {', '.join(formats)}" + (f" (sem {', '.join(missing)})" if missing else ''))
+    print()
+
+    failed = 0
+    for endpoint, client in endpoints:
+        for size in args.sizes:
+            columns = build_columns(size)
+            print(f"   {endpoint} · {size:,} linhas")
+            print(f"   {'Formato':<8} {'Req. (KB)':>10} {'Resp. (KB)':>11} {'Montar (ms)':>12} "
+                  f"{'Requisição (ms)':>16} {'Ler (ms)':>9} {'Total (ms)':>11} {'Speedup':>8}")
+            baseline = None
+            for fmt in formats:
+                result = run(client, endpoint, columns, fmt, args.repeat)
+                total_ms = result['encode_ms'] + result['request_ms'] + result['decode_ms']
+                baseline = baseline or (total_ms, result['result'])
+                print(f"   {fmt:<8} {result['request_bytes'] / 1024:>10,.0f} {result['response_bytes'] / 1024:>11,.0f} "
+                      f"{result['encode_ms']:>12.1f} {result['request_ms']:>16.1f} {result['decode_ms']:>9.1f} "
+                      f"{total_ms:>11.1f} {baseline[0] / total_ms:>7.1f}x")
+
+                values, labels = result['result']
+                mismatches = sum(a != b or la != lb
+                                 for a, b, la, lb in zip(values, baseline[1][0], labels, baseline[1][1]))
+                failed += mismatches
+                if mismatches:
+                    print(f"   ❌ {mismatches} linhas divergentes do JSON ({fmt})")
+            print()
+
+    print(f"Paridade: {'OK' if not failed else f'{failed} divergências'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
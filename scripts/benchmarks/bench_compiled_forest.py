@@ -0,0 +1,188 @@
+"""
+Benchmark da floresta compilada - Sompo
+=======================================
+
+Compara o RandomForest de classificação no sklearn (.joblib) com a
+floresta compilada em arrays NumPy (compiled_forest.py, .forest.bin):
+
+- tamanho do arquivo
+- carga em um processo novo (import + leitura do arquivo) e memória (pico
+  de RSS do processo)
+- latência de predict_proba em lotes de 1, 100 e 10k linhas (sklearn com
+  n_jobs=1 e com o n_jobs do treinamento)
+- paridade bit a bit das probabilidades (limiares e vizinhos, linhas
+  sintéticas e linhas com NaN); sai com código 1 se houver divergência
+
+Sem backend/models/modeloClassificacao.joblib, treina uma floresta com os
+parâmetros de train_classification_model.py em dados sintéticos.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_compiled_forest.py
+    python scripts/benchmarks/bench_compiled_forest.py --sizes 1 100 10000 --repeat 20
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_single_pass import build_features  # noqa: E402
+from compiled_forest import MODEL_PATH, compile_forest, verify_forest  # noqa: E402
+
+# Executado no processo filho: argv = scripts, formato (joblib/bin), caminho
+CHILD = '''
+import sys, time, json, resource, warnings
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+if sys.argv[2] == 'joblib':
+    import joblib
+    model = joblib.load(sys.argv[3])
+else:
+    from compiled_forest import CompiledForest
+    model = CompiledForest.load(sys.argv[3])
+load_ms = (time.perf_counter() - start) * 1000
+try:
+    # Pico do próprio processo (ru_maxrss herda o pico do pai através do exec)
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'load_ms': load_ms, 'rss_mb': rss_kb / 1024}))
+'''
+
+
+def train_synthetic_forest(rows=37000, seed=0):
+    """RandomForest com os parâmetros do treinamento, em dados sintéticos"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    features = build_features(rows, seed)
+    rng = np.random.default_rng(seed)
+    labels = ((features[:, 3] > 18).astype(int) + (features[:, 6] > 2) + (rng.random(rows) < 0.3)).clip(0, 2)
+    model = RandomForestClassifier(n_estimators=100, max_depth=15, min_samples_split=5, min_samples_leaf=2,
+                                   random_state=42, n_jobs=-1, class_weight='balanced')
+    return model.fit(features, labels)
+
+
+def load_in_fresh_process(kind, path, runs):
+    """Mediana da carga (ms) e do pico de RSS (MB) em processos novos"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', CHILD, str(SCRIPTS_DIR), kind, str(path)],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return (float(np.median([r['load_ms'] for r in results])),
+            float(np.median([r['rss_mb'] for r in results])))
+
+
+def time_ms(fn, features, repeat):
+    """Mediana de repeat chamadas (ms)"""
+    fn(features)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(features)
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def sklearn_proba(model, n_jobs):
+    def predict(features):
+        model.set_params(n_jobs=n_jobs)
+        return model.predict_proba(features)
+    return predict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--model', type=Path, default=MODEL_PATH, help='Modelo .joblib (RandomForest)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000], help='Tamanhos de lote')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetições por medida (mediana)')
+    parser.add_argument('--runs', type=int, default=3, help='Processos novos na medida de carga')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.model.exists():
+            model_path = args.model
+            model = joblib.load(model_path)
+            source = str(model_path)
+        else:
+            print(f"⚠️  {args.model} não encontrado: treinando floresta sintética "
+                  f"(parâmetros de train_classification_model.py)")
+            model_path = Path(workdir) / 'modeloClassificacao.joblib'
+            model = train_synthetic_forest()
+            joblib.dump(model, model_path)
+            source = 'floresta sintética'
+
+        training_jobs = model.get_params()['n_jobs']
+        start = time.perf_counter()
+        forest = compile_forest(model)
+        compile_ms = (time.perf_counter() - start) * 1000
+        # Grava em um diretório temporário (não sobrescreve o .forest.bin do projeto)
+        forest_path = Path(workdir) / 'bench.forest.bin'
+        forest_size = forest.save(forest_path)
+
+        n_nodes = len(forest.feature)
+        print(f"🌲 {source}: {forest.n_estimators} árvores, {n_nodes:,} nós, profundidade {forest.max_depth} "
+              f"(compilação {compile_ms:.0f} ms)")
+        print()
+
+        # Arquivo, carga e memória
+        joblib_load_ms, joblib_rss = load_in_fresh_process('joblib', model_path, args.runs)
+        bin_load_ms, bin_rss = load_in_fresh_process('bin', forest_path, args.runs)
+        print(f"   {'Formato':<22} {'Arquivo (MB)':>13} {'Carga (ms)':>11} {'RSS (MB)':>9}")
+        print(f"   {'sklearn (.joblib)':<22} {model_path.stat().st_size / 1024 / 1024:>13.1f} "
+              f"{joblib_load_ms:>11.1f} {joblib_rss:>9.1f}")
+        print(f"   {'compilada (.bin)':<22} {forest_size / 1024 / 1024:>13.1f} "
+              f"{bin_load_ms:>11.1f} {bin_rss:>9.1f}")
+        print("   (carga em processo novo, incluindo os imports; RSS = pico do processo)")
+        print()
+
+        # Latência por tamanho de lote
+        print(f"   {'Lote':>7} {'sklearn n_jobs=1':>17} {f'sklearn n_jobs={training_jobs}':>17} "
+              f"{'compilada':>10} {'Speedup':>8}")
+        for size in args.sizes:
+            features = build_features(size, seed=size)
+            repeat = args.repeat if size <= 1000 else max(3, args.repeat // 4)
+            sequential_ms = time_ms(sklearn_proba(model, 1), features, repeat)
+            parallel_ms = time_ms(sklearn_proba(model, training_jobs), features, repeat)
+            compiled_ms = time_ms(forest.predict_proba, features, repeat)
+            print(f"   {size:>7,} {sequential_ms:>17.3f} {parallel_ms:>17.3f} {compiled_ms:>10.3f} "
+                  f"{min(sequential_ms, parallel_ms) / compiled_ms:>7.1f}x")
+        print()
+
+        # Paridade bit a bit (sklearn somando as árvores em ordem, n_jobs=1)
+        with_nan = build_features(5000, seed=7)
+        with_nan[np.random.default_rng(7).random(with_nan.shape) < 0.1] = np.nan
+        checks = {
+            'limiares e vizinhos': verify_forest(model, forest),
+            'linhas sintéticas': verify_forest(model, forest, build_features(10000, seed=3)),
+            'linhas com NaN': verify_forest(model, forest, with_nan),
+        }
+        for name, ok in checks.items():
+            print(f"   {'✅' if ok else '❌'} Paridade ({name})")
+        model.set_params(n_jobs=training_jobs)
+
+    print()
+    failed = not all(checks.values())
+    print(f"Paridade: {'OK' if not failed else 'DIVERGENTE'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark do cubo de contextos - Sompo
+======================================
+
+Gera o cubo quantizado de context_grid.py para segmentos sintéticos e
+mede:
+
+- tempo de geração com 1 e N workers (cubos idênticos)
+- erro da quantização uint8 contra os scores exatos (máximo 0,2 ponto)
+- erro do lookup antigo, que aproxima cada requisição por um dos 8
+  contextos fixos (regra de determineContext em risk-lookup.service.ts),
+  contra o score exato do contexto da requisição
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_context_grid.py --segments 500 --workers 2
+    python scripts/benchmarks/bench_context_grid.py --grid "mes=1-12;clima=claro,chuvoso"
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_risk_map import build_segments  # noqa: E402
+from context_grid import ContextGrid, RiskCube, generate_risk_cube, write_risk_cube  # noqa: E402
+from risk_artifact import SCORE_SCALE  # noqa: E402
+from risk_map import CONTEXTOS, score_risk_map  # noqa: E402
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+# Segmentos com score exato (float) para medir os erros
+SAMPLE_SEGMENTS = 100
+
+
+def legacy_context(ctx):
+    """Contexto fixo escolhido pelo backend antigo para um contexto do grid"""
+    phase = 'noite' if ctx['hora'] >= 18 or ctx['hora'] < 6 else 'dia'
+    if ctx['clima'] in ('chuvoso', 'neblina'):
+        clima = 'chuvoso'
+    elif ctx['clima'] == 'nublado':
+        clima = 'nublado'
+    else:
+        clima = 'claro'
+    name = f"{phase}_{clima}"
+    names = [c['nome'] for c in CONTEXTOS]
+    return names.index(name) if name in names else names.index('dia_claro')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--segments', type=int, default=500, help='Segmentos sintéticos')
+    parser.add_argument('--grid', default='default', help='Especificação do grid')
+    parser.add_argument('--workers', type=int, default=2, help='Workers da segunda geração')
+    args = parser.parse_args()
+
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+
+    model = joblib.load(MODEL_PATH)
+    le_dict = joblib.load(ENCODERS_PATH)
+
+    grid, removed = ContextGrid.from_spec(args.grid).restrict_to_encoders(le_dict)
+    segments = build_segments(args.segments, list(le_dict['uf'].classes_))
+    segments = segments.drop_duplicates(['uf', 'br', 'km']).reset_index(drop=True)
+    contexts = grid.contexts()
+    combinations = len(segments) * len(contexts)
+    failed = False
+
+    print(f"📍 {len(segments):,} segmentos × {len(grid):,} contextos {grid.shape} = {combinations:,} combinações")
+    if removed:
+        print(f"   (fora dos encoders: {', '.join(f'{a}={v}' for a, v in removed)})")
+    print()
+
+    cubes = {}
+    for workers in sorted({1, args.workers}):
+        start = time.perf_counter()
+        cubes[workers], _, _ = generate_risk_cube(model, le_dict, segments, grid, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"   Geração com {workers} worker(s): {elapsed:.2f}s ({combinations / elapsed:,.0f} combinações/s)")
+    cube = cubes[1]
+    identical = all(np.array_equal(cube, other) for other in cubes.values())
+    failed |= not identical
+    print(f"   Cubos idênticos entre workers: {'OK' if identical else 'DIVERGENTE'}")
+    print()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / 'risk_cube.bin'
+        size = write_risk_cube(path, segments, cube, grid)
+
+        start = time.perf_counter()
+        risk_cube = RiskCube(path)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        # Scores exatos de uma amostra de segmentos em todos os contextos
+        sample = segments.iloc[:SAMPLE_SEGMENTS].reset_index(drop=True)
+        exact, _, _ = score_risk_map(model, le_dict, sample, contexts)
+        legacy, _, _ = score_risk_map(model, le_dict, sample, CONTEXTOS)
+
+        rows = np.array([risk_cube.find(uf, br, km) for uf, br, km in
+                         zip(sample['uf'], sample['br'].astype(int), sample['km'].astype(int))])
+        quantized = risk_cube.decode_scores(risk_cube.scores[rows])
+        quantization_error = np.abs(quantized - exact)
+
+        snapped = legacy[:, [legacy_context(ctx) for ctx in contexts]]
+        snapping_error = np.abs(snapped - exact)
+
+        start = time.perf_counter()
+        for uf, br, km in zip(sample['uf'], sample['br'], sample['km']):
+            risk_cube.lookup_context(uf, br, km, hora=22, dia_semana=5, clima='chuvoso')
+        lookup_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        risk_cube.close()
+
+    float32_mb = combinations * 4 / 1024 / 1024
+    print(f"   Cubo uint8: {size / 1024 / 1024:.2f} MB (float32 seria {float32_mb:.2f} MB), "
+          f"abertura {open_ms:.2f} ms, lookup {lookup_us:.1f} µs")
+    print()
+    print(f"Erro vs score exato ({len(sample)} segmentos × {len(contexts):,} contextos):")
+    print(f"   Cubo quantizado:      médio {quantization_error.mean():.3f} | máximo {quantization_error.max():.3f}")
+    print(f"   8 contextos fixos:    médio {snapping_error.mean():.3f} | máximo {snapping_error.max():.3f}")
+
+    ok = quantization_error.max() <= 0.5 / SCORE_SCALE + 1e-6
+    failed |= not ok
+    print(f"   Quantização dentro do limite ({0.5 / SCORE_SCALE:.1f}): {'OK' if ok else 'DIVERGENTE'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
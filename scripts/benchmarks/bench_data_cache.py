@@ -0,0 +1,132 @@
+"""
+Benchmark do cache colunar de dados - Sompo
+===========================================
+
+Mede tempo de carga e pico de memória (RSS) de pd.read_excel contra
+data_cache.load_dataset (cache frio e quente). Cada medição roda em um
+subprocesso próprio, para que o pico de RSS seja só daquela leitura.
+
+Sem --path, gera um XLSX sintético no formato do DATATRAN.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_data_cache.py --path DadosReais/dados_acidentes.xlsx
+    python scripts/benchmarks/bench_data_cache.py --rows 50000
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import datetime as dt
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from data_cache import CACHE_DIR_NAME  # noqa: E402
+
+# Executado em subprocesso: carrega o arquivo e devolve tempo, RSS e memória do DataFrame
+MEASURE_CODE = '''
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+import pandas as pd
+from data_cache import load_dataset, peak_rss_mb
+mode, path = sys.argv[2], sys.argv[3]
+start = time.perf_counter()
+df = pd.read_excel(path) if mode == 'excel' else load_dataset(path, verbose=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'peak_rss_mb': peak_rss_mb(),
+    'frame_mb': df.memory_usage(deep=True).sum() / 1024 / 1024,
+    'rows': len(df),
+}))
+'''
+
+
+def build_synthetic_excel(path, n, seed=42):
+    """XLSX sintético com as colunas do DATATRAN usadas pelos scripts"""
+    rng = np.random.default_rng(seed)
+    times = np.array([dt.time(h, m) for h in range(24) for m in range(0, 60, 5)], dtype=object)
+    df = pd.DataFrame({
+        'id': np.arange(n),
+        'data_inversa': pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 1460, n), unit='D'),
+        'horario': times[rng.integers(0, len(times), n)],
+        'uf': rng.choice(['SP', 'MG', 'RJ', 'PR', 'SC', 'RS', 'BA', 'GO'], n),
+        'br': rng.choice([101, 116, 381, 40, 153, 262], n),
+        'km': np.round(rng.uniform(0, 600, n), 1),
+        'municipio': rng.choice([f'MUNICIPIO {i}' for i in range(800)], n),
+        'causa_acidente': rng.choice(['Falta de atenção', 'Velocidade incompatível', 'Ingestão de álcool'], n),
+        'tipo_acidente': rng.choice(['Colisão traseira', 'Saída de pista', 'Capotamento'], n),
+        'fase_dia': rng.choice(['Pleno dia', 'Plena Noite', 'Amanhecer', 'Anoitecer'], n),
+        'condicao_metereologica': rng.choice(['Céu Claro', 'Nublado', 'Chuva', 'Sol'], n),
+        'tipo_pista': rng.choice(['Dupla', 'Simples', 'Múltipla'], n),
+        'mortos': rng.poisson(0.05, n),
+        'feridos_leves': rng.poisson(0.5, n),
+        'feridos_graves': rng.poisson(0.2, n),
+        'latitude': rng.uniform(-30, -5, n),
+        'longitude': rng.uniform(-60, -35, n),
+    })
+    df.to_excel(path, index=False)
+
+
+def measure(mode, path):
+    output = subprocess.run(
+        [sys.executable, '-c', MEASURE_CODE, str(SCRIPTS_DIR), mode, str(path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def report(label, result):
+    rss = f"{result['peak_rss_mb']:,.0f} MB" if result['peak_rss_mb'] is not None else 'n/d'
+    print(f"   {label:<24} {result['seconds']:>8.2f}s   pico RSS {rss:>9}   "
+          f"DataFrame {result['frame_mb']:>7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--path', help='XLSX real (padrão: sintético)')
+    parser.add_argument('--rows', type=int, default=50000, help='Linhas do XLSX sintético')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='sompo-cache-bench-'))
+    try:
+        if args.path:
+            path = workdir / Path(args.path).name
+            shutil.copy2(args.path, path)
+        else:
+            path = workdir / 'dados_acidentes.xlsx'
+            print(f"📝 Gerando XLSX sintético com {args.rows:,} linhas...")
+            build_synthetic_excel(path, args.rows)
+
+        print(f"📊 {path.name} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+        print()
+
+        excel = measure('excel', path)
+        cold = measure('cache', path)
+        warm = measure('cache', path)
+
+        report('pd.read_excel', excel)
+        report('load_dataset (frio)', cold)
+        report('load_dataset (quente)', warm)
+        print()
+        print(f"   Carga: {excel['seconds'] / warm['seconds']:.0f}x mais rápida | "
+              f"DataFrame: {excel['frame_mb'] / warm['frame_mb']:.1f}x menor")
+
+        cache_files = sorted((path.parent / CACHE_DIR_NAME).iterdir())
+        print(f"   Cache: {', '.join(f.name for f in cache_files)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark de encoding categórico - Sompo
+========================================
+
+Mede a latência de codificar as 4 features categóricas de uma requisição
+com LabelEncoder.transform (antes) e com as tabelas de lookup compiladas
+por compile_encoders (depois), e o custo por linha em lotes.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_encoding.py
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference_engine import compile_encoders, encode_value, encode_column  # noqa: E402
+
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+CATEGORICAL = ['uf', 'clima_categoria', 'fase_dia_categoria', 'tipo_pista_categoria']
+
+
+def build_rows(label_encoders, n, seed=42):
+    """Gera n linhas com valores conhecidos pelos encoders"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        name: rng.choice(label_encoders[name].classes_, n).tolist()
+        for name in CATEGORICAL
+    }
+    return [{name: columns[name][i] for name in CATEGORICAL} for i in range(n)]
+
+
+def per_request_transform(label_encoders, row):
+    return [label_encoders[name].transform([row[name]])[0] for name in CATEGORICAL]
+
+
+def per_request_tables(encoding_tables, row):
+    return [encode_value(encoding_tables, name, row[name]) for name in CATEGORICAL]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1000, 100000])
+    args = parser.parse_args()
+
+    label_encoders = joblib.load(ENCODERS_PATH)
+
+    start = time.perf_counter()
+    encoding_tables = compile_encoders(label_encoders)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    rows = build_rows(label_encoders, args.requests)
+
+    # Paridade: mesmos códigos do LabelEncoder
+    for row in rows[:1000]:
+        assert per_request_transform(label_encoders, row) == per_request_tables(encoding_tables, row)
+
+    start = time.perf_counter()
+    for row in rows:
+        per_request_transform(label_encoders, row)
+    before_us = (time.perf_counter() - start) / len(rows) * 1e6
+
+    start = time.perf_counter()
+    for row in rows:
+        per_request_tables(encoding_tables, row)
+    after_us = (time.perf_counter() - start) / len(rows) * 1e6
+
+    print()
+    print(f"Compilação das tabelas: {compile_ms:.3f} ms (uma vez, no load_model)")
+    print()
+    print("Por requisição (4 features categóricas):")
+    print(f"   LabelEncoder.transform: {before_us:10.2f} µs")
+    print(f"   Tabelas de lookup:      {after_us:10.2f} µs ({before_us / after_us:.0f}x)")
+    print()
+    print("Em lote (por linha, 4 colunas):")
+    for n in args.batch_sizes:
+        batch = build_rows(label_encoders, n, seed=n)
+        columns = {name: [row[name] for row in batch] for name in CATEGORICAL}
+
+        start = time.perf_counter()
+        for name in CATEGORICAL:
+            label_encoders[name].transform(columns[name])
+        transform_us = (time.perf_counter() - start) / n * 1e6
+
+        start = time.perf_counter()
+        for name in CATEGORICAL:
+            encode_column(encoding_tables[name], columns[name])
+        tables_us = (time.perf_counter() - start) / n * 1e6
+
+        print(f"   {n:>8,} linhas: transform {transform_us:.3f} µs | "
+              f"tabelas {tables_us:.3f} µs ({transform_us / tables_us:.1f}x)")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark do feature engineering dos treinamentos - Sompo
+=========================================================
+
+Compara o STEP 2 antigo dos scripts de treinamento (apply linha a linha
+para hora e gravidade) com feature_engineering.engineer_features sobre um
+extrato sintético do DATATRAN. Verifica que os DataFrames gerados são
+idênticos para os dois scripts (gravidade e classificacao) e mede o tempo.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_feature_engineering.py --rows 1000000
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import datetime as dt
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from feature_engineering import (  # noqa: E402
+    DAY_PHASE_MAPPING,
+    ROAD_TYPE_MAPPING,
+    WEATHER_CATEGORY_MAPPING,
+    engineer_features,
+)
+
+
+def build_raw(n, seed=42):
+    """Extrato sintético com as colunas usadas no feature engineering"""
+    rng = np.random.default_rng(seed)
+
+    times = np.array([dt.time(h, m) for h in range(24) for m in range(0, 60, 5)], dtype=object)
+    horario = times[rng.integers(0, len(times), n)]
+    horario[rng.random(n) < 0.001] = None
+    horario[rng.random(n) < 0.001] = '12:30:00'
+
+    weather = list(WEATHER_CATEGORY_MAPPING) + ['Granizo', None]
+    phases = list(DAY_PHASE_MAPPING) + [None]
+    roads = list(ROAD_TYPE_MAPPING) + [None]
+    dates = pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 1460, n), unit='D')
+
+    casualties = {}
+    for column, rate in [('mortos', 0.05), ('feridos_graves', 0.2), ('feridos_leves', 0.5)]:
+        values = rng.poisson(rate, n).astype(np.float64)
+        values[rng.random(n) < 0.01] = np.nan
+        casualties[column] = values
+
+    return pd.DataFrame({
+        'data_inversa': dates.strftime('%Y-%m-%d'),
+        'horario': horario,
+        'uf': rng.choice(['SP', 'MG', 'RJ', 'PR'], n),
+        'br': rng.choice([101, 116, 381], n),
+        'km': rng.uniform(0, 600, n),
+        'condicao_metereologica': rng.choice(np.array(weather, dtype=object), n),
+        'fase_dia': rng.choice(np.array(phases, dtype=object), n),
+        'tipo_pista': rng.choice(np.array(roads, dtype=object), n),
+        **casualties,
+    })
+
+
+def legacy_features(df, target_column):
+    """STEP 2 original de train_risk_model.py / train_classification_model.py"""
+    df_clean = df.copy()
+    df_clean['data'] = pd.to_datetime(df_clean['data_inversa'], errors='coerce')
+    df_clean['hora'] = df_clean['horario'].apply(lambda x: x.hour if hasattr(x, 'hour') else 12)
+    df_clean['dia_semana'] = df_clean['data'].dt.dayofweek
+    df_clean['mes'] = df_clean['data'].dt.month
+    df_clean['clima_categoria'] = df_clean['condicao_metereologica'].map(WEATHER_CATEGORY_MAPPING).fillna('claro')
+    df_clean['fase_dia_categoria'] = df_clean['fase_dia'].map(DAY_PHASE_MAPPING).fillna('dia')
+    df_clean['tipo_pista_categoria'] = df_clean['tipo_pista'].map(ROAD_TYPE_MAPPING).fillna('simples')
+    df_clean['mortos'] = df_clean['mortos'].fillna(0).astype(int)
+    df_clean['feridos_graves'] = df_clean['feridos_graves'].fillna(0).astype(int)
+    df_clean['feridos_leves'] = df_clean['feridos_leves'].fillna(0).astype(int)
+
+    def classify_severity(row):
+        if row['mortos'] > 0:
+            return 2
+        elif row['feridos_graves'] > 0 or row['feridos_leves'] > 0:
+            return 1
+        else:
+            return 0
+
+    df_clean[target_column] = df_clean.apply(classify_severity, axis=1)
+    return df_clean
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Linhas sintéticas')
+    args = parser.parse_args()
+
+    raw = build_raw(args.rows)
+    print(f"📊 {len(raw):,} linhas sintéticas")
+    print()
+
+    failed = False
+    for target in ('gravidade', 'classificacao'):
+        expected, legacy_time = timed(legacy_features, raw, target)
+        result, vector_time = timed(engineer_features, raw, target_column=target)
+
+        try:
+            pd.testing.assert_frame_equal(result, expected)
+            ok = True
+        except AssertionError as e:
+            ok = False
+            print(f"   ❌ {e}")
+        failed |= not ok
+
+        print(f"{target}:")
+        print(f"   Paridade: {'OK' if ok else 'DIVERGENTE'}")
+        print(f"   apply linha a linha: {legacy_time:.2f}s")
+        print(f"   vetorizado:          {vector_time:.2f}s ({legacy_time / vector_time:.1f}x)")
+        print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark da previsão LSTM em CPU - Sompo
+=========================================
+
+Mede o caminho de serviço de lstm_forecast.py em CPU:
+
+- carga em um processo novo (imports + modelo): backend numpy (pesos do
+  .keras via h5py) e keras (TensorFlow), quando instalado
+- latência de uma passada pela rede em lotes de 1, 16, 256 e 1000 janelas
+  nos dois backends (keras com ML_LSTM_THREADS threads intra-op)
+- serviço: N previsões uma a uma (uma passada por requisição, sem cache)
+  contra um lote de N janelas em run() (uma passada por passo do
+  horizonte) e o mesmo lote repetido (cache por janela)
+- paridade: numpy contra keras (diferença máxima < 1e-5) e lote contra
+  previsões individuais; sai com código 1 se houver divergência
+
+Sem DadosReais/dados_acidentes.xlsx, usa um histórico sintético de
+acidentes (SP e outras UFs, várias BRs, 2007-2025).
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_lstm_forecast.py
+    ML_LSTM_THREADS=4 python scripts/benchmarks/bench_lstm_forecast.py --requests 500 --horizon 3
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from data_cache import load_dataset  # noqa: E402
+from lstm_forecast import (  # noqa: E402
+    DATA_PATH,
+    MODEL_PATH,
+    THREADS,
+    LSTMForecaster,
+    build_series,
+    load_network,
+)
+
+# Executado no processo filho: argv = scripts, backend, caminho do modelo, threads
+CHILD = '''
+import sys, time, json, warnings, os
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+warnings.filterwarnings('ignore')
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from lstm_forecast import load_network
+network = load_network(sys.argv[3], sys.argv[2], int(sys.argv[4]))
+load_ms = (time.perf_counter() - start) * 1000
+network.predict(__import__('numpy').zeros((1, network.window, 1), dtype='float32'))
+print(json.dumps({'load_ms': load_ms, 'first_ms': (time.perf_counter() - start) * 1000 - load_ms}))
+'''
+
+BATCH_SIZES = [1, 16, 256, 1000]
+
+
+def synthetic_history(seed=0):
+    """Acidentes sintéticos: tendência, sazonalidade anual e ruído por BR"""
+    rng = np.random.default_rng(seed)
+    months = pd.period_range('2007-01', '2025-06', freq='M')
+    roads = {('SP', 116): 120, ('SP', 381): 60, ('SP', 101): 25, ('SP', 459): 8, ('MG', 381): 90, ('RJ', 116): 70}
+    frames = []
+    for (uf, br), level in roads.items():
+        season = 1 + 0.15 * np.sin(2 * np.pi * (months.month.to_numpy() - 3) / 12)
+        trend = np.linspace(1.0, 0.7, len(months))
+        counts = rng.poisson(level * season * trend)
+        starts = months.to_timestamp().repeat(counts)
+        days = rng.integers(0, 28, len(starts))
+        frames.append(pd.DataFrame({
+            'data_inversa': starts + pd.to_timedelta(days, unit='D'),
+            'uf': uf,
+            'br': br,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_in_fresh_process(backend, threads, runs):
+    """Mediana da carga e da primeira passada (ms) em processos novos"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', CHILD, str(SCRIPTS_DIR), backend, str(MODEL_PATH),
+                                 str(threads)], capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return (float(np.median([r['load_ms'] for r in results])),
+            float(np.median([r['first_ms'] for r in results])))
+
+
+def median_ms(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def keras_available():
+    try:
+        import tensorflow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=1000, help='Previsões no teste de serviço')
+    parser.add_argument('--horizon', type=int, default=1, help='Horizonte de cada previsão')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetições por medida (mediana)')
+    parser.add_argument('--runs', type=int, default=3, help='Processos novos na medida de carga')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+
+    if not MODEL_PATH.exists():
+        print(f"❌ Modelo não encontrado: {MODEL_PATH}")
+        sys.exit(1)
+
+    if DATA_PATH.exists():
+        df = load_dataset(DATA_PATH)
+        source = str(DATA_PATH)
+    else:
+        print(f"⚠️  {DATA_PATH} não encontrado: histórico sintético de acidentes")
+        df = synthetic_history()
+        source = 'histórico sintético'
+
+    backends = ['numpy'] + (['keras'] if keras_available() else [])
+    networks = {backend: load_network(MODEL_PATH, backend, THREADS) for backend in backends}
+    periods, counts_by_series = build_series(df)
+    print(f"🔮 LSTM {MODEL_PATH.name}: {source}, {len(counts_by_series)} séries de {len(periods)} períodos "
+          f"({os.cpu_count()} CPUs, ML_LSTM_THREADS={THREADS})")
+    if 'keras' not in networks:
+        print("   (tensorflow não instalado: só o backend numpy)")
+    print()
+
+    # Carga em processo novo
+    print(f"   {'Backend':<8} {'Carga (ms)':>11} {'1ª passada (ms)':>16}")
+    for backend in backends:
+        load_ms, first_ms = load_in_fresh_process(backend, THREADS, args.runs)
+        print(f"   {backend:<8} {load_ms:>11.1f} {first_ms:>16.2f}")
+    print("   (processo novo, incluindo os imports)")
+    print()
+
+    # Latência por tamanho de lote
+    rng = np.random.default_rng(0)
+    header = ''.join(f"{backend + ' (ms)':>14}" for backend in backends)
+    print(f"   {'Janelas':>8}{header}{'µs/janela':>11}")
+    for size in BATCH_SIZES:
+        windows = rng.random((size, 4, 1), dtype=np.float32)
+        times = [median_ms(lambda: networks[backend].predict(windows), args.repeat) for backend in backends]
+        cells = ''.join(f"{ms:>14.3f}" for ms in times)
+        print(f"   {size:>8,}{cells}{min(times) * 1000 / size:>11.1f}")
+    print()
+
+    # Serviço: uma a uma x lote x lote em cache
+    failed = 0
+    print(f"   {'Backend':<8} {'Uma a uma (ms)':>15} {'Lote (ms)':>10} {'Lote em cache (ms)':>19} {'Speedup':>8}")
+    for backend in backends:
+        forecaster = LSTMForecaster(networks[backend], periods, counts_by_series, cache_size=0)
+        rows = rng.integers(0, len(forecaster.windows), args.requests)
+        requests = np.column_stack([rows, np.full(args.requests, args.horizon)])
+        repeat = max(3, args.repeat // 4)
+
+        single_ms = median_ms(lambda: [forecaster.run(requests[i:i + 1]) for i in range(len(requests))],
+                              max(1, repeat // 3))
+        batch_ms = median_ms(lambda: forecaster.run(requests), repeat)
+        cached = LSTMForecaster(networks[backend], periods, counts_by_series, cache_size=args.requests)
+        cached.run(requests)
+        cached_ms = median_ms(lambda: cached.run(requests), repeat)
+        print(f"   {backend:<8} {single_ms:>15.1f} {batch_ms:>10.2f} {cached_ms:>19.2f} "
+              f"{single_ms / batch_ms:>7.0f}x")
+
+        # Lote == previsões individuais
+        batched, _, _ = forecaster.run(requests)
+        individual = np.vstack([forecaster.run(requests[i:i + 1])[0] for i in range(len(requests))])
+        mismatches = int((np.abs(batched - individual) > 1e-3).any(axis=1).sum())
+        failed += mismatches
+        if mismatches:
+            print(f"   ❌ {mismatches} previsões do lote divergentes das individuais ({backend})")
+    print(f"   ({args.requests} janelas, horizonte {args.horizon}; uma a uma = uma chamada a run() por janela)")
+    print()
+
+    # Paridade numpy x keras
+    if 'keras' in networks:
+        windows = rng.random((5000, 4, 1), dtype=np.float32)
+        difference = float(np.abs(networks['numpy'].predict(windows) - networks['keras'].predict(windows)).max())
+        ok = difference < 1e-5
+        failed += not ok
+        print(f"   {'✅' if ok else '❌'} Paridade numpy x keras (diferença máxima {difference:.2e})")
+    print(f"   {'✅' if not failed else '❌'} Paridade lote x individual")
+    print()
+
+    print(f"Paridade: {'OK' if not failed else 'DIVERGENTE'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
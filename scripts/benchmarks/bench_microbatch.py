@@ -0,0 +1,99 @@
+"""
+Benchmark de micro-batching - Sompo
+===================================
+
+Simula N threads de servidor fazendo predições de 1 linha em paralelo e
+compara chamada direta ao modelo com o MicroBatcher (vazão, p50 e p99).
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_microbatch.py
+    python scripts/benchmarks/bench_microbatch.py --threads 8 32 --max-wait-ms 1 2
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference_engine import predict_with_proba  # noqa: E402
+from micro_batcher import MicroBatcher  # noqa: E402
+from bench_single_pass import build_features  # noqa: E402
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+
+
+def run_load(predict, rows, threads, requests_per_thread):
+    """Dispara as threads e retorna (req/s, latências em ms)"""
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(t):
+        barrier.wait()
+        for i in range(requests_per_thread):
+            row = rows[(t * requests_per_thread + i) % len(rows)]
+            start = time.perf_counter()
+            predict(row)
+            latencies[t].append((time.perf_counter() - start) * 1000)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in pool:
+        th.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for th in pool:
+        th.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = np.concatenate([np.array(lat) for lat in latencies])
+    return len(all_latencies) / elapsed, all_latencies
+
+
+def report(label, rps, latencies):
+    print(f"   {label:<24} {rps:>9,.0f} req/s | p50 {np.percentile(latencies, 50):7.3f} ms | "
+          f"p99 {np.percentile(latencies, 99):7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=300, help='Requisições por thread')
+    parser.add_argument('--max-wait-ms', type=float, nargs='+', default=[1.0, 2.0])
+    parser.add_argument('--max-rows', type=int, default=64)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    features = build_features(2000)
+    rows = [features[i:i + 1] for i in range(len(features))]
+
+    for threads in args.threads:
+        print(f"\n{threads} thread(s) concorrente(s):")
+        rps, lat = run_load(lambda x: predict_with_proba(model, x), rows, threads, args.requests)
+        report('sem micro-batching', rps, lat)
+
+        for wait_ms in args.max_wait_ms:
+            batcher = MicroBatcher(
+                lambda x, m: predict_with_proba(m, x),
+                max_wait_ms=wait_ms,
+                max_rows=args.max_rows
+            )
+            batcher.start()
+            rps, lat = run_load(lambda x: batcher.predict(x, model), rows, threads, args.requests)
+            stats = batcher.stats()
+            batcher.stop()
+            report(f'micro-batch {wait_ms:g} ms', rps, lat)
+            print(f"   {'':<24} lote médio {stats['batch_rows']['mean']:.1f} linhas, "
+                  f"espera p99 {stats['queue_wait_ms']['p99']:.3f} ms")
+    print()
+
+
+if __name__ == '__main__':
+    main()
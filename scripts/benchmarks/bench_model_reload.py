@@ -0,0 +1,201 @@
+"""
+Benchmark da recarga do modelo sem reiniciar - Sompo
+====================================================
+
+Threads enviam POST /predict (cliente de teste do Flask, sem rede)
+enquanto os arquivos do modelo são trocados no disco a cada --swap-every
+segundos, alternando entre o modelo de risco atual e um modelo alternativo
+(LightGBM pequeno treinado aqui em dados sintéticos). A API recarrega pela
+observação dos arquivos (model_reloader.py) e, a cada troca, também por
+POST /admin/reload-model.
+
+Verifica:
+- nenhuma requisição falha durante as trocas
+- cada resposta é exatamente a de uma das duas versões (nunca uma mistura
+  de modelo e encoders de versões diferentes)
+- p50/p99 de /predict com e sem recargas
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_model_reload.py
+    python scripts/benchmarks/bench_model_reload.py --threads 8 --duration 10 --swap-every 0.5
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import ml_prediction_api as api  # noqa: E402
+from bench_predict_batch import build_payload  # noqa: E402
+from model_reloader import synthetic_features  # noqa: E402
+
+# /admin/reload-model só atende com ML_ADMIN_TOKEN definido
+os.environ.setdefault('ML_ADMIN_TOKEN', 'benchmark')
+ADMIN_HEADERS = {'X-Admin-Token': os.environ['ML_ADMIN_TOKEN']}
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+
+def build_alternative_model(encoding_tables, path):
+    """Modelo LightGBM pequeno com as mesmas 9 features e 3 classes"""
+    from lightgbm import LGBMClassifier
+
+    features = synthetic_features(encoding_tables, rows=3000, seed=7)
+    labels = (features[:, 3] // 8).astype(int)  # classe pela hora: 0-7, 8-15, 16-23
+    model = LGBMClassifier(n_estimators=20, num_leaves=8, verbose=-1)
+    model.fit(features, labels)
+    joblib.dump(model, path)
+
+
+def replace_file(source, target):
+    """Troca atômica do arquivo (como o treinamento deve gravar)"""
+    tmp = target.with_suffix('.tmp')
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+def score_all(client, payload):
+    return [client.post('/predict', json=body).get_json()['data']['risk_score'] for body in payload]
+
+
+def run_traffic(client, payload, threads, duration, on_tick=None, tick_s=None):
+    """Envia /predict de várias threads; retorna (respostas, erros, latências em ms)"""
+    responses = [[] for _ in range(threads)]
+    errors = [0] * threads
+    latencies = [[] for _ in range(threads)]
+    stop = threading.Event()
+
+    def worker(t):
+        i = t
+        while not stop.is_set():
+            index = i % len(payload)
+            start = time.perf_counter()
+            response = client.post('/predict', json=payload[index])
+            latencies[t].append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors[t] += 1
+            else:
+                responses[t].append((index, response.get_json()['data']['risk_score']))
+            i += threads
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        time.sleep(tick_s or duration)
+        if on_tick is not None and time.perf_counter() < deadline:
+            on_tick()
+    stop.set()
+    for thread in pool:
+        thread.join()
+
+    return ([r for part in responses for r in part], sum(errors),
+            np.array([ms for part in latencies for ms in part]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, default=4, help='Threads de clientes')
+    parser.add_argument('--duration', type=float, default=6.0, help='Segundos de tráfego em cada fase')
+    parser.add_argument('--swap-every', type=float, default=0.5, help='Intervalo entre trocas do modelo (s)')
+    parser.add_argument('--interval', type=float, default=0.05, help='Intervalo de observação dos arquivos (s)')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições distintas no tráfego')
+    args = parser.parse_args()
+
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        original = workdir / 'original.joblib'
+        alternative = workdir / 'alternative.joblib'
+        shutil.copyfile(MODEL_PATH, original)
+
+        api.MODEL_PATH = workdir / 'risk_model.joblib'
+        api.ENCODERS_PATH = workdir / 'label_encoders.joblib'
+        shutil.copyfile(MODEL_PATH, api.MODEL_PATH)
+        shutil.copyfile(ENCODERS_PATH, api.ENCODERS_PATH)
+
+        if not api.load_model():
+            sys.exit(1)
+        build_alternative_model(api.active_model.encoding_tables, alternative)
+
+        client = api.app.test_client()
+        payload = [body for body in build_payload(args.requests)
+                   if client.post('/predict', json=body).status_code == 200]
+
+        # Respostas de referência de cada versão
+        reference = {api.active_model.version: score_all(client, payload)}
+        replace_file(alternative, api.MODEL_PATH)
+        api.reloader.reload('benchmark')
+        reference[api.active_model.version] = score_all(client, payload)
+        versions = list(reference)
+        replace_file(original, api.MODEL_PATH)
+        api.reloader.reload('benchmark')
+        differing = sum(a != b for a, b in zip(*reference.values()))
+
+        # Fase 1: tráfego sem trocas
+        _, steady_errors, steady_lat = run_traffic(client, payload, args.threads, args.duration)
+
+        # Fase 2: tráfego com trocas pelo disco (observação) e por /admin/reload-model
+        api.reloader.interval_s = args.interval
+        api.reloader.start()
+        state = {'swaps': 0, 'admin_errors': 0}
+
+        def swap():
+            state['swaps'] += 1
+            replace_file(alternative if state['swaps'] % 2 else original, api.MODEL_PATH)
+            if state['swaps'] % 3 == 0:
+                state['admin_errors'] += client.post('/admin/reload-model', headers=ADMIN_HEADERS).status_code != 200
+
+        responses, reload_errors, reload_lat = run_traffic(
+            client, payload, args.threads, args.duration, on_tick=swap, tick_s=args.swap_every
+        )
+        api.reloader.stop()
+        reload_stats = api.reloader.stats()
+
+        served = {version: 0 for version in versions}
+        inconsistent = 0
+        for index, score in responses:
+            matches = [v for v in versions if reference[v][index] == score]
+            inconsistent += not matches
+            if len(matches) == 1:
+                served[matches[0]] += 1
+
+    print(f"🔄 {len(payload)} requisições distintas ({differing} com score diferente entre as versões), "
+          f"{args.threads} threads, {args.duration:g}s por fase")
+    print()
+    print(f"   {'Fase':<16} {'Requisições':>12} {'Erros':>6} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, errors, lat in (('Sem recarga', steady_errors, steady_lat),
+                               ('Com recargas', reload_errors, reload_lat)):
+        print(f"   {label:<16} {len(lat):>12,} {errors:>6} {np.percentile(lat, 50):>9.3f} "
+              f"{np.percentile(lat, 99):>9.3f}")
+    print()
+    print(f"   Trocas no disco: {state['swaps']} | Recargas: {reload_stats['reloads']} | "
+          f"Falhas de recarga: {reload_stats['failures']} | Erros do admin: {state['admin_errors']}")
+    print("   Respostas por versão: " + ', '.join(f"{v}: {n:,}" for v, n in served.items()))
+    print()
+
+    failed = steady_errors + reload_errors + inconsistent + state['admin_errors'] + reload_stats['failures']
+    print(f"Consistência: {'OK' if failed == 0 else f'{failed} falhas ({inconsistent} respostas fora das duas versões)'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
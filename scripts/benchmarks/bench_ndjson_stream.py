@@ -0,0 +1,250 @@
+"""
+Benchmark de /predict-stream (NDJSON) - Sompo
+=============================================
+
+Sobe ml_prediction_api.py (um worker, porta 5000) e envia jobs de 10k,
+100k e 1M registros por HTTP de verdade (http.client, corpo chunked
+enviado por uma thread enquanto a resposta é lida):
+
+- /predict-batch (JSON, até --batch-max linhas): tempo até o primeiro
+  resultado (= tempo total) e pico de RSS da API
+- /predict-stream: tempo até o primeiro resultado, tempo total,
+  registros/s e pico de RSS da API (amostrado a cada 10 ms)
+- contrapressão: no maior job o cliente para de ler por --pause s; mostra
+  quanto do corpo conseguiu enviar nesse tempo (a API para de ler a
+  entrada quando a saída não é consumida)
+
+Paridade: os scores do stream são iguais aos de /predict-batch no menor
+job e todo registro tem resultado; sai com código 1 se houver divergência.
+A porta 5000 precisa estar livre.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_ndjson_stream.py
+    python scripts/benchmarks/bench_ndjson_stream.py --sizes 10000 100000 --batch-max 10000
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import psutil
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_predict_batch import build_payload  # noqa: E402
+
+API_SCRIPT = SCRIPTS_DIR / 'ml_prediction_api.py'
+HOST, PORT = '127.0.0.1', 5000
+
+# Linhas distintas reaproveitadas (variando o km) para montar jobs grandes sem custo no cliente
+POOL_SIZE = 5_000
+
+
+def wait_healthy(timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://{HOST}:{PORT}/health', timeout=2) as response:
+                if json.loads(response.read()).get('model_loaded'):
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+class RssSampler:
+    """Pico de RSS de um processo, amostrado em uma thread"""
+
+    def __init__(self, pid, interval=0.01):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def ndjson_lines(n):
+    """n registros NDJSON (bytes), a partir de um conjunto fixo de linhas"""
+    pool = build_payload(min(n, POOL_SIZE))
+    for i in range(n):
+        item = pool[i % len(pool)]
+        if i >= len(pool):
+            item = dict(item, km=round((item['km'] + i * 0.1) % 600, 1))
+        yield (json.dumps(item) + '\n').encode()
+
+
+def run_batch(n):
+    """/predict-batch com n linhas: (tempo total em ms, scores)"""
+    body = json.dumps({'predictions': [json.loads(line) for line in ndjson_lines(n)]}).encode()
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=600)
+    start = time.perf_counter()
+    conn.request('POST', '/predict-batch', body=body, headers={'Content-Type': 'application/json'})
+    data = json.loads(conn.getresponse().read())
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    conn.close()
+    return elapsed_ms, [p['data']['risk_score'] for p in data['data']['predictions']]
+
+
+def run_stream(n, pause_s=0.0, block_rows=500):
+    """
+    /predict-stream com n registros, corpo enviado por uma thread
+
+    Returns:
+        Dict com tempos (ms), scores, resumo, progresso e bytes enviados na pausa
+    """
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=600)
+    conn.putrequest('POST', '/predict-stream')
+    conn.putheader('Content-Type', 'application/x-ndjson')
+    conn.putheader('Transfer-Encoding', 'chunked')
+    conn.endheaders()
+    # A thread envia pelo socket diretamente: o http.client solta conn.sock ao
+    # receber "Connection: close", ainda com o corpo sendo enviado
+    sock = conn.sock
+    sent = {'bytes': 0}
+
+    def send():
+        block = []
+        for line in ndjson_lines(n):
+            block.append(line)
+            if len(block) == block_rows:
+                data = b''.join(block)
+                sock.sendall(b'%x\r\n%s\r\n' % (len(data), data))
+                sent['bytes'] += len(data)
+                block = []
+        if block:
+            data = b''.join(block)
+            sock.sendall(b'%x\r\n%s\r\n' % (len(data), data))
+            sent['bytes'] += len(data)
+        sock.sendall(b'0\r\n\r\n')
+
+    start = time.perf_counter()
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+
+    paused_bytes = None
+    if pause_s:
+        time.sleep(pause_s)
+        paused_bytes = sent['bytes']
+
+    response = conn.getresponse()
+    first_ms = None
+    scores = []
+    summary = None
+    chunks = []
+    for line in response:
+        record = json.loads(line)
+        if 'line' in record:
+            if first_ms is None:
+                first_ms = (time.perf_counter() - start) * 1000
+            scores.append(record['data']['risk_score'] if 'data' in record else None)
+        elif 'progress' in record:
+            chunks.append(record['progress'])
+        else:
+            summary = record
+    total_ms = (time.perf_counter() - start) * 1000
+    sender.join()
+    conn.close()
+    return {
+        'first_ms': first_ms,
+        'total_ms': total_ms,
+        'scores': scores,
+        'summary': summary,
+        'chunks': chunks,
+        'paused_bytes': paused_bytes,
+        'sent_bytes': sent['bytes'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Registros por job')
+    parser.add_argument('--batch-max', type=int, default=100_000,
+                        help='Maior job medido também em /predict-batch')
+    parser.add_argument('--pause', type=float, default=3.0, help='Pausa de leitura no maior job (s)')
+    args = parser.parse_args()
+
+    env = {**os.environ, 'ML_API_WORKERS': '1', 'PYTHONIOENCODING': 'utf-8', 'PYTHONWARNINGS': 'ignore'}
+    process = subprocess.Popen([sys.executable, str(API_SCRIPT)], cwd=SCRIPTS_DIR.parent, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    failed = 0
+    try:
+        if not wait_healthy():
+            print("❌ API não ficou pronta (porta 5000 livre? modelo treinado?)")
+            sys.exit(1)
+        baseline_rss = psutil.Process(process.pid).memory_info().rss
+
+        print(f"🌊 Streaming NDJSON: ml_prediction_api.py com 1 worker "
+              f"(RSS inicial {baseline_rss / 1024 / 1024:.0f} MB)")
+        print()
+        print(f"   {'Registros':>10} {'Rota':<16} {'1º resultado (ms)':>18} {'Total (ms)':>11} "
+              f"{'Registros/s':>12} {'Pico RSS (MB)':>14}")
+
+        reference = None
+        largest = max(args.sizes)
+        for n in args.sizes:
+            if n <= args.batch_max:
+                with RssSampler(process.pid) as sampler:
+                    batch_ms, batch_scores = run_batch(n)
+                reference = reference or batch_scores
+                print(f"   {n:>10,} {'/predict-batch':<16} {batch_ms:>18,.0f} {batch_ms:>11,.0f} "
+                      f"{n / batch_ms * 1000:>12,.0f} {(sampler.peak - baseline_rss) / 1024 / 1024:>+14.1f}")
+
+            pause = args.pause if n == largest else 0.0
+            with RssSampler(process.pid) as sampler:
+                result = run_stream(n, pause)
+            print(f"   {n:>10,} {'/predict-stream':<16} {result['first_ms']:>18,.0f} {result['total_ms']:>11,.0f} "
+                  f"{n / result['total_ms'] * 1000:>12,.0f} {(sampler.peak - baseline_rss) / 1024 / 1024:>+14.1f}")
+
+            if len(result['scores']) != n or (result['summary'] or {}).get('summary', {}).get('rows') != n:
+                failed += 1
+                print(f"   ❌ {len(result['scores'])} resultados para {n} registros")
+            if reference is not None and n == len(reference):
+                mismatches = sum(a != b for a, b in zip(result['scores'], reference))
+                failed += mismatches
+                if mismatches:
+                    print(f"   ❌ {mismatches} scores divergentes de /predict-batch")
+            if pause:
+                chunk_ms = [c['chunk_ms'] for c in result['chunks']]
+                print(f"   {'':>10} contrapressão: leitura parada por {pause:.0f} s, cliente enviou "
+                      f"{result['paused_bytes'] / 1024 / 1024:.1f} de {result['sent_bytes'] / 1024 / 1024:.0f} MB; "
+                      f"{len(chunk_ms)} blocos, mediana {sorted(chunk_ms)[len(chunk_ms) // 2]:.1f} ms por bloco")
+        print("   (pico de RSS acima do RSS da API pronta)")
+        print()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=15)
+
+    print(f"Paridade: {'OK' if not failed else f'{failed} divergências'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de /predict-batch - Sompo
+===================================
+
+Compara o caminho antigo (replay de /predict por item com
+app.test_request_context) com o motor em lote (uma chamada de
+predict_proba por requisição).
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_predict_batch.py
+    python scripts/benchmarks/bench_predict_batch.py --sizes 10 1000 --legacy-max 1000
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ml_prediction_api as api  # noqa: E402
+
+
+def build_payload(n, seed=42):
+    """Gera n requisições sintéticas no formato de /predict"""
+    rng = np.random.default_rng(seed)
+    ufs = ['SP', 'RJ', 'MG', 'PR', 'SC', 'RS', 'BA', 'GO']
+    weathers = ['claro', 'nublado', 'chuva', 'neblina']
+    phases = ['dia', 'noite', 'amanhecer', 'anoitecer']
+    roads = ['simples', 'dupla', 'multipla']
+    return [
+        {
+            'uf': ufs[rng.integers(len(ufs))],
+            'br': int(rng.choice([101, 116, 381, 40])),
+            'km': float(round(rng.uniform(0, 600), 1)),
+            'hour': int(rng.integers(24)),
+            'dayOfWeek': int(rng.integers(7)),
+            'month': int(rng.integers(1, 13)),
+            'weatherCondition': weathers[rng.integers(len(weathers))],
+            'dayPhase': phases[rng.integers(len(phases))],
+            'roadType': roads[rng.integers(len(roads))],
+        }
+        for _ in range(n)
+    ]
+
+
+def legacy_predict_batch(items):
+    """Caminho antigo: um /predict simulado por item"""
+    results = []
+    for pred_input in items:
+        with api.app.test_request_context('/predict', method='POST', json=pred_input):
+            response = api.predict()
+            if isinstance(response, tuple):
+                results.append(response[0].get_json())
+            else:
+                results.append(response.get_json())
+    with api.app.app_context():
+        return api.jsonify({'success': True, 'data': {'predictions': results}}).get_data()
+
+
+def batch_predict(items):
+    """Caminho novo: motor em lote + serialização da resposta"""
+    results, _ = api.predict_risk_batch(api.active_model.model, api.active_model.encoding_tables, items)
+    with api.app.app_context():
+        return api.jsonify({'success': True, 'data': {'predictions': results}}).get_data()
+
+
+def timed(fn, items, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help='Maior lote medido no caminho antigo')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if not api.load_model():
+        sys.exit(1)
+
+    print()
+    print(f"{'linhas':>8} | {'antigo (s)':>11} | {'antigo (linhas/s)':>17} | "
+          f"{'lote (s)':>9} | {'lote (linhas/s)':>15} | {'speedup':>8}")
+    print("-" * 84)
+
+    for n in args.sizes:
+        items = build_payload(n)
+        repeat = args.repeat if n <= 1000 else 1
+        batch_t = timed(batch_predict, items, repeat)
+
+        if n <= args.legacy_max:
+            legacy_t = timed(legacy_predict_batch, items, repeat)
+            print(f"{n:>8,} | {legacy_t:>11.4f} | {n / legacy_t:>17,.0f} | "
+                  f"{batch_t:>9.4f} | {n / batch_t:>15,.0f} | {legacy_t / batch_t:>7.1f}x")
+        else:
+            print(f"{n:>8,} | {'-':>11} | {'-':>17} | "
+                  f"{batch_t:>9.4f} | {n / batch_t:>15,.0f} | {'-':>8}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark de /predict-route - Sompo
+===================================
+
+Compara, para rotas de 100, 1.000 e 5.000 km (cliente de teste do Flask,
+sem rede):
+
+- caminho atual: um POST /predict por km, todos com a hora de saída
+- /predict-route: uma requisição, horário de passagem em cada segmento
+
+e separa o tempo de /predict-route (sem o Flask) em expansão dos trechos,
+modelo e resposta (agregados e lista de segmentos).
+
+Paridade: o score de cada segmento de /predict-route é igual ao de
+/predict-batch com o mesmo contexto projetado (hora, dia da semana, mês e
+fase do dia de cada segmento); sai com código 1 se houver divergência.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_predict_route.py
+    python scripts/benchmarks/bench_predict_route.py --distances 1000 --repeat 50
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ml_prediction_api as api  # noqa: E402
+from inference_engine import predict_with_proba  # noqa: E402
+from route_risk import expand_route, parse_route_input, score_route  # noqa: E402
+
+# Rodovias dos trechos sintéticos (uf, br); a rota alterna entre elas a cada 300 km
+LEGS = [('SP', 116), ('PR', 116), ('SC', 101), ('RS', 101)]
+LEG_KM = 300
+
+
+def build_route(distance_km, include_segments=True):
+    """Body de /predict-route com trechos de até LEG_KM"""
+    legs = []
+    covered = 0
+    while covered < distance_km:
+        uf, br = LEGS[len(legs) % len(LEGS)]
+        length = min(LEG_KM, distance_km - covered)
+        legs.append({'uf': uf, 'br': br, 'kmStart': 10, 'kmEnd': 10 + length})
+        covered += length
+    return {
+        'legs': legs,
+        'departureTime': '2025-10-14T22:30:00',
+        'averageSpeedKmh': 70,
+        'weatherCondition': 'chuva',
+        'includeSegments': include_segments,
+    }
+
+
+def per_km_requests(body):
+    """Requisições do caminho atual: um /predict por km, com a hora de saída"""
+    return [
+        {'uf': leg['uf'], 'br': leg['br'], 'km': float(km), 'hour': 22, 'dayOfWeek': 1, 'month': 10,
+         'weatherCondition': body['weatherCondition'], 'dayPhase': 'noite'}
+        for leg in body['legs']
+        for km in range(leg['kmStart'], leg['kmEnd'])
+    ]
+
+
+def median_ms(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def stage_times(bundle, body, repeat):
+    """Mediana (ms) de cada etapa de /predict-route fora do Flask"""
+    route = parse_route_input(body)
+    segments = expand_route(route, bundle.encoding_tables)
+    expand_ms = median_ms(lambda: expand_route(parse_route_input(body), bundle.encoding_tables), repeat)
+    model_ms = median_ms(lambda: predict_with_proba(bundle.model, segments['features']), repeat)
+    total_ms = median_ms(lambda: score_route(bundle.model, bundle.encoding_tables, body), repeat)
+    return expand_ms, model_ms, max(0.0, total_ms - expand_ms - model_ms)
+
+
+def check_parity(client, body):
+    """Scores de /predict-route == /predict-batch com os contextos projetados"""
+    segments = client.post('/predict-route', json=body).get_json()['data']['segments']
+    items = [
+        {'uf': s['uf'], 'br': s['br'], 'km': s['km'], 'hour': s['hour'], 'dayOfWeek': s['day_of_week'],
+         'month': s['month'], 'dayPhase': s['day_phase'], 'weatherCondition': body['weatherCondition']}
+        for s in segments
+    ]
+    batch = client.post('/predict-batch', json={'predictions': items}).get_json()['data']['predictions']
+    mismatches = sum(s['risk_score'] != b['data']['risk_score'] for s, b in zip(segments, batch))
+    hours = len({s['hour'] for s in segments})
+    return mismatches, hours
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--distances', type=int, nargs='+', default=[100, 1000, 5000], help='Distâncias (km)')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetições por medida (mediana)')
+    parser.add_argument('--per-km-max', type=int, default=1000,
+                        help='Maior distância medida no caminho de um /predict por km')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    if not api.load_model():
+        sys.exit(1)
+    bundle = api.active_model
+    client = api.app.test_client()
+
+    print(f"🛣️  Risco de rota: {args.repeat} repetições (mediana, ms), segmentos de 1 km")
+    print()
+    print(f"   {'Rota (km)':>9} {'/predict por km':>16} {'/predict-route':>15} {'sem segmentos':>14} "
+          f"{'Expansão':>9} {'Modelo':>8} {'Resposta':>10} {'Speedup':>8}")
+
+    failed = 0
+    for distance in args.distances:
+        body = build_route(distance)
+        summary_body = build_route(distance, include_segments=False)
+
+        per_km_ms = None
+        if distance <= args.per_km_max:
+            requests = per_km_requests(body)
+            per_km_ms = median_ms(lambda: [client.post('/predict', json=r) for r in requests],
+                                  max(1, args.repeat // 10))
+        route_ms = median_ms(lambda: client.post('/predict-route', json=body), args.repeat)
+        summary_ms = median_ms(lambda: client.post('/predict-route', json=summary_body), args.repeat)
+        expand_ms, model_ms, aggregate_ms = stage_times(bundle, body, args.repeat)
+
+        per_km_text = f"{per_km_ms:>16,.1f}" if per_km_ms is not None else f"{'-':>16}"
+        speedup = f"{per_km_ms / route_ms:>7.0f}x" if per_km_ms is not None else f"{'-':>8}"
+        print(f"   {distance:>9,} {per_km_text} {route_ms:>15.2f} {summary_ms:>14.2f} "
+              f"{expand_ms:>9.2f} {model_ms:>8.2f} {aggregate_ms:>10.2f} {speedup}")
+
+        mismatches, hours = check_parity(client, body)
+        failed += mismatches
+        if mismatches:
+            print(f"   ❌ {mismatches} segmentos divergentes de /predict-batch")
+        else:
+            print(f"   {'':>9} ✅ Paridade com /predict-batch ({hours} horas de passagem distintas)")
+    print()
+
+    print(f"Paridade: {'OK' if not failed else f'{failed} divergências'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
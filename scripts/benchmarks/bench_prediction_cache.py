@@ -0,0 +1,133 @@
+"""
+Benchmark do cache de predições - Sompo
+=======================================
+
+Simula o rastreamento da frota: caminhões percorrem rodovias reais
+(risk_scores.json) reportando a posição a cada --step-km km, e cada
+posição vira um POST /predict na API (cliente de teste do Flask, sem rede).
+Compara a API sem cache e com prediction_cache.py:
+
+- vazão, p50 e p99 por requisição
+- taxa de acerto do cache
+- paridade: resposta com cache == resposta sem cache no km quantizado
+- diferença de score entre o km quantizado e o km exato (efeito da
+  quantização, só informativo)
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_prediction_cache.py
+    python scripts/benchmarks/bench_prediction_cache.py --trucks 200 --reports 50 --km-step 0.5
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ml_prediction_api as api  # noqa: E402
+from prediction_cache import PredictionCache  # noqa: E402
+
+JSON_PATH = Path("backend/risk_scores.json")
+
+
+def build_trace(trucks, reports, step_km, seed=42):
+    """Posições reportadas pelos caminhões, intercaladas como chegariam na API"""
+    rng = random.Random(seed)
+    highways = sorted({tuple(key.split('_')[:2]) for key in
+                       json.loads(JSON_PATH.read_text(encoding='utf-8'))['scores']})
+    # Poucas rotas de frota: vários caminhões na mesma rodovia e horário
+    routes = [(rng.choice(highways), rng.randrange(0, 500, 10), rng.choice([6, 14, 22]),
+               rng.choice(['claro', 'chuva'])) for _ in range(max(1, trucks // 4))]
+
+    trace = []
+    for truck in range(trucks):
+        (uf, br), start_km, hour, weather = rng.choice(routes)
+        offset = rng.uniform(0, step_km)
+        for i in range(reports):
+            trace.append((i, truck, {
+                'uf': uf, 'br': int(br), 'km': round(start_km + offset + i * step_km, 3),
+                'hour': hour, 'dayOfWeek': 2, 'month': 6, 'weatherCondition': weather,
+                'dayPhase': 'noite' if hour >= 18 else 'dia',
+            }))
+    trace.sort(key=lambda item: (item[0], item[1]))
+    return [body for _, _, body in trace]
+
+
+def run(client, trace):
+    """Envia o trace e retorna (req/s, latências em ms, respostas)"""
+    latencies = np.empty(len(trace))
+    responses = []
+    start = time.perf_counter()
+    for i, body in enumerate(trace):
+        t = time.perf_counter()
+        responses.append(client.post('/predict', json=body).get_json())
+        latencies[i] = (time.perf_counter() - t) * 1000
+    return len(trace) / (time.perf_counter() - start), latencies, responses
+
+
+def without_metadata(response):
+    data = dict(response['data'])
+    data.pop('input')
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--trucks', type=int, default=100, help='Caminhões simulados')
+    parser.add_argument('--reports', type=int, default=40, help='Posições reportadas por caminhão')
+    parser.add_argument('--step-km', type=float, default=0.25, help='Distância entre posições')
+    parser.add_argument('--km-step', type=float, default=1.0, help='Quantização do km no cache')
+    args = parser.parse_args()
+
+    if not api.load_model():
+        sys.exit(1)
+    client = api.app.test_client()
+    trace = build_trace(args.trucks, args.reports, args.step_km)
+
+    api.prediction_cache = None
+    plain_rps, plain_lat, plain = run(client, trace)
+
+    api.prediction_cache = PredictionCache(max_entries=10000, ttl_s=300, km_step=args.km_step)
+    api.prediction_cache.set_model_version(api.active_model.version)
+    cached_rps, cached_lat, cached = run(client, trace)
+    stats = api.prediction_cache.stats()
+
+    # Paridade: mesma resposta da API sem cache com o km quantizado
+    quantize = api.prediction_cache.quantize_km
+    api.prediction_cache = None
+    mismatches = 0
+    deltas = []
+    for body, exact, response in zip(trace, plain, cached):
+        reference = client.post('/predict', json=dict(body, km=quantize(body['km']))).get_json()
+        mismatches += without_metadata(reference) != without_metadata(response)
+        mismatches += response['data']['input'] != exact['data']['input']
+        deltas.append(abs(response['data']['risk_score'] - exact['data']['risk_score']))
+    deltas = np.array(deltas)
+
+    print(f"🚚 {args.trucks} caminhões × {args.reports} posições = {len(trace):,} requisições "
+          f"(a cada {args.step_km:g} km, cache em passos de {args.km_step:g} km, pid {os.getpid()})")
+    print()
+    print(f"   {'':<12} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for label, rps, lat in (('Sem cache', plain_rps, plain_lat), ('Com cache', cached_rps, cached_lat)):
+        print(f"   {label:<12} {rps:>9,.0f} {np.percentile(lat, 50):>9.3f} {np.percentile(lat, 99):>9.3f}")
+    print()
+    print(f"   Acertos: {stats['hits']:,} | Faltas: {stats['misses']:,} | Taxa: {stats['hit_rate']:.1%} | "
+          f"Entradas: {stats['entries']:,}")
+    print(f"   Score no km quantizado vs km exato: médio {deltas.mean():.3f} | máximo {deltas.max():.3f}")
+    print()
+    print(f"Paridade: {'OK' if mismatches == 0 else f'{mismatches} divergências'}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark do custo das métricas por etapa - Sompo
+=================================================
+
+Mede o custo de request_metrics.py nas requisições (cliente de teste do
+Flask, sem rede), com ML_METRICS_SAMPLE_RATE 0, 0.1 e 1 (um processo por
+taxa, já que a taxa é lida na importação):
+
+- latência mediana de POST /predict e de POST /predict-batch (100 itens)
+- custo de uma marca de etapa (mark) dentro e fora de uma requisição
+- tempo de GET /metrics com as séries geradas
+
+Verificação: com a taxa 1, cada requisição medida aparece em
+sompo_requests_total e gera as seis etapas de /predict; sai com código 1
+se faltar alguma.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_request_metrics.py
+    python scripts/benchmarks/bench_request_metrics.py --requests 2000 --rates 0 1
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+# Executado no processo filho: argv = scripts, requisições
+CHILD = '''
+import json, logging, sys, time, warnings
+warnings.filterwarnings('ignore')
+logging.disable(logging.WARNING)
+sys.path.insert(0, sys.argv[1])
+import numpy as np
+import ml_prediction_api as api
+import request_metrics
+from model_reloader import sample_request
+
+if not api.load_model():
+    sys.exit(1)
+api.finish_startup()
+client = api.app.test_client()
+item = sample_request(api.active_model.encoding_tables)
+batch = {'predictions': [item] * 100}
+n = int(sys.argv[2])
+
+def median_us(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return float(np.median(samples))
+
+def marks():
+    for _ in range(1000):
+        request_metrics.mark('inference')
+
+result = {
+    'predict_us': median_us(lambda: client.post('/predict', json=item), n),
+    'batch_us': median_us(lambda: client.post('/predict-batch', json=batch), max(10, n // 10)),
+    'mark_idle_ns': median_us(marks, 50),
+}
+with api.app.test_request_context('/predict', method='POST'):
+    api.app.preprocess_request()
+    result['mark_request_ns'] = median_us(marks, 50)
+    request_metrics._current.set(request_metrics._NO_REQUEST)
+result['metrics_us'] = median_us(lambda: client.get('/metrics'), 50)
+text = client.get('/metrics').get_data(as_text=True)
+result['requests'] = sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+                         if line.startswith('sompo_requests_total') and 'endpoint="/predict"' in line)
+result['stages'] = sorted({line.split('stage="')[1].split('"')[0] for line in text.splitlines()
+                           if line.startswith('sompo_stage_duration_seconds_count')
+                           and 'endpoint="/predict"' in line})
+result['expected'] = n + 1
+print(json.dumps(result))
+'''
+
+STAGES = ['encoding', 'inference', 'parse', 'postprocess', 'serialization', 'validation']
+
+
+def run_child(rate, requests):
+    """Resultados de um processo com ML_METRICS_SAMPLE_RATE=rate"""
+    env = dict(os.environ, ML_METRICS_SAMPLE_RATE=str(rate), ML_API_WORKERS='1')
+    output = subprocess.run([sys.executable, '-c', CHILD, str(SCRIPTS_DIR), str(requests)], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=1000, help='Requisições /predict por taxa')
+    parser.add_argument('--rates', type=float, nargs='+', default=[0, 0.1, 1], help='Taxas de amostragem')
+    args = parser.parse_args()
+
+    print(f"⏱️  Métricas por etapa: {args.requests} requisições /predict por taxa (mediana)")
+    print()
+    print(f"   {'Taxa':>5} {'/predict (µs)':>14} {'lote 100 (µs)':>14} {'mark fora (ns)':>15} "
+          f"{'mark na req. (ns)':>18} {'/metrics (µs)':>14}")
+
+    failed = 0
+    for rate in args.rates:
+        result = run_child(rate, args.requests)
+        print(f"   {rate:>5g} {result['predict_us']:>14.1f} {result['batch_us']:>14.1f} "
+              f"{result['mark_idle_ns']:>15.0f} {result['mark_request_ns']:>18.0f} {result['metrics_us']:>14.1f}")
+
+        if result['requests'] != result['expected']:
+            failed += 1
+            print(f"   ❌ sompo_requests_total={result['requests']:.0f}, esperado {result['expected']}")
+        if rate >= 1 and result['stages'] != STAGES:
+            failed += 1
+            print(f"   ❌ Etapas de /predict: {result['stages']}")
+    print("   (mark: ns por chamada; fora = sem requisição ou não sorteada)")
+    print()
+
+    print(f"Métricas: {'OK' if not failed else f'{failed} falhas'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark do artefato binário de scores - Sompo
+===============================================
+
+Compara backend/risk_scores.json com o artefato binário mapeável
+(risk_artifact.py): tamanho em disco, tempo de abertura e latência de
+lookup. Verifica também que o artefato devolve os mesmos scores do JSON.
+
+Com --scale N (até 10), replica cada segmento nos KMs seguintes para
+simular segmentos de 1 km.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_risk_artifact.py --scale 10
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from risk_artifact import RiskScoreArtifact, write_risk_artifact  # noqa: E402
+
+JSON_PATH = Path("backend/risk_scores.json")
+
+
+def scale_scores(data, scale):
+    """Replica cada segmento de 10 km nos KMs km+1 ... km+scale-1"""
+    if scale <= 1:
+        return data
+    scores = {}
+    for key, segment in data['scores'].items():
+        uf, br, km = key.split('_')
+        for i in range(min(scale, 10)):
+            scores[f"{uf}_{br}_{int(km) + i}"] = segment
+    return {'metadata': dict(data['metadata'], total_segments=len(scores)), 'scores': scores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scale', type=int, default=1, help='Multiplicador do número de segmentos')
+    parser.add_argument('--lookups', type=int, default=100000, help='Lookups medidos')
+    args = parser.parse_args()
+
+    data = scale_scores(json.loads(JSON_PATH.read_text(encoding='utf-8')), args.scale)
+    contexts = data['metadata']['contexts']
+    keys = list(data['scores'])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = Path(workdir) / 'risk_scores.json'
+        bin_path = Path(workdir) / 'risk_scores.bin'
+
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+        parts = [key.split('_') for key in keys]
+        write_risk_artifact(
+            bin_path,
+            [p[0] for p in parts], [int(p[1]) for p in parts], [int(p[2]) for p in parts],
+            [[data['scores'][key][c] for c in contexts] for key in keys],
+            contexts, data['metadata']
+        )
+
+        start = time.perf_counter()
+        with open(json_path, encoding='utf-8') as f:
+            loaded = json.load(f)['scores']
+        json_open_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        artifact = RiskScoreArtifact(bin_path)
+        bin_open_ms = (time.perf_counter() - start) * 1000
+
+        mismatches = sum(
+            artifact.lookup(*key.split('_'), context) != data['scores'][key][context]
+            for key in keys for context in contexts
+        )
+
+        rng = random.Random(42)
+        sample = [(rng.choice(keys), rng.choice(contexts)) for _ in range(args.lookups)]
+        split = [(*key.split('_'), context) for key, context in sample]
+
+        start = time.perf_counter()
+        for key, context in sample:
+            loaded[key][context]
+        json_lookup_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        for uf, br, km, context in split:
+            artifact.lookup(uf, br, km, context)
+        bin_lookup_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        artifact.lookup_batch([s[0] for s in split], [s[1] for s in split], [s[2] for s in split], contexts[0])
+        batch_lookup_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        print(f"📍 {len(keys):,} segmentos × {len(contexts)} contextos")
+        print()
+        print(f"{'':<22}{'JSON':>12}{'Binário':>12}")
+        print(f"{'Tamanho (MB)':<22}{json_path.stat().st_size / 1024 / 1024:>12.2f}"
+              f"{bin_path.stat().st_size / 1024 / 1024:>12.2f}")
+        print(f"{'Abertura (ms)':<22}{json_open_ms:>12.1f}{bin_open_ms:>12.2f}")
+        print(f"{'Lookup (µs)':<22}{json_lookup_us:>12.2f}{bin_lookup_us:>12.2f}")
+        print(f"{'Lookup em lote (µs)':<22}{'-':>12}{batch_lookup_us:>12.2f}")
+        print()
+        print(f"Paridade: {'OK' if mismatches == 0 else f'{mismatches} divergências'}")
+
+        artifact.close()
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark da geração do mapa de risco - Sompo
+=============================================
+
+Compara o laço antigo do STEP 5 de train_risk_model.py (uma linha de
+DataFrame e um predict_proba por segmento × contexto) com a geração
+vetorizada de risk_map.py, sobre segmentos sintéticos. Verifica que os
+scores gerados são idênticos e mede o tempo de cada caminho.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_risk_map.py --segments 5000
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from risk_map import (  # noqa: E402
+    CONTEXTOS,
+    score_risk_map,
+    statistical_risk_map,
+    to_risk_scores_dict,
+)
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+
+def build_segments(n, ufs, seed=42):
+    """Segmentos sintéticos no formato de aggregate_segments"""
+    rng = np.random.default_rng(seed)
+    total = rng.integers(1, 40, n)
+    return pd.DataFrame({
+        'uf': rng.choice(ufs, n),
+        'br': rng.choice([101, 116, 381, 40, 153], n).astype(np.float64),
+        'km': (rng.integers(0, 60, n) * 10).astype(np.float64),
+        'total_acidentes': total,
+        'gravidade_media': rng.uniform(0, 2, n),
+        'total_mortos': rng.integers(0, 3, n),
+        'total_feridos_graves': rng.integers(0, 5, n),
+        'total_feridos_leves': rng.integers(0, 10, n),
+    })
+
+
+def legacy_risk_map(segments, model, le_dict):
+    """Laço original do STEP 5 (segments.iterrows × contextos)"""
+    risk_scores = {}
+    for _, segment in segments.iterrows():
+        uf = segment['uf']
+        br = str(int(segment['br'])).zfill(3)
+        km = int(segment['km'])
+
+        score_base = min(
+            (segment['total_acidentes'] / 10) * 30
+            + (segment['gravidade_media'] / 2) * 70,
+            100
+        )
+
+        segment_scores = {}
+        for contexto in CONTEXTOS:
+            if model is not None:
+                try:
+                    features_input = pd.DataFrame([{
+                        'uf_encoded': le_dict['uf'].transform([uf])[0],
+                        'br': int(segment['br']),
+                        'km': km,
+                        'hora': contexto['hora'],
+                        'dia_semana': contexto['dia_semana'],
+                        'mes': 6,
+                        'clima_categoria_encoded': le_dict['clima_categoria'].transform([contexto['clima']])[0],
+                        'fase_dia_categoria_encoded': le_dict['fase_dia_categoria'].transform([contexto['fase']])[0],
+                        'tipo_pista_categoria_encoded': le_dict['tipo_pista_categoria'].transform(['simples'])[0],
+                    }])
+                    proba = model.predict_proba(features_input)[0]
+                    score_ml = proba[1] * 50 + proba[2] * 100
+                    score_final = score_ml * 0.6 + score_base * 0.4
+                except Exception:
+                    score_final = score_base
+            else:
+                score_final = score_base
+                if contexto['fase'] == 'noite':
+                    score_final *= 1.3
+                if contexto['clima'] == 'chuvoso':
+                    score_final *= 1.4
+                if contexto['clima'] == 'neblina':
+                    score_final *= 1.5
+                if contexto['dia_semana'] in [5, 6]:
+                    score_final *= 1.2
+                score_final = min(score_final, 100)
+
+            segment_scores[contexto['nome']] = round(score_final, 2)
+
+        risk_scores[f"{uf}_{br}_{km}"] = segment_scores
+    return risk_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--segments', type=int, default=5000, help='Segmentos sintéticos')
+    args = parser.parse_args()
+
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+
+    model = joblib.load(MODEL_PATH)
+    le_dict = joblib.load(ENCODERS_PATH)
+
+    # Inclui uma UF desconhecida para exercitar o fallback por segmento
+    ufs = list(le_dict['uf'].classes_) + ['XX']
+    segments = build_segments(args.segments, ufs)
+    combinations = len(segments) * len(CONTEXTOS)
+    failed = False
+
+    print(f"📍 {len(segments):,} segmentos × {len(CONTEXTOS)} contextos = {combinations:,} combinações")
+    print()
+
+    start = time.perf_counter()
+    expected = legacy_risk_map(segments, model, le_dict)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores, failures, timings = score_risk_map(model, le_dict, segments, CONTEXTOS)
+    result = to_risk_scores_dict(segments, CONTEXTOS, scores)
+    vector_time = time.perf_counter() - start
+
+    ok = result == expected
+    failed |= not ok
+    print("LightGBM:")
+    print(f"   Paridade: {'OK' if ok else 'DIVERGENTE'} ({len(failures):,} segmentos no fallback)")
+    print(f"   Laço antigo: {legacy_time:.2f}s ({combinations / legacy_time:,.0f} combinações/s)")
+    print(f"   Vetorizado:  {vector_time:.3f}s ({combinations / vector_time:,.0f} combinações/s, "
+          f"{legacy_time / vector_time:.0f}x)")
+    print(f"      features {timings['features']:.3f}s | predict {timings['predict']:.3f}s | "
+          f"combinação {timings['blend']:.3f}s")
+    print()
+
+    expected = legacy_risk_map(segments, None, le_dict)
+    result = to_risk_scores_dict(segments, CONTEXTOS, statistical_risk_map(segments, CONTEXTOS))
+    ok = result == expected
+    failed |= not ok
+    print(f"Estatístico (sem modelo): paridade {'OK' if ok else 'DIVERGENTE'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark da atualização incremental do mapa de risco - Sompo
+=============================================================
+
+Gera o mapa de risco (8 contextos) e o cubo de contextos para segmentos
+sintéticos, simula uma carga noturna (uma fração dos segmentos com
+estatísticas alteradas + segmentos novos) e compara:
+
+- geração completa: pontua todos os segmentos com o modelo salvo
+- atualização incremental (risk_refresh.refresh_artifact): pontua só os
+  segmentos alterados/novos e mantém os demais
+
+Os artefatos das duas abordagens precisam ser idênticos.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_risk_refresh.py --segments 2000 --changed 0.02
+    python scripts/benchmarks/bench_risk_refresh.py --grid "hora=0-23;clima=claro,chuvoso"
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_risk_map import build_segments  # noqa: E402
+from context_grid import ContextGrid, generate_risk_cube, write_risk_cube  # noqa: E402
+from risk_artifact import RiskScoreArtifact, write_risk_artifact  # noqa: E402
+from risk_map import CONTEXTOS, score_risk_map  # noqa: E402
+from risk_refresh import refresh_artifact, segment_fingerprints  # noqa: E402
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+# Fração de segmentos novos em relação aos alterados
+NEW_SEGMENTS_RATIO = 0.25
+
+
+def nightly_update(segments, changed_fraction, seed=7):
+    """Altera as estatísticas de uma fração dos segmentos e acrescenta novos"""
+    rng = np.random.default_rng(seed)
+    updated = segments.copy()
+    n_changed = max(1, int(len(segments) * changed_fraction))
+    rows = rng.choice(len(segments), n_changed, replace=False)
+    updated.loc[rows, 'total_acidentes'] += 1
+    updated.loc[rows, 'gravidade_media'] = rng.uniform(0, 2, n_changed)
+
+    # Segmentos novos em KMs fora da faixa sintética (0-590)
+    new = build_segments(max(1, int(n_changed * NEW_SEGMENTS_RATIO)), sorted(segments['uf'].unique()), seed=seed)
+    new['km'] = new['km'] + 1000
+    new = new.drop_duplicates(['uf', 'br', 'km'])
+    return pd.concat([updated, new], ignore_index=True), n_changed, len(new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--segments', type=int, default=2000, help='Segmentos sintéticos')
+    parser.add_argument('--changed', type=float, default=0.02, help='Fração de segmentos alterados')
+    parser.add_argument('--grid', default='hora=0-23;dia_semana=2;tipo_pista=simples',
+                        help='Especificação do grid do cubo')
+    args = parser.parse_args()
+
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+
+    model = joblib.load(MODEL_PATH)
+    le_dict = joblib.load(ENCODERS_PATH)
+    grid, _ = ContextGrid.from_spec(args.grid).restrict_to_encoders(le_dict)
+    contexts = [ctx['nome'] for ctx in CONTEXTOS]
+    metadata = {'revision': 1}
+
+    segments = build_segments(args.segments, list(le_dict['uf'].classes_))
+    segments = segments.drop_duplicates(['uf', 'br', 'km']).reset_index(drop=True)
+    updated, n_changed, n_new = nightly_update(segments, args.changed)
+    fingerprints = segment_fingerprints(updated)
+
+    print(f"📍 {len(segments):,} segmentos, {n_changed:,} alterados e {n_new:,} novos "
+          f"(mapa: {len(contexts)} contextos, cubo: {len(grid):,} contextos)")
+    print()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        map_path, cube_path = workdir / 'risk_scores.bin', workdir / 'risk_cube.bin'
+
+        # Artefatos da revisão anterior
+        scores, _, _ = score_risk_map(model, le_dict, segments, CONTEXTOS)
+        write_risk_artifact(map_path, segments['uf'], segments['br'], segments['km'], scores, contexts,
+                            metadata, fingerprints=segment_fingerprints(segments))
+        cube, _, _ = generate_risk_cube(model, le_dict, segments, grid)
+        write_risk_cube(cube_path, segments, cube, grid, metadata, segment_fingerprints(segments))
+
+        for name, path in (('Mapa de risco', map_path), ('Cubo', cube_path)):
+            start = time.perf_counter()
+            if path == map_path:
+                full, _, _ = score_risk_map(model, le_dict, updated, CONTEXTOS)
+                full_path = workdir / 'full_scores.bin'
+                write_risk_artifact(full_path, updated['uf'], updated['br'], updated['km'], full, contexts,
+                                    metadata, fingerprints=fingerprints)
+            else:
+                full, _, _ = generate_risk_cube(model, le_dict, updated, grid)
+                full_path = workdir / 'full_cube.bin'
+                write_risk_cube(full_path, updated, full, grid, metadata, fingerprints)
+            full_seconds = time.perf_counter() - start
+
+            _, stats = refresh_artifact(path, updated, fingerprints, model, le_dict, metadata)
+
+            with RiskScoreArtifact(full_path) as expected, RiskScoreArtifact(path) as refreshed:
+                identical = (np.array_equal(expected.keys, refreshed.keys)
+                             and np.array_equal(expected.scores, refreshed.scores)
+                             and np.array_equal(expected.fingerprints, refreshed.fingerprints))
+            failed |= not identical
+
+            print(f"{name}:")
+            print(f"   Geração completa      {full_seconds:>8.2f}s ({len(updated):,} segmentos)")
+            print(f"   Atualização           {stats['seconds']:>8.2f}s ({stats['rescored']:,} repontuados, "
+                  f"{stats['unchanged']:,} mantidos) → {full_seconds / stats['seconds']:.1f}x")
+            print(f"   Artefatos idênticos: {'OK' if identical else 'DIVERGENTE'}")
+            print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
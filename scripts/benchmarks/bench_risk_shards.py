@@ -0,0 +1,105 @@
+"""
+Benchmark da geração em shards do cubo de risco - Sompo
+=======================================================
+
+Gera o cubo de contextos de segmentos sintéticos com risk_shards.py em
+1, 2, 4 e 8 processos e mede tempo, combinações/s, speedup e pico de
+memória dos workers. Todos os artefatos precisam ser idênticos entre si
+e ao cubo da geração em um processo (context_grid.generate_risk_cube).
+
+O speedup depende dos núcleos disponíveis (os.cpu_count() é exibido);
+com um núcleo só, mais workers apenas dividem o mesmo processador.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_risk_shards.py
+    python scripts/benchmarks/bench_risk_shards.py --segments 8000 --grid default --workers 1 2 4 8
+    python scripts/benchmarks/bench_risk_shards.py --shard-rows 100000   # shards menores, menos memória
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_risk_map import build_segments  # noqa: E402
+from context_grid import ContextGrid, generate_risk_cube  # noqa: E402
+from risk_artifact import RiskScoreArtifact  # noqa: E402
+from risk_shards import FORK_AVAILABLE, SHARD_ROWS, write_sharded_artifact  # noqa: E402
+
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--segments', type=int, default=2000, help='Segmentos sintéticos')
+    parser.add_argument('--grid', default='hora=0-23;dia_semana=0-6;tipo_pista=simples',
+                        help='Especificação do grid')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Processos medidos')
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS, help='Linhas de features por shard')
+    args = parser.parse_args()
+
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+    if not FORK_AVAILABLE:
+        print("⚠️  Sem 'fork' neste sistema: os workers usam 'spawn' e recebem uma cópia do modelo")
+
+    model = joblib.load(MODEL_PATH)
+    le_dict = joblib.load(ENCODERS_PATH)
+    grid, _ = ContextGrid.from_spec(args.grid).restrict_to_encoders(le_dict)
+    contexts = grid.contexts()
+
+    # KMs até 5.990 para permitir mais segmentos únicos que bench_risk_map
+    segments = build_segments(args.segments, list(le_dict['uf'].classes_))
+    segments['km'] = segments['km'] + np.random.default_rng(1).integers(0, 10, len(segments)) * 600
+    segments = segments.drop_duplicates(['uf', 'br', 'km']).reset_index(drop=True)
+    combinations = len(segments) * len(contexts)
+
+    print(f"📍 {len(segments):,} segmentos × {len(contexts):,} contextos = {combinations:,} combinações "
+          f"(shards de até {args.shard_rows:,} linhas, {os.cpu_count()} CPU(s))")
+    print()
+
+    reference, _, _ = generate_risk_cube(model, le_dict, segments, grid, workers=1)
+    failed = False
+    baseline = None
+
+    print(f"   {'Workers':>7} {'Shards':>7} {'Tempo':>9} {'Comb./s':>11} {'Speedup':>8} {'RSS worker':>11}  Paridade")
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in args.workers:
+            path = Path(workdir) / f'risk_cube_{workers}.bin'
+            start = time.perf_counter()
+            _, _, _, stats = write_sharded_artifact(
+                path, model, le_dict, segments, contexts,
+                score_dtype='uint8', grid=grid.to_header(), workers=workers, shard_rows=args.shard_rows,
+            )
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+
+            # O artefato guarda as linhas ordenadas pela chave; compara segmento a segmento
+            with RiskScoreArtifact(path) as artifact:
+                rows = artifact.find_batch(segments['uf'], segments['br'], segments['km'])
+                identical = bool((rows >= 0).all() and np.array_equal(artifact.scores[rows], reference))
+            failed |= not identical
+
+            rss = stats['worker_peak_rss_mb']
+            rss = f"{rss:,.0f} MB" if rss is not None else 'n/d'
+            print(f"   {workers:>7} {stats['shards']:>7} {elapsed:>8.2f}s {combinations / elapsed:>11,.0f} "
+                  f"{baseline / elapsed:>7.2f}x {rss:>11}  {'OK' if identical else 'DIVERGENTE'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark do índice de segmentos por rodovia - Sompo
+====================================================
+
+Compara, para segmentos inexistentes (misses), a busca de vizinhos do
+backend (monta "UF_BR_KM" a cada ±10 km até ±20/±50 km e consulta um dict)
+com segment_index.py (bisect nos KMs ordenados da rodovia). Verifica que
+os dois devolvem os mesmos vizinhos e mede a interpolação.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_segment_index.py
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from risk_artifact import RiskScoreArtifact, convert_json  # noqa: E402
+from segment_index import SegmentIndex  # noqa: E402
+
+JSON_PATH = Path("backend/risk_scores.json")
+CONTEXT = 'dia_claro'
+
+
+def legacy_nearest(scores, uf, br, km, search_range=20):
+    """findNearbySegmentScore do backend: primeiro vizinho a ±10, ±20 km"""
+    for offset in range(10, search_range + 1, 10):
+        for candidate in (km - offset, km + offset):
+            segment = scores.get(f"{uf}_{br}_{candidate}")
+            if segment is not None:
+                return candidate
+    return None
+
+
+def legacy_nearby(scores, uf, br, km, limit=3):
+    """findNearbySegments do backend: até limit vizinhos em ±50 km"""
+    nearby = []
+    for offset in range(10, 51, 10):
+        for candidate in (km - offset, km + offset):
+            if len(nearby) >= limit:
+                return nearby
+            if f"{uf}_{br}_{candidate}" in scores:
+                nearby.append(candidate)
+    return nearby
+
+
+def build_misses(scores, n, seed=42):
+    """Segmentos inexistentes (UF, BR, KM) próximos de rodovias conhecidas"""
+    rng = random.Random(seed)
+    highways = {}
+    for key in scores:
+        uf, br, km = key.split('_')
+        highways.setdefault((uf, br), []).append(int(km))
+
+    names = list(highways)
+    misses = []
+    while len(misses) < n:
+        uf, br = rng.choice(names)
+        kms = highways[(uf, br)]
+        km = rng.randrange(max(min(kms) - 60, 0), max(kms) + 70, 10)
+        if f"{uf}_{br}_{km}" not in scores:
+            misses.append((uf, br, km))
+    return misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--queries', type=int, default=20000, help='Consultas medidas')
+    args = parser.parse_args()
+
+    scores = json.loads(JSON_PATH.read_text(encoding='utf-8'))['scores']
+    misses = build_misses(scores, args.queries)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bin_path = Path(workdir) / 'risk_scores.bin'
+        convert_json(JSON_PATH, bin_path)
+        artifact = RiskScoreArtifact(bin_path)
+        index = SegmentIndex(artifact)
+        half = artifact.segment_km / 2
+
+        # Paridade: mesmo vizinho (±20 km) e mesmos 3 vizinhos (±50 km)
+        mismatches = 0
+        for uf, br, km in misses:
+            nearest = index.nearest(uf, br, km + half, max_distance=20)
+            nearby = index.k_nearest(uf, br, km + half, k=3, max_distance=50)
+            mismatches += (nearest.km if nearest else None) != legacy_nearest(scores, uf, br, km)
+            mismatches += [n.km for n in nearby] != legacy_nearby(scores, uf, br, km)
+
+        start = time.perf_counter()
+        for uf, br, km in misses:
+            legacy_nearest(scores, uf, br, km)
+            legacy_nearby(scores, uf, br, km)
+        legacy_us = (time.perf_counter() - start) / len(misses) * 1e6
+
+        start = time.perf_counter()
+        for uf, br, km in misses:
+            index.nearest(uf, br, km + half, max_distance=20)
+            index.k_nearest(uf, br, km + half, k=3, max_distance=50)
+        index_us = (time.perf_counter() - start) / len(misses) * 1e6
+
+        start = time.perf_counter()
+        for uf, br, km in misses:
+            index.interpolate(uf, br, km + 3, CONTEXT)
+        interpolate_us = (time.perf_counter() - start) / len(misses) * 1e6
+
+        print(f"📍 {len(artifact):,} segmentos em {len(index):,} rodovias, "
+              f"{len(misses):,} consultas a segmentos inexistentes")
+        print()
+        print(f"   Sondagem de chaves (±20 + ±50 km)  {legacy_us:>8.2f} µs/consulta")
+        print(f"   Índice ordenado (bisect)           {index_us:>8.2f} µs/consulta")
+        print(f"   Interpolação                       {interpolate_us:>8.2f} µs/consulta")
+        print()
+        print(f"Paridade: {'OK' if mismatches == 0 else f'{mismatches} divergências'}")
+
+        del index
+        artifact.close()
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de inferência em passada única - Sompo
+================================================
+
+Verifica que argmax(predict_proba) reproduz exatamente model.predict para
+os modelos de risco (LightGBM) e de classificação (RandomForest), e mede o
+custo de predict + predict_proba contra uma única passada.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_single_pass.py
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inference_engine import predict_with_proba  # noqa: E402
+
+MODELS = {
+    'risco (LightGBM)': Path("backend/models/risk_model.joblib"),
+    'classificação (RandomForest)': Path("backend/models/modeloClassificacao.joblib"),
+}
+
+
+def build_features(n, seed=42):
+    """Matriz sintética n x 9 dentro das faixas das features de treino"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 27, n),         # uf_encoded
+        rng.choice([101, 116, 381, 40], n),
+        rng.uniform(0, 600, n),         # km
+        rng.integers(0, 24, n),         # hora
+        rng.integers(0, 7, n),          # dia_semana
+        rng.integers(1, 13, n),         # mes
+        rng.integers(0, 5, n),          # clima
+        rng.integers(0, 4, n),          # fase do dia
+        rng.integers(0, 3, n),          # tipo de pista
+    ]).astype(np.float64)
+
+
+def check_parity(model, features):
+    """Compara classe e probabilidades da passada única com o caminho antigo"""
+    expected_class = model.predict(features)
+    expected_proba = model.predict_proba(features)
+    classes, proba, _ = predict_with_proba(model, features)
+    return (np.array_equal(expected_class, classes)
+            and np.allclose(expected_proba, proba, rtol=0, atol=1e-12))
+
+
+def time_per_request(fn, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for row in rows:
+            fn(row)
+    return (time.perf_counter() - start) / (repeat * len(rows)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000, help='Linhas do teste de paridade')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições de 1 linha medidas')
+    args = parser.parse_args()
+
+    features = build_features(args.rows)
+    single_rows = [features[i:i + 1] for i in range(args.requests)]
+    failed = False
+
+    for name, path in MODELS.items():
+        if not path.exists():
+            print(f"⚠️  {name}: modelo não encontrado em {path}, pulando")
+            continue
+
+        model = joblib.load(path)
+        ok = check_parity(model, features)
+        failed |= not ok
+
+        old_ms = time_per_request(
+            lambda x: (model.predict(x), model.predict_proba(x)), single_rows, 3
+        )
+        new_ms = time_per_request(lambda x: predict_with_proba(model, x), single_rows, 3)
+
+        print(f"{name}:")
+        print(f"   Paridade em {args.rows:,} linhas: {'OK' if ok else 'DIVERGENTE'}")
+        print(f"   predict + predict_proba: {old_ms:.3f} ms/req")
+        print(f"   passada única:           {new_ms:.3f} ms/req ({old_ms / new_ms:.2f}x)")
+        print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
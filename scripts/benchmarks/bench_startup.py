@@ -0,0 +1,125 @@
+"""
+Benchmark da inicialização das APIs - Sompo
+===========================================
+
+Sobe cada API em um interpretador novo (sem abrir o socket) e mede:
+
+- tempo até pronta, do lançamento do processo até o fim de load_model()
+  e do aquecimento (inclui a partida do Python)
+- etapas do relatório de inicialização: partida e imports, carga do modelo,
+  aquecimento do modelo e das rotas
+- latência da primeira e da segunda requisição, com e sem aquecimento
+
+A API de classificação e a unificada só são medidas quando
+backend/models/modeloClassificacao.joblib existe.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_startup.py
+    python scripts/benchmarks/bench_startup.py --runs 5 --apis ml_prediction_api
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+CLASSIFICATION_MODEL_PATH = Path("backend/models/modeloClassificacao.joblib")
+
+# API -> (função de carga, rota da primeira requisição, requer o modelo de classificação)
+APIS = {
+    'ml_prediction_api': ('load_model', '/predict', False),
+    'classification_api': ('load_model', '/classify', True),
+    'ensemble_api': ('load_models', '/ensemble', True),
+}
+
+# Executado no processo filho: argv = módulo, função de carga, rota, aquecer (0/1)
+CHILD = '''
+import sys, time, json, logging, warnings
+warnings.filterwarnings('ignore')
+logging.disable(logging.CRITICAL)
+sys.path.insert(0, sys.argv[1])
+module_name, load_name, route, warm = sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5] == '1'
+
+import model_reloader
+if not warm:
+    model_reloader.warm_up = lambda model, encoding_tables, rows=0: None
+
+api = __import__(module_name)
+if not getattr(api, load_name)():
+    sys.exit(1)
+timings = api.finish_startup() if warm else {'imports_ms': api.IMPORTS_MS}
+ready_at = time.time()
+
+bundles = [api.active_model] if hasattr(api, 'active_model') else [
+    api.risk_api.active_model, api.classification_api.active_model]
+timings.setdefault('model_load_ms', sum(b.load_ms for b in bundles))
+bundle = bundles[0]
+client = api.app.test_client()
+body = model_reloader.sample_request(bundle.encoding_tables)
+requests_ms = []
+for _ in range(2):
+    start = time.perf_counter()
+    client.post(route, json=body)
+    requests_ms.append((time.perf_counter() - start) * 1000)
+
+print(json.dumps(dict(timings, ready_at=ready_at, first_request_ms=requests_ms[0],
+                      second_request_ms=requests_ms[1])))
+'''
+
+
+def run_child(module_name, warm):
+    load_name, route, _ = APIS[module_name]
+    launched_at = time.time()
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, str(SCRIPTS_DIR), module_name, load_name, route, '1' if warm else '0'],
+        capture_output=True, text=True, check=True,
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data['ready_ms'] = (data.pop('ready_at') - launched_at) * 1000
+    return data
+
+
+def median(runs, key):
+    values = [run[key] for run in runs if run.get(key) is not None]
+    return float(np.median(values)) if values else None
+
+
+def fmt(ms):
+    return f"{ms:>9,.1f}" if ms is not None else f"{'-':>9}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=3, help='Processos por configuração (mediana)')
+    parser.add_argument('--apis', nargs='+', default=list(APIS), choices=list(APIS))
+    args = parser.parse_args()
+
+    print(f"⏱️  Inicialização das APIs (mediana de {args.runs} processos, ms)")
+    print()
+    print(f"   {'API':<20} {'Aquec.':<6} {'Pronta':>9} {'Imports':>9} {'Modelo':>9} "
+          f"{'Aq.mod.':>9} {'Aq.rotas':>9} {'1ª req.':>9} {'2ª req.':>9}")
+
+    for module_name in args.apis:
+        if APIS[module_name][2] and not CLASSIFICATION_MODEL_PATH.exists():
+            print(f"   {module_name:<20} pulada: {CLASSIFICATION_MODEL_PATH} não encontrado")
+            continue
+        for warm in (False, True):
+            runs = [run_child(module_name, warm) for _ in range(args.runs)]
+            print(f"   {module_name:<20} {'sim' if warm else 'não':<6} {fmt(median(runs, 'ready_ms'))} "
+                  f"{fmt(median(runs, 'imports_ms'))} {fmt(median(runs, 'model_load_ms'))} "
+                  f"{fmt(median(runs, 'warmup_ms'))} {fmt(median(runs, 'routes_warmup_ms'))} "
+                  f"{fmt(median(runs, 'first_request_ms'))} {fmt(median(runs, 'second_request_ms'))}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
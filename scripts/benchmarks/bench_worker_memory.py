@@ -0,0 +1,254 @@
+"""
+Benchmark de memória por worker da API de classificação - Sompo
+===============================================================
+
+Sobe classification_api.py com 1, 4 e 8 workers (ML_API_WORKERS) em dois
+modos e mede a memória de cada worker em /proc/<pid>/smaps_rollup:
+
+- antes: RandomForest do sklearn desserializado do .joblib
+  (ML_COMPILED_FOREST=0)
+- depois: floresta compilada mapeada do .forest.bin (compiled_forest.py)
+
+Em duas fases:
+
+- após o fork: workers recém-criados, modelo herdado do pai
+  (copy-on-write)
+- após recarga: o .joblib é regravado e cada worker recarrega o modelo
+  por conta própria (model_reloader.py); é o estado de uma API que já
+  passou por um retreinamento
+
+Colunas: RSS e USS (memória exclusiva do processo: Private_Clean +
+Private_Dirty) médios por worker, e PSS somado de todos os processos da
+API (pai + workers), a memória efetivamente ocupada no host.
+
+Roda em um diretório temporário (backend/models com cópia do modelo e dos
+encoders); sem backend/models/modeloClassificacao.joblib, treina uma
+floresta sintética com os parâmetros do treinamento. Só Linux; a porta
+5001 precisa estar livre.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmarks/bench_worker_memory.py
+    python scripts/benchmarks/bench_worker_memory.py --workers 1 4 --requests 200
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_compiled_forest import train_synthetic_forest  # noqa: E402
+from compiled_forest import MODEL_PATH, export_forest  # noqa: E402
+from model_reloader import sample_request  # noqa: E402
+from inference_engine import compile_encoders  # noqa: E402
+
+API_SCRIPT = SCRIPTS_DIR / "classification_api.py"
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+URL = 'http://localhost:5001'
+
+# Modo -> valor de ML_COMPILED_FOREST
+MODES = {
+    'sklearn (.joblib)': '0',
+    'compilada (mmap)': '1',
+}
+
+
+def read_memory(pid):
+    """Rss, Pss e USS (Private_Clean + Private_Dirty) do processo em MB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        'rss': values.get('Rss', 0.0),
+        'pss': values.get('Pss', 0.0),
+        'uss': values.get('Private_Clean', 0.0) + values.get('Private_Dirty', 0.0),
+    }
+
+
+def child_pids(pid):
+    """Workers do servidor pre-fork (filhos diretos do processo da API)"""
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def get_json(path):
+    with urllib.request.urlopen(f"{URL}{path}", timeout=5) as response:
+        return json.load(response)
+
+
+def post_json(path, body):
+    request = urllib.request.Request(f"{URL}{path}", data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def wait_healthy(timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if get_json('/health').get('model_loaded'):
+                return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def wait_reloaded(since, workers, timeout=120):
+    """Espera 3 x workers respostas seguidas de /health com o modelo carregado depois de since"""
+    deadline = time.time() + timeout
+    fresh = 0
+    while time.time() < deadline and fresh < 3 * workers:
+        try:
+            loaded_at = datetime.fromisoformat(get_json('/health')['loaded_at'])
+            fresh = fresh + 1 if loaded_at > since else 0
+        except OSError:
+            fresh = 0
+        time.sleep(0.05)
+    return fresh >= 3 * workers
+
+
+def send_traffic(body, requests):
+    errors = 0
+    for _ in range(requests):
+        try:
+            errors += post_json('/classify', body) != 200
+        except OSError:
+            errors += 1
+    return errors
+
+
+def measure(api_pid):
+    """Médias por worker e PSS total (com 1 worker a API atende no próprio processo)"""
+    parent = read_memory(api_pid)
+    workers = [read_memory(pid) for pid in child_pids(api_pid)]
+    processes = [parent] + workers
+    if not workers:
+        workers = [parent]
+    return {
+        'rss': float(np.mean([w['rss'] for w in workers])),
+        'uss': float(np.mean([w['uss'] for w in workers])),
+        'pss_total': sum(p['pss'] for p in processes),
+    }
+
+
+def rewrite_model(model_path):
+    """Regrava o .joblib com o mesmo conteúdo (mtime novo dispara a recarga)"""
+    tmp_path = model_path.with_name(model_path.name + '.tmp')
+    shutil.copyfile(model_path, tmp_path)
+    os.replace(tmp_path, model_path)
+
+
+def run_api(workdir, mode_value, workers, body, requests, interval):
+    """Sobe a API e retorna {fase: medidas}"""
+    env = {**os.environ, 'ML_API_WORKERS': str(workers), 'ML_COMPILED_FOREST': mode_value,
+           'ML_MODEL_WATCH_INTERVAL_S': str(interval), 'PYTHONIOENCODING': 'utf-8',
+           'PYTHONWARNINGS': 'ignore'}
+    process = subprocess.Popen([sys.executable, str(API_SCRIPT)], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_healthy():
+            raise RuntimeError(f"API não ficou pronta com {workers} worker(s)")
+        results = {}
+        errors = send_traffic(body, requests)
+        results['após o fork'] = dict(measure(process.pid), errors=errors)
+
+        swapped_at = datetime.now()
+        rewrite_model(Path(workdir) / MODEL_PATH)
+        if not wait_reloaded(swapped_at, workers):
+            raise RuntimeError(f"Workers não recarregaram o modelo ({workers} worker(s))")
+        errors = send_traffic(body, requests)
+        results['após recarga'] = dict(measure(process.pid), errors=errors)
+        return results
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=15)
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=100, help='Requisições /classify por fase')
+    parser.add_argument('--interval', type=float, default=0.2, help='ML_MODEL_WATCH_INTERVAL_S das APIs')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    if not sys.platform.startswith('linux'):
+        print("❌ Requer Linux (/proc/<pid>/smaps_rollup e servidor pre-fork)")
+        sys.exit(1)
+    if not ENCODERS_PATH.exists():
+        print(f"❌ Encoders não encontrados: {ENCODERS_PATH}")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        models_dir = Path(workdir) / MODEL_PATH.parent
+        models_dir.mkdir(parents=True)
+        shutil.copyfile(ENCODERS_PATH, models_dir / ENCODERS_PATH.name)
+        model_path = models_dir / MODEL_PATH.name
+        if MODEL_PATH.exists():
+            shutil.copyfile(MODEL_PATH, model_path)
+            model = joblib.load(model_path)
+            source = str(MODEL_PATH)
+        else:
+            print(f"⚠️  {MODEL_PATH} não encontrado: treinando floresta sintética "
+                  f"(parâmetros de train_classification_model.py)")
+            model = train_synthetic_forest()
+            joblib.dump(model, model_path)
+            source = 'floresta sintética'
+        forest_path, forest_size = export_forest(model, model_path)
+        body = sample_request(compile_encoders(joblib.load(ENCODERS_PATH)))
+
+        print(f"🧠 Memória por worker da API de classificação ({source}: "
+              f"{model_path.stat().st_size / 1024 / 1024:.1f} MB .joblib, "
+              f"{forest_size / 1024 / 1024:.1f} MB {forest_path.suffix})")
+        print()
+        print(f"   {'Modo':<18} {'Workers':>7} {'Fase':<13} {'RSS/worker':>11} {'USS/worker':>11} "
+              f"{'PSS total':>10} {'Erros':>6}")
+
+        failed = 0
+        for workers in args.workers:
+            for mode, value in MODES.items():
+                try:
+                    results = run_api(workdir, value, workers, body, args.requests, args.interval)
+                except RuntimeError as e:
+                    print(f"   {mode:<18} {workers:>7} ❌ {e}")
+                    failed += 1
+                    continue
+                for phase, m in results.items():
+                    failed += m['errors']
+                    print(f"   {mode:<18} {workers:>7} {phase:<13} {m['rss']:>8.1f} MB {m['uss']:>8.1f} MB "
+                          f"{m['pss_total']:>7.1f} MB {m['errors']:>6}")
+            print()
+
+    print("   (RSS conta páginas compartilhadas em cada worker; USS é só a parte exclusiva)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Teste de carga da API de Predição - Sompo
+=========================================
+
+Sobe ml_prediction_api.py com diferentes números de workers
+(ML_API_WORKERS), dispara requisições concorrentes em /predict a partir de
+processos cliente e reporta RPS e latências p50/p95/p99.
+
+Uso (a partir da raiz do projeto, porta 5000 livre):
+    python scripts/benchmarks/load_test.py
+    python scripts/benchmarks/load_test.py --workers 1 4 --clients 16 --requests 200
+    python scripts/benchmarks/load_test.py --url http://localhost:5000   # servidor já rodando
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from multiprocessing import Pool
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+API_SCRIPT = Path(__file__).resolve().parent.parent / "ml_prediction_api.py"
+
+
+def build_body(i):
+    ufs = ['SP', 'RJ', 'MG', 'PR', 'SC', 'RS']
+    return json.dumps({
+        'uf': ufs[i % len(ufs)],
+        'br': 116,
+        'km': float(i % 600),
+        'hour': i % 24,
+        'weatherCondition': 'chuva' if i % 3 == 0 else 'claro',
+    })
+
+
+def client(args):
+    """Processo cliente: envia requisições sequenciais e retorna latências em ms"""
+    url, client_id, n_requests = args
+    target = urlparse(url)
+    latencies = []
+    errors = 0
+    for i in range(n_requests):
+        body = build_body(client_id * n_requests + i)
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+            conn.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status != 200:
+                errors += 1
+        except OSError:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def wait_healthy(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+                if json.load(response).get('model_loaded'):
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def run_load(url, clients, requests_per_client):
+    with Pool(clients) as pool:
+        start = time.perf_counter()
+        results = pool.map(client, [(url, c, requests_per_client) for c in range(clients)])
+        elapsed = time.perf_counter() - start
+    latencies = np.concatenate([np.array(lat) for lat, _ in results])
+    errors = sum(err for _, err in results)
+    return len(latencies) / elapsed, latencies, errors
+
+
+def report(label, rps, latencies, errors):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{label:>10} | {rps:>9,.0f} | {p50:>8.2f} | {p95:>8.2f} | {p99:>8.2f} | {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=16, help='Processos cliente concorrentes')
+    parser.add_argument('--requests', type=int, default=250, help='Requisições por cliente')
+    parser.add_argument('--url', help='Testar um servidor já em execução em vez de subir a API')
+    args = parser.parse_args()
+
+    print()
+    print(f"{'workers':>10} | {'RPS':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'erros':>6}")
+    print("-" * 66)
+
+    if args.url:
+        report('externo', *run_load(args.url, args.clients, args.requests))
+        return
+
+    url = 'http://localhost:5000'
+    for workers in args.workers:
+        env = {**os.environ, 'ML_API_WORKERS': str(workers), 'PYTHONIOENCODING': 'utf-8'}
+        process = subprocess.Popen(
+            [sys.executable, str(API_SCRIPT)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_healthy(url):
+                print(f"{workers:>10} | API não ficou pronta")
+                continue
+            # Aquecimento
+            run_load(url, 2, 10)
+            report(str(workers), *run_load(url, args.clients, args.requests))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=15)
+            time.sleep(0.5)
+    print()
+
+
+if __name__ == '__main__':
+    main()
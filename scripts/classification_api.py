@@ -9,6 +9,20 @@ Endpoints:
     GET /health - Health check
     GET /model-info - Informações sobre o modelo carregado
     POST /classify - Classificar tipo de acidente
+    POST /batch-classify - Classificação em lote (JSON ou colunas em Arrow
+        IPC, .npz ou msgpack, ver columnar_batch.py)
+    POST /classify-stream - Classificação em streaming NDJSON (ver ndjson_stream.py)
+    POST /admin/reload-model - Recarrega o modelo do disco sem reiniciar
+    GET /metrics - Latência por etapa, requisições, erros e lotes (Prometheus)
+
+Recarga do modelo sem reiniciar: ver model_reloader.py
+(ML_MODEL_WATCH_INTERVAL_S, ML_ADMIN_TOKEN).
+
+Métricas: ver request_metrics.py (ML_METRICS_SAMPLE_RATE, ML_METRICS_DIR).
+
+O RandomForest é avaliado pela floresta compilada em arrays NumPy
+(compiled_forest.py, modeloClassificacao.forest.bin), com probabilidades
+idênticas às do sklearn.
     
 Autor: Sistema Sompo
 Data: 2025-10-14
@@ -16,12 +30,31 @@ Data: 2025-10-14
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
 import numpy as np
-import pandas as pd
 import logging
+import os
 from pathlib import Path
 from datetime import datetime
+import time
+
+from inference_engine import (
+    ACCIDENT_CLASSES,
+    CLASSIFICATION_WEATHER_MAPPING,
+    CLASSIFICATION_ROAD_TYPE,
+    InputError,
+    day_phase_from_hour,
+    encode_value,
+    predict_with_proba,
+)
+from compiled_forest import load_classifier
+from model_reloader import ModelReloader, load_bundle, admin_authorized, prepare_worker, sample_request
+import columnar_batch
+import ndjson_stream
+import request_metrics
+from serving import serve, get_worker_count, warm_up_routes, log_startup, process_uptime_ms
+
+# Partida do processo até aqui (imports concluídos)
+IMPORTS_MS = process_uptime_ms()
 
 # Configuração de logging
 logging.basicConfig(
@@ -32,27 +65,25 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
+request_metrics.install(app, 'classification')
 
 # Caminhos dos modelos
 MODEL_PATH = Path("backend/models/modeloClassificacao.joblib")
 ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
 
-# Variáveis globais para modelo e encoders
-classification_model = None
-label_encoders = None
-model_loaded_at = None
+# Modelo ativo (ModelBundle: modelo, encoders e versão, trocados juntos)
+active_model = None
+
+# Recarga do modelo sem reiniciar
+reloader = None
 
-# Mapeamento de classes (baseado no DATATRAN)
-ACCIDENT_CLASSES = [
-    "Sem Vítimas",
-    "Com Vítimas Feridas", 
-    "Com Vítimas Fatais"
-]
+# Tempos da inicialização (finish_startup)
+startup_timings = None
 
 
 def load_model():
     """Carrega o modelo e encoders do disco"""
-    global classification_model, label_encoders, model_loaded_at
+    global reloader
     
     try:
         logger.info("🤖 Carregando modelo de classificação de acidentes...")
@@ -66,21 +97,26 @@ def load_model():
             logger.error(f"❌ Encoders não encontrados: {ENCODERS_PATH}")
             return False
         
-        # Carregar modelo de classificação
-        classification_model = joblib.load(MODEL_PATH)
+        # Carregar modelo de classificação e encoders (aquecidos antes de atender)
+        bundle = load_bundle(MODEL_PATH, ENCODERS_PATH, loader=load_classifier)
         logger.info(f"   ✅ Modelo de classificação carregado: {MODEL_PATH}")
-        
-        # Carregar encoders
-        label_encoders = joblib.load(ENCODERS_PATH)
         logger.info(f"   ✅ Label encoders carregados: {ENCODERS_PATH}")
+        swap_model(bundle)
         
-        model_loaded_at = datetime.now()
+        reloader = ModelReloader(
+            [MODEL_PATH, ENCODERS_PATH],
+            lambda: load_bundle(MODEL_PATH, ENCODERS_PATH, loader=load_classifier),
+            swap_model,
+            bundle.signature,
+            name='Modelo de classificação'
+        )
         
         logger.info("=" * 60)
         logger.info("✅ MODELO DE CLASSIFICAÇÃO PRONTO!")
-        logger.info(f"   Tipo: {type(classification_model).__name__}")
+        logger.info(f"   Tipo: {type(bundle.model).__name__}")
+        logger.info(f"   Versão: {bundle.version} (aquecimento {bundle.warmup_ms or 0:.1f} ms)")
         logger.info(f"   Classes: {len(ACCIDENT_CLASSES)}")
-        logger.info(f"   Encoders disponíveis: {list(label_encoders.keys())}")
+        logger.info(f"   Encoders disponíveis: {list(bundle.label_encoders.keys())}")
         logger.info("=" * 60)
         
         return True
@@ -90,18 +126,55 @@ def load_model():
         return False
 
 
-def prepare_features(data):
+def swap_model(bundle):
+    """Publica um novo modelo (uma atribuição; requisições em andamento seguem no anterior)"""
+    global active_model
+    active_model = bundle
+    request_metrics.set_model_version('classification', bundle.version)
+
+
+def configure_worker():
+    """Inicialização de cada worker: threads do modelo e observação dos arquivos"""
+    prepare_worker(active_model, get_worker_count())
+    if reloader is not None:
+        reloader.start()
+    request_metrics.registry.start()
+
+
+def finish_startup():
+    """Aquece as rotas e registra os tempos de inicialização (antes de abrir o socket)"""
+    global startup_timings
+    
+    sample = sample_request(active_model.encoding_tables)
+    routes_ms = warm_up_routes(app, [
+        ('POST', '/classify', sample),
+        ('POST', '/batch-classify', {'predictions': [sample, sample]}),
+        ('GET', '/health', None),
+    ])
+    # Requisições do aquecimento não entram nas métricas
+    request_metrics.registry.reset()
+    startup_timings = {
+        'imports_ms': IMPORTS_MS,
+        'model_load_ms': active_model.load_ms,
+        'warmup_ms': active_model.warmup_ms,
+        'routes_warmup_ms': routes_ms,
+        'total_ms': process_uptime_ms(),
+    }
+    log_startup('Classification API', startup_timings)
+    return startup_timings
+
+
+def parse_classification_input(data):
     """
-    Prepara features para o modelo
+    Extrai e valida os campos de /classify
     
     Args:
         data: Dict com uf, br, km, hour, weatherCondition, dayOfWeek
         
     Returns:
-        Array numpy com features preparadas
+        Tupla (uf, br, km, hour, day_of_week, month, clima, fase do dia)
     """
     try:
-        # Extrair e validar dados
         uf = str(data.get('uf', 'SP')).upper()
         br = int(data.get('br', 116))
         km = float(data.get('km', 0))
@@ -111,69 +184,146 @@ def prepare_features(data):
         
         # Mapear condição meteorológica
         weather_input = str(data.get('weatherCondition', 'claro')).lower()
-        weather_mapping = {
-            'claro': 'claro',
-            'clear': 'claro',
-            'sol': 'claro',
-            'nublado': 'nublado',
-            'cloudy': 'nublado',
-            'chuvoso': 'chuvoso',
-            'chuva': 'chuvoso',
-            'rain': 'chuvoso',
-            'neblina': 'neblina',
-            'fog': 'neblina',
-            'vento': 'vento',
-            'wind': 'vento'
-        }
-        weather = weather_mapping.get(weather_input, 'claro')
+        weather = CLASSIFICATION_WEATHER_MAPPING.get(weather_input, 'claro')
         
         # Mapear fase do dia baseado na hora
-        if 6 <= hour < 12:
-            day_phase = 'amanhecer' if hour < 8 else 'dia'
-        elif 12 <= hour < 18:
-            day_phase = 'dia'
-        elif 18 <= hour < 20:
-            day_phase = 'anoitecer'
-        else:
-            day_phase = 'noite'
-            
-        # Tipo de pista padrão
-        road_type = 'simples'
-        
-        # Encodar features categóricas
-        uf_encoded = label_encoders['uf'].transform([uf])[0] if uf in label_encoders['uf'].classes_ else 0
-        weather_encoded = label_encoders['clima_categoria'].transform([weather])[0]
-        day_phase_encoded = label_encoders['fase_dia_categoria'].transform([day_phase])[0]
-        road_type_encoded = label_encoders['tipo_pista_categoria'].transform([road_type])[0]
+        day_phase = day_phase_from_hour(hour)
         
-        # Criar array de features na ordem correta
-        features = np.array([
-            uf_encoded,
-            br,
-            km,
-            hour,
-            day_of_week,
-            month,
-            weather_encoded,
-            day_phase_encoded,
-            road_type_encoded
-        ])
-        
-        return features
+        return uf, br, km, hour, day_of_week, month, weather, day_phase
         
     except Exception as e:
         logger.error(f"Erro ao preparar features: {e}", exc_info=True)
         raise
 
 
+def encode_classification_input(values, encoding_tables):
+    """
+    Codifica os campos validados na linha de features do modelo
+    
+    UF desconhecida é codificada como 0 (a classificação segue normalmente).
+    
+    Raises:
+        InputError: Valor categórico desconhecido pelos encoders
+    """
+    uf, br, km, hour, day_of_week, month, weather, day_phase = values
+    
+    # Encodar features categóricas (tipo de pista padrão)
+    uf_encoded = encoding_tables['uf'].get(uf, 0)
+    weather_encoded = encode_value(encoding_tables, 'clima_categoria', weather)
+    day_phase_encoded = encode_value(encoding_tables, 'fase_dia_categoria', day_phase)
+    road_type_encoded = encode_value(encoding_tables, 'tipo_pista_categoria', CLASSIFICATION_ROAD_TYPE)
+    
+    # Criar array de features na ordem correta
+    return np.array([
+        uf_encoded,
+        br,
+        km,
+        hour,
+        day_of_week,
+        month,
+        weather_encoded,
+        day_phase_encoded,
+        road_type_encoded
+    ])
+
+
+def format_classification(prediction, probabilities):
+    """Classe, confiança e probabilidades de uma linha (comum a /classify e aos lotes)"""
+    return {
+        'classification': ACCIDENT_CLASSES[prediction],
+        'confidence': float(max(probabilities)),
+        'probabilities': {
+            ACCIDENT_CLASSES[i]: float(prob)
+            for i, prob in enumerate(probabilities)
+        },
+        'severity_index': int(prediction),  # 0, 1, ou 2
+    }
+
+
+def _encode_batch_items(items, encoding_tables, results):
+    """
+    Valida e codifica os itens de um lote (erros vão direto para results)
+    
+    Returns:
+        Tupla (linhas de features, posição de cada linha no lote)
+    """
+    parsed = []
+    for i, pred_data in enumerate(items):
+        try:
+            parsed.append((i, parse_classification_input(pred_data)))
+        except Exception as e:
+            results[i] = {
+                'error': str(e),
+                'input': pred_data
+            }
+            request_metrics.error(e)
+    request_metrics.mark('validation')
+    
+    rows = []
+    positions = []
+    for i, values in parsed:
+        try:
+            rows.append(encode_classification_input(values, encoding_tables))
+            positions.append(i)
+        except InputError as e:
+            results[i] = {
+                'error': str(e),
+                'input': items[i]
+            }
+            request_metrics.error(e)
+    request_metrics.mark('encoding')
+    return rows, positions
+
+
+def _json_batch_items(data):
+    """Itens do corpo JSON de /batch-classify"""
+    items = data.get('predictions') if isinstance(data, dict) else None
+    if not items:
+        raise InputError('Lista de predições vazia')
+    return items
+
+
+def classify_batch(model, encoding_tables, items):
+    """
+    Classificação de um lote em uma única chamada ao modelo
+    
+    Itens inválidos recebem {'error': ..., 'input': item} na sua posição.
+    Usado por /batch-classify e /classify-stream.
+    
+    Returns:
+        Tupla (lista de resultados na ordem de entrada, tempo do modelo em ms)
+    """
+    results = [None] * len(items)
+    
+    # Validar e codificar cada item; erros ficam na posição do item
+    rows, positions = _encode_batch_items(items, encoding_tables, results)
+    if not rows:
+        return results, 0.0
+    
+    # Uma única passada pelo modelo para todo o lote
+    classes, proba, model_time_ms = predict_with_proba(
+        model, np.vstack(rows)
+    )
+    request_metrics.mark('inference')
+    request_metrics.batch(len(rows))
+    
+    for k, i in enumerate(positions):
+        results[i] = dict(format_classification(classes[k], proba[k]), input=items[i])
+    request_metrics.mark('postprocess')
+    
+    return results, model_time_ms
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
+    bundle = active_model
     return jsonify({
-        'status': 'healthy' if classification_model is not None else 'model_not_loaded',
+        'status': 'healthy' if bundle is not None else 'model_not_loaded',
         'service': 'classification-api',
-        'model_loaded': classification_model is not None,
-        'loaded_at': model_loaded_at.isoformat() if model_loaded_at else None,
+        'model_loaded': bundle is not None,
+        'model_version': bundle.version if bundle is not None else None,
+        'loaded_at': bundle.loaded_at.isoformat() if bundle is not None else None,
         'timestamp': datetime.now().isoformat()
     })
 
@@ -181,17 +331,23 @@ def health():
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Informações sobre o modelo"""
-    if classification_model is None:
+    bundle = active_model
+    if bundle is None:
         return jsonify({
             'error': 'Modelo não carregado'
         }), 503
     
     return jsonify({
-        'model_type': type(classification_model).__name__,
+        'model_type': type(bundle.model).__name__,
+        'model_version': bundle.version,
         'classes': ACCIDENT_CLASSES,
         'n_classes': len(ACCIDENT_CLASSES),
-        'encoders': list(label_encoders.keys()),
-        'loaded_at': model_loaded_at.isoformat() if model_loaded_at else None,
+        'encoders': list(bundle.label_encoders.keys()),
+        'loaded_at': bundle.loaded_at.isoformat(),
+        'warmup_ms': round(bundle.warmup_ms, 3) if bundle.warmup_ms is not None else None,
+        'reload': reloader.stats() if reloader is not None else None,
+        'startup': ({key: round(ms, 3) for key, ms in startup_timings.items() if ms is not None}
+                    if startup_timings else None),
         'model_path': str(MODEL_PATH),
         'features': [
             'uf_encoded',
@@ -207,6 +363,37 @@ def model_info():
     })
 
 
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """
+    Recarrega modelo e encoders do disco (aquecidos antes da troca)
+    
+    Com ML_API_WORKERS > 1, recarrega só o worker que atendeu a requisição.
+    """
+    if not admin_authorized(request):
+        return jsonify({'error': 'Token de administração ausente ou inválido (defina ML_ADMIN_TOKEN para habilitar a rota)'}), 403
+    
+    if reloader is None:
+        return jsonify({'error': 'Modelo não carregado'}), 503
+    
+    previous = active_model
+    try:
+        bundle = reloader.reload('admin')
+    except Exception as e:
+        return jsonify({
+            'error': f'Falha ao recarregar: {e}',
+            'model_version': previous.version if previous is not None else None
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'previous_version': previous.version if previous is not None else None,
+        'model_version': bundle.version,
+        'warmup_ms': round(bundle.warmup_ms, 3),
+        'pid': os.getpid()
+    })
+
+
 @app.route('/classify', methods=['POST'])
 def classify():
     """
@@ -236,50 +423,60 @@ def classify():
     }
     """
     try:
-        if classification_model is None:
+        # Uma leitura do modelo ativo: a requisição inteira usa a mesma versão
+        bundle = active_model
+        if bundle is None:
             return jsonify({
                 'error': 'Modelo não carregado. Execute train_risk_model.py'
             }), 503
+        request_metrics.use_model('classification', bundle.version)
         
         # Validar request
-        if not request.json:
-            return jsonify({'error': 'Request body vazio'}), 400
-        
         data = request.json
+        request_metrics.mark('parse')
+        if not data:
+            return jsonify({'error': 'Request body vazio'}), 400
         
         # Preparar features
-        features = prepare_features(data)
+        values = parse_classification_input(data)
+        request_metrics.mark('validation')
+        features = encode_classification_input(values, bundle.encoding_tables)
         
         # Reshape para predição
         features_reshaped = features.reshape(1, -1)
+        request_metrics.mark('encoding')
         
-        # Fazer predição
-        prediction = classification_model.predict(features_reshaped)[0]
-        probabilities = classification_model.predict_proba(features_reshaped)[0]
+        # Fazer predição (uma única passada pelo modelo)
+        classes, proba, model_time_ms = predict_with_proba(bundle.model, features_reshaped)
+        request_metrics.mark('inference')
+        request_metrics.batch(1)
         
         # Montar resposta
-        result = {
-            'classification': ACCIDENT_CLASSES[prediction],
-            'confidence': float(max(probabilities)),
-            'probabilities': {
-                ACCIDENT_CLASSES[i]: float(prob) 
-                for i, prob in enumerate(probabilities)
-            },
-            'severity_index': int(prediction),  # 0, 1, ou 2
-            'input_summary': {
+        result = dict(
+            format_classification(classes[0], proba[0]),
+            input_summary={
                 'location': f"{data.get('uf')}-BR{data.get('br')} KM {data.get('km')}",
                 'time': f"{data.get('hour')}:00",
                 'weather': data.get('weatherCondition')
             },
-            'timestamp': datetime.now().isoformat()
-        }
+            timestamp=datetime.now().isoformat(),
+            metadata={
+                'model_time_ms': round(model_time_ms, 3)
+            }
+        )
         
         logger.info(f"Classificação: {result['classification']} (confiança: {result['confidence']:.2%})")
+        request_metrics.mark('postprocess')
         
         return jsonify(result)
         
+    except InputError as e:
+        request_metrics.error(e)
+        return jsonify({'error': str(e)}), e.status_code
+        
     except KeyError as e:
         logger.error(f"Campo obrigatório faltando: {e}")
+        request_metrics.error(e)
         return jsonify({
             'error': f'Campo obrigatório faltando: {e}',
             'required_fields': ['uf', 'br', 'km', 'hour']
@@ -287,6 +484,7 @@ def classify():
         
     except Exception as e:
         logger.error(f"Erro na classificação: {e}", exc_info=True)
+        request_metrics.error(e)
         return jsonify({
             'error': f'Erro ao classificar: {str(e)}'
         }), 500
@@ -304,56 +502,68 @@ def batch_classify():
             { "uf": "RJ", "br": "101", "km": 85, "hour": 14, ... }
         ]
     }
+    
+    Também aceita o lote em colunas (Content-Type Arrow IPC, .npz ou
+    msgpack; ver columnar_batch.py), com resposta só com classe,
+    confiança e probabilidades.
     """
     try:
-        if classification_model is None:
+        bundle = active_model
+        if bundle is None:
             return jsonify({'error': 'Modelo não carregado'}), 503
+        request_metrics.use_model('classification', bundle.version)
         
-        data = request.json
-        predictions_input = data.get('predictions', [])
-        
-        if not predictions_input:
-            return jsonify({'error': 'Lista de predições vazia'}), 400
+        # Lote colunar binário (Arrow, .npz, msgpack): resposta enxuta
+        fmt = columnar_batch.request_format(request.mimetype)
+        if fmt is not None:
+            return columnar_batch.handle_batch(request, fmt, columnar_batch.classify_columns, bundle)
         
-        results = []
+        try:
+            predictions_input = _json_batch_items(request.json)
+        except InputError as e:
+            request_metrics.error(e)
+            return jsonify({'error': str(e)}), e.status_code
+        request_metrics.mark('parse')
         
-        for pred_data in predictions_input:
-            try:
-                features = prepare_features(pred_data)
-                features_reshaped = features.reshape(1, -1)
-                
-                prediction = classification_model.predict(features_reshaped)[0]
-                probabilities = classification_model.predict_proba(features_reshaped)[0]
-                
-                results.append({
-                    'classification': ACCIDENT_CLASSES[prediction],
-                    'confidence': float(max(probabilities)),
-                    'probabilities': {
-                        ACCIDENT_CLASSES[i]: float(prob) 
-                        for i, prob in enumerate(probabilities)
-                    },
-                    'severity_index': int(prediction),
-                    'input': pred_data
-                })
-                
-            except Exception as e:
-                results.append({
-                    'error': str(e),
-                    'input': pred_data
-                })
+        results, model_time_ms = classify_batch(bundle.model, bundle.encoding_tables, predictions_input)
         
         return jsonify({
             'total': len(results),
             'successful': sum(1 for r in results if 'error' not in r),
             'failed': sum(1 for r in results if 'error' in r),
-            'results': results
+            'results': results,
+            'metadata': {
+                'model_time_ms': round(model_time_ms, 3)
+            }
         })
         
     except Exception as e:
         logger.error(f"Erro na classificação em lote: {e}", exc_info=True)
+        request_metrics.error(e)
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/classify-stream', methods=['POST'])
+def classify_stream():
+    """
+    Classificação em streaming para jobs grandes (NDJSON)
+    
+    Body: um objeto no formato de /classify por linha, lido aos poucos.
+    Resposta: NDJSON, um resultado de /batch-classify por linha (com
+    "line"), progresso por bloco e resumo no fim; ver ndjson_stream.py.
+    """
+    bundle = active_model
+    if bundle is None:
+        return jsonify({'error': 'Modelo não carregado'}), 503
+    request_metrics.use_model('classification', bundle.version)
+    
+    return ndjson_stream.stream_response(
+        request,
+        lambda items: classify_batch(bundle.model, bundle.encoding_tables, items),
+        bundle.version
+    )
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint não encontrado'}), 404
@@ -376,18 +586,24 @@ if __name__ == '__main__':
         print("   python scripts/train_risk_model.py")
         exit(1)
     
+    finish_startup()
+    workers = get_worker_count()
+    
     print()
-    print("🚀 Servidor iniciando na porta 5001...")
+    print(f"🚀 Servidor iniciando na porta 5001 ({workers} worker(s))...")
     print()
     print("📋 Endpoints disponíveis:")
     print("   GET  http://localhost:5001/health")
     print("   GET  http://localhost:5001/model-info")
     print("   POST http://localhost:5001/classify")
     print("   POST http://localhost:5001/batch-classify")
+    print("   POST http://localhost:5001/classify-stream")
+    print("   POST http://localhost:5001/admin/reload-model")
+    print("   GET  http://localhost:5001/metrics")
     print()
     print("=" * 60)
     print()
     
-    # Iniciar servidor
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    # Iniciar servidor (observação do modelo iniciada em cada worker)
+    serve(app, '0.0.0.0', 5001, workers=workers, post_fork=configure_worker)
 
@@ -0,0 +1,491 @@
+"""
+Lotes em Formato Colunar Binário - Sompo
+========================================
+
+/predict-batch e /batch-classify aceitam, além do JSON, o lote em colunas
+binárias, escolhidas pelo Content-Type da requisição:
+
+- application/vnd.apache.arrow.stream: Arrow IPC (stream), via pyarrow
+- application/x-npz: arquivo .npz do NumPy (np.savez; lido sem pickle)
+- application/msgpack: mapa coluna -> lista, via msgpack
+
+As colunas têm os nomes dos campos do JSON (uf, br, km, hour, dayOfWeek,
+month, weatherCondition, dayPhase, roadType) e vão direto para a matriz
+de features, sem um dict por linha: números convertidos por coluna e
+categorias mapeadas e codificadas uma vez por valor distinto. Nulo (ou
+texto vazio, já que o .npz não tem nulo) equivale a campo ausente: padrão
+do campo, ou erro na linha se o campo for obrigatório.
+
+A resposta é enxuta: só as colunas de resultado (RISK_OUTPUT e
+CLASSIFICATION_OUTPUT) e a coluna error (nula nas linhas válidas; nelas
+os números ficam NaN e a classe -1), sem eco da entrada nem
+recomendações. O formato vem do Accept (Arrow, .npz, msgpack ou
+application/json com as mesmas colunas); sem Accept, o mesmo da
+requisição. Total, falhas e tempo do modelo vão nos headers
+X-Batch-Total, X-Batch-Failed e X-Model-Time-Ms.
+
+pyarrow e msgpack são opcionais: sem eles o formato correspondente
+responde HTTP 415.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import io
+
+import numpy as np
+
+import request_metrics
+from inference_engine import (
+    ACCIDENT_CLASSES,
+    CLASSIFICATION_ROAD_TYPE,
+    CLASSIFICATION_WEATHER_MAPPING,
+    FEATURE_COLUMNS,
+    PHASE_MAPPING,
+    REQUIRED_FIELDS,
+    RISK_CLASSES,
+    ROAD_MAPPING,
+    WEATHER_MAPPING,
+    InputError,
+    day_phase_from_hour,
+    predict_with_proba,
+    score_probabilities,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+except ImportError:
+    pa = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Content-Type -> formato
+FORMATS = {
+    'application/vnd.apache.arrow.stream': 'arrow',
+    'application/x-npz': 'npz',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+}
+
+# Formato -> Content-Type da resposta
+MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'npz': 'application/x-npz',
+    'msgpack': 'application/msgpack',
+    'json': 'application/json',
+}
+
+# Colunas da resposta enxuta
+RISK_OUTPUT = ['risk_score', 'risk_level', 'predicted_class'] + [f'prob_{name}' for name in RISK_CLASSES]
+CLASSIFICATION_OUTPUT = ['classification', 'severity_index', 'confidence',
+                         'prob_sem_vitimas', 'prob_vitimas_feridas', 'prob_vitimas_fatais']
+
+
+class FormatError(InputError):
+    """Formato de lote sem a biblioteca instalada (HTTP 415)"""
+    status_code = 415
+
+
+def request_format(mimetype):
+    """Formato colunar do Content-Type, ou None (JSON)"""
+    return FORMATS.get(mimetype)
+
+
+def response_format(accept_mimetypes, request_fmt):
+    """
+    Formato da resposta a partir do Accept
+
+    Args:
+        accept_mimetypes: request.accept_mimetypes do Flask
+        request_fmt: Formato da requisição (usado sem Accept ou com */*)
+
+    Só oferece formatos com a biblioteca instalada.
+    """
+    offered = [MIMETYPES[request_fmt]] + [
+        mimetype for fmt, mimetype in MIMETYPES.items() if fmt != request_fmt and available(fmt)
+    ]
+    best = accept_mimetypes.best_match(offered)
+    if best is None:
+        return request_fmt
+    return 'json' if best == MIMETYPES['json'] else FORMATS[best]
+
+
+def available(fmt):
+    """Se a biblioteca do formato está instalada"""
+    return not (fmt == 'arrow' and pa is None or fmt == 'msgpack' and msgpack is None)
+
+
+def _require(fmt):
+    if not available(fmt):
+        package = 'pyarrow' if fmt == 'arrow' else fmt
+        raise FormatError(f'Formato {fmt} indisponível: instale {package}')
+
+
+def decode_columns(body, fmt):
+    """
+    Lê o corpo da requisição em colunas
+
+    Returns:
+        Tupla (dict coluna -> valores, número de linhas); valores são
+        pa.ChunkedArray (Arrow) ou np.ndarray
+
+    Raises:
+        FormatError: Biblioteca do formato não instalada
+        InputError: Corpo ilegível ou colunas de tamanhos diferentes
+    """
+    _require(fmt)
+    try:
+        if fmt == 'arrow':
+            table = pa.ipc.open_stream(body).read_all()
+            columns = {name: table.column(name) for name in table.column_names}
+        elif fmt == 'npz':
+            with np.load(io.BytesIO(body), allow_pickle=False) as npz:
+                columns = {name: npz[name] for name in npz.files}
+        else:
+            data = msgpack.unpackb(body)
+            if not isinstance(data, dict):
+                raise InputError('Lote msgpack deve ser um mapa coluna -> lista')
+            columns = {str(name): np.asarray(values) for name, values in data.items()}
+    except InputError:
+        raise
+    except Exception as e:
+        raise InputError(f'Lote {fmt} inválido: {e}')
+
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise InputError('Colunas do lote com tamanhos diferentes')
+    return columns, lengths.pop() if lengths else 0
+
+
+def _numeric(columns, name, n, default=None):
+    """
+    Coluna numérica em float64; nulos viram NaN
+
+    Sem a coluna, preenche com default (NaN se obrigatória).
+    """
+    if name not in columns:
+        return np.full(n, np.nan if default is None else default, dtype=np.float64)
+    values = columns[name]
+    if pa is not None and isinstance(values, pa.ChunkedArray):
+        values = values.to_numpy()
+    try:
+        values = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise InputError(f'Coluna {name} deve ser numérica')
+    if default is not None:
+        values = np.where(np.isnan(values), default, values)
+    return values
+
+
+def _categories(columns, name, n):
+    """
+    Fatora uma coluna de texto em valores distintos
+
+    Returns:
+        Tupla (lista de valores distintos, None para nulo ou vazio; índice
+        de cada linha nessa lista)
+    """
+    if name not in columns:
+        return [None], np.zeros(n, dtype=np.intp)
+    values = columns[name]
+
+    if pa is not None and isinstance(values, pa.ChunkedArray):
+        if pa.types.is_dictionary(values.type):
+            values = values.cast(values.type.value_type)
+        encoded = values.dictionary_encode().combine_chunks()
+        uniques = [value or None for value in encoded.dictionary.to_pylist()]
+        inverse = encoded.indices.fill_null(len(uniques)).to_numpy(zero_copy_only=False)
+        return uniques + [None], inverse.astype(np.intp)
+
+    values = np.asarray(values)
+    missing = values == None if values.dtype == object else np.zeros(n, dtype=bool)  # noqa: E711
+    if values.dtype.kind == 'S':
+        values = np.char.decode(values, 'utf-8')
+    keys = np.where(missing, '', values).astype(str)
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    return [value or None for value in uniques.tolist()], inverse.reshape(-1)
+
+
+def _encode_categories(columns, name, n, table, normalize):
+    """
+    Códigos do encoder para uma coluna de texto, um lookup por valor distinto
+
+    Args:
+        normalize: Valor distinto (None = nulo) -> categoria do encoder
+
+    Returns:
+        Tupla (códigos float64, -1 para desconhecido; categoria de cada linha)
+    """
+    uniques, inverse = _categories(columns, name, n)
+    labels = [normalize(value) for value in uniques]
+    codes = np.array([table.get(label, -1) for label in labels], dtype=np.float64)
+    return codes[inverse], np.array(labels, dtype=object)[inverse]
+
+
+def _mark_errors(errors, mask, message_fn):
+    """Grava a mensagem nas linhas da máscara que ainda não têm erro"""
+    for i in np.flatnonzero(mask):
+        if errors[i] is None:
+            errors[i] = message_fn(i)
+
+
+def _run_model(model, features, errors):
+    """Passada única pelo modelo nas linhas sem erro"""
+    valid = np.array([err is None for err in errors], dtype=bool)
+    failed = len(errors) - int(valid.sum())
+    if failed:
+        request_metrics.error('InputError', failed)
+    request_metrics.mark('encoding')
+
+    if not valid.any():
+        return valid, None, None, 0.0
+    classes, proba, model_time_ms = predict_with_proba(model, features[valid])
+    request_metrics.mark('inference')
+    request_metrics.batch(int(valid.sum()))
+    return valid, classes, proba, model_time_ms
+
+
+def _filled(n, valid, values, fill, dtype):
+    """Coluna de saída com os valores nas linhas válidas e fill nas demais"""
+    column = np.full(n, fill, dtype=dtype)
+    column[valid] = values
+    return column
+
+
+def predict_risk_columns(model, encoding_tables, columns, n):
+    """
+    Predição de risco de um lote colunar (/predict-batch)
+
+    Mesmas regras de parse_risk_input e mesmos scores do lote JSON.
+
+    Args:
+        model: Classificador com predict_proba (LightGBM)
+        encoding_tables: Tabelas retornadas por compile_encoders
+        columns: Colunas retornadas por decode_columns
+        n: Número de linhas
+
+    Returns:
+        Tupla (dict coluna -> array da resposta enxuta, tempo do modelo em ms)
+
+    Raises:
+        InputError: Coluna obrigatória ausente ou coluna numérica com texto
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in columns:
+            raise InputError(f'Coluna obrigatória ausente: {field}')
+
+    features = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+    errors = np.full(n, None, dtype=object)
+
+    br = _numeric(columns, 'br', n)
+    km = _numeric(columns, 'km', n)
+    features[:, 1] = np.trunc(br)
+    features[:, 2] = km
+    features[:, 3] = np.trunc(_numeric(columns, 'hour', n, 12))
+    features[:, 4] = np.trunc(_numeric(columns, 'dayOfWeek', n, 2))
+    features[:, 5] = np.trunc(_numeric(columns, 'month', n, 6))
+    request_metrics.mark('validation')
+
+    categorical = [
+        (0, 'uf', 'uf', lambda v: None if v is None else str(v).upper()),
+        (6, 'weatherCondition', 'clima_categoria',
+         lambda v: WEATHER_MAPPING.get('claro' if v is None else str(v).lower(), 'claro')),
+        (7, 'dayPhase', 'fase_dia_categoria',
+         lambda v: PHASE_MAPPING.get('dia' if v is None else str(v).lower(), 'dia')),
+        (8, 'roadType', 'tipo_pista_categoria',
+         lambda v: ROAD_MAPPING.get('simples' if v is None else str(v).lower(), 'simples')),
+    ]
+    encoded = []
+    for col_idx, name, encoder_name, normalize in categorical:
+        codes, labels = _encode_categories(columns, name, n, encoding_tables[encoder_name], normalize)
+        features[:, col_idx] = codes
+        encoded.append((encoder_name, codes, labels))
+
+    # Mesma ordem de erros do lote JSON: campos obrigatórios, depois encoders
+    uf_labels = encoded[0][2]
+    _mark_errors(errors, uf_labels == None, lambda i: 'Campo obrigatório ausente: uf')  # noqa: E711
+    for field, values in (('br', br), ('km', km)):
+        _mark_errors(errors, ~np.isfinite(values), lambda i, field=field: f'Campo obrigatório ausente: {field}')
+    for field, codes, labels in encoded:
+        _mark_errors(errors, codes < 0, lambda i, field=field, labels=labels:
+                     f"Valor não reconhecido nos encoders: {field}='{labels[i]}'")
+
+    valid, classes, proba, model_time_ms = _run_model(model, features, errors)
+
+    output = {
+        'risk_score': np.full(n, np.nan),
+        'risk_level': np.full(n, None, dtype=object),
+        'predicted_class': np.full(n, -1, dtype=np.int8),
+    }
+    output.update({f'prob_{name}': np.full(n, np.nan) for name in RISK_CLASSES})
+    if proba is not None:
+        risk_scores, risk_levels = score_probabilities(proba)
+        output['risk_score'][valid] = np.round(risk_scores, 2)
+        output['risk_level'][valid] = risk_levels
+        output['predicted_class'][valid] = classes
+        for k, name in enumerate(RISK_CLASSES):
+            output[f'prob_{name}'][valid] = np.round(proba[:, k] * 100, 2)
+    output['error'] = errors
+    request_metrics.mark('postprocess')
+    return output, model_time_ms
+
+
+def classify_columns(model, encoding_tables, columns, n):
+    """
+    Classificação de um lote colunar (/batch-classify)
+
+    Mesmas regras e padrões de parse_classification_input.
+
+    Returns:
+        Tupla (dict coluna -> array da resposta enxuta, tempo do modelo em ms)
+    """
+    features = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+    errors = np.full(n, None, dtype=object)
+
+    hour = np.trunc(_numeric(columns, 'hour', n, 12))
+    features[:, 1] = np.trunc(_numeric(columns, 'br', n, 116))
+    features[:, 2] = _numeric(columns, 'km', n, 0)
+    features[:, 3] = hour
+    features[:, 4] = np.trunc(_numeric(columns, 'dayOfWeek', n, 2))
+    features[:, 5] = np.trunc(_numeric(columns, 'month', n, 6))
+    request_metrics.mark('validation')
+
+    uf_codes, _ = _encode_categories(columns, 'uf', n, encoding_tables['uf'],
+                                     lambda v: 'SP' if v is None else str(v).upper())
+    weather_codes, weather_labels = _encode_categories(
+        columns, 'weatherCondition', n, encoding_tables['clima_categoria'],
+        lambda v: CLASSIFICATION_WEATHER_MAPPING.get('claro' if v is None else str(v).lower(), 'claro'))
+
+    # Fase do dia derivada da hora: uma consulta por hora distinta
+    hours, inverse = np.unique(hour, return_inverse=True)
+    phases = np.array([day_phase_from_hour(h) for h in hours], dtype=object)
+    phase_table = encoding_tables['fase_dia_categoria']
+    phase_codes = np.array([phase_table.get(p, -1) for p in phases], dtype=np.float64)[inverse.reshape(-1)]
+    phase_labels = phases[inverse.reshape(-1)]
+
+    road_code = encoding_tables['tipo_pista_categoria'].get(CLASSIFICATION_ROAD_TYPE, -1)
+    features[:, 0] = np.maximum(uf_codes, 0)  # UF desconhecida -> 0, como no JSON
+    features[:, 6] = weather_codes
+    features[:, 7] = phase_codes
+    features[:, 8] = road_code
+
+    for codes, labels, field in ((weather_codes, weather_labels, 'clima_categoria'),
+                                 (phase_codes, phase_labels, 'fase_dia_categoria')):
+        _mark_errors(errors, codes < 0,
+                     lambda i, field=field, labels=labels: f"Valor não reconhecido nos encoders: {field}='{labels[i]}'")
+    if road_code < 0:
+        _mark_errors(errors, np.ones(n, dtype=bool), lambda i: (
+            f"Valor não reconhecido nos encoders: tipo_pista_categoria='{CLASSIFICATION_ROAD_TYPE}'"))
+
+    valid, classes, proba, model_time_ms = _run_model(model, features, errors)
+
+    output = {
+        'classification': np.full(n, None, dtype=object),
+        'severity_index': np.full(n, -1, dtype=np.int8),
+        'confidence': np.full(n, np.nan),
+    }
+    probability_columns = CLASSIFICATION_OUTPUT[3:]
+    output.update({name: np.full(n, np.nan) for name in probability_columns})
+    if proba is not None:
+        output['classification'][valid] = np.array(ACCIDENT_CLASSES, dtype=object)[classes]
+        output['severity_index'][valid] = classes
+        output['confidence'][valid] = proba.max(axis=1)
+        # Coluna k de predict_proba -> ACCIDENT_CLASSES[k], como no lote JSON
+        for k, name in enumerate(probability_columns[:proba.shape[1]]):
+            output[name][valid] = proba[:, k]
+    output['error'] = errors
+    request_metrics.mark('postprocess')
+    return output, model_time_ms
+
+
+def encode_columns(columns, fmt):
+    """
+    Serializa as colunas da resposta
+
+    Texto nulo vira null (Arrow, msgpack, JSON) ou '' (.npz); números
+    inválidos viram null (Arrow, JSON) ou NaN (.npz, msgpack).
+    """
+    _require(fmt)
+    if fmt == 'arrow':
+        table = pa.table({name: pa.array(values, from_pandas=True) for name, values in columns.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if fmt == 'npz':
+        buffer = io.BytesIO()
+        np.savez(buffer, **{
+            name: np.where(values == None, '', values).astype(str) if values.dtype == object else values  # noqa: E711
+            for name, values in columns.items()
+        })
+        return buffer.getvalue()
+    if fmt == 'msgpack':
+        return msgpack.packb({name: values.tolist() for name, values in columns.items()})
+    return {
+        name: (np.where(np.isnan(values), None, values) if values.dtype.kind == 'f' else values).tolist()
+        for name, values in columns.items()
+    }
+
+
+def columnar_response(columns, fmt, model_time_ms):
+    """
+    Resposta Flask de um lote colunar
+
+    Args:
+        columns: Colunas de predict_risk_columns/classify_columns
+        fmt: Formato de response_format
+        model_time_ms: Tempo do modelo
+    """
+    from flask import Response, jsonify
+
+    total = len(columns['error'])
+    failed = int(sum(err is not None for err in columns['error']))
+    headers = {
+        'X-Batch-Total': str(total),
+        'X-Batch-Failed': str(failed),
+        'X-Model-Time-Ms': f'{model_time_ms:.3f}',
+    }
+    if fmt == 'json':
+        response = jsonify({
+            'total': total,
+            'failed': failed,
+            'columns': encode_columns(columns, 'json'),
+            'metadata': {
+                'model_time_ms': round(model_time_ms, 3)
+            }
+        })
+        response.headers.update(headers)
+        return response
+    return Response(encode_columns(columns, fmt), mimetype=MIMETYPES[fmt], headers=headers)
+
+
+def handle_batch(request, fmt, predict_fn, bundle):
+    """
+    Atende um lote colunar: lê as colunas, prediz e responde no formato negociado
+
+    Args:
+        request: Requisição Flask
+        fmt: Formato da requisição (request_format)
+        predict_fn: predict_risk_columns ou classify_columns
+        bundle: ModelBundle ativo (modelo e encoders)
+
+    Returns:
+        Resposta Flask; erros de entrada em JSON com HTTP 400 (415 sem a
+        biblioteca do formato)
+    """
+    from flask import jsonify
+
+    try:
+        columns, n = decode_columns(request.get_data(), fmt)
+        request_metrics.mark('parse')
+        if n == 0:
+            raise InputError('Lote vazio')
+        output, model_time_ms = predict_fn(bundle.model, bundle.encoding_tables, columns, n)
+        return columnar_response(output, response_format(request.accept_mimetypes, fmt), model_time_ms)
+    except InputError as e:
+        request_metrics.error(e)
+        return jsonify({'error': str(e)}), e.status_code
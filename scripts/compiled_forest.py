@@ -0,0 +1,440 @@
+"""
+Floresta Compilada para Inferência Rápida - Sompo
+=================================================
+
+Converte o RandomForestClassifier de train_classification_model.py
+(modeloClassificacao.joblib) em arrays NumPy planos, com todas as árvores
+concatenadas:
+
+    feature, threshold      Feature e limiar de cada nó
+    base                    Filho esquerdo (o direito é base + 1; folhas
+                            apontam para si mesmas)
+    missing_left            Lado dos valores ausentes (NaN)
+    value                   Probabilidades de cada nó (usadas nas folhas)
+    roots                   Nó raiz de cada árvore
+
+Os nós de cada árvore são renumerados em largura, com os dois filhos
+adjacentes: cada nível do percurso é nó = base[nó] + (x > limiar[nó]).
+A avaliação percorre todas as árvores e linhas de um bloco de uma vez
+(max_depth iterações de np.take), sem o custo por chamada do sklearn
+(validação, joblib.Parallel e uma chamada Cython por árvore). O ganho é
+grande em lotes pequenos, o caso das APIs; em lotes de milhares de linhas
+o percurso em Cython do sklearn é mais rápido.
+
+As probabilidades são idênticas bit a bit às de predict_proba do sklearn
+avaliando as árvores em ordem (n_jobs=1; com mais threads o próprio sklearn
+soma as árvores em ordem variável):
+- X é convertido para float32, como no sklearn
+- o limiar float64 é trocado pelo maior float32 <= limiar (mesmo resultado
+  de x <= limiar para todo x float32)
+- as árvores são somadas em sequência (cumsum) e divididas pelo número de
+  árvores
+
+O arquivo compilado (modeloClassificacao.forest.bin) guarda a versão do
+.joblib de origem; classification_api.py usa a floresta compilada enquanto
+ela corresponder ao .joblib e, caso contrário, compila o .joblib na carga
+e grava o arquivo. A conversão é verificada contra o sklearn antes de ser
+usada ou gravada. ML_COMPILED_FOREST=0 desativa (usa o modelo do sklearn).
+
+Formato do arquivo (mapeável em memória, como risk_artifact.py):
+
+    [cabeçalho fixo 16 bytes]
+        magic      8s   b'SOMPOFRT'
+        version    u32
+        header_len u32  tamanho do cabeçalho JSON
+    [cabeçalho JSON]   n_features, max_depth, source e, por array,
+                       dtype, shape e offset
+    [arrays]           little-endian, sem compressão, alinhados a 64 bytes
+
+A carga mapeia o arquivo com mmap (somente leitura) e expõe os arrays sem
+cópia: todos os workers e APIs do host (inclusive após recargas, que não
+herdam o modelo do pai por copy-on-write) compartilham uma única cópia
+física das árvores no page cache.
+
+Uso:
+    python scripts/compiled_forest.py
+    python scripts/compiled_forest.py --model backend/models/modeloClassificacao.joblib
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from inference_engine import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+FORMAT_MAGIC = b'SOMPOFRT'
+FORMAT_VERSION = 2
+
+# magic, version, header_len
+HEADER_STRUCT = struct.Struct('<8sII')
+
+# Alinhamento dos arrays no arquivo
+ALIGNMENT = 64
+
+# Sufixo do arquivo compilado, ao lado do .joblib
+COMPILED_SUFFIX = '.forest.bin'
+
+# 0 = APIs usam o modelo do sklearn
+USE_COMPILED_FOREST = os.environ.get('ML_COMPILED_FOREST', '1') != '0'
+
+# Linhas avaliadas por bloco: as matrizes árvores x linhas de cada nível
+# cabem no cache (blocos maiores ficam mais lentos)
+CHUNK_ROWS = 256
+
+# Linhas da verificação contra o sklearn
+VERIFY_ROWS = 2048
+
+MODEL_PATH = Path("backend/models/modeloClassificacao.joblib")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def compiled_path(model_path):
+    """Caminho da floresta compilada de um .joblib"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + COMPILED_SUFFIX)
+
+
+def _float32_floor(threshold):
+    """Maior float32 <= limiar: x <= limiar equivale a x <= float32_floor(limiar) para x float32"""
+    lower = threshold.astype(np.float32)
+    above = lower.astype(np.float64) > threshold
+    lower[above] = np.nextafter(lower[above], np.float32(-np.inf))
+    return lower
+
+
+class CompiledForest:
+    """
+    Floresta de decisão em arrays planos, com predict_proba vetorizado
+
+    Mesma interface usada pelas APIs: predict_proba, classes_ e get_params.
+    """
+
+    ARRAYS = ['feature', 'threshold', 'base', 'missing_left', 'value', 'roots']
+
+    def __init__(self, arrays, classes, n_features, max_depth, source=None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.classes_ = classes
+        self.n_classes_ = len(classes)
+        self.n_features_in_ = n_features
+        self.n_estimators = len(self.roots)
+        self.max_depth = max_depth
+        self.source = source
+        self.missing_right = ~self.missing_left
+
+    def get_params(self, deep=True):
+        """Sem parâmetros ajustáveis (avaliação em uma thread)"""
+        return {}
+
+    def _leaves(self, X):
+        """Folha (índice global do nó) de cada árvore para cada linha: matriz árvores x linhas"""
+        n_rows = len(X)
+        flat = X.ravel()
+        row_offset = np.arange(n_rows, dtype=np.int32) * np.int32(self.n_features_in_)
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        has_nan = np.isnan(flat).any()
+        for _ in range(self.max_depth):
+            x = np.take(flat, np.take(self.feature, nodes) + row_offset)
+            go_right = x > np.take(self.threshold, nodes)
+            if has_nan:
+                go_right |= np.isnan(x) & np.take(self.missing_right, nodes)
+            # Filho esquerdo em base, direito em base + 1
+            nodes = np.take(self.base, nodes) + go_right
+        return nodes
+
+    def predict_proba(self, X):
+        """
+        Probabilidades por classe (idênticas ao predict_proba do sklearn)
+
+        Args:
+            X: Matriz n x n_features (ou uma linha)
+
+        Returns:
+            Matriz n x n_classes float64
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Esperadas {self.n_features_in_} features, recebidas {X.shape[1]}")
+
+        proba = np.empty((len(X), self.n_classes_), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + CHUNK_ROWS])
+            # Soma sequencial das árvores (mesma ordem de arredondamento do sklearn)
+            proba[start:start + CHUNK_ROWS] = np.cumsum(np.take(self.value, leaves, axis=0), axis=0)[-1]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        """Grava o .forest.bin (substituição atômica)"""
+        path = Path(path)
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays['classes'] = np.asarray(self.classes_)
+
+        # Offsets relativos ao início do bloco de arrays (logo após o cabeçalho JSON)
+        table = {}
+        offset = 0
+        for name, array in arrays.items():
+            table[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape),
+                           'offset': offset}
+            offset = _align(offset + array.nbytes)
+        header = json.dumps({
+            'n_features': int(self.n_features_in_),
+            'max_depth': int(self.max_depth),
+            'source': self.source,
+            'arrays': table,
+        }).encode('utf-8')
+        data_offset = _align(HEADER_STRUCT.size + len(header))
+
+        # Nome temporário por processo: workers podem gravar o mesmo arquivo ao mesmo tempo
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER_STRUCT.pack(FORMAT_MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_offset + table[name]['offset'])
+                f.write(np.ascontiguousarray(array, dtype=table[name]['dtype']).tobytes())
+            f.truncate(data_offset + offset)
+        os.replace(tmp_path, path)
+        return path.stat().st_size
+
+    @classmethod
+    def load(cls, path):
+        """
+        Mapeia um .forest.bin em memória (só NumPy: sem sklearn nem pickle)
+
+        Os arrays são somente leitura e apontam direto para o arquivo.
+
+        Raises:
+            ValueError: Arquivo inválido, truncado ou de outra versão do formato
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, header_len = HEADER_STRUCT.unpack_from(mapped, 0)
+            if magic != FORMAT_MAGIC:
+                raise ValueError(f"{Path(path).name} não é uma floresta compilada")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Versão de formato não suportada: {version}")
+            header = json.loads(mapped[HEADER_STRUCT.size:HEADER_STRUCT.size + header_len].decode('utf-8'))
+            data_offset = _align(HEADER_STRUCT.size + header_len)
+            arrays = {
+                name: np.frombuffer(mapped, dtype=spec['dtype'], count=int(np.prod(spec['shape'])),
+                                    offset=data_offset + spec['offset']).reshape(spec['shape'])
+                for name, spec in header['arrays'].items()
+            }
+        except (struct.error, KeyError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"{Path(path).name} corrompido: {e}") from e
+        return cls(arrays, arrays['classes'], header['n_features'], header['max_depth'], header['source'])
+
+
+def _breadth_first_order(tree):
+    """Nós da árvore em largura: os dois filhos de cada nó ficam adjacentes"""
+    order = [np.array([0])]
+    frontier = order[0]
+    while len(frontier):
+        left = tree.children_left[frontier]
+        internal = left != -1
+        frontier = np.column_stack([left[internal], tree.children_right[frontier][internal]]).ravel()
+        order.append(frontier)
+    return np.concatenate(order)
+
+
+def compile_forest(model, source=None):
+    """
+    Compila um RandomForestClassifier (uma saída) em uma CompiledForest
+
+    Args:
+        model: RandomForestClassifier treinado
+        source: Versão do .joblib de origem (model_fingerprint)
+    """
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Apenas florestas de uma saída são suportadas")
+
+    parts = {name: [] for name in CompiledForest.ARRAYS}
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        order = _breadth_first_order(tree)
+        new_id = np.empty(n_nodes, dtype=np.int32)
+        new_id[order] = np.arange(n_nodes, dtype=np.int32)
+
+        left = tree.children_left[order]
+        is_leaf = left == -1
+        feature = tree.feature[order].astype(np.int32)
+        threshold = _float32_floor(tree.threshold[order])
+        base = np.where(is_leaf, np.arange(n_nodes), new_id[np.where(is_leaf, 0, left)]).astype(np.int32)
+        missing_left = getattr(tree, 'missing_go_to_left', np.zeros(n_nodes, dtype=np.uint8))[order].astype(bool)
+
+        # Folhas apontam para si mesmas (x > inf nunca vale, NaN vai à esquerda):
+        # o percurso roda max_depth níveis sem desvios
+        feature[is_leaf] = 0
+        threshold[is_leaf] = np.inf
+        missing_left[is_leaf] = True
+
+        parts['feature'].append(feature)
+        parts['threshold'].append(threshold)
+        parts['base'].append(base + offset)
+        parts['missing_left'].append(missing_left)
+        parts['value'].append(tree.value[order, 0, :model.n_classes_].astype(np.float64))
+        parts['roots'].append(np.int32(offset))
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    arrays = {name: np.concatenate(values) if name != 'roots' else np.array(values, dtype=np.int32)
+              for name, values in parts.items()}
+    return CompiledForest(arrays, np.asarray(model.classes_), model.n_features_in_, max_depth, source)
+
+
+def verification_rows(forest, rows=VERIFY_ROWS, seed=0):
+    """
+    Linhas de teste: valores nos limiares das árvores e vizinhos
+
+    Cobre os dois lados de cada comparação, inclusive x == limiar.
+    """
+    rng = np.random.default_rng(seed)
+    internal = forest.base != np.arange(len(forest.base))
+    X = np.zeros((rows, forest.n_features_in_), dtype=np.float32)
+    for column in range(forest.n_features_in_):
+        thresholds = forest.threshold[internal & (forest.feature == column)]
+        if len(thresholds) == 0:
+            X[:, column] = rng.integers(0, 10, rows)
+            continue
+        values = rng.choice(thresholds, rows)
+        step = rng.integers(-1, 2, rows)
+        values[step < 0] = np.nextafter(values[step < 0], np.float32(-np.inf))
+        values[step > 0] = np.nextafter(values[step > 0], np.float32(np.inf))
+        X[:, column] = values
+    return X
+
+
+def verify_forest(model, forest, X=None):
+    """True se as probabilidades da floresta compilada == predict_proba do sklearn (em ordem)"""
+    if X is None:
+        X = verification_rows(forest)
+    n_jobs = model.get_params().get('n_jobs')
+    model.set_params(n_jobs=1)
+    try:
+        expected = model.predict_proba(X)
+    finally:
+        model.set_params(n_jobs=n_jobs)
+    return np.array_equal(expected, forest.predict_proba(X))
+
+
+def load_classifier(model_path):
+    """
+    Carrega o classificador para as APIs (loader de model_reloader.load_bundle)
+
+    Mapeia a floresta compilada quando ela corresponde ao .joblib; senão
+    carrega o .joblib e, se for uma floresta, compila na hora (verificada
+    contra o sklearn; em caso de divergência, mantém o modelo do sklearn) e
+    grava o .forest.bin para as próximas cargas e os outros processos.
+    """
+    model_path = Path(model_path)
+    if not USE_COMPILED_FOREST:
+        import joblib
+        return joblib.load(model_path)
+
+    source = model_fingerprint(model_path)
+    compiled = compiled_path(model_path)
+
+    if compiled.exists():
+        try:
+            forest = CompiledForest.load(compiled)
+            if forest.source == source:
+                return forest
+            logger.warning(f"⚠️  {compiled.name} não corresponde a {model_path.name}; compilando na carga")
+        except (ValueError, OSError) as e:
+            logger.warning(f"⚠️  Floresta compilada inválida ({e}); compilando na carga")
+
+    import joblib
+    model = joblib.load(model_path)
+    if not hasattr(model, 'estimators_'):
+        return model
+
+    forest = compile_forest(model, source)
+    if not verify_forest(model, forest):
+        logger.warning("⚠️  Floresta compilada diverge do sklearn instalado; usando o modelo original")
+        return model
+
+    try:
+        forest.save(compiled)
+        return CompiledForest.load(compiled)
+    except OSError as e:
+        # Diretório somente leitura: segue com os arrays em memória (não compartilhados)
+        logger.warning(f"⚠️  Não foi possível gravar {compiled.name} ({e}); floresta em memória")
+        return forest
+
+
+def export_forest(model, model_path):
+    """
+    Grava a floresta compilada ao lado do .joblib já salvo
+
+    Returns:
+        Tupla (caminho, tamanho em bytes)
+
+    Raises:
+        ValueError: Probabilidades divergentes do sklearn
+    """
+    model_path = Path(model_path)
+    forest = compile_forest(model, model_fingerprint(model_path))
+    if not verify_forest(model, forest):
+        raise ValueError("Floresta compilada diverge de predict_proba do sklearn")
+    path = compiled_path(model_path)
+    return path, forest.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compila o RandomForest de classificação em arrays NumPy')
+    parser.add_argument('--model', type=Path, default=MODEL_PATH, help='Modelo .joblib de origem')
+    args = parser.parse_args()
+
+    if not args.model.exists():
+        print(f"❌ Modelo não encontrado: {args.model}")
+        print("   Execute: python scripts/train_classification_model.py")
+        sys.exit(1)
+
+    import joblib
+    start = time.perf_counter()
+    model = joblib.load(args.model)
+    if not hasattr(model, 'estimators_'):
+        print(f"❌ {args.model} não é uma floresta de decisão ({type(model).__name__})")
+        sys.exit(1)
+
+    try:
+        path, size = export_forest(model, args.model)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ Floresta compilada: {path} ({size / 1024 / 1024:.1f} MB, "
+          f"{args.model.stat().st_size / 1024 / 1024:.1f} MB no .joblib)")
+    print(f"   {len(model.estimators_)} árvores, probabilidades idênticas ao sklearn "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
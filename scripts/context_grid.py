@@ -0,0 +1,371 @@
+"""
+Grid de Contextos e Cubo de Risco Quantizado - Sompo
+====================================================
+
+Os 8 contextos fixos de risk_map.CONTEXTOS aproximam qualquer requisição
+por um cenário típico (ex.: toda noite vira "22h de quarta, junho, pista
+simples"). Este módulo gera scores para um grid configurável de contextos
+(hora × dia da semana × mês × clima × fase × tipo de pista) e os grava
+em um cubo segmentos × contextos quantizado em uint8, no formato de
+risk_artifact.py (mapeável em memória).
+
+- A fase do dia pode ser um eixo próprio ou 'auto' (derivada da hora,
+  como em inference_engine.day_phase_from_hour), o que evita combinações
+  impossíveis como "14h, noite"
+- Os segmentos são pontuados em blocos de ~CHUNK_ROWS linhas de features
+  (memória limitada pelo bloco, não pelo grid) e os blocos podem rodar
+  em paralelo (threads; o predict_proba do LightGBM libera o GIL). No
+  treinamento, o cubo é gerado em shards num pool de processos e gravado
+  sem passar pela memória (risk_shards.write_sharded_artifact)
+
+Grid via especificação textual (env RISK_CONTEXT_GRID em train_risk_model.py):
+    "default"                               # DEFAULT_GRID
+    "mes=1-12;clima=claro,chuvoso;fase=auto"  # sobrescreve eixos do padrão
+
+Uso:
+    from context_grid import RiskCube
+    with RiskCube("backend/risk_cube.bin") as cube:
+        cube.lookup_context('SP', 116, 233, hora=22, dia_semana=5, clima='chuvoso')
+
+    python scripts/context_grid.py backend/risk_cube.bin SP 116 233 --hora 22 --clima chuvoso
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference_engine import compile_encoders, day_phase_from_hour
+from risk_artifact import RiskScoreArtifact, quantize_scores, write_risk_artifact
+from risk_map import (
+    CHUNK_ROWS,
+    CONTEXT_MONTH,
+    CONTEXT_ROAD_TYPE,
+    SEGMENT_KM,
+    score_risk_map,
+    statistical_risk_map,
+)
+
+# Eixos do grid, na ordem das colunas do cubo (o último varia mais rápido)
+GRID_AXES = ('hora', 'dia_semana', 'mes', 'clima', 'fase', 'tipo_pista')
+NUMERIC_AXES = ('hora', 'dia_semana', 'mes')
+
+# Eixos categóricos -> encoder correspondente
+AXIS_ENCODERS = {
+    'clima': 'clima_categoria',
+    'fase': 'fase_dia_categoria',
+    'tipo_pista': 'tipo_pista_categoria',
+}
+
+# Fase derivada da hora em vez de eixo próprio
+AUTO_PHASE = 'auto'
+
+# 24 h × 7 dias × 4 climas × 3 tipos de pista = 2.016 contextos (mês fixo)
+DEFAULT_GRID = {
+    'hora': list(range(24)),
+    'dia_semana': list(range(7)),
+    'mes': [CONTEXT_MONTH],
+    'clima': ['claro', 'nublado', 'chuvoso', 'neblina'],
+    'fase': AUTO_PHASE,
+    'tipo_pista': ['simples', 'dupla', 'multipla'],
+}
+
+# Threads de geração (RISK_GRID_WORKERS)
+GRID_WORKERS = int(os.environ.get('RISK_GRID_WORKERS', '1'))
+
+
+def _parse_numbers(text):
+    """'0-23' / '1,6,12' / '0-5,18-23' -> lista de inteiros"""
+    values = []
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            low, high = part.split('-')
+            values.extend(range(int(low), int(high) + 1))
+        elif part:
+            values.append(int(part))
+    return values
+
+
+def parse_grid_spec(spec):
+    """
+    Converte a especificação textual do grid em dict de eixos
+
+    Args:
+        spec: "default" ou "eixo=valores;eixo=valores" (eixos de GRID_AXES;
+            numéricos aceitam faixas "a-b", categóricos listas "a,b")
+
+    Returns:
+        Dict com os eixos informados (os demais ficam com DEFAULT_GRID)
+
+    Raises:
+        ValueError: Eixo desconhecido ou valor inválido
+    """
+    axes = {}
+    spec = (spec or '').strip()
+    if spec.lower() in ('', 'default', '1', 'true'):
+        return axes
+
+    for item in spec.split(';'):
+        if not item.strip():
+            continue
+        if '=' not in item:
+            raise ValueError(f"Eixo sem valores na especificação do grid: '{item}'")
+        name, text = (part.strip() for part in item.split('=', 1))
+        if name not in GRID_AXES:
+            raise ValueError(f"Eixo desconhecido: '{name}' (eixos: {', '.join(GRID_AXES)})")
+        if name in NUMERIC_AXES:
+            axes[name] = _parse_numbers(text)
+        elif name == 'fase' and text == AUTO_PHASE:
+            axes[name] = AUTO_PHASE
+        else:
+            axes[name] = [value.strip() for value in text.split(',') if value.strip()]
+    return axes
+
+
+class ContextGrid:
+    """
+    Produto cartesiano dos eixos de contexto
+
+    Attributes:
+        axes: Dict eixo -> valores ('fase' pode ser AUTO_PHASE)
+        auto_phase: Fase derivada da hora
+        shape: Tamanho de cada dimensão do cubo (sem 'fase' quando automática)
+    """
+
+    def __init__(self, axes=None):
+        axes = {**DEFAULT_GRID, **(axes or {})}
+        unknown = set(axes) - set(GRID_AXES)
+        if unknown:
+            raise ValueError(f"Eixos desconhecidos: {sorted(unknown)}")
+
+        self.auto_phase = axes['fase'] == AUTO_PHASE
+        self.axes = {
+            name: axes[name] if name == 'fase' and self.auto_phase else list(axes[name])
+            for name in GRID_AXES
+        }
+        self._dims = [name for name in GRID_AXES if not (name == 'fase' and self.auto_phase)]
+        for name in self._dims:
+            if not self.axes[name]:
+                raise ValueError(f"Eixo '{name}' sem valores")
+            if len(set(self.axes[name])) != len(self.axes[name]):
+                raise ValueError(f"Valores repetidos no eixo '{name}'")
+
+        self.shape = tuple(len(self.axes[name]) for name in self._dims)
+        self._positions = {
+            name: {value: i for i, value in enumerate(self.axes[name])} for name in self._dims
+        }
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(parse_grid_spec(spec))
+
+    def to_header(self):
+        """Eixos serializáveis (campo grid do artefato)"""
+        return dict(self.axes)
+
+    def restrict_to_encoders(self, le_dict):
+        """
+        Remove valores categóricos que os encoders não conhecem
+
+        Returns:
+            Tupla (novo ContextGrid, lista de (eixo, valor) removidos)
+        """
+        tables = compile_encoders(le_dict)
+        axes = dict(self.axes)
+        removed = []
+        for name, encoder in AXIS_ENCODERS.items():
+            if name == 'fase' and self.auto_phase:
+                continue
+            known = [value for value in axes[name] if value in tables[encoder]]
+            removed.extend((name, value) for value in axes[name] if value not in tables[encoder])
+            axes[name] = known
+        return ContextGrid(axes), removed
+
+    def contexts(self):
+        """Contextos no formato de risk_map.CONTEXTOS, na ordem das colunas"""
+        contexts = []
+        for values in itertools.product(*(self.axes[name] for name in self._dims)):
+            ctx = dict(zip(self._dims, values))
+            if self.auto_phase:
+                ctx['fase'] = day_phase_from_hour(ctx['hora'])
+            ctx['nome'] = context_name(ctx)
+            contexts.append(ctx)
+        return contexts
+
+    def _position(self, name, value):
+        positions = self._positions[name]
+        if name in NUMERIC_AXES:
+            if value in positions:
+                return positions[value]
+            # Valor fora do grid: usa o mais próximo
+            grid_values = self.axes[name]
+            return min(range(len(grid_values)), key=lambda i: abs(grid_values[i] - value))
+        try:
+            return positions[value]
+        except KeyError:
+            raise KeyError(f"Valor fora do grid: {name}='{value}'") from None
+
+    def column(self, hora=12, dia_semana=2, mes=CONTEXT_MONTH, clima='claro',
+               tipo_pista=CONTEXT_ROAD_TYPE, fase=None):
+        """
+        Coluna do cubo para um contexto
+
+        Eixos numéricos fora do grid usam o valor mais próximo; com fase
+        automática o parâmetro fase é ignorado (derivada da hora).
+
+        Raises:
+            KeyError: Valor categórico fora do grid
+        """
+        values = {'hora': int(hora), 'dia_semana': int(dia_semana), 'mes': int(mes),
+                  'clima': clima, 'fase': fase, 'tipo_pista': tipo_pista}
+        column = 0
+        for name, size in zip(self._dims, self.shape):
+            column = column * size + self._position(name, values[name])
+        return column
+
+
+def context_name(ctx):
+    """Nome da coluna do cubo (ex.: h22_d5_m06_chuvoso_noite_simples)"""
+    return (f"h{ctx['hora']:02d}_d{ctx['dia_semana']}_m{ctx['mes']:02d}_"
+            f"{ctx['clima']}_{ctx['fase']}_{ctx['tipo_pista']}")
+
+
+def generate_risk_cube(model, le_dict, segments, grid, workers=GRID_WORKERS, chunk_rows=CHUNK_ROWS):
+    """
+    Scores quantizados (uint8) de todos os segmentos em todos os contextos
+
+    Os segmentos são divididos em blocos de ~chunk_rows linhas de features;
+    cada bloco é pontuado por risk_map.score_risk_map (ou pelo score
+    estatístico, sem modelo) e quantizado antes do próximo, então a
+    memória não cresce com o tamanho do grid.
+
+    Args:
+        model: Modelo treinado (ou None para o score estatístico)
+        le_dict: LabelEncoders do treinamento
+        segments: DataFrame de risk_map.aggregate_segments
+        grid: ContextGrid
+        workers: Blocos pontuados em paralelo (threads)
+        chunk_rows: Linhas de features por bloco
+
+    Returns:
+        Tupla (cubo uint8 segmentos x contextos, failures, tempos em s)
+    """
+    contexts = grid.contexts()
+    n_segments = len(segments)
+    cube = np.empty((n_segments, len(contexts)), dtype=np.uint8)
+    block_size = max(1, chunk_rows // len(contexts))
+    timings = {'features': 0.0, 'predict': 0.0, 'blend': 0.0}
+    failures = []
+
+    def score_block(start):
+        block = segments.iloc[start:start + block_size].reset_index(drop=True)
+        if model is None:
+            return start, statistical_risk_map(block, contexts), [], {}
+        scores, block_failures, block_timings = score_risk_map(
+            model, le_dict, block, contexts, chunk_rows
+        )
+        return start, scores, block_failures, block_timings
+
+    starts = range(0, n_segments, block_size)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for start, scores, block_failures, block_timings in executor.map(score_block, starts):
+            cube[start:start + len(scores)] = quantize_scores(scores)
+            failures.extend((start + i, reason) for i, reason in block_failures)
+            for name, seconds in block_timings.items():
+                timings[name] += seconds
+
+    return cube, failures, timings
+
+
+def write_risk_cube(path, segments, cube, grid, metadata=None, fingerprints=None):
+    """Grava o cubo no formato de risk_artifact.py (score_dtype='uint8')"""
+    return write_risk_artifact(
+        path,
+        segments['uf'], segments['br'], segments['km'],
+        cube,
+        [ctx['nome'] for ctx in grid.contexts()],
+        metadata,
+        segment_km=SEGMENT_KM,
+        score_dtype='uint8',
+        grid=grid.to_header(),
+        fingerprints=fingerprints,
+    )
+
+
+class RiskCube(RiskScoreArtifact):
+    """
+    Artefato de risco com grid de contextos (lookup por hora, dia, clima...)
+
+    Attributes:
+        context_grid: ContextGrid do cubo
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        if self.grid is None:
+            self.close()
+            raise ValueError(f"Artefato sem grid de contextos: {path}")
+        self.context_grid = ContextGrid(self.grid)
+
+    def lookup_context(self, uf, br, km, **context):
+        """
+        Score do segmento que contém o KM no contexto informado
+
+        Args:
+            uf, br, km: Rodovia e posição
+            **context: hora, dia_semana, mes, clima, tipo_pista, fase
+                (ver ContextGrid.column)
+
+        Returns:
+            Score 0-100 ou None se o segmento não existir
+        """
+        row = self.find(uf, br, int(float(km)) // self.segment_km * self.segment_km)
+        if row < 0:
+            return None
+        column = self.context_grid.column(**context)
+        return round(float(self.decode_scores(self.scores[row, column])), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta o cubo de risco por contexto')
+    parser.add_argument('path', help='Arquivo do cubo (ex.: backend/risk_cube.bin)')
+    parser.add_argument('uf')
+    parser.add_argument('br', type=int)
+    parser.add_argument('km', type=float)
+    parser.add_argument('--hora', type=int, default=12)
+    parser.add_argument('--dia-semana', type=int, default=2, help='0=segunda ... 6=domingo')
+    parser.add_argument('--mes', type=int, default=CONTEXT_MONTH)
+    parser.add_argument('--clima', default='claro')
+    parser.add_argument('--fase', help='Só para grids com eixo de fase')
+    parser.add_argument('--tipo-pista', default=CONTEXT_ROAD_TYPE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with RiskCube(args.path) as cube:
+        open_ms = (time.perf_counter() - start) * 1000
+        grid = cube.context_grid
+        print(f"🧊 {args.path}: {len(cube):,} segmentos × {len(grid):,} contextos "
+              f"{grid.shape} ({open_ms:.1f} ms)")
+
+        context = dict(hora=args.hora, dia_semana=args.dia_semana, mes=args.mes,
+                       clima=args.clima, tipo_pista=args.tipo_pista, fase=args.fase)
+        score = cube.lookup_context(args.uf, args.br, args.km, **context)
+        name = cube.contexts[grid.column(**context)]
+        if score is None:
+            print(f"   ⚠️  Segmento {args.uf}/BR-{args.br} KM {args.km:g} não encontrado")
+        else:
+            print(f"   {name}: {score:.2f}")
+
+
+if __name__ == '__main__':
+    main()
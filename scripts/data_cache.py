@@ -0,0 +1,295 @@
+"""
+Cache Colunar dos Dados de Acidentes - Sompo
+============================================
+
+Converte o Excel (DadosReais/dados_acidentes.xlsx) e os CSVs do DATATRAN
+uma única vez para um arquivo colunar tipado (Parquet), com colunas de
+texto repetitivas como category e numéricos reduzidos ao menor tipo sem
+perda. As leituras seguintes carregam o cache, muito mais rápido e com
+menos memória que o parse do XLSX/CSV.
+
+O cache fica em <pasta do arquivo>/.cache/ e é invalidado automaticamente
+quando o arquivo de origem muda (tamanho/mtime, confirmado por SHA-256) ou
+quando os parâmetros de leitura mudam.
+
+Sem pyarrow instalado, o cache é gravado em pickle (mesmos dtypes).
+
+Uso:
+    from data_cache import load_dataset
+    df = load_dataset("DadosReais/dados_acidentes.xlsx")
+
+    # Pré-gerar o cache (ingestão)
+    python scripts/data_cache.py DadosReais/dados_acidentes.xlsx
+    python scripts/data_cache.py datatran2025/datatran2025.csv --sep ";" --encoding latin-1
+
+Configuração:
+    SOMPO_DATA_CACHE=0   Desativa o cache (lê sempre a origem)
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CACHE_DIR_NAME = '.cache'
+
+# Versão do formato do cache; incrementar ao mudar optimize_dtypes
+CACHE_VERSION = 1
+
+# Colunas de texto com até esta fração de valores distintos viram category
+CATEGORY_MAX_RATIO = 0.5
+
+
+def cache_enabled():
+    return os.environ.get('SOMPO_DATA_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None se indisponível)"""
+    # VmHWM é zerado no exec; ru_maxrss herda o pico do processo pai
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é KB no Linux e bytes no macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def read_source(path, **read_kwargs):
+    """Lê o arquivo de origem (XLSX/XLS ou CSV)"""
+    if path.suffix.lower() in ('.xlsx', '.xls'):
+        return pd.read_excel(path, **read_kwargs)
+    return pd.read_csv(path, **read_kwargs)
+
+
+def _is_string_column(series):
+    values = series.dropna()
+    return len(values) > 0 and values.map(type).eq(str).all()
+
+
+def optimize_dtypes(df):
+    """
+    Reduz os dtypes sem alterar valores
+
+    - texto com poucos valores distintos -> category
+    - inteiros -> menor inteiro que comporta a coluna
+    - floats -> float32 apenas quando a conversão é exata
+    """
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+
+        if series.dtype == object:
+            if (len(series) and series.nunique(dropna=True) / len(series) <= CATEGORY_MAX_RATIO
+                    and _is_string_column(series)):
+                df[column] = series.astype('category')
+
+        elif pd.api.types.is_integer_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+
+        elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            narrowed = series.astype(np.float32)
+            if np.array_equal(narrowed.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+                df[column] = narrowed
+
+    return df
+
+
+def _cache_paths(path, read_kwargs):
+    options = json.dumps(read_kwargs, sort_keys=True, default=str)
+    key = hashlib.sha256(options.encode('utf-8')).hexdigest()[:8]
+    base = path.parent / CACHE_DIR_NAME / f"{path.name}.{key}"
+    return base.with_name(base.name + '.meta.json'), base
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_file(meta_path, meta):
+    """Arquivo de dados do cache (gravado ao lado do .meta.json)"""
+    return meta_path.parent / meta['cache_file']
+
+
+def _cache_is_fresh(meta_path, meta, path, stat):
+    """Valida o cache: mtime/tamanho iguais, ou conteúdo igual (SHA-256)"""
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False, None
+    if not _cache_file(meta_path, meta).exists():
+        return False, None
+    if meta['source_size'] != stat.st_size:
+        return False, None
+    if meta['source_mtime_ns'] == stat.st_mtime_ns:
+        return True, None
+
+    # mtime mudou (cópia, checkout): confere o conteúdo antes de regerar
+    sha256 = file_sha256(path)
+    return sha256 == meta['source_sha256'], sha256
+
+
+def _write_cache(df, cache_base):
+    """Grava em Parquet (ou pickle sem pyarrow); retorna o caminho gravado"""
+    if HAS_PYARROW:
+        cache_file = cache_base.with_name(cache_base.name + '.parquet')
+        try:
+            df.to_parquet(cache_file, index=False)
+            return cache_file
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError) as e:
+            # Colunas com tipos mistos (comum em planilhas) não cabem em Parquet
+            print(f"   ⚠️  Parquet indisponível para estes dados ({e}); usando pickle")
+
+    cache_file = cache_base.with_name(cache_base.name + '.pkl')
+    df.to_pickle(cache_file)
+    return cache_file
+
+
+def _read_cache(cache_file):
+    if cache_file.suffix == '.parquet':
+        return pd.read_parquet(cache_file)
+    return pd.read_pickle(cache_file)
+
+
+def build_cache(path, **read_kwargs):
+    """
+    Lê a origem, otimiza os dtypes e grava o cache
+
+    Returns:
+        DataFrame otimizado
+    """
+    path = Path(path)
+    meta_path, cache_base = _cache_paths(path, read_kwargs)
+    cache_base.parent.mkdir(parents=True, exist_ok=True)
+
+    stat = path.stat()
+    df = optimize_dtypes(read_source(path, **read_kwargs))
+
+    old_meta = _read_meta(meta_path)
+    cache_file = _write_cache(df, cache_base)
+    if old_meta and old_meta.get('cache_file') != cache_file.name:
+        _cache_file(meta_path, old_meta).unlink(missing_ok=True)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': str(path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_sha256': file_sha256(path),
+        'read_kwargs': read_kwargs,
+        'cache_file': cache_file.name,
+        'rows': len(df),
+        'created_at': datetime.now().isoformat(),
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False, default=str)
+
+    return df
+
+
+def load_dataset(path, verbose=True, **read_kwargs):
+    """
+    Carrega um XLSX/CSV através do cache colunar
+
+    Args:
+        path: Arquivo de origem
+        verbose: Imprime origem do carregamento, tempo e pico de memória
+        **read_kwargs: Parâmetros de pd.read_excel / pd.read_csv
+            (fazem parte da chave do cache)
+
+    Returns:
+        DataFrame com dtypes otimizados (category/downcast)
+    """
+    path = Path(path)
+    start = time.perf_counter()
+
+    if not cache_enabled():
+        df = read_source(path, **read_kwargs)
+        source = 'origem (cache desativado)'
+    else:
+        meta_path, _ = _cache_paths(path, read_kwargs)
+        meta = _read_meta(meta_path)
+        fresh, sha256 = _cache_is_fresh(meta_path, meta, path, path.stat())
+
+        if fresh:
+            df = _read_cache(_cache_file(meta_path, meta))
+            source = f"cache {meta['cache_file']}"
+            if sha256 is not None:
+                # Conteúdo igual com mtime novo: só atualiza o mtime registrado
+                meta['source_mtime_ns'] = path.stat().st_mtime_ns
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, indent=2, ensure_ascii=False, default=str)
+        else:
+            df = build_cache(path, **read_kwargs)
+            source = 'origem (cache regerado)'
+
+    if verbose:
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()
+        peak_text = f", pico RSS {peak:,.0f} MB" if peak is not None else ''
+        print(f"   ⚡ {path.name}: {len(df):,} linhas de {source} em {elapsed:.2f}s{peak_text}")
+
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera o cache colunar de um XLSX/CSV')
+    parser.add_argument('path', help='Arquivo de origem')
+    parser.add_argument('--sep', help='Separador do CSV (ex.: ";")')
+    parser.add_argument('--encoding', help='Encoding do CSV (ex.: latin-1)')
+    parser.add_argument('--force', action='store_true', help='Regera mesmo se o cache estiver válido')
+    args = parser.parse_args()
+
+    read_kwargs = {k: v for k, v in (('sep', args.sep), ('encoding', args.encoding)) if v}
+
+    if args.force:
+        start = time.perf_counter()
+        df = build_cache(args.path, **read_kwargs)
+        print(f"   ✅ Cache regerado: {len(df):,} linhas em {time.perf_counter() - start:.2f}s")
+    else:
+        df = load_dataset(args.path, **read_kwargs)
+
+    print(f"   💾 Memória do DataFrame: {df.memory_usage(deep=True).sum() / 1024 / 1024:,.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+API Flask Unificada de Inferência (Ensemble) - Sompo
+====================================================
+
+Um único processo com o modelo de risco (LightGBM) e o de classificação
+(RandomForest). Serve o ensemble em uma só chamada e também as rotas das
+APIs individuais, podendo substituir ml_prediction_api.py (porta 5000) e
+classification_api.py (porta 5001) com metade dos processos e da memória.
+
+Endpoints:
+    GET  /health - Status da API
+    GET  /model-info - Informações sobre os modelos carregados
+    POST /ensemble - Predição ensemble (risco + classificação)
+    POST /ensemble-batch - Predição ensemble em lote
+    POST /predict, /predict-batch, /predict-route, /predict-stream - Mesmas
+        rotas de ml_prediction_api.py
+    POST /forecast, /forecast-batch, GET /forecast-info - Previsão LSTM de
+        ml_prediction_api.py (com ML_FORECAST_ENABLED)
+    POST /classify, /batch-classify, /classify-stream - Mesmas rotas de
+        classification_api.py
+    GET  /batching-stats - Métricas do micro-batching de /predict
+    POST /admin/reload-model - Recarrega os dois modelos do disco sem reiniciar
+    GET  /metrics - Latência por etapa, requisições, erros e lotes de todas as
+        rotas (Prometheus, ver request_metrics.py)
+
+Os dois modelos são observados e recarregados sem reiniciar (ver
+model_reloader.py); cada requisição usa a versão de cada modelo ativa
+quando ela começou.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+import logging
+import os
+from datetime import datetime
+import time
+
+import ml_prediction_api as risk_api
+import classification_api as classification_api
+from ensemble_engine import predict_ensemble_batch
+from model_reloader import admin_authorized, sample_request
+import request_metrics
+from serving import serve, get_worker_count, warm_up_routes, log_startup, process_uptime_ms
+
+# Partida do processo até aqui (imports concluídos)
+IMPORTS_MS = process_uptime_ms()
+
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+CORS(app)
+request_metrics.install(app, 'ensemble')
+
+PORT = 5002
+
+models_loaded_at = None
+
+# Tempos da inicialização (finish_startup)
+startup_timings = None
+
+# Rotas das APIs individuais servidas pelo mesmo processo
+for rule, view_func, methods in [
+    ('/predict', risk_api.predict, ['POST']),
+    ('/predict-batch', risk_api.predict_batch, ['POST']),
+    ('/predict-route', risk_api.predict_route, ['POST']),
+    ('/forecast', risk_api.forecast, ['POST']),
+    ('/forecast-batch', risk_api.forecast_batch_route, ['POST']),
+    ('/forecast-info', risk_api.forecast_info, ['GET']),
+    ('/batching-stats', risk_api.batching_stats, ['GET']),
+    ('/classify', classification_api.classify, ['POST']),
+    ('/batch-classify', classification_api.batch_classify, ['POST']),
+    ('/predict-stream', risk_api.predict_stream, ['POST']),
+    ('/classify-stream', classification_api.classify_stream, ['POST']),
+]:
+    app.add_url_rule(rule, view_func=view_func, methods=methods)
+
+
+def load_models():
+    """Carrega os dois modelos e compartilha um único conjunto de encoders"""
+    global models_loaded_at
+    
+    if not risk_api.load_model() or not classification_api.load_model():
+        return False
+    
+    # Mesmo arquivo de encoders: o classificador usa os do modelo de risco
+    # (uma recarga posterior volta a ter cópias próprias)
+    classification_api.active_model = classification_api.active_model._replace(
+        label_encoders=risk_api.active_model.label_encoders,
+        encoding_tables=risk_api.active_model.encoding_tables
+    )
+    models_loaded_at = datetime.now()
+    logger.info("✅ Ensemble pronto (risco + classificação em um processo)")
+    return True
+
+
+def configure_worker():
+    """Inicialização de cada worker: micro-batching, cache e observação dos dois modelos"""
+    risk_api.configure_worker()
+    classification_api.configure_worker()
+
+
+def finish_startup():
+    """Aquece as rotas e registra os tempos de inicialização (antes de abrir o socket)"""
+    global startup_timings
+    
+    sample = sample_request(risk_api.active_model.encoding_tables)
+    routes_ms = warm_up_routes(app, [
+        ('POST', '/ensemble', sample),
+        ('POST', '/ensemble-batch', {'predictions': [sample, sample]}),
+        ('POST', '/predict', sample),
+        ('POST', '/classify', sample),
+        ('GET', '/health', None),
+    ])
+    # Requisições do aquecimento não entram nas métricas
+    request_metrics.registry.reset()
+    bundles = [risk_api.active_model, classification_api.active_model]
+    startup_timings = {
+        'imports_ms': IMPORTS_MS,
+        'model_load_ms': sum(bundle.load_ms for bundle in bundles),
+        'warmup_ms': sum(bundle.warmup_ms or 0 for bundle in bundles),
+        'routes_warmup_ms': routes_ms,
+        'total_ms': process_uptime_ms(),
+    }
+    log_startup('Ensemble API', startup_timings)
+    return startup_timings
+
+
+def models_ready():
+    return risk_api.active_model is not None and classification_api.active_model is not None
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check (compatível com os clientes das duas APIs individuais)"""
+    ready = models_ready()
+    return jsonify({
+        'status': 'healthy' if ready else 'model_not_loaded',
+        'service': 'ensemble-api',
+        'model_loaded': ready,
+        'models': {
+            'risk_model': risk_api.active_model is not None,
+            'classification_model': classification_api.active_model is not None
+        },
+        'model_versions': {
+            'risk_model': risk_api.active_model.version if risk_api.active_model is not None else None,
+            'classification_model': (classification_api.active_model.version
+                                     if classification_api.active_model is not None else None)
+        },
+        'loaded_at': models_loaded_at.isoformat() if models_loaded_at else None,
+        'version': '1.0.0'
+    })
+
+
+@app.route('/model-info', methods=['GET'])
+def model_info():
+    """Informações sobre os modelos"""
+    if not models_ready():
+        return jsonify({'error': 'Modelos não carregados'}), 503
+    
+    risk_bundle = risk_api.active_model
+    classification_bundle = classification_api.active_model
+    return jsonify({
+        'risk_model': type(risk_bundle.model).__name__,
+        'classification_model': type(classification_bundle.model).__name__,
+        'model_versions': {
+            'risk_model': risk_bundle.version,
+            'classification_model': classification_bundle.version
+        },
+        'encoders': list(risk_bundle.label_encoders.keys()),
+        'loaded_at': models_loaded_at.isoformat() if models_loaded_at else None,
+        'reload': {
+            'risk_model': risk_api.reloader.stats(),
+            'classification_model': classification_api.reloader.stats()
+        },
+        'startup': ({key: round(ms, 3) for key, ms in startup_timings.items() if ms is not None}
+                    if startup_timings else None)
+    })
+
+
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_models():
+    """Recarrega os dois modelos do disco (só no worker que atendeu a requisição)"""
+    if not admin_authorized(request):
+        return jsonify({'error': 'Token de administração ausente ou inválido (defina ML_ADMIN_TOKEN para habilitar a rota)'}), 403
+    
+    if not models_ready():
+        return jsonify({'error': 'Modelos não carregados'}), 503
+    
+    versions = {}
+    for name, api in (('risk_model', risk_api), ('classification_model', classification_api)):
+        previous = api.active_model.version
+        try:
+            bundle = api.reloader.reload('admin')
+        except Exception as e:
+            return jsonify({
+                'error': f'Falha ao recarregar {name}: {e}',
+                'model_versions': {
+                    'risk_model': risk_api.active_model.version,
+                    'classification_model': classification_api.active_model.version
+                }
+            }), 500
+        versions[name] = {'previous_version': previous, 'model_version': bundle.version}
+    
+    return jsonify({
+        'success': True,
+        'models': versions,
+        'pid': os.getpid()
+    })
+
+
+def run_ensemble(items):
+    start = time.perf_counter()
+    # Uma leitura de cada modelo ativo: o lote inteiro usa as mesmas versões
+    risk_bundle = risk_api.active_model
+    classification_bundle = classification_api.active_model
+    request_metrics.use_model('risk', risk_bundle.version)
+    request_metrics.use_model('classification', classification_bundle.version)
+    results, timings = predict_ensemble_batch(
+        risk_bundle.model,
+        classification_bundle.model,
+        risk_bundle.encoding_tables,
+        items
+    )
+    metadata = {
+        'risk_model_ms': round(timings['risk_model_ms'], 3),
+        'classification_model_ms': round(timings['classification_model_ms'], 3),
+        'total_ms': round((time.perf_counter() - start) * 1000, 3)
+    }
+    return results, metadata
+
+
+@app.route('/ensemble', methods=['POST'])
+def ensemble():
+    """
+    Predição ensemble para um segmento
+    
+    Body JSON: mesmo formato de /predict
+    Resposta: mesmo formato de EnsemblePredictionResult (backend)
+    """
+    if not models_ready():
+        return jsonify({'error': 'Modelos não carregados'}), 503
+    
+    try:
+        data = request.get_json()
+        request_metrics.mark('parse')
+        if not data:
+            return jsonify({'error': 'Request body vazio'}), 400
+        
+        results, metadata = run_ensemble([data])
+        result = results[0]
+        
+        if 'error' in result:
+            return jsonify({'error': result['error']}), 400
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'metadata': metadata
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na predição ensemble: {e}", exc_info=True)
+        request_metrics.error(e)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/ensemble-batch', methods=['POST'])
+def ensemble_batch():
+    """
+    Predição ensemble em lote
+    
+    Body JSON:
+    {
+        "predictions": [
+            {"uf": "SP", "br": 116, "km": 100, ...},
+            {"uf": "RJ", "br": 101, "km": 85, ...}
+        ]
+    }
+    """
+    if not models_ready():
+        return jsonify({'error': 'Modelos não carregados'}), 503
+    
+    try:
+        data = request.get_json()
+        request_metrics.mark('parse')
+        predictions_input = data.get('predictions', []) if data else []
+        
+        if not predictions_input or not isinstance(predictions_input, list):
+            return jsonify({'error': 'Lista de predições vazia'}), 400
+        
+        results, metadata = run_ensemble(predictions_input)
+        failed = sum(1 for r in results if 'error' in r)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'total': len(results),
+                'successful': len(results) - failed,
+                'failed': failed,
+                'results': results
+            },
+            'metadata': metadata
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na predição ensemble em lote: {e}", exc_info=True)
+        request_metrics.error(e)
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("  🧩 API Unificada de Inferência (Ensemble) - Sompo")
+    print("=" * 60)
+    print()
+    
+    if not load_models():
+        print("❌ Falha ao carregar modelos. Execute:")
+        print("   python scripts/train_risk_model.py")
+        print("   python scripts/train_classification_model.py")
+        exit(1)
+    
+    finish_startup()
+    workers = get_worker_count()
+    
+    print()
+    print(f"🚀 Servidor iniciando na porta {PORT} ({workers} worker(s))...")
+    print()
+    print("📋 Endpoints disponíveis:")
+    print(f"   GET  http://localhost:{PORT}/health")
+    print(f"   GET  http://localhost:{PORT}/model-info")
+    print(f"   POST http://localhost:{PORT}/ensemble")
+    print(f"   POST http://localhost:{PORT}/ensemble-batch")
+    print(f"   POST http://localhost:{PORT}/predict, /predict-batch, /predict-route")
+    print(f"   POST http://localhost:{PORT}/classify, /batch-classify")
+    print(f"   POST http://localhost:{PORT}/admin/reload-model")
+    print()
+    print("=" * 60)
+    print()
+    
+    serve(app, '0.0.0.0', PORT, workers=workers, post_fork=configure_worker)
@@ -0,0 +1,352 @@
+"""
+Motor de Ensemble - Sompo
+=========================
+
+Executa o modelo de risco (LightGBM) e o de classificação (RandomForest)
+sobre a mesma matriz de features e combina as saídas com as mesmas regras
+de EnsemblePredictionService (backend/src/services/ensemble-prediction.service.ts):
+concordância, score ponderado, inconsistências e recomendações.
+
+As features numéricas e a UF são codificadas uma única vez. O modelo de
+classificação recebe a mesma matriz com as três colunas que a API de
+classificação deriva de forma própria (clima com termos em inglês, fase do
+dia pela hora e pista simples), para manter os resultados idênticos aos das
+duas chamadas HTTP separadas.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+import request_metrics
+
+from inference_engine import (
+    ACCIDENT_CLASSES,
+    CLASSIFICATION_WEATHER_MAPPING,
+    CLASSIFICATION_ROAD_TYPE,
+    RISK_CLASSES,
+    InputError,
+    encode_column,
+    encode_risk_batch,
+    parse_risk_input,
+    predict_with_proba,
+    score_probabilities,
+)
+
+
+def build_classification_matrix(features, raw_rows, encoding_tables):
+    """
+    Deriva a matriz do modelo de classificação a partir da matriz de risco
+
+    Returns:
+        Tupla (matriz float64, máscara de linhas válidas)
+    """
+    matrix = features.copy()
+
+    weather = [
+        CLASSIFICATION_WEATHER_MAPPING.get(str(raw.get('weatherCondition', 'claro')).lower(), 'claro')
+        for raw in raw_rows
+    ]
+    hours = matrix[:, 3].astype(np.int64)
+    phases = np.select(
+        [(hours >= 6) & (hours < 8), (hours >= 8) & (hours < 18), (hours >= 18) & (hours < 20)],
+        ['amanhecer', 'dia', 'anoitecer'],
+        default='noite'
+    )
+
+    weather_codes, weather_known = encode_column(encoding_tables['clima_categoria'], weather)
+    phase_codes, phase_known = encode_column(encoding_tables['fase_dia_categoria'], phases.tolist())
+    road_codes, road_known = encode_column(
+        encoding_tables['tipo_pista_categoria'], [CLASSIFICATION_ROAD_TYPE] * len(raw_rows)
+    )
+
+    matrix[:, 6] = weather_codes
+    matrix[:, 7] = phase_codes
+    matrix[:, 8] = road_codes
+    return matrix, weather_known & phase_known & road_known
+
+
+def agreement_scores(risk_classes, classification_indexes):
+    """Concordância 0-100: 100 mesma classe, 65 classe vizinha, 30 divergente"""
+    distance = np.abs(risk_classes.astype(np.int64) - classification_indexes.astype(np.int64))
+    return np.select([distance == 0, distance == 1], [100.0, 65.0], default=30.0)
+
+
+def weighted_scores(risk_scores, classification_confidence, agreement):
+    """Score ponderado pelos pesos adaptativos do ensemble"""
+    risk_weight = np.where(agreement > 80, 0.5, np.where(agreement < 50, 0.75, 0.6))
+    class_weight = np.where(agreement > 80, 0.5, np.where(agreement < 50, 0.25, 0.4))
+    weighted = risk_scores * risk_weight + classification_confidence * 100 * class_weight
+    return np.clip(weighted, 0, 100)
+
+
+def risk_level_for(score):
+    if score >= 80:
+        return 'critico'
+    if score >= 60:
+        return 'alto'
+    if score >= 40:
+        return 'moderado'
+    return 'baixo'
+
+
+def confidence_level_for(agreement, classification_confidence):
+    avg_confidence = (agreement + classification_confidence * 100) / 2
+    if avg_confidence >= 85:
+        return 'muito_alta'
+    if avg_confidence >= 70:
+        return 'alta'
+    if avg_confidence >= 50:
+        return 'média'
+    return 'baixa'
+
+
+def detect_inconsistencies(risk_score, risk_class, classification_index):
+    inconsistencies = []
+
+    if risk_class != classification_index:
+        inconsistencies.append(
+            f"Modelos divergem na severidade: modelo de risco prevê classe {risk_class}, "
+            f"classificação prevê classe {classification_index}"
+        )
+    if risk_score > 70 and classification_index == 0:
+        inconsistencies.append(
+            'Alto score de risco mas classificação indica "Sem Vítimas" - revisar contexto'
+        )
+    if risk_score < 40 and classification_index == 2:
+        inconsistencies.append(
+            'Baixo score de risco mas classificação indica "Com Vítimas Fatais" - revisar dados'
+        )
+
+    return inconsistencies
+
+
+def ensemble_recommendations(level, classification, models_agree, weather, hour, day_of_week):
+    recommendations = []
+
+    if level == 'critico':
+        recommendations.append('🚨 RISCO CRÍTICO: Considere rota alternativa urgentemente')
+        recommendations.append('Reduza velocidade em pelo menos 30%')
+        recommendations.append('Ative monitoramento intensivo')
+    elif level == 'alto':
+        recommendations.append('⚠️ Alto risco: Atenção redobrada necessária')
+        recommendations.append('Reduza velocidade em 20%')
+    elif level == 'moderado':
+        recommendations.append('⚡ Risco moderado: Mantenha atenção')
+    else:
+        recommendations.append('✅ Risco relativamente baixo')
+
+    if classification == 'Com Vítimas Fatais':
+        recommendations.append('🚨 Alta probabilidade de fatalidade neste trecho')
+        recommendations.append('Mantenha kit de emergência e primeiros socorros')
+    elif classification == 'Com Vítimas Feridas':
+        recommendations.append('⚠️ Risco de ferimentos graves')
+        recommendations.append('Verifique equipamentos de segurança')
+
+    if 'chuv' in weather.lower():
+        recommendations.append('🌧️ Chuva: aumente distância de segurança')
+    if hour >= 20 or hour <= 6:
+        recommendations.append('🌙 Período noturno: use farol alto quando apropriado')
+    if day_of_week in (0, 6):
+        recommendations.append('📅 Fim de semana: tráfego e comportamento diferentes')
+
+    if models_agree:
+        recommendations.append('✅ Ambos os modelos concordam - alta confiabilidade')
+    else:
+        recommendations.append('⚠️ Modelos divergem - considere análise adicional')
+
+    return recommendations
+
+
+def _format_km(km):
+    return int(km) if float(km).is_integer() else km
+
+
+def _parse_items(items, results):
+    """
+    Valida os itens do lote (erros vão direto para results)
+
+    Returns:
+        Tupla (linhas padronizadas, itens originais, posição de cada linha no lote)
+    """
+    rows = []
+    raw_rows = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise InputError('Item do lote deve ser um objeto JSON')
+            rows.append(parse_risk_input(item))
+            raw_rows.append(item)
+            positions.append(i)
+        except Exception as e:
+            results[i] = {'error': str(e), 'input': item}
+            request_metrics.error(e)
+    return rows, raw_rows, positions
+
+
+def _build_result(row, raw, risk, classification, agreement, score, timestamp):
+    """
+    Resultado de um item, no formato de EnsemblePredictionService.combineResults
+
+    Args:
+        row: Linha padronizada (parse_risk_input)
+        raw: Item original
+        risk: Tupla (score, classe prevista, probabilidades) do modelo de risco
+        classification: Tupla (índice, confiança, probabilidades) da
+            classificação, ou None quando os encoders da classificação não
+            reconhecem a linha (só o modelo de risco, como no backend)
+        agreement: Concordância entre os modelos (0-100)
+        score: Score ponderado
+        timestamp: Horário ISO do lote
+    """
+    risk_score, risk_class, risk_proba = risk
+    level = risk_level_for(score)
+    models = {
+        'risk_model': {
+            'score': risk_score,
+            'predicted_class': risk_class,
+            'probabilities': {
+                name: round(float(p) * 100, 2) for name, p in zip(RISK_CLASSES, risk_proba)
+            },
+            'source': 'ml_api',
+        },
+    }
+    models_used = ['risk_model (ml_api)']
+
+    if classification is None:
+        # Mesmos valores do backend quando falta a classificação
+        severity_index, confidence, label = 1, 0.0, 'Desconhecido'
+        inconsistencies = []
+    else:
+        severity_index, confidence, cls_proba = classification
+        label = ACCIDENT_CLASSES[severity_index]
+        models['classification_model'] = {
+            'classification': label,
+            'confidence': confidence,
+            'severity_index': severity_index,
+            'probabilities': {ACCIDENT_CLASSES[c]: float(p) for c, p in enumerate(cls_proba)},
+        }
+        models_used.append('classification_model')
+        inconsistencies = detect_inconsistencies(risk_score, risk_class, severity_index)
+    models_agree = risk_class == severity_index
+
+    return {
+        'risk_score': round(score, 2),
+        'risk_level': level,
+        'accident_classification': label,
+        'classification_confidence': round(confidence, 2),
+        'models': models,
+        'ensemble': {
+            'models_agree': models_agree,
+            'agreement_score': agreement,
+            'confidence_level': confidence_level_for(agreement, confidence),
+            'weighted_score': round(score, 2),
+            'inconsistencies': inconsistencies,
+        },
+        'recommendations': ensemble_recommendations(
+            level,
+            label,
+            models_agree,
+            str(raw.get('weatherCondition', 'claro')),
+            row['hour'],
+            row['day_of_week']
+        ),
+        'metadata': {
+            'location': f"{row['uf']}-BR{raw['br']} KM {_format_km(row['km'])}",
+            'timestamp': timestamp,
+            'models_used': models_used,
+            'fallback_used': classification is None,
+        },
+    }
+
+
+def predict_ensemble_batch(risk_model, classification_model, encoding_tables, items):
+    """
+    Ensemble para um lote: uma chamada a cada modelo sobre a mesma matriz
+
+    Linhas que o modelo de risco aceita mas os encoders da classificação
+    não reconhecem saem só com o modelo de risco (fallback_used), como no
+    ensemble de duas chamadas do backend.
+
+    Args:
+        risk_model: Modelo de risco (risk_model.joblib)
+        classification_model: Modelo de classificação (modeloClassificacao.joblib)
+        encoding_tables: Tabelas retornadas por compile_encoders
+        items: Lista de dicts no formato de /predict
+
+    Returns:
+        Tupla (lista na ordem de entrada com o resultado do ensemble ou
+        {'error': ..., 'input': ...}, dict com tempos dos modelos em ms)
+    """
+    results = [None] * len(items)
+    rows, raw_rows, positions = _parse_items(items, results)
+    request_metrics.mark('validation')
+
+    timings = {'risk_model_ms': 0.0, 'classification_model_ms': 0.0}
+    if not rows:
+        return results, timings
+
+    features, errors = encode_risk_batch(rows, encoding_tables)
+    classification_features, classification_known = build_classification_matrix(
+        features, raw_rows, encoding_tables
+    )
+
+    valid = [j for j, err in enumerate(errors) if err is None]
+    for j, err in enumerate(errors):
+        if err is not None:
+            results[positions[j]] = {'error': err, 'input': raw_rows[j]}
+    if len(valid) < len(rows):
+        request_metrics.error('InputError', len(rows) - len(valid))
+    request_metrics.mark('encoding')
+
+    if not valid:
+        return results, timings
+
+    risk_classes, risk_proba, timings['risk_model_ms'] = predict_with_proba(
+        risk_model, features[valid]
+    )
+
+    # Sem classificação: classe 1, confiança 0 e concordância neutra (50), como no backend
+    classified = classification_known[valid]
+    cls_classes = np.ones(len(valid), dtype=np.int64)
+    cls_confidence = np.zeros(len(valid))
+    agreement = np.full(len(valid), 50.0)
+    cls_proba = None
+    if classified.any():
+        cls_predicted, cls_proba, timings['classification_model_ms'] = predict_with_proba(
+            classification_model, classification_features[np.asarray(valid)[classified]]
+        )
+        cls_classes[classified] = cls_predicted
+        cls_confidence[classified] = cls_proba.max(axis=1)
+        agreement[classified] = agreement_scores(risk_classes[classified], cls_predicted)
+    request_metrics.mark('inference')
+    request_metrics.batch(len(valid))
+
+    raw_scores, _ = score_probabilities(risk_proba)
+    risk_scores = np.round(raw_scores, 2)
+    weighted = weighted_scores(risk_scores, cls_confidence, agreement)
+    # Linha de cada item classificado em cls_proba
+    cls_rows = np.cumsum(classified) - 1
+
+    timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+    for k, j in enumerate(valid):
+        classification = None
+        if classified[k]:
+            classification = (int(cls_classes[k]), float(cls_confidence[k]), cls_proba[cls_rows[k]])
+        results[positions[j]] = _build_result(
+            rows[j],
+            raw_rows[j],
+            (float(risk_scores[k]), int(risk_classes[k]), risk_proba[k]),
+            classification,
+            float(agreement[k]),
+            float(weighted[k]),
+            timestamp
+        )
+    request_metrics.mark('postprocess')
+
+    return results, timings
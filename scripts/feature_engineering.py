@@ -0,0 +1,155 @@
+"""
+Feature Engineering Vetorizado - Sompo
+======================================
+
+Etapa de feature engineering compartilhada por train_risk_model.py e
+train_classification_model.py: datas, hora, categorias simplificadas e
+rótulo de gravidade.
+
+Tudo é feito por coluna: os mapeamentos e a extração da hora são
+calculados uma vez por valor distinto (pd.factorize) e espalhados para as
+linhas por indexação, e a gravidade sai de um np.select.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import numpy as np
+import pandas as pd
+
+# Condições meteorológicas do DATATRAN -> categorias simplificadas
+WEATHER_CATEGORY_MAPPING = {
+    'Céu Claro': 'claro',
+    'Sol': 'claro',
+    'Nublado': 'nublado',
+    'Chuva': 'chuvoso',
+    'Garoa/Chuvisco': 'chuvoso',
+    'Nevoeiro/Neblina': 'neblina',
+    'Vento': 'vento',
+    'Ignorado': 'claro',
+}
+
+# Fase do dia do DATATRAN -> categorias
+DAY_PHASE_MAPPING = {
+    'Pleno dia': 'dia',
+    'Plena Noite': 'noite',
+    'Amanhecer': 'amanhecer',
+    'Anoitecer': 'anoitecer',
+}
+
+# Tipo de pista do DATATRAN -> categorias
+ROAD_TYPE_MAPPING = {
+    'Dupla': 'dupla',
+    'Simples': 'simples',
+    'Múltipla': 'multipla',
+}
+
+# Hora usada quando horario não tem hora reconhecível
+DEFAULT_HOUR = 12
+
+CASUALTY_COLUMNS = ['mortos', 'feridos_graves', 'feridos_leves']
+
+
+def parse_dates(df):
+    """
+    Converte a coluna de data (data_inversa ou data) para datetime
+
+    Raises:
+        ValueError: Se nenhuma coluna de data existir
+    """
+    for column in ('data_inversa', 'data'):
+        if column in df.columns:
+            return pd.to_datetime(df[column], errors='coerce')
+    raise ValueError("Coluna de data não encontrada")
+
+
+def _hour_of(value):
+    return value.hour if hasattr(value, 'hour') else DEFAULT_HOUR
+
+
+def extract_hour(horario):
+    """
+    Hora (0-23) da coluna horario
+
+    Colunas datetime usam o acessor .dt. Colunas de objetos (datetime.time
+    vindos do Excel) têm a hora calculada uma vez por valor distinto.
+    Valores sem atributo hour (texto, vazio) recebem DEFAULT_HOUR.
+    """
+    if pd.api.types.is_datetime64_any_dtype(horario):
+        return horario.dt.hour
+
+    codes, uniques = pd.factorize(horario)
+    unique_hours = np.array([_hour_of(value) for value in uniques], dtype=np.float64)
+    hours = unique_hours[codes] if len(uniques) else np.empty(len(codes), dtype=np.float64)
+
+    # factorize agrupa None/NaN/NaT no código -1; NaT tem atributo hour (NaN)
+    missing = np.flatnonzero(codes == -1)
+    if len(missing):
+        hours[missing] = [_hour_of(value) for value in horario.to_numpy()[missing]]
+
+    if not np.isnan(hours).any():
+        hours = hours.astype(np.int64)
+    return pd.Series(hours, index=horario.index, name=horario.name)
+
+
+def map_category(series, mapping, default):
+    """Aplica um mapeamento categórico por valor distinto, com valor padrão"""
+    codes, uniques = pd.factorize(series)
+    mapped = pd.Series(np.asarray(uniques, dtype=object)).map(mapping).to_numpy(dtype=object)
+    mapped = np.append(mapped, np.nan)  # código -1 (ausente) -> NaN -> default
+    return pd.Series(mapped[codes], index=series.index, name=series.name).fillna(default)
+
+
+def severity_labels(df):
+    """
+    Gravidade do acidente: 2 = com mortos, 1 = com feridos, 0 = sem vítimas
+    """
+    has_injured = (df['feridos_graves'] > 0) | (df['feridos_leves'] > 0)
+    return pd.Series(
+        np.select([df['mortos'] > 0, has_injured], [2, 1], default=0),
+        index=df.index
+    )
+
+
+def engineer_features(df, target_column='gravidade'):
+    """
+    Feature engineering completo dos scripts de treinamento
+
+    Adiciona data, hora, dia_semana, mes, clima_categoria,
+    fase_dia_categoria, tipo_pista_categoria e a coluna alvo; converte as
+    colunas de vítimas para int.
+
+    Args:
+        df: DataFrame bruto do DATATRAN
+        target_column: Nome da coluna de gravidade gerada
+
+    Returns:
+        Novo DataFrame (o original não é modificado)
+
+    Raises:
+        ValueError: Se nenhuma coluna de data existir
+    """
+    df_clean = df.copy()
+
+    df_clean['data'] = parse_dates(df_clean)
+
+    # Extrair features temporais
+    df_clean['hora'] = extract_hour(df_clean['horario'])
+    df_clean['dia_semana'] = df_clean['data'].dt.dayofweek  # 0=Monday, 6=Sunday
+    df_clean['mes'] = df_clean['data'].dt.month
+
+    # Categorias simplificadas
+    df_clean['clima_categoria'] = map_category(
+        df_clean['condicao_metereologica'], WEATHER_CATEGORY_MAPPING, 'claro'
+    )
+    df_clean['fase_dia_categoria'] = map_category(df_clean['fase_dia'], DAY_PHASE_MAPPING, 'dia')
+    df_clean['tipo_pista_categoria'] = map_category(
+        df_clean['tipo_pista'], ROAD_TYPE_MAPPING, 'simples'
+    )
+
+    # Target: 0 = sem vítimas, 1 = com feridos, 2 = com mortos
+    for column in CASUALTY_COLUMNS:
+        df_clean[column] = df_clean[column].fillna(0).astype(int)
+    df_clean[target_column] = severity_labels(df_clean)
+
+    return df_clean
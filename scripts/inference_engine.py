@@ -0,0 +1,410 @@
+"""
+Motor de Inferência em Lote - Sompo
+===================================
+
+Valida e codifica um lote inteiro de requisições em uma única matriz NumPy,
+executa uma só chamada de predict_proba e deriva classe, score e nível de
+risco com operações vetoriais.
+
+A classe prevista sai do argmax das probabilidades (mesmo resultado de
+model.predict), então as árvores são percorridas uma única vez.
+
+Usado por ml_prediction_api.py e classification_api.py.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import hashlib
+import time
+
+import numpy as np
+
+import request_metrics
+
+# Ordem das features esperada pelos modelos (mesma do treinamento)
+FEATURE_COLUMNS = [
+    'uf_encoded', 'br', 'km', 'hora', 'dia_semana', 'mes',
+    'clima_categoria_encoded', 'fase_dia_categoria_encoded',
+    'tipo_pista_categoria_encoded'
+]
+
+RISK_CLASSES = ['sem_vitimas', 'com_feridos', 'com_mortos']
+
+# Classes do modelo de classificação (baseado no DATATRAN)
+ACCIDENT_CLASSES = [
+    "Sem Vítimas",
+    "Com Vítimas Feridas",
+    "Com Vítimas Fatais"
+]
+
+REQUIRED_FIELDS = ['uf', 'br', 'km']
+
+# Mapeamentos de condições da API de risco
+WEATHER_MAPPING = {
+    'claro': 'claro',
+    'nublado': 'nublado',
+    'chuva': 'chuvoso',
+    'chuvoso': 'chuvoso',
+    'neblina': 'neblina',
+    'nevoeiro': 'neblina'
+}
+
+PHASE_MAPPING = {
+    'dia': 'dia',
+    'noite': 'noite',
+    'amanhecer': 'amanhecer',
+    'anoitecer': 'anoitecer'
+}
+
+ROAD_MAPPING = {
+    'simples': 'simples',
+    'dupla': 'dupla',
+    'multipla': 'multipla'
+}
+
+
+# Mapeamento de clima da API de classificação (aceita termos em inglês)
+CLASSIFICATION_WEATHER_MAPPING = {
+    'claro': 'claro',
+    'clear': 'claro',
+    'sol': 'claro',
+    'nublado': 'nublado',
+    'cloudy': 'nublado',
+    'chuvoso': 'chuvoso',
+    'chuva': 'chuvoso',
+    'rain': 'chuvoso',
+    'neblina': 'neblina',
+    'fog': 'neblina',
+    'vento': 'vento',
+    'wind': 'vento'
+}
+
+# Tipo de pista padrão da API de classificação
+CLASSIFICATION_ROAD_TYPE = 'simples'
+
+
+class InputError(ValueError):
+    """Erro de validação de uma linha de entrada (HTTP 400)"""
+    status_code = 400
+
+
+def model_fingerprint(*paths):
+    """Versão curta (12 hex do SHA-256) dos arquivos do modelo e dos encoders"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def parse_risk_input(data):
+    """
+    Valida e padroniza uma requisição de predição de risco
+
+    Args:
+        data: Dict no formato aceito por /predict
+
+    Returns:
+        Dict com uf, br, km, hour, day_of_week, month, clima_categoria,
+        fase_dia_categoria e tipo_pista_categoria
+
+    Raises:
+        InputError: Campo obrigatório ausente
+        ValueError/TypeError: Valor numérico inválido
+    """
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise InputError(f'Campo obrigatório ausente: {field}')
+
+    weather = data.get('weatherCondition', 'claro').lower()
+    day_phase = data.get('dayPhase', 'dia').lower()
+    road_type = data.get('roadType', 'simples').lower()
+
+    return {
+        'uf': str(data['uf']).upper(),
+        'br': int(data['br']),
+        'km': float(data['km']),
+        'hour': int(data.get('hour', 12)),
+        'day_of_week': int(data.get('dayOfWeek', 2)),
+        'month': int(data.get('month', 6)),
+        'clima_categoria': WEATHER_MAPPING.get(weather, 'claro'),
+        'fase_dia_categoria': PHASE_MAPPING.get(day_phase, 'dia'),
+        'tipo_pista_categoria': ROAD_MAPPING.get(road_type, 'simples')
+    }
+
+
+def day_phase_from_hour(hour):
+    """Fase do dia derivada da hora (regra da API de classificação)"""
+    if 6 <= hour < 12:
+        return 'amanhecer' if hour < 8 else 'dia'
+    elif 12 <= hour < 18:
+        return 'dia'
+    elif 18 <= hour < 20:
+        return 'anoitecer'
+    else:
+        return 'noite'
+
+
+def compile_encoders(label_encoders):
+    """
+    Compila os LabelEncoders em tabelas de lookup
+
+    LabelEncoder.transform valida a entrada, monta arrays e roda
+    np.searchsorted para codificar um único valor. As tabelas trocam isso
+    por um acesso O(1) a dict, com os mesmos códigos do encoder.
+
+    Args:
+        label_encoders: Dict de LabelEncoders carregado de label_encoders.joblib
+
+    Returns:
+        Dict nome do encoder -> {valor: código}
+    """
+    return {
+        name: {str(label): code for code, label in enumerate(encoder.classes_)}
+        for name, encoder in label_encoders.items()
+    }
+
+
+def encode_value(encoding_tables, name, value):
+    """
+    Codifica um valor categórico
+
+    Raises:
+        InputError: Valor desconhecido para o encoder (mesma regra nas duas APIs)
+    """
+    code = encoding_tables[name].get(value)
+    if code is None:
+        raise InputError(f"Valor não reconhecido nos encoders: {name}='{value}'")
+    return code
+
+
+def encode_column(table, values):
+    """
+    Codifica uma coluna inteira com uma tabela de lookup
+
+    Valores desconhecidos recebem -1 em vez de abortar o lote inteiro.
+
+    Returns:
+        Tupla (códigos int64, máscara booleana de valores conhecidos)
+    """
+    codes = np.fromiter((table.get(v, -1) for v in values), dtype=np.int64, count=len(values))
+    return codes, codes >= 0
+
+
+def encode_risk_batch(rows, encoding_tables):
+    """
+    Monta a matriz de features para linhas já padronizadas
+
+    Args:
+        rows: Lista de dicts retornados por parse_risk_input
+        encoding_tables: Tabelas retornadas por compile_encoders
+
+    Returns:
+        Tupla (matriz float64 n x 9, lista de erros por linha ou None)
+    """
+    n = len(rows)
+    features = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+    errors = [None] * n
+
+    categorical = [
+        (0, 'uf', 'uf'),
+        (6, 'clima_categoria', 'clima_categoria'),
+        (7, 'fase_dia_categoria', 'fase_dia_categoria'),
+        (8, 'tipo_pista_categoria', 'tipo_pista_categoria'),
+    ]
+    for col_idx, encoder_name, field in categorical:
+        values = [row[field] for row in rows]
+        codes, known = encode_column(encoding_tables[encoder_name], values)
+        features[:, col_idx] = codes
+        for i in np.flatnonzero(~known):
+            if errors[i] is None:
+                errors[i] = f"Valor não reconhecido nos encoders: {field}='{values[i]}'"
+
+    numeric = [(1, 'br'), (2, 'km'), (3, 'hour'), (4, 'day_of_week'), (5, 'month')]
+    for col_idx, field in numeric:
+        features[:, col_idx] = [row[field] for row in rows]
+
+    return features, errors
+
+
+def predict_with_proba(model, features):
+    """
+    Inferência em uma única passada pelo modelo
+
+    Args:
+        model: Classificador sklearn/LightGBM com predict_proba e classes_
+        features: Matriz n x 9
+
+    Returns:
+        Tupla (classes previstas, matriz de probabilidades, tempo do modelo em ms)
+    """
+    start = time.perf_counter()
+    proba = model.predict_proba(features)
+    classes = model.classes_[np.argmax(proba, axis=1)]
+    model_time_ms = (time.perf_counter() - start) * 1000
+    return classes, proba, model_time_ms
+
+
+def score_probabilities(proba):
+    """
+    Deriva score (0-100) e nível de risco a partir das probabilidades
+
+    Score ponderado: sem_vitimas*0 + com_feridos*50 + com_mortos*100
+    """
+    risk_scores = proba[:, 1] * 50 + proba[:, 2] * 100
+    return risk_scores, risk_levels_for(risk_scores)
+
+
+def risk_levels_for(risk_scores):
+    """Nível de risco de cada score: critico >= 80, alto >= 60, moderado >= 40, baixo"""
+    return np.select(
+        [risk_scores >= 80, risk_scores >= 60, risk_scores >= 40],
+        ['critico', 'alto', 'moderado'],
+        default='baixo'
+    )
+
+
+def build_recommendations(risk_level, hour, clima_categoria):
+    """Gera recomendações para um nível de risco e contexto"""
+    recommendations = []
+    if risk_level == 'critico':
+        recommendations.append('🚨 RISCO CRÍTICO: Considere rota alternativa urgentemente')
+        recommendations.append('Reduza velocidade em pelo menos 30%')
+    elif risk_level == 'alto':
+        recommendations.append('⚠️ ALTO RISCO: Atenção redobrada necessária')
+        recommendations.append('Reduza velocidade em 20%')
+    elif risk_level == 'moderado':
+        recommendations.append('⚡ RISCO MODERADO: Mantenha atenção')
+    else:
+        recommendations.append('✅ Risco relativamente baixo')
+
+    # Recomendações contextuais
+    if hour >= 18 or hour < 6:
+        recommendations.append('🌙 Período noturno: use farol alto quando apropriado')
+    if clima_categoria == 'chuvoso':
+        recommendations.append('🌧️ Chuva: reduza velocidade e aumente distância')
+    if clima_categoria == 'neblina':
+        recommendations.append('🌫️ Neblina: velocidade reduzida e farol baixo')
+
+    return recommendations
+
+
+def format_risk_input(row):
+    """Bloco 'input' do payload de /predict (eco da requisição padronizada)"""
+    return {
+        'uf': row['uf'],
+        'br': row['br'],
+        'km': row['km'],
+        'context': {
+            'hour': row['hour'],
+            'weather': row['clima_categoria'],
+            'day_phase': row['fase_dia_categoria'],
+            'road_type': row['tipo_pista_categoria']
+        }
+    }
+
+
+def format_risk_result(row, risk_score, risk_level, predicted_class, proba):
+    """Monta o payload 'data' de /predict para uma linha"""
+    return {
+        'risk_score': risk_score,
+        'risk_level': risk_level,
+        'predicted_class': predicted_class,
+        'class_probabilities': {
+            name: round(float(p) * 100, 2)
+            for name, p in zip(RISK_CLASSES, proba)
+        },
+        'recommendations': build_recommendations(
+            risk_level, row['hour'], row['clima_categoria']
+        ),
+        'input': format_risk_input(row)
+    }
+
+
+def _parse_risk_items(items, results):
+    """
+    Valida os itens de um lote de risco (erros vão direto para results)
+
+    Returns:
+        Tupla (linhas padronizadas, posição de cada linha no lote)
+    """
+    rows = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise InputError('Item do lote deve ser um objeto JSON')
+            rows.append(parse_risk_input(item))
+            positions.append(i)
+        except Exception as e:
+            results[i] = {'error': str(e)}
+            request_metrics.error(e)
+    return rows, positions
+
+
+def _encoding_errors(errors, positions, results):
+    """Registra em results as linhas que os encoders recusaram; retorna as válidas"""
+    valid = [j for j, err in enumerate(errors) if err is None]
+    for j, err in enumerate(errors):
+        if err is not None:
+            results[positions[j]] = {'error': err}
+    if len(valid) < len(errors):
+        request_metrics.error('InputError', len(errors) - len(valid))
+    return valid
+
+
+def _format_risk_batch(rows, positions, valid, classes, proba, results):
+    """Preenche results com o payload de /predict de cada linha avaliada"""
+    risk_scores, risk_levels = score_probabilities(proba)
+    risk_scores = np.round(risk_scores, 2)
+    for k, j in enumerate(valid):
+        results[positions[j]] = {
+            'success': True,
+            'data': format_risk_result(
+                rows[j],
+                float(risk_scores[k]),
+                str(risk_levels[k]),
+                int(classes[k]),
+                proba[k]
+            )
+        }
+
+
+def predict_risk_batch(model, encoding_tables, items):
+    """
+    Predição de risco para um lote de requisições em uma só chamada ao modelo
+
+    Linhas inválidas não derrubam o lote: recebem {'error': ...} na sua
+    posição e as demais seguem para o modelo.
+
+    Args:
+        model: Classificador com predict_proba (LightGBM)
+        encoding_tables: Tabelas retornadas por compile_encoders
+        items: Lista de dicts no formato de /predict
+
+    Returns:
+        Tupla (lista na ordem de entrada de {'success': True, 'data': {...}}
+        ou {'error': '...'}, tempo do modelo em ms)
+    """
+    results = [None] * len(items)
+    rows, positions = _parse_risk_items(items, results)
+    request_metrics.mark('validation')
+    if not rows:
+        return results, 0.0
+
+    features, errors = encode_risk_batch(rows, encoding_tables)
+    valid = _encoding_errors(errors, positions, results)
+    request_metrics.mark('encoding')
+    if not valid:
+        return results, 0.0
+
+    classes, proba, model_time_ms = predict_with_proba(model, features[valid])
+    request_metrics.mark('inference')
+    request_metrics.batch(len(valid))
+
+    _format_risk_batch(rows, positions, valid, classes, proba, results)
+    request_metrics.mark('postprocess')
+
+    return results, model_time_ms
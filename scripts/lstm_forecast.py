@@ -0,0 +1,601 @@
+"""
+Previsão de Acidentes em SP com o LSTM - Sompo
+==============================================
+
+Serve o modelo DadosReais/modelo_lstm_acidentes_sp.keras (LSTM(50) ->
+LSTM(50) -> Dense(1), janelas de 4 períodos) em CPU, por /forecast e
+/forecast-batch de ml_prediction_api.py:
+
+1. Carga única: a rede é lida do .keras uma vez por processo. Backend
+   padrão 'numpy': os pesos saem do model.weights.h5 do arquivo (h5py) e
+   a passada é feita em NumPy, sem TensorFlow no processo da API (carga
+   em milissegundos, sem o custo fixo de cada chamada ao Keras). Backend
+   'keras': keras.models.load_model + predict_on_batch, com as threads
+   intra/inter-op do TensorFlow configuradas antes da primeira chamada
+2. Séries e janelas pré-montadas: acidentes por período (ML_FORECAST_FREQUENCY)
+   em SP no total e por BR, normalizados em [0, 1] (min-max de cada
+   série) e cortados em todas as janelas deslizantes de 4 períodos em um
+   único array; uma requisição vira um índice nesse array
+3. Lote: /forecast-batch (e /forecast com ML_MICROBATCH_ENABLED, pelo
+   micro_batcher.py) avalia todas as janelas em uma passada pela rede por
+   passo do horizonte (horizontes > 1 realimentam a previsão na janela)
+4. Cache por janela: previsões já calculadas são reaproveitadas até
+   chegar dado novo; o ModelReloader observa o .keras e a planilha, e a
+   recarga publica um LSTMForecaster novo (séries, janelas e cache vazios)
+
+O treinamento não gravou o normalizador: as contagens são normalizadas
+com o min-max da própria série (o modelo espera entradas em [0, 1]), e a
+previsão volta para acidentes com a mesma escala.
+
+Configuração:
+    ML_FORECAST_ENABLED=1           Carrega a previsão na API (padrão: desativado)
+    ML_FORECAST_DATA=...            Planilha de acidentes (padrão: DadosReais/dados_acidentes.xlsx)
+    ML_FORECAST_FREQUENCY=M         Período da série (alias de período do pandas: M, W, ...)
+    ML_FORECAST_CACHE_SIZE=4096     Janelas com previsão em cache
+    ML_LSTM_BACKEND=numpy           numpy (h5py) ou keras (tensorflow)
+    ML_LSTM_THREADS=1               Threads da passada (BLAS no numpy, intra-op no keras; 0 = padrão da biblioteca)
+
+Uso (a partir da raiz do projeto):
+    python scripts/lstm_forecast.py --series SP --horizon 3
+    python scripts/lstm_forecast.py --series BR-116 --end-period 2024-12
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import request_metrics
+from data_cache import load_dataset
+from feature_engineering import parse_dates
+from inference_engine import InputError, model_fingerprint
+from model_reloader import file_signature
+
+logger = logging.getLogger(__name__)
+
+# Modelo e histórico de acidentes
+MODEL_PATH = Path("DadosReais/modelo_lstm_acidentes_sp.keras")
+DATA_PATH = Path(os.environ.get('ML_FORECAST_DATA', "DadosReais/dados_acidentes.xlsx"))
+
+# Estado das séries e nome da série total
+UF = 'SP'
+
+# Período de agregação das contagens
+FREQUENCY = os.environ.get('ML_FORECAST_FREQUENCY', 'M')
+
+# Backend da passada e threads
+BACKEND = os.environ.get('ML_LSTM_BACKEND', 'numpy')
+THREADS = int(os.environ.get('ML_LSTM_THREADS', '1'))
+
+# Horizonte máximo (períodos à frente, previsão recursiva)
+MAX_HORIZON = 12
+
+# Janelas por requisição de /forecast-batch
+MAX_BATCH_REQUESTS = 1000
+
+# Janelas com previsão em cache
+CACHE_SIZE = int(os.environ.get('ML_FORECAST_CACHE_SIZE', '4096'))
+
+# BRs com menos acidentes no histórico ficam sem série própria
+MIN_SERIES_ACCIDENTS = 100
+
+# Contagens de uma série e o intervalo do min-max
+Series = namedtuple('Series', ['name', 'periods', 'counts', 'low', 'high', 'offset'])
+
+
+def _lstm_weights(h5, layer_config):
+    """Valida uma camada LSTM do .keras e lê (kernel, recorrente, bias, return_sequences)"""
+    name = layer_config['name']
+    if (layer_config['activation'], layer_config['recurrent_activation']) != ('tanh', 'sigmoid') \
+            or layer_config['go_backwards'] or layer_config['stateful']:
+        raise ValueError(f"Camada LSTM não suportada: {name}")
+    kernel, recurrent, bias = (np.asarray(h5[f'layers/{name}/cell/vars/{i}'], dtype=np.float32)
+                               for i in range(3))
+    return kernel, recurrent, bias, layer_config['return_sequences']
+
+
+def _dense_weights(h5, layer_config):
+    """Valida uma camada Dense (só linear) e lê (kernel, bias)"""
+    name = layer_config['name']
+    if layer_config['activation'] != 'linear':
+        raise ValueError(f"Ativação não suportada na camada {name}: {layer_config['activation']}")
+    return tuple(np.asarray(h5[f'layers/{name}/vars/{i}'], dtype=np.float32) for i in range(2))
+
+
+class NumpyLSTM:
+    """
+    Passada do LSTM empilhado em NumPy a partir dos pesos do .keras
+
+    Suporta o que o modelo usa: LSTM (tanh/sigmoid, portas na ordem do
+    Keras i, f, c, o), Dropout (identidade na inferência) e Dense linear.
+    """
+
+    def __init__(self, window, lstm_layers, dense_kernel, dense_bias):
+        self.window = window
+        self.dense_kernel = dense_kernel
+        self.dense_bias = dense_bias
+
+        # sigmoid(x) = 0.5 * tanh(x / 2) + 0.5: com as colunas das portas i, f
+        # e o pré-escaladas por 0.5, um tanh sobre as 4 portas de uma vez
+        self.lstm_layers = []
+        for kernel, recurrent, bias, return_sequences in lstm_layers:
+            units = recurrent.shape[0]
+            scale = np.full(4 * units, 0.5, dtype=np.float32)
+            scale[2 * units:3 * units] = 1.0
+            self.lstm_layers.append((kernel * scale, recurrent * scale, bias * scale, return_sequences))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Lê config.json e model.weights.h5 do arquivo .keras
+
+        Raises:
+            ImportError: h5py não instalado
+            ValueError: Camada ou ativação não suportada
+        """
+        try:
+            import h5py
+        except ImportError as e:
+            raise ImportError("Backend numpy do LSTM requer h5py: pip install h5py") from e
+
+        with zipfile.ZipFile(path) as archive:
+            config = json.loads(archive.read('config.json'))
+            weights = io.BytesIO(archive.read('model.weights.h5'))
+
+        window = None
+        lstm_layers = []
+        dense = None
+        with h5py.File(weights, 'r') as h5:
+            for layer in config['config']['layers']:
+                kind, layer_config = layer['class_name'], layer['config']
+                if kind == 'InputLayer':
+                    window = layer_config['batch_shape'][1]
+                elif kind == 'LSTM':
+                    lstm_layers.append(_lstm_weights(h5, layer_config))
+                elif kind == 'Dense':
+                    dense = _dense_weights(h5, layer_config)
+                elif kind != 'Dropout':
+                    raise ValueError(f"Camada não suportada: {kind} ({layer_config['name']})")
+
+        if window is None or not lstm_layers or dense is None:
+            raise ValueError(f"Arquitetura inesperada em {path}")
+        return cls(window, lstm_layers, *dense)
+
+    def predict(self, windows):
+        """Janelas (n, window, 1) float32 -> previsão normalizada (n,)"""
+        n, steps, _ = windows.shape
+        # Tempo no primeiro eixo: a fatia de cada passo é contígua
+        sequence = np.ascontiguousarray(windows.transpose(1, 0, 2), dtype=np.float32)
+        for kernel, recurrent, bias, return_sequences in self.lstm_layers:
+            units = recurrent.shape[0]
+            # Projeção da entrada de todos os passos em uma multiplicação
+            # (com uma feature de entrada, o produto externo por broadcast é mais rápido que o matmul)
+            if kernel.shape[0] == 1:
+                projected = sequence * kernel[0]
+            else:
+                projected = (sequence.reshape(steps * n, -1) @ kernel).reshape(steps, n, -1)
+            projected += bias
+
+            # Buffers reaproveitados entre os passos (operações in-place)
+            h = np.zeros((n, units), dtype=np.float32)
+            c = np.zeros_like(h)
+            candidate = np.empty_like(h)
+            z = np.empty((n, 4 * units), dtype=np.float32)
+            outputs = np.empty((steps, n, units), dtype=np.float32) if return_sequences else None
+            for step in range(steps):
+                np.matmul(h, recurrent, out=z)
+                z += projected[step]
+                np.tanh(z, out=z)
+                for gate in (z[:, :2 * units], z[:, 3 * units:]):
+                    gate *= 0.5
+                    gate += 0.5
+                # c = f * c + i * g;  h = o * tanh(c)
+                c *= z[:, units:2 * units]
+                np.multiply(z[:, :units], z[:, 2 * units:3 * units], out=candidate)
+                c += candidate
+                h = outputs[step] if outputs is not None else h
+                np.tanh(c, out=h)
+                h *= z[:, 3 * units:]
+            sequence = outputs
+        return (h @ self.dense_kernel + self.dense_bias)[:, 0]
+
+
+class KerasLSTM:
+    """Modelo carregado pelo Keras (TensorFlow), predict_on_batch por lote"""
+
+    def __init__(self, path, threads=THREADS):
+        configure_tensorflow(threads)
+        import keras
+
+        self.model = keras.models.load_model(path, compile=False)
+        self.window = self.model.input_shape[1]
+
+    def predict(self, windows):
+        """Janelas (n, window, 1) float32 -> previsão normalizada (n,)"""
+        return np.asarray(self.model.predict_on_batch(windows))[:, 0]
+
+
+def configure_tensorflow(threads):
+    """
+    Threads intra-op (por operação) e inter-op (uma: o grafo do LSTM é
+    sequencial) do TensorFlow; só vale antes da primeira operação
+
+    Raises:
+        ImportError: tensorflow não instalado
+    """
+    try:
+        import tensorflow as tf
+    except ImportError as e:
+        raise ImportError("ML_LSTM_BACKEND=keras requer tensorflow: pip install tensorflow-cpu") from e
+    if threads <= 0:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:
+        logger.warning("⚠️  TensorFlow já inicializado: threads do LSTM mantidas")
+
+
+def configure_blas(threads):
+    """Limita as threads do BLAS do NumPy (matrizes do LSTM são pequenas demais para dividir)"""
+    if threads <= 0:
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=threads, user_api='blas')
+
+
+def load_network(path=MODEL_PATH, backend=BACKEND, threads=THREADS):
+    """
+    Carrega o LSTM no backend pedido
+
+    Raises:
+        ValueError: Backend desconhecido
+    """
+    if backend == 'numpy':
+        configure_blas(threads)
+        return NumpyLSTM.load(path)
+    if backend == 'keras':
+        return KerasLSTM(path, threads)
+    raise ValueError(f"ML_LSTM_BACKEND desconhecido: {backend} (use numpy ou keras)")
+
+
+def build_series(df, frequency=FREQUENCY, uf=UF, min_accidents=MIN_SERIES_ACCIDENTS):
+    """
+    Contagens de acidentes por período em uf (total) e por BR
+
+    Períodos sem acidentes entram com zero, do primeiro ao último período
+    do histórico do estado.
+
+    Returns:
+        (PeriodIndex, {nome da série: contagens float64})
+
+    Raises:
+        ValueError: Nenhum acidente com data válida no estado
+    """
+    dates = parse_dates(df)
+    mask = (df['uf'].astype(str).str.upper() == uf) & dates.notna()
+    if not mask.any():
+        raise ValueError(f"Nenhum acidente com data válida em {uf}")
+
+    periods = dates[mask].dt.to_period(frequency)
+    index = pd.period_range(periods.min(), periods.max(), freq=frequency)
+    roads = pd.to_numeric(df.loc[mask, 'br'], errors='coerce')
+
+    counts = pd.crosstab(periods, roads).reindex(index, fill_value=0)
+    series = {uf: counts.sum(axis=1).to_numpy(dtype=np.float64)}
+    for road in counts.columns[counts.sum(axis=0) >= min_accidents]:
+        series[f'BR-{int(road)}'] = counts[road].to_numpy(dtype=np.float64)
+    return index, series
+
+
+class LSTMForecaster:
+    """
+    Rede, séries normalizadas e janelas pré-montadas (publicado inteiro na recarga)
+
+    Cada janela deslizante de todas as séries é uma linha de
+    self.windows; a janela j de uma série cobre os períodos j .. j+window-1
+    e prevê o período j+window. Tem os atributos que o ModelReloader usa
+    (version, signature, warmup_ms).
+    """
+
+    def __init__(self, network, periods, counts_by_series, version=None, signature=None,
+                 load_ms=None, cache_size=CACHE_SIZE):
+        self.network = network
+        self.window = network.window
+        self.periods = periods
+        self.version = version
+        self.signature = signature
+        self.loaded_at = datetime.now()
+        self.load_ms = load_ms
+        self.warmup_ms = None
+
+        self.series = {}
+        windows = []
+        lows = []
+        spans = []
+        offset = 0
+        for name, counts in counts_by_series.items():
+            if len(counts) < self.window:
+                continue
+            low, high = float(counts.min()), float(counts.max())
+            span = high - low if high > low else 1.0
+            scaled = ((counts - low) / span).astype(np.float32)
+            series_windows = np.lib.stride_tricks.sliding_window_view(scaled, self.window)
+            windows.append(series_windows)
+            lows.append(np.full(len(series_windows), low))
+            spans.append(np.full(len(series_windows), span))
+            self.series[name] = Series(name, periods, counts, low, high, offset)
+            offset += len(series_windows)
+
+        if not self.series:
+            raise ValueError(f"Histórico menor que a janela do modelo ({self.window} períodos)")
+        self.windows = np.ascontiguousarray(np.concatenate(windows)[:, :, None])
+        self._low = np.concatenate(lows)
+        self._span = np.concatenate(spans)
+
+        # Cache: linha de self.windows -> previsão normalizada (horizonte mais longo já pedido)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def resolve(self, data):
+        """
+        Valida uma requisição de previsão
+
+        Body: {"series": "SP" | "BR-116", "br": 116, "horizon": 3, "endPeriod": "2024-12"}
+        (series ou br; sem endPeriod, a janela termina no último período)
+
+        Returns:
+            (série, linha de self.windows, horizonte)
+
+        Raises:
+            InputError: Série, período ou horizonte inválido
+        """
+        if not isinstance(data, dict):
+            raise InputError('Body deve ser um objeto JSON')
+
+        name = data.get('series')
+        if name is None:
+            name = f"BR-{int(data['br'])}" if data.get('br') is not None else UF
+        series = self.series.get(str(name).upper())
+        if series is None:
+            raise InputError(f"Série sem histórico suficiente: {name}")
+
+        horizon = int(data.get('horizon', 1))
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise InputError(f"Campo horizon deve estar entre 1 e {MAX_HORIZON}")
+
+        last = len(self.periods) - 1
+        end = data.get('endPeriod')
+        if end is not None:
+            try:
+                last = self.periods.get_loc(pd.Period(str(end), freq=self.periods.freq))
+            except (KeyError, ValueError):
+                raise InputError(f"endPeriod fora do histórico: '{end}' "
+                                 f"({self.periods[0]} a {self.periods[-1]})")
+            if last < self.window - 1:
+                raise InputError(f"endPeriod precisa de {self.window} períodos de histórico: '{end}'")
+
+        return series, series.offset + last - (self.window - 1), horizon
+
+    def run(self, requests):
+        """
+        Previsões de um lote (usada diretamente e pelo micro-batcher)
+
+        Args:
+            requests: Matriz (n, 2) com linha de self.windows e horizonte
+
+        Returns:
+            (acidentes previstos (n, horizonte máximo), previsão normalizada,
+            tempo do modelo em ms); posições além do horizonte de cada
+            linha ficam NaN
+        """
+        rows = requests[:, 0].astype(np.intp)
+        horizons = requests[:, 1].astype(np.intp)
+        scaled = np.full((len(rows), int(horizons.max())), np.nan, dtype=np.float32)
+
+        # Janelas com previsão em cache para o horizonte pedido
+        missing = []
+        with self._lock:
+            for i, (row, horizon) in enumerate(zip(rows, horizons)):
+                cached = self._cache.get(row)
+                if cached is not None and len(cached) >= horizon:
+                    self._cache.move_to_end(row)
+                    scaled[i, :horizon] = cached[:horizon]
+                    self._hits += 1
+                else:
+                    missing.append(i)
+                    self._misses += 1
+
+        model_time_ms = 0.0
+        if missing:
+            missing = np.array(missing)
+            start = time.perf_counter()
+            scaled[missing] = self._forecast(rows[missing], horizons[missing], scaled.shape[1])
+            model_time_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                for i in missing:
+                    self._cache[rows[i]] = scaled[i, :horizons[i]].copy()
+                    self._cache.move_to_end(rows[i])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        accidents = np.maximum(scaled * self._span[rows, None] + self._low[rows, None], 0.0)
+        return accidents, scaled, model_time_ms
+
+    def _forecast(self, rows, horizons, steps):
+        """Previsão recursiva: uma passada pela rede por passo, para todas as janelas ativas"""
+        windows = self.windows[rows]
+        scaled = np.full((len(rows), steps), np.nan, dtype=np.float32)
+        active = np.arange(len(rows))
+        for step in range(int(horizons.max())):
+            active = active[horizons[active] > step]
+            predicted = self.network.predict(windows[active])
+            scaled[active, step] = predicted
+            windows[active, :-1] = windows[active, 1:]
+            windows[active, -1, 0] = predicted
+        return scaled
+
+    def format(self, series, row, horizon, accidents):
+        """Resposta de uma previsão: janela de entrada e períodos previstos"""
+        end = row - series.offset + self.window - 1
+        return {
+            'series': series.name,
+            'frequency': self.periods.freqstr,
+            'window': [
+                {'period': str(self.periods[i]), 'accidents': int(series.counts[i])}
+                for i in range(end - self.window + 1, end + 1)
+            ],
+            'forecast': [
+                {'period': str(self.periods[end] + step + 1), 'accidents': round(float(accidents[step]), 1)}
+                for step in range(horizon)
+            ],
+        }
+
+    def warm_up(self):
+        """Uma passada por todas as janelas finais (não entra no cache)"""
+        start = time.perf_counter()
+        last_rows = [s.offset + len(self.periods) - self.window for s in self.series.values()]
+        self._forecast(np.array(last_rows), np.ones(len(last_rows), dtype=np.intp), 1)
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        return self.warmup_ms
+
+    def stats(self):
+        """Séries, janelas e métricas do cache"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'version': self.version,
+                'loaded_at': self.loaded_at.isoformat(),
+                'backend': type(self.network).__name__,
+                'window': self.window,
+                'frequency': self.periods.freqstr,
+                'first_period': str(self.periods[0]),
+                'last_period': str(self.periods[-1]),
+                'series': sorted(self.series),
+                'windows': len(self.windows),
+                'cache': {
+                    'entries': len(self._cache),
+                    'max_entries': self.cache_size,
+                    'hits': self._hits,
+                    'misses': self._misses,
+                    'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                },
+            }
+
+
+def forecast_batch(forecaster, items):
+    """
+    Previsões de um lote de requisições em uma só chamada a run()
+
+    Itens inválidos recebem {'error': ...} na sua posição, como em
+    inference_engine.predict_risk_batch.
+
+    Returns:
+        Tupla (lista na ordem de entrada de {'success': True, 'data': {...}}
+        ou {'error': '...'}, tempo do modelo em ms)
+    """
+    results = [None] * len(items)
+    resolved = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            resolved.append(forecaster.resolve(item))
+            positions.append(i)
+        except (ValueError, TypeError, KeyError) as e:
+            results[i] = {'error': str(e)}
+            request_metrics.error(e)
+    request_metrics.mark('validation')
+
+    model_time_ms = 0.0
+    if resolved:
+        requests = np.array([[row, horizon] for _, row, horizon in resolved])
+        accidents, _, model_time_ms = forecaster.run(requests)
+        request_metrics.mark('inference')
+        request_metrics.batch(len(requests))
+        for k, (series, row, horizon) in enumerate(resolved):
+            results[positions[k]] = {
+                'success': True,
+                'data': forecaster.format(series, row, horizon, accidents[k])
+            }
+        request_metrics.mark('postprocess')
+    return results, model_time_ms
+
+
+def load_forecaster(model_path=MODEL_PATH, data_path=DATA_PATH, backend=BACKEND, threads=THREADS):
+    """
+    Rede, séries e janelas em um LSTMForecaster aquecido
+
+    Raises:
+        RuntimeError: Arquivos alterados durante a carga (gravação em andamento)
+    """
+    paths = [model_path, data_path]
+    signature = file_signature(paths)
+
+    start = time.perf_counter()
+    network = load_network(model_path, backend, threads)
+    periods, counts_by_series = build_series(load_dataset(data_path, verbose=False))
+    version = model_fingerprint(model_path, data_path)
+
+    if file_signature(paths) != signature:
+        raise RuntimeError("Modelo ou histórico alterado durante a carga")
+    forecaster = LSTMForecaster(network, periods, counts_by_series, version, signature,
+                                (time.perf_counter() - start) * 1000)
+    forecaster.warm_up()
+    return forecaster
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Previsão de acidentes em SP com o LSTM')
+    parser.add_argument('--series', default=UF, help='Série: SP ou BR-<número>')
+    parser.add_argument('--horizon', type=int, default=1, help=f'Períodos à frente (até {MAX_HORIZON})')
+    parser.add_argument('--end-period', help='Último período da janela (padrão: último do histórico)')
+    parser.add_argument('--model', type=Path, default=MODEL_PATH)
+    parser.add_argument('--data', type=Path, default=DATA_PATH)
+    parser.add_argument('--backend', default=BACKEND, choices=['numpy', 'keras'])
+    args = parser.parse_args()
+
+    for path in (args.model, args.data):
+        if not path.exists():
+            print(f"❌ Arquivo não encontrado: {path}")
+            sys.exit(1)
+
+    forecaster = load_forecaster(args.model, args.data, args.backend)
+    print(f"🔮 LSTM ({args.backend}): {len(forecaster.series)} séries, {len(forecaster.windows):,} janelas, "
+          f"carga {forecaster.load_ms:.0f} ms")
+
+    try:
+        series, row, horizon = forecaster.resolve(
+            {'series': args.series, 'horizon': args.horizon, 'endPeriod': args.end_period})
+    except InputError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    accidents, _, _ = forecaster.run(np.array([[row, horizon]]))
+    result = forecaster.format(series, row, horizon, accidents[0])
+
+    print("   Janela: " + ', '.join(f"{p['period']}={p['accidents']}" for p in result['window']))
+    for item in result['forecast']:
+        print(f"   📈 {item['period']}: {item['accidents']:.1f} acidentes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Micro-batching de Inferência - Sompo
+====================================
+
+Agrupa requisições concorrentes de /predict em uma única chamada ao modelo.
+
+Cada thread do servidor Flask enfileira sua linha de features e aguarda;
+uma thread de despacho junta o que chegar em até MAX_WAIT_MS (ou até
+MAX_ROWS linhas), empilha tudo em uma matriz, roda um só predict_proba e
+devolve a fatia de cada chamador.
+
+Cada requisição enfileira também o modelo que leu no início (versão
+fixada): requisições de versões diferentes, durante uma recarga, nunca
+dividem uma chamada ao modelo.
+
+Configuração (variáveis de ambiente, lidas por ml_prediction_api.py):
+    ML_MICROBATCH_ENABLED=1      Ativa o micro-batching (padrão: desativado)
+    ML_MICROBATCH_MAX_WAIT_MS=2  Espera máxima pela formação do lote
+    ML_MICROBATCH_MAX_ROWS=64    Tamanho máximo do lote
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Fila de inferência com despacho em lote
+
+    Args:
+        predict_fn: Função (matriz, modelo) -> (classes, proba, model_time_ms),
+            normalmente predict_with_proba; o modelo é o enfileirado com as
+            linhas (None quando não informado)
+        max_wait_ms: Tempo máximo que a primeira requisição do lote espera
+        max_rows: Número máximo de linhas por chamada ao modelo
+    """
+
+    def __init__(self, predict_fn, max_wait_ms=2.0, max_rows=64):
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_rows = max_rows
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+
+        # Métricas
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_batch_rows = 0
+        self._max_queue_depth = 0
+        self._errors = 0
+        self._recent_waits_ms = deque(maxlen=1000)
+        self._recent_batch_rows = deque(maxlen=1000)
+
+    def start(self):
+        """Inicia a thread de despacho"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name='micro-batcher', daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"⚡ Micro-batching ativo (espera máx: {self.max_wait * 1000:.1f} ms, "
+            f"lote máx: {self.max_rows} linhas)"
+        )
+
+    def stop(self):
+        """Encerra a thread de despacho após o lote corrente"""
+        self._running = False
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def submit(self, features, model=None):
+        """
+        Enfileira uma matriz de features (n x 9)
+
+        Args:
+            features: Matriz de features
+            model: Modelo que deve avaliar as linhas (o da versão fixada
+                pela requisição); só linhas do mesmo modelo dividem o lote
+
+        Returns:
+            Future com (classes, proba, metadata)
+        """
+        future = Future()
+        self._queue.put((features, model, future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def predict(self, features, model=None, timeout=None):
+        """Enfileira e aguarda o resultado: (classes, proba, metadata do lote)"""
+        return self.submit(features, model).result(timeout=timeout)
+
+    def _collect(self):
+        """Bloqueia até a primeira requisição e junta as que chegarem na janela"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+
+        while rows < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+            rows += len(item[0])
+
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if batch:
+                self._dispatch_by_model(batch)
+
+    def _dispatch_by_model(self, batch):
+        """Uma chamada ao modelo por modelo presente no lote (normalmente um só)"""
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[1]), []).append(item)
+        for group in groups.values():
+            self._dispatch(group)
+
+    def _dispatch(self, batch):
+        dispatched_at = time.perf_counter()
+        sizes = [len(features) for features, _, _, _ in batch]
+        total_rows = sum(sizes)
+
+        try:
+            matrix = batch[0][0] if len(batch) == 1 else np.vstack([f for f, _, _, _ in batch])
+            classes, proba, model_time_ms = self.predict_fn(matrix, batch[0][1])
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        waits = []
+        for (_, _, future, enqueued_at), size in zip(batch, sizes):
+            wait_ms = (dispatched_at - enqueued_at) * 1000
+            waits.append(wait_ms)
+            future.set_result((
+                classes[offset:offset + size],
+                proba[offset:offset + size],
+                {
+                    'model_time_ms': model_time_ms,
+                    'queue_wait_ms': wait_ms,
+                    'batch_rows': total_rows,
+                    'batch_requests': len(batch),
+                }
+            ))
+            offset += size
+
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._rows += total_rows
+            self._max_batch_rows = max(self._max_batch_rows, total_rows)
+            self._recent_waits_ms.extend(waits)
+            self._recent_batch_rows.append(total_rows)
+
+    def stats(self):
+        """Métricas de fila, tamanho de lote e espera"""
+        with self._lock:
+            waits = np.array(self._recent_waits_ms) if self._recent_waits_ms else np.zeros(1)
+            batch_rows = np.array(self._recent_batch_rows) if self._recent_batch_rows else np.zeros(1)
+            return {
+                'enabled': self._running,
+                'max_wait_ms': self.max_wait * 1000,
+                'max_rows': self.max_rows,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'batches': self._batches,
+                'requests': self._requests,
+                'rows': self._rows,
+                'errors': self._errors,
+                'batch_rows': {
+                    'mean': round(self._rows / self._batches, 2) if self._batches else 0,
+                    'p50': float(np.percentile(batch_rows, 50)),
+                    'max': self._max_batch_rows,
+                },
+                'queue_wait_ms': {
+                    'p50': round(float(np.percentile(waits, 50)), 3),
+                    'p99': round(float(np.percentile(waits, 99)), 3),
+                    'max': round(float(waits.max()), 3),
+                },
+            }
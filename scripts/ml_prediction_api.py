@@ -6,8 +6,36 @@ Carrega modelo LightGBM salvo em joblib e fornece predições via HTTP REST.
 
 Endpoints:
     POST /predict - Predição de risco para um segmento
+    POST /predict-batch - Predição em lote (uma chamada ao modelo por lote;
+        JSON ou colunas em Arrow IPC, .npz ou msgpack, ver columnar_batch.py)
+    POST /predict-stream - Predição em streaming NDJSON, bloco a bloco, com
+        memória constante (ver ndjson_stream.py)
+    POST /predict-route - Risco de uma viagem inteira com horário de chegada
+        em cada segmento (ver route_risk.py)
+    POST /forecast - Previsão de acidentes em SP (LSTM, ver lstm_forecast.py)
+    POST /forecast-batch - Previsões em lote (uma passada pela rede por passo)
+    GET /forecast-info - Séries, backend e cache da previsão
     GET /health - Status da API
     GET /model-info - Informações sobre o modelo carregado
+    GET /batching-stats - Métricas do micro-batching (quando ativo)
+    GET /cache-stats - Métricas do cache de predições (quando ativo)
+    GET /metrics - Latência por etapa, requisições, erros e lotes (Prometheus)
+    POST /admin/reload-model - Recarrega o modelo do disco sem reiniciar
+
+Micro-batching opcional de /predict: ver micro_batcher.py
+(ML_MICROBATCH_ENABLED, ML_MICROBATCH_MAX_WAIT_MS, ML_MICROBATCH_MAX_ROWS).
+
+Cache opcional de /predict: ver prediction_cache.py
+(ML_CACHE_ENABLED, ML_CACHE_SIZE, ML_CACHE_TTL_S, ML_CACHE_KM_STEP, ML_CACHE_REDIS_URL).
+
+Recarga do modelo sem reiniciar: ver model_reloader.py
+(ML_MODEL_WATCH_INTERVAL_S, ML_ADMIN_TOKEN).
+
+Latência por etapa, erros e lotes em GET /metrics (formato Prometheus):
+ver request_metrics.py (ML_METRICS_SAMPLE_RATE, ML_METRICS_DIR).
+
+Previsão opcional com o LSTM: ver lstm_forecast.py
+(ML_FORECAST_ENABLED, ML_FORECAST_DATA, ML_FORECAST_FREQUENCY, ML_LSTM_BACKEND, ML_LSTM_THREADS).
 
 Autor: Sistema Sompo
 Data: 2025-10-14
@@ -15,10 +43,40 @@ Data: 2025-10-14
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
 import numpy as np
+import os
 from pathlib import Path
 import logging
+import time
+
+from inference_engine import (
+    InputError,
+    parse_risk_input,
+    encode_value,
+    predict_with_proba,
+    score_probabilities,
+    format_risk_input,
+    format_risk_result,
+    predict_risk_batch,
+)
+from lstm_forecast import (
+    MAX_BATCH_REQUESTS as MAX_FORECAST_REQUESTS,
+    MODEL_PATH as FORECAST_MODEL_PATH,
+    DATA_PATH as FORECAST_DATA_PATH,
+    forecast_batch,
+    load_forecaster,
+)
+from micro_batcher import MicroBatcher
+from model_reloader import ModelReloader, load_bundle, admin_authorized, prepare_worker, sample_request
+from prediction_cache import PredictionCache, SharedCache
+import columnar_batch
+import ndjson_stream
+import request_metrics
+from route_risk import score_route
+from serving import serve, get_worker_count, warm_up_routes, log_startup, process_uptime_ms
+
+# Partida do processo até aqui (imports concluídos)
+IMPORTS_MS = process_uptime_ms()
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -27,11 +85,27 @@ logger = logging.getLogger(__name__)
 # Criar app Flask
 app = Flask(__name__)
 CORS(app)  # Permitir requisições do backend Node.js
+request_metrics.install(app, 'ml-prediction')
 
-# Variáveis globais para modelo e encoders
-model = None
-label_encoders = None
-model_loaded = False
+# Modelo ativo (ModelBundle: modelo, encoders e versão, trocados juntos)
+active_model = None
+
+# Recarga do modelo sem reiniciar
+reloader = None
+
+# Micro-batching de /predict (None = desativado)
+batcher = None
+
+# Cache de /predict (None = desativado)
+prediction_cache = None
+
+# Previsão com o LSTM (LSTMForecaster; None = desativada), recarga e micro-batching de /forecast
+forecaster = None
+forecast_reloader = None
+forecast_batcher = None
+
+# Tempos da inicialização (finish_startup)
+startup_timings = None
 
 # Caminhos dos arquivos
 MODEL_PATH = Path("backend/models/risk_model.joblib")
@@ -40,7 +114,7 @@ ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
 
 def load_model():
     """Carrega o modelo e encoders do disco"""
-    global model, label_encoders, model_loaded
+    global reloader
     
     try:
         logger.info("🤖 Carregando modelo de ML...")
@@ -55,31 +129,197 @@ def load_model():
             logger.error("   Execute: python train_risk_model.py")
             return False
         
-        # Carregar modelo
-        model = joblib.load(MODEL_PATH)
+        # Carregar modelo e encoders (aquecidos antes de atender)
+        bundle = load_bundle(MODEL_PATH, ENCODERS_PATH)
         logger.info(f"   ✅ Modelo carregado: {MODEL_PATH}")
-        
-        # Carregar encoders
-        label_encoders = joblib.load(ENCODERS_PATH)
         logger.info(f"   ✅ Encoders carregados: {ENCODERS_PATH}")
+        logger.info(f"   🔥 Aquecimento: {bundle.warmup_ms or 0:.1f} ms (versão {bundle.version})")
+        swap_model(bundle)
+        
+        reloader = ModelReloader(
+            [MODEL_PATH, ENCODERS_PATH],
+            lambda: load_bundle(MODEL_PATH, ENCODERS_PATH),
+            swap_model,
+            bundle.signature,
+            name='Modelo de risco'
+        )
+        
+        load_forecast()
         
-        model_loaded = True
         logger.info("✅ Sistema de predição pronto!")
         return True
         
     except Exception as e:
         logger.error(f"❌ Erro ao carregar modelo: {e}")
-        model_loaded = False
         return False
 
 
+def load_forecast():
+    """Carrega o LSTM e as janelas de SP quando ML_FORECAST_ENABLED (falha não impede a API)"""
+    global forecast_reloader
+    
+    if os.environ.get('ML_FORECAST_ENABLED', '0').lower() not in ('1', 'true', 'yes'):
+        return None
+    
+    for path in (FORECAST_MODEL_PATH, FORECAST_DATA_PATH):
+        if not path.exists():
+            logger.warning(f"⚠️  Previsão LSTM desativada: {path} não encontrado")
+            return None
+    
+    try:
+        bundle = load_forecaster()
+    except Exception as e:
+        logger.warning(f"⚠️  Previsão LSTM desativada: {e}")
+        return None
+    
+    logger.info(f"   🔮 Previsão LSTM: {len(bundle.series)} séries, {len(bundle.windows):,} janelas "
+                f"({type(bundle.network).__name__}, carga {bundle.load_ms:.0f} ms)")
+    swap_forecaster(bundle)
+    
+    forecast_reloader = ModelReloader(
+        [FORECAST_MODEL_PATH, FORECAST_DATA_PATH],
+        load_forecaster,
+        swap_forecaster,
+        bundle.signature,
+        name='Modelo LSTM'
+    )
+    return bundle
+
+
+def swap_forecaster(bundle):
+    """Publica séries, janelas e cache novos (dado novo invalida as previsões em cache)"""
+    global forecaster
+    forecaster = bundle
+    request_metrics.set_model_version('lstm', bundle.version)
+
+
+def run_forecast(requests, bundle):
+    """Previsão no LSTM lido pela requisição (usada pelo micro-batcher de /forecast)"""
+    return bundle.run(requests)
+
+
+def finish_startup():
+    """Aquece as rotas e registra os tempos de inicialização (antes de abrir o socket)"""
+    global startup_timings
+    
+    sample = sample_request(active_model.encoding_tables)
+    routes_ms = warm_up_routes(app, [
+        ('POST', '/predict', sample),
+        ('POST', '/predict-batch', {'predictions': [sample, sample]}),
+        ('POST', '/predict-route', {'legs': [{'uf': sample['uf'], 'br': sample['br'],
+                                              'kmStart': 0, 'kmEnd': 100}]}),
+    ] + ([
+        ('POST', '/forecast', {'horizon': 1}),
+    ] if forecaster is not None else []) + [
+        ('GET', '/health', None),
+    ])
+    # Requisições do aquecimento não entram nas métricas
+    request_metrics.registry.reset()
+    startup_timings = {
+        'imports_ms': IMPORTS_MS,
+        'model_load_ms': active_model.load_ms,
+        'warmup_ms': active_model.warmup_ms,
+        'routes_warmup_ms': routes_ms,
+        'total_ms': process_uptime_ms(),
+    }
+    log_startup('ML Prediction API', startup_timings)
+    return startup_timings
+
+
+def swap_model(bundle):
+    """Publica um novo modelo (uma atribuição; requisições em andamento seguem no anterior)"""
+    global active_model
+    
+    # Versão do modelo: invalida o cache de predições antes da troca
+    if prediction_cache is not None:
+        prediction_cache.set_model_version(bundle.version)
+    active_model = bundle
+    request_metrics.set_model_version('risk', bundle.version)
+
+
+def run_model(features, model):
+    """Inferência no modelo lido pela requisição (usada pelo micro-batcher)"""
+    return predict_with_proba(model, features)
+
+
+def configure_batching():
+    """Ativa o micro-batching de /predict conforme variáveis de ambiente"""
+    global batcher, forecast_batcher
+    
+    if os.environ.get('ML_MICROBATCH_ENABLED', '0').lower() not in ('1', 'true', 'yes'):
+        return None
+    
+    batcher = MicroBatcher(
+        run_model,
+        max_wait_ms=float(os.environ.get('ML_MICROBATCH_MAX_WAIT_MS', 2)),
+        max_rows=int(os.environ.get('ML_MICROBATCH_MAX_ROWS', 64))
+    )
+    batcher.start()
+    
+    if forecaster is not None:
+        forecast_batcher = MicroBatcher(
+            run_forecast,
+            max_wait_ms=batcher.max_wait * 1000,
+            max_rows=batcher.max_rows
+        )
+        forecast_batcher.start()
+    return batcher
+
+
+def configure_cache():
+    """Ativa o cache de /predict conforme variáveis de ambiente"""
+    global prediction_cache
+    
+    if os.environ.get('ML_CACHE_ENABLED', '0').lower() not in ('1', 'true', 'yes'):
+        return None
+    
+    ttl_s = float(os.environ.get('ML_CACHE_TTL_S', 300))
+    shared = None
+    redis_url = os.environ.get('ML_CACHE_REDIS_URL')
+    if redis_url:
+        try:
+            shared = SharedCache(redis_url, ttl_s)
+        except ImportError as e:
+            logger.warning(f"⚠️  Cache compartilhado desativado: {e}")
+    
+    prediction_cache = PredictionCache(
+        max_entries=int(os.environ.get('ML_CACHE_SIZE', 10000)),
+        ttl_s=ttl_s,
+        km_step=float(os.environ.get('ML_CACHE_KM_STEP', 1)),
+        shared=shared
+    )
+    prediction_cache.set_model_version(active_model.version if active_model is not None else None)
+    logger.info(
+        f"🗃️  Cache de predições ativo ({prediction_cache.max_entries} entradas, "
+        f"TTL {ttl_s:g}s, km em passos de {prediction_cache.km_step:g}"
+        f"{', compartilhado' if shared is not None else ''})"
+    )
+    return prediction_cache
+
+
+def configure_worker():
+    """Inicialização de cada worker (threads e conexões não sobrevivem ao fork)"""
+    prepare_worker(active_model, get_worker_count())
+    configure_batching()
+    configure_cache()
+    if reloader is not None:
+        reloader.start()
+    if forecast_reloader is not None:
+        forecast_reloader.start()
+    request_metrics.registry.start()
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check da API"""
+    bundle = active_model
     return jsonify({
-        'status': 'ok' if model_loaded else 'error',
+        'status': 'ok' if bundle is not None else 'error',
         'service': 'ML Prediction API',
-        'model_loaded': model_loaded,
+        'model_loaded': bundle is not None,
+        'model_version': bundle.version if bundle is not None else None,
+        'model_loaded_at': bundle.loaded_at.isoformat() if bundle is not None else None,
+        'forecast_loaded': forecaster is not None,
         'version': '1.0.0'
     })
 
@@ -87,24 +327,85 @@ def health():
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Informações sobre o modelo"""
-    if not model_loaded:
+    bundle = active_model
+    if bundle is None:
         return jsonify({
             'error': 'Modelo não carregado'
         }), 503
     
     return jsonify({
         'model_type': 'LightGBM',
-        'model_class': str(type(model).__name__),
+        'model_class': str(type(bundle.model).__name__),
+        'model_version': bundle.version,
+        'loaded_at': bundle.loaded_at.isoformat(),
+        'warmup_ms': round(bundle.warmup_ms, 3) if bundle.warmup_ms is not None else None,
+        'reload': reloader.stats() if reloader is not None else None,
+        'startup': ({key: round(ms, 3) for key, ms in startup_timings.items() if ms is not None}
+                    if startup_timings else None),
         'features': [
             'uf_encoded', 'br', 'km', 'hora', 'dia_semana', 'mes',
             'clima_categoria_encoded', 'fase_dia_categoria_encoded', 
             'tipo_pista_categoria_encoded'
         ],
-        'encoders': list(label_encoders.keys()) if label_encoders else [],
+        'encoders': list(bundle.label_encoders.keys()) if bundle.label_encoders else [],
         'classes': ['sem_vitimas', 'com_feridos', 'com_mortos']
     })
 
 
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """
+    Recarrega modelo e encoders do disco (aquecidos antes da troca)
+    
+    Com ML_API_WORKERS > 1, recarrega só o worker que atendeu a requisição
+    (os demais detectam os arquivos novos pela observação periódica).
+    """
+    if not admin_authorized(request):
+        return jsonify({
+            'error': 'Token de administração ausente ou inválido (defina ML_ADMIN_TOKEN para habilitar a rota)'
+        }), 403
+    
+    if reloader is None:
+        return jsonify({
+            'error': 'Modelo não carregado'
+        }), 503
+    
+    previous = active_model
+    try:
+        bundle = reloader.reload('admin')
+    except Exception as e:
+        return jsonify({
+            'error': f'Falha ao recarregar: {e}',
+            'model_version': previous.version if previous is not None else None
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'previous_version': previous.version if previous is not None else None,
+        'model_version': bundle.version,
+        'warmup_ms': round(bundle.warmup_ms, 3),
+        'pid': os.getpid()
+    })
+
+
+@app.route('/batching-stats', methods=['GET'])
+def batching_stats():
+    """Métricas do micro-batching: profundidade da fila, tamanho de lote e espera"""
+    if batcher is None:
+        return jsonify({'enabled': False})
+    
+    return jsonify(batcher.stats())
+
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Métricas do cache de predições: acertos, faltas, remoções e expirações (por worker)"""
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    
+    return jsonify(dict(prediction_cache.stats(), pid=os.getpid()))
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """
@@ -123,150 +424,109 @@ def predict():
         "roadType": "simples"
     }
     """
-    if not model_loaded:
+    # Uma leitura do modelo ativo: a requisição inteira usa a mesma versão
+    bundle = active_model
+    if bundle is None:
         return jsonify({
             'error': 'Modelo não carregado. Execute train_risk_model.py'
         }), 503
+    encoding_tables = bundle.encoding_tables
+    request_metrics.use_model('risk', bundle.version)
     
     try:
         data = request.get_json()
+        request_metrics.mark('parse')
         
-        # Validar dados obrigatórios
-        required_fields = ['uf', 'br', 'km']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'error': f'Campo obrigatório ausente: {field}'
-                }), 400
-        
-        # Extrair e padronizar dados
-        uf = str(data['uf']).upper()
-        br = int(data['br'])
-        km = float(data['km'])
-        hour = int(data.get('hour', 12))
-        day_of_week = int(data.get('dayOfWeek', 2))
-        month = int(data.get('month', 6))
-        
-        # Mapear condições
-        weather = data.get('weatherCondition', 'claro').lower()
-        weather_mapping = {
-            'claro': 'claro',
-            'nublado': 'nublado',
-            'chuva': 'chuvoso',
-            'chuvoso': 'chuvoso',
-            'neblina': 'neblina',
-            'nevoeiro': 'neblina'
-        }
-        clima_categoria = weather_mapping.get(weather, 'claro')
-        
-        day_phase = data.get('dayPhase', 'dia').lower()
-        phase_mapping = {
-            'dia': 'dia',
-            'noite': 'noite',
-            'amanhecer': 'amanhecer',
-            'anoitecer': 'anoitecer'
-        }
-        fase_dia_categoria = phase_mapping.get(day_phase, 'dia')
-        
-        road_type = data.get('roadType', 'simples').lower()
-        road_mapping = {
-            'simples': 'simples',
-            'dupla': 'dupla',
-            'multipla': 'multipla'
-        }
-        tipo_pista_categoria = road_mapping.get(road_type, 'simples')
-        
-        # Preparar features para predição
+        # Validar, padronizar e codificar dados
         try:
-            uf_encoded = label_encoders['uf'].transform([uf])[0]
-            clima_encoded = label_encoders['clima_categoria'].transform([clima_categoria])[0]
-            fase_encoded = label_encoders['fase_dia_categoria'].transform([fase_dia_categoria])[0]
-            pista_encoded = label_encoders['tipo_pista_categoria'].transform([tipo_pista_categoria])[0]
-        except ValueError as e:
+            row = parse_risk_input(data)
+            request_metrics.mark('validation')
+            
+            # Cache: mesmo trecho (km quantizado) e contexto já calculados
+            cache_key = None
+            if prediction_cache is not None:
+                cache_key = prediction_cache.make_key(row)
+                cached = prediction_cache.get(cache_key)
+                if cached is not None:
+                    request_metrics.mark('postprocess')
+                    return jsonify({
+                        'success': True,
+                        'data': dict(cached, input=format_risk_input(row)),
+                        'metadata': {'cache': 'hit'}
+                    })
+            
+            uf_encoded = encode_value(encoding_tables, 'uf', row['uf'])
+            clima_encoded = encode_value(encoding_tables, 'clima_categoria', row['clima_categoria'])
+            fase_encoded = encode_value(encoding_tables, 'fase_dia_categoria', row['fase_dia_categoria'])
+            pista_encoded = encode_value(encoding_tables, 'tipo_pista_categoria', row['tipo_pista_categoria'])
+        except InputError as e:
+            request_metrics.error(e)
             return jsonify({
-                'error': f'Valor não reconhecido nos encoders: {e}'
-            }), 400
+                'error': str(e)
+            }), e.status_code
         
         # Criar array de features
+        # Com cache, o modelo é avaliado no km quantizado da chave
         features = np.array([[
             uf_encoded,
-            br,
-            km,
-            hour,
-            day_of_week,
-            month,
+            row['br'],
+            cache_key[2] if cache_key is not None else row['km'],
+            row['hour'],
+            row['day_of_week'],
+            row['month'],
             clima_encoded,
             fase_encoded,
             pista_encoded
         ]])
+        request_metrics.mark('encoding')
         
-        # Fazer predição
-        prediction_class = model.predict(features)[0]
-        prediction_proba = model.predict_proba(features)[0]
-        
-        # Calcular score de risco (0-100)
-        # Score ponderado: sem_vitimas*0 + com_feridos*50 + com_mortos*100
-        risk_score = prediction_proba[1] * 50 + prediction_proba[2] * 100
-        
-        # Classificar nível
-        if risk_score >= 80:
-            risk_level = 'critico'
-        elif risk_score >= 60:
-            risk_level = 'alto'
-        elif risk_score >= 40:
-            risk_level = 'moderado'
+        # Fazer predição (uma única passada pelo modelo, agrupada com
+        # requisições concorrentes quando o micro-batching está ativo)
+        if batcher is not None:
+            classes, proba, batch_info = batcher.predict(features, bundle.model)
+            metadata = {
+                'model_time_ms': round(batch_info['model_time_ms'], 3),
+                'queue_wait_ms': round(batch_info['queue_wait_ms'], 3),
+                'batch_rows': batch_info['batch_rows']
+            }
         else:
-            risk_level = 'baixo'
+            classes, proba, model_time_ms = predict_with_proba(bundle.model, features)
+            metadata = {
+                'model_time_ms': round(model_time_ms, 3)
+            }
+        request_metrics.mark('inference')
+        request_metrics.batch(1)
         
-        # Gerar recomendações
-        recommendations = []
-        if risk_level == 'critico':
-            recommendations.append('🚨 RISCO CRÍTICO: Considere rota alternativa urgentemente')
-            recommendations.append('Reduza velocidade em pelo menos 30%')
-        elif risk_level == 'alto':
-            recommendations.append('⚠️ ALTO RISCO: Atenção redobrada necessária')
-            recommendations.append('Reduza velocidade em 20%')
-        elif risk_level == 'moderado':
-            recommendations.append('⚡ RISCO MODERADO: Mantenha atenção')
-        else:
-            recommendations.append('✅ Risco relativamente baixo')
+        # Calcular score de risco (0-100) e classificar nível
+        risk_scores, risk_levels = score_probabilities(proba)
+        risk_score = round(risk_scores[0], 2)
+        risk_level = str(risk_levels[0])
         
-        # Adicionar recomendações contextuais
-        if hour >= 18 or hour < 6:
-            recommendations.append('🌙 Período noturno: use farol alto quando apropriado')
-        if clima_categoria == 'chuvoso':
-            recommendations.append('🌧️ Chuva: reduza velocidade e aumente distância')
-        if clima_categoria == 'neblina':
-            recommendations.append('🌫️ Neblina: velocidade reduzida e farol baixo')
+        result = format_risk_result(
+            row,
+            risk_score,
+            risk_level,
+            int(classes[0]),
+            proba[0]
+        )
+        if cache_key is not None:
+            prediction_cache.put(
+                cache_key,
+                {key: value for key, value in result.items() if key != 'input'},
+                bundle.version
+            )
+            metadata['cache'] = 'miss'
+        request_metrics.mark('postprocess')
         
         return jsonify({
             'success': True,
-            'data': {
-                'risk_score': round(risk_score, 2),
-                'risk_level': risk_level,
-                'predicted_class': int(prediction_class),
-                'class_probabilities': {
-                    'sem_vitimas': round(float(prediction_proba[0]) * 100, 2),
-                    'com_feridos': round(float(prediction_proba[1]) * 100, 2),
-                    'com_mortos': round(float(prediction_proba[2]) * 100, 2)
-                },
-                'recommendations': recommendations,
-                'input': {
-                    'uf': uf,
-                    'br': br,
-                    'km': km,
-                    'context': {
-                        'hour': hour,
-                        'weather': clima_categoria,
-                        'day_phase': fase_dia_categoria,
-                        'road_type': tipo_pista_categoria
-                    }
-                }
-            }
+            'data': result,
+            'metadata': metadata
         })
         
     except Exception as e:
         logger.error(f"Erro na predição: {e}")
+        request_metrics.error(e)
         return jsonify({
             'error': str(e)
         }), 500
@@ -284,14 +544,26 @@ def predict_batch():
             {"uf": "SP", "br": 116, "km": 200, ...}
         ]
     }
+    
+    Também aceita o lote em colunas (Content-Type Arrow IPC, .npz ou
+    msgpack; ver columnar_batch.py), com resposta só com score, nível,
+    classe e probabilidades.
     """
-    if not model_loaded:
+    bundle = active_model
+    if bundle is None:
         return jsonify({
             'error': 'Modelo não carregado'
         }), 503
+    request_metrics.use_model('risk', bundle.version)
     
     try:
+        # Lote colunar binário (Arrow, .npz, msgpack): resposta enxuta
+        fmt = columnar_batch.request_format(request.mimetype)
+        if fmt is not None:
+            return columnar_batch.handle_batch(request, fmt, columnar_batch.predict_risk_columns, bundle)
+        
         data = request.get_json()
+        request_metrics.mark('parse')
         predictions_input = data.get('predictions', [])
         
         if not predictions_input:
@@ -299,35 +571,260 @@ def predict_batch():
                 'error': 'Lista de predições vazia'
             }), 400
         
-        results = []
-        for pred_input in predictions_input:
-            # Simular requisição individual
-            with app.test_request_context(
-                '/predict',
-                method='POST',
-                json=pred_input
-            ):
-                response = predict()
-                if isinstance(response, tuple):
-                    results.append(response[0].get_json())
-                else:
-                    results.append(response.get_json())
+        if not isinstance(predictions_input, list):
+            return jsonify({
+                'error': 'Campo predictions deve ser uma lista'
+            }), 400
+        
+        # Valida, codifica e prediz o lote inteiro em uma só chamada ao modelo
+        results, model_time_ms = predict_risk_batch(bundle.model, bundle.encoding_tables, predictions_input)
         
         return jsonify({
             'success': True,
             'data': {
                 'predictions': results,
                 'total': len(results)
+            },
+            'metadata': {
+                'model_time_ms': round(model_time_ms, 3)
             }
         })
         
     except Exception as e:
         logger.error(f"Erro na predição em lote: {e}")
+        request_metrics.error(e)
         return jsonify({
             'error': str(e)
         }), 500
 
 
+@app.route('/predict-stream', methods=['POST'])
+def predict_stream():
+    """
+    Predição em streaming para jobs grandes (NDJSON)
+    
+    Body: um objeto no formato de /predict por linha
+    (Content-Type: application/x-ndjson), lido aos poucos.
+    
+    Resposta: NDJSON, um item de /predict-batch por linha (com "line"),
+    uma linha de progresso por bloco de ML_STREAM_CHUNK_ROWS e um resumo
+    no fim. Memória constante; ver ndjson_stream.py.
+    """
+    bundle = active_model
+    if bundle is None:
+        return jsonify({
+            'error': 'Modelo não carregado'
+        }), 503
+    request_metrics.use_model('risk', bundle.version)
+    
+    # O job inteiro usa o modelo e os encoders ativos no início
+    return ndjson_stream.stream_response(
+        request,
+        lambda items: predict_risk_batch(bundle.model, bundle.encoding_tables, items),
+        bundle.version
+    )
+
+
+@app.route('/predict-route', methods=['POST'])
+def predict_route():
+    """
+    Risco de uma rota inteira (trechos expandidos em segmentos, uma chamada ao modelo)
+    
+    Body JSON:
+    {
+        "legs": [
+            {"uf": "SP", "br": 116, "kmStart": 100, "kmEnd": 400},
+            {"uf": "RJ", "br": 116, "kmStart": 0, "kmEnd": 230}
+        ],
+        "departureTime": "2025-10-14T06:30:00",
+        "averageSpeedKmh": 70,
+        "weatherCondition": "claro",
+        "windowKm": 50
+    }
+    """
+    bundle = active_model
+    if bundle is None:
+        return jsonify({
+            'error': 'Modelo não carregado'
+        }), 503
+    
+    request_metrics.use_model('risk', bundle.version)
+    
+    start = time.perf_counter()
+    try:
+        data = request.get_json()
+        request_metrics.mark('parse')
+        result, model_time_ms = score_route(bundle.model, bundle.encoding_tables, data)
+    except InputError as e:
+        request_metrics.error(e)
+        return jsonify({
+            'error': str(e)
+        }), e.status_code
+    except (ValueError, TypeError) as e:
+        request_metrics.error(e)
+        return jsonify({
+            'error': f'Valor inválido: {e}'
+        }), 400
+    except Exception as e:
+        logger.error(f"Erro na predição de rota: {e}")
+        request_metrics.error(e)
+        return jsonify({
+            'error': str(e)
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'data': result,
+        'metadata': {
+            'model_time_ms': round(model_time_ms, 3),
+            'total_ms': round((time.perf_counter() - start) * 1000, 3)
+        }
+    })
+
+
+@app.route('/forecast', methods=['POST'])
+def forecast():
+    """
+    Previsão de acidentes em SP (total ou por BR) com o LSTM
+    
+    Body JSON:
+    {
+        "series": "SP",          (ou "br": 116 para a série da BR)
+        "horizon": 3,            (períodos à frente, padrão 1)
+        "endPeriod": "2024-12"   (último período da janela, padrão: o mais recente)
+    }
+    """
+    bundle = forecaster
+    if bundle is None:
+        return jsonify({
+            'error': 'Previsão não carregada (ML_FORECAST_ENABLED)'
+        }), 503
+    
+    request_metrics.use_model('lstm', bundle.version)
+    
+    try:
+        data = request.get_json()
+        request_metrics.mark('parse')
+        try:
+            series, row, horizon = bundle.resolve(data)
+        except InputError as e:
+            request_metrics.error(e)
+            return jsonify({
+                'error': str(e)
+            }), e.status_code
+        except (ValueError, TypeError) as e:
+            request_metrics.error(e)
+            return jsonify({
+                'error': f'Valor inválido: {e}'
+            }), 400
+        request_metrics.mark('validation')
+        
+        requests = np.array([[row, horizon]])
+        if forecast_batcher is not None:
+            accidents, _, batch_info = forecast_batcher.predict(requests, bundle)
+            metadata = {
+                'model_time_ms': round(batch_info['model_time_ms'], 3),
+                'queue_wait_ms': round(batch_info['queue_wait_ms'], 3),
+                'batch_rows': batch_info['batch_rows']
+            }
+        else:
+            accidents, _, model_time_ms = bundle.run(requests)
+            metadata = {
+                'model_time_ms': round(model_time_ms, 3)
+            }
+        request_metrics.mark('inference')
+        request_metrics.batch(1)
+        result = bundle.format(series, row, horizon, accidents[0])
+        request_metrics.mark('postprocess')
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'metadata': dict(metadata, forecast_version=bundle.version)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na previsão: {e}")
+        request_metrics.error(e)
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+
+@app.route('/forecast-batch', methods=['POST'])
+def forecast_batch_route():
+    """
+    Previsões em lote (todas as janelas em uma passada pela rede por passo do horizonte)
+    
+    Body JSON:
+    {
+        "forecasts": [
+            {"series": "SP", "horizon": 3},
+            {"br": 116, "endPeriod": "2024-12"}
+        ]
+    }
+    """
+    bundle = forecaster
+    if bundle is None:
+        return jsonify({
+            'error': 'Previsão não carregada (ML_FORECAST_ENABLED)'
+        }), 503
+    
+    request_metrics.use_model('lstm', bundle.version)
+    
+    try:
+        data = request.get_json()
+        request_metrics.mark('parse')
+        items = data.get('forecasts', []) if isinstance(data, dict) else None
+        
+        if not items or not isinstance(items, list):
+            return jsonify({
+                'error': 'Campo forecasts deve ser uma lista não vazia'
+            }), 400
+        
+        if len(items) > MAX_FORECAST_REQUESTS:
+            return jsonify({
+                'error': f'Lote com {len(items)} previsões excede o limite de {MAX_FORECAST_REQUESTS}'
+            }), 400
+        
+        results, model_time_ms = forecast_batch(bundle, items)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'forecasts': results,
+                'total': len(results)
+            },
+            'metadata': {
+                'model_time_ms': round(model_time_ms, 3),
+                'forecast_version': bundle.version
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na previsão em lote: {e}")
+        request_metrics.error(e)
+        return jsonify({
+            'error': str(e)
+        }), 500
+
+
+@app.route('/forecast-info', methods=['GET'])
+def forecast_info():
+    """Séries disponíveis, backend, cache e recarga da previsão (por worker)"""
+    bundle = forecaster
+    if bundle is None:
+        return jsonify({'enabled': False})
+    
+    return jsonify(dict(
+        bundle.stats(),
+        enabled=True,
+        reload=forecast_reloader.stats() if forecast_reloader is not None else None,
+        batching=forecast_batcher.stats() if forecast_batcher is not None else None,
+        pid=os.getpid()
+    ))
+
+
 if __name__ == '__main__':
     print()
     print("=" * 80)
@@ -337,20 +834,33 @@ if __name__ == '__main__':
     
     # Carregar modelo
     if load_model():
+        finish_startup()
+        workers = get_worker_count()
         print()
         print("🚀 Iniciando servidor Flask...")
         print("   📡 http://localhost:5000")
+        print(f"   👷 Workers: {workers}")
         print("   💡 Endpoints:")
         print("      GET  /health")
         print("      GET  /model-info")
+        print("      GET  /batching-stats")
+        print("      GET  /cache-stats")
+        print("      GET  /metrics")
         print("      POST /predict")
         print("      POST /predict-batch")
+        print("      POST /predict-route")
+        print("      POST /predict-stream")
+        if forecaster is not None:
+            print("      POST /forecast")
+            print("      POST /forecast-batch")
+            print("      GET  /forecast-info")
+        print("      POST /admin/reload-model")
         print()
         print("=" * 80)
         print()
         
-        # Iniciar servidor
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        # Iniciar servidor (micro-batcher, cache e observação do modelo são iniciados em cada worker)
+        serve(app, '0.0.0.0', 5000, workers=workers, post_fork=configure_worker)
     else:
         print()
         print("❌ Falha ao carregar modelo. Execute:")
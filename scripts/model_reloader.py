@@ -0,0 +1,326 @@
+"""
+Recarga do Modelo sem Reiniciar (Hot Reload) - Sompo
+====================================================
+
+Após um novo treinamento as APIs trocam de modelo sem derrubar o processo
+nem as requisições em andamento:
+
+1. Uma thread observa os arquivos do modelo e dos encoders (mtime e
+   tamanho) a cada ML_MODEL_WATCH_INTERVAL_S segundos. A recarga só começa
+   quando os arquivos ficam iguais por um intervalo inteiro (o treinamento
+   pode estar no meio da gravação; os treinamentos gravam com
+   dump_atomic)
+2. Modelo e encoders novos são carregados na thread, enquanto o modelo
+   atual continua atendendo
+3. Aquecimento: predições com um lote sintético (códigos válidos para os
+   encoders) antes da troca, para a primeira requisição não pagar o custo
+4. Troca atômica: modelo, encoders e versão formam um ModelBundle
+   imutável, publicado com uma única atribuição. Cada requisição lê o
+   bundle uma vez e usa a mesma versão do início ao fim
+
+Falha na carga ou no aquecimento mantém o modelo atual (registrada em
+stats()). A recarga também pode ser pedida por POST /admin/reload-model
+com o header X-Admin-Token igual a ML_ADMIN_TOKEN; sem o token
+configurado a rota fica desativada (403), já que as APIs escutam em
+0.0.0.0.
+
+Com ML_API_WORKERS > 1 cada worker observa os arquivos e recarrega por
+conta própria (o modelo novo não é compartilhado copy-on-write como o
+carregado pelo pai, exceto a floresta compilada da classificação, mapeada
+do disco: ver compiled_forest.py); /admin/reload-model recarrega só o
+worker que atendeu a requisição. Os workers predizem com uma thread (prepare_worker):
+o OpenMP do LightGBM trava ao abrir threads em um processo criado por fork
+depois que o pai já o usou (carga e aquecimento).
+
+Configuração:
+    ML_MODEL_WATCH_INTERVAL_S=5   Intervalo de verificação (0 desativa a observação)
+    ML_ADMIN_TOKEN=...            Token de /admin/reload-model (sem ele, a rota fica desativada)
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import hmac
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from inference_engine import FEATURE_COLUMNS, compile_encoders, model_fingerprint, predict_with_proba
+
+logger = logging.getLogger(__name__)
+
+# Modelo ativo: estimador, encoders, tabelas de lookup e versão (hash dos
+# arquivos), mais o estado dos arquivos lidos (signature)
+ModelBundle = namedtuple('ModelBundle', [
+    'model', 'label_encoders', 'encoding_tables', 'version', 'loaded_at', 'load_ms', 'warmup_ms', 'signature'
+])
+
+WATCH_INTERVAL_S = float(os.environ.get('ML_MODEL_WATCH_INTERVAL_S', '5'))
+
+# Linhas do lote sintético de aquecimento
+WARMUP_ROWS = 64
+
+# Threads de predição dos modelos carregados (None = padrão do modelo; 1 nos workers pre-fork)
+_predict_threads = None
+
+# Encoders das colunas categóricas de FEATURE_COLUMNS
+CATEGORICAL_COLUMNS = {
+    'uf_encoded': 'uf',
+    'clima_categoria_encoded': 'clima_categoria',
+    'fase_dia_categoria_encoded': 'fase_dia_categoria',
+    'tipo_pista_categoria_encoded': 'tipo_pista_categoria',
+}
+
+# Faixas das colunas numéricas no lote sintético
+NUMERIC_RANGES = {
+    'br': (10, 500),
+    'km': (0, 800),
+    'hora': (0, 24),
+    'dia_semana': (0, 7),
+    'mes': (1, 13),
+}
+
+
+def file_signature(paths):
+    """(mtime_ns, tamanho) de cada arquivo, None para os ausentes"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def dump_atomic(obj, path):
+    """
+    joblib.dump com substituição atômica (arquivo temporário + os.replace)
+
+    Usado pelos treinamentos: a API nunca lê um modelo gravado pela metade.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def synthetic_features(encoding_tables, rows=WARMUP_ROWS, seed=0):
+    """Matriz rows x 9 com códigos conhecidos pelos encoders (aquecimento)"""
+    rng = np.random.default_rng(seed)
+    features = np.empty((rows, len(FEATURE_COLUMNS)), dtype=np.float64)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        if column in CATEGORICAL_COLUMNS:
+            features[:, i] = rng.integers(0, max(1, len(encoding_tables[CATEGORICAL_COLUMNS[column]])), rows)
+        else:
+            low, high = NUMERIC_RANGES[column]
+            features[:, i] = rng.integers(low, high, rows)
+    return features
+
+
+def warm_up(model, encoding_tables, rows=WARMUP_ROWS):
+    """
+    Aquece o modelo com um lote sintético e uma linha isolada
+
+    Returns:
+        Tempo total em ms
+    """
+    start = time.perf_counter()
+    features = synthetic_features(encoding_tables, rows)
+    predict_with_proba(model, features)
+    predict_with_proba(model, features[:1])
+    return (time.perf_counter() - start) * 1000
+
+
+def load_bundle(model_path, encoders_path, warmup=True, loader=joblib.load):
+    """
+    Carrega modelo e encoders em um ModelBundle (aquecido)
+
+    Args:
+        loader: Função que carrega o modelo a partir do caminho
+            (compiled_forest.load_classifier na API de classificação)
+
+    Raises:
+        RuntimeError: Arquivos alterados durante a carga (gravação em andamento)
+    """
+    paths = [model_path, encoders_path]
+    signature = file_signature(paths)
+
+    start = time.perf_counter()
+    model = loader(model_path)
+    if _predict_threads is not None:
+        set_threads(model, _predict_threads)
+    label_encoders = joblib.load(encoders_path)
+    encoding_tables = compile_encoders(label_encoders)
+    version = model_fingerprint(model_path, encoders_path)
+
+    if file_signature(paths) != signature:
+        raise RuntimeError("Arquivos do modelo alterados durante a carga")
+    load_ms = (time.perf_counter() - start) * 1000
+
+    warmup_ms = warm_up(model, encoding_tables) if warmup else None
+    return ModelBundle(model, label_encoders, encoding_tables, version, datetime.now(),
+                       load_ms, warmup_ms, signature)
+
+
+def set_threads(model, threads):
+    """Limita as threads de predição do modelo (n_jobs do LightGBM/RandomForest)"""
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+
+
+def prepare_worker(bundle, workers):
+    """
+    Ajusta o modelo herdado por um worker pre-fork (chamar após o fork)
+
+    Com mais de um worker, o modelo atual e os recarregados depois
+    predizem com uma thread; o paralelismo vem dos processos.
+    """
+    global _predict_threads
+    if workers <= 1 or not hasattr(os, 'fork'):
+        return
+    _predict_threads = 1
+    if bundle is not None:
+        set_threads(bundle.model, 1)
+
+
+def sample_request(encoding_tables):
+    """Corpo de /predict (e /classify, /ensemble) com valores conhecidos pelos encoders"""
+    return {
+        'uf': str(next(iter(encoding_tables['uf']))),
+        'br': 116,
+        'km': 100.0,
+        'hour': 12,
+        'dayOfWeek': 2,
+        'month': 6,
+        'weatherCondition': 'claro',
+        'dayPhase': 'dia',
+        'roadType': 'simples',
+    }
+
+
+def admin_authorized(request):
+    """Valida o header X-Admin-Token contra ML_ADMIN_TOKEN (sem token configurado, recusa)"""
+    token = os.environ.get('ML_ADMIN_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+class ModelReloader:
+    """
+    Observa os arquivos do modelo e publica um novo ModelBundle quando mudam
+
+    Args:
+        paths: Arquivos observados (modelo e encoders)
+        load_fn: Função sem argumentos que retorna o novo ModelBundle
+        swap_fn: Função que publica o bundle (uma atribuição global)
+        signature: file_signature dos arquivos do bundle atual
+        interval_s: Intervalo de verificação (0 = só recarga manual)
+        name: Nome do modelo nos logs
+    """
+
+    def __init__(self, paths, load_fn, swap_fn, signature, interval_s=WATCH_INTERVAL_S, name='Modelo'):
+        self.paths = [Path(p) for p in paths]
+        self.load_fn = load_fn
+        self.swap_fn = swap_fn
+        self.interval_s = interval_s
+        self.name = name
+
+        self._signature = signature
+        self._pending = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Métricas
+        self._reloads = 0
+        self._failures = 0
+        self._last_error = None
+        self._last_reload_at = None
+        self._last_reload_ms = None
+
+    def start(self):
+        """Inicia a thread de observação (chamar em cada worker, após o fork)"""
+        if self.interval_s <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='model-reloader', daemon=True)
+        self._thread.start()
+        logger.info(f"👀 {self.name}: observando {', '.join(p.name for p in self.paths)} "
+                    f"a cada {self.interval_s:g}s")
+
+    def stop(self):
+        """Encerra a thread de observação"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            signature = file_signature(self.paths)
+            if signature == self._signature or None in signature:
+                self._pending = None
+                continue
+            if signature != self._pending:
+                # Espera um intervalo sem mudanças antes de carregar
+                self._pending = signature
+                continue
+            try:
+                self.reload('arquivos alterados')
+            except Exception:
+                pass  # registrado em reload(); o modelo atual segue ativo
+
+    def reload(self, reason='manual'):
+        """
+        Carrega, aquece e publica o modelo atual do disco
+
+        Returns:
+            Novo ModelBundle
+
+        Raises:
+            Exception: Falha na carga (o modelo anterior continua ativo)
+        """
+        with self._lock:
+            attempted = file_signature(self.paths)
+            start = time.perf_counter()
+            try:
+                bundle = self.load_fn()
+            except Exception as e:
+                # Só tenta de novo quando os arquivos mudarem outra vez
+                self._signature = attempted
+                self._pending = None
+                self._failures += 1
+                self._last_error = str(e)
+                logger.error(f"❌ {self.name}: falha ao recarregar ({reason}): {e}; mantendo o modelo atual")
+                raise
+
+            self.swap_fn(bundle)
+            self._signature = bundle.signature
+            self._pending = None
+            self._reloads += 1
+            self._last_error = None
+            self._last_reload_at = datetime.now()
+            self._last_reload_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"🔄 {self.name} recarregado ({reason}): versão {bundle.version}, "
+                        f"{self._last_reload_ms:.0f} ms (aquecimento {bundle.warmup_ms or 0:.1f} ms)")
+            return bundle
+
+    def stats(self):
+        """Estado da observação e contadores de recarga"""
+        return {
+            'watching': self._thread is not None and self._thread.is_alive(),
+            'interval_s': self.interval_s,
+            'reloads': self._reloads,
+            'failures': self._failures,
+            'last_error': self._last_error,
+            'last_reload_at': self._last_reload_at.isoformat() if self._last_reload_at else None,
+            'last_reload_ms': round(self._last_reload_ms, 3) if self._last_reload_ms is not None else None,
+        }
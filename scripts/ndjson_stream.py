@@ -0,0 +1,236 @@
+"""
+Pontuação em Streaming (NDJSON) - Sompo
+=======================================
+
+/predict-stream e /classify-stream recebem um registro JSON por linha
+(NDJSON, no formato de /predict e /classify) e devolvem os resultados
+também em NDJSON, bloco a bloco, enquanto a entrada ainda chega:
+
+- a entrada é lida em blocos de READ_BYTES e dividida em linhas aqui
+  (linha maior que MAX_LINE_BYTES vira erro, sem acumular)
+- a cada CHUNK_ROWS registros, o bloco passa por uma única chamada ao
+  modelo (mesmo motor dos lotes) e os resultados saem na hora
+- a memória fica em um bloco de entrada e um de saída, qualquer que seja
+  o tamanho do job
+
+Contrapressão: o corpo da resposta é um gerador WSGI; o próximo bloco da
+entrada só é lido depois que a saída do anterior foi entregue ao socket.
+Se o cliente para de ler, a leitura e o modelo param junto. Por isso o
+cliente deve ler a resposta enquanto envia (curl já faz isso; com
+requests/http.client, envie o corpo de outra thread).
+
+Saída, uma linha por registro e por bloco:
+    {"line": 1, "success": true, "data": {...}}     (mesmo item de /predict-batch)
+    {"line": 2, "error": "Campo obrigatório ausente: km"}
+    {"progress": {"chunk": 1, "rows": 1000, "failed": 1, "chunk_rows": 1000,
+                  "chunk_ms": 14.2, "model_ms": 11.8, "rows_per_s": 70422}}
+    ...
+    {"summary": {"rows": ..., "failed": ..., "chunks": ..., "total_ms": ...,
+                 "model_ms": ..., "rows_per_s": ..., "model_version": "..."}}
+
+"line" é a linha da entrada (1 = primeira; linhas em branco são
+ignoradas). Falha inesperada no meio do job encerra o stream com
+{"error": ..., "summary": {...}} (o status HTTP já foi enviado).
+O job inteiro usa a versão do modelo ativa no início.
+
+Configuração:
+    ML_STREAM_CHUNK_ROWS=1000   Registros por chamada ao modelo
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import json
+import logging
+import os
+import time
+
+import request_metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = max(1, int(os.environ.get('ML_STREAM_CHUNK_ROWS', 1000)))
+
+# Leitura da entrada: tamanho de cada leitura e maior linha aceita
+READ_BYTES = 64 * 1024
+MAX_LINE_BYTES = 64 * 1024
+
+# Intervalo (registros) entre logs de progresso do job
+LOG_EVERY_ROWS = 100_000
+
+
+def read_lines(stream, read_bytes=READ_BYTES, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Linhas de um stream binário, lidas em blocos
+
+    Yields:
+        Tupla (número da linha, bytes da linha sem o '\\n'; None se a
+        linha passou de max_line_bytes e foi descartada)
+    """
+    pending = b''
+    oversized = False
+    line_no = 0
+    while True:
+        block = stream.read(read_bytes)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            line_no += 1
+            if oversized:
+                oversized = False
+                yield line_no, None
+            else:
+                yield line_no, line if len(line) <= max_line_bytes else None
+        if len(pending) > max_line_bytes:
+            # Descarta até o próximo '\n', sem guardar a linha
+            pending = b''
+            oversized = True
+    if pending or oversized:
+        yield line_no + 1, None if oversized else pending
+
+
+def read_chunks(stream, chunk_rows=CHUNK_ROWS):
+    """
+    Blocos de registros NDJSON
+
+    Yields:
+        Lista de (número da linha, dict do registro ou mensagem de erro)
+    """
+    chunk = []
+    for line_no, line in read_lines(stream):
+        if line is None:
+            chunk.append((line_no, f'Linha maior que {MAX_LINE_BYTES} bytes'))
+        elif not line.strip():
+            continue
+        else:
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = f'JSON inválido: {e}'
+            chunk.append((line_no, record))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Um encoder para o job inteiro (json.dumps com opções monta um por chamada)
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _dumps(obj):
+    return _ENCODER.encode(obj) + '\n'
+
+
+def score_stream(stream, score_fn, endpoint, model_version, chunk_rows=CHUNK_ROWS):
+    """
+    Gerador do corpo NDJSON: pontua a entrada bloco a bloco
+
+    Args:
+        stream: Entrada binária (request.stream)
+        score_fn: Lista de dicts -> (resultados na mesma ordem, tempo do
+            modelo em ms), ex.: predict_risk_batch com modelo e encoders fixos
+        endpoint: Rota, para as métricas e os logs
+        model_version: Versão do modelo que atende o job
+        chunk_rows: Registros por chamada ao modelo
+
+    Yields:
+        Bytes de cada bloco de saída (resultados + linha de progresso)
+    """
+    start = time.perf_counter()
+    rows = failed = chunks = 0
+    model_ms = 0.0
+    next_log = LOG_EVERY_ROWS
+
+    def summary():
+        total_ms = (time.perf_counter() - start) * 1000
+        return {
+            'rows': rows,
+            'failed': failed,
+            'chunks': chunks,
+            'total_ms': round(total_ms, 1),
+            'model_ms': round(model_ms, 1),
+            'rows_per_s': round(rows / total_ms * 1000) if total_ms else 0,
+            'model_version': model_version,
+        }
+
+    chunk_iter = read_chunks(stream, chunk_rows)
+    while True:
+        timer = request_metrics.start_chunk(endpoint)
+        chunk_start = time.perf_counter()
+        try:
+            chunk = next(chunk_iter, None)
+            if chunk is None:
+                break
+            request_metrics.mark('parse')
+
+            records = [record for _, record in chunk if isinstance(record, dict)]
+            results, chunk_model_ms = score_fn(records) if records else ([], 0.0)
+            scored = iter(results)
+
+            lines = []
+            chunk_failed = 0
+            for line_no, record in chunk:
+                if isinstance(record, dict):
+                    result = {'line': line_no, **next(scored)}
+                else:
+                    result = {'line': line_no, 'error': record if isinstance(record, str)
+                              else 'Registro deve ser um objeto JSON'}
+                    request_metrics.error('InputError')
+                chunk_failed += 'error' in result
+                lines.append(_dumps(result))
+
+            chunks += 1
+            rows += len(chunk)
+            failed += chunk_failed
+            model_ms += chunk_model_ms
+            chunk_ms = (time.perf_counter() - chunk_start) * 1000
+            lines.append(_dumps({'progress': {
+                'chunk': chunks,
+                'rows': rows,
+                'failed': failed,
+                'chunk_rows': len(chunk),
+                'chunk_ms': round(chunk_ms, 2),
+                'model_ms': round(chunk_model_ms, 2),
+                'rows_per_s': round(len(chunk) / chunk_ms * 1000) if chunk_ms else 0,
+            }}))
+            body = ''.join(lines).encode('utf-8')
+            request_metrics.mark('serialization')
+        except Exception as e:
+            logger.error(f"Erro no streaming de {endpoint} após {rows} registros: {e}", exc_info=True)
+            request_metrics.error(e)
+            yield _dumps({'error': str(e), 'summary': summary()}).encode('utf-8')
+            return
+        finally:
+            request_metrics.finish_chunk(timer)
+
+        yield body
+
+        if rows >= next_log:
+            logger.info(f"🌊 {endpoint}: {rows:,} registros ({failed:,} com erro) em {chunks} blocos")
+            next_log += LOG_EVERY_ROWS
+
+    result = summary()
+    logger.info(f"🌊 {endpoint} concluído: {rows:,} registros, {failed:,} com erro, "
+                f"{result['total_ms']:,.0f} ms ({result['rows_per_s']:,} registros/s)")
+    yield _dumps({'summary': result}).encode('utf-8')
+
+
+def stream_response(request, score_fn, model_version):
+    """
+    Resposta Flask em streaming NDJSON para a requisição atual
+
+    Args:
+        request: Requisição Flask (corpo NDJSON)
+        score_fn: Ver score_stream
+        model_version: Versão do modelo que atende o job
+    """
+    from flask import Response, stream_with_context
+
+    endpoint = request.url_rule.rule
+    body = score_stream(request.stream, score_fn, endpoint, model_version)
+    return Response(stream_with_context(body), mimetype='application/x-ndjson',
+                    headers={'X-Model-Version': str(model_version), 'X-Accel-Buffering': 'no'})
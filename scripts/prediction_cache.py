@@ -0,0 +1,232 @@
+"""
+Cache de Predições (LRU + TTL) - Sompo
+======================================
+
+O rastreamento da frota chama /predict repetidamente com a mesma rodovia,
+trecho e contexto (os caminhões reportam posições ao longo das mesmas
+BRs). Este módulo guarda o resultado de /predict (score, nível, classe,
+probabilidades e recomendações) por uma chave normalizada:
+
+    (uf, br, km quantizado, hora, dia da semana, mês, clima, fase, tipo de pista)
+
+- LRU limitado a ML_CACHE_SIZE entradas; cada entrada expira após
+  ML_CACHE_TTL_S segundos
+- O km é quantizado em passos de ML_CACHE_KM_STEP km e o modelo é avaliado
+  no km quantizado, então o resultado não depende de qual requisição do
+  trecho chegou primeiro (ML_CACHE_KM_STEP=0 desativa a quantização)
+- A versão do modelo (hash dos arquivos, set_model_version em load_model)
+  faz parte da chave: recarregar o modelo descarta o cache local e isola
+  as entradas antigas do cache compartilhado
+- Cache compartilhado opcional entre workers e instâncias (Redis ou
+  servidor compatível, ML_CACHE_REDIS_URL; requer o pacote redis). Falhas
+  do servidor não derrubam a predição: o cache compartilhado é ignorado
+  por SHARED_RETRY_S segundos
+
+Configuração (variáveis de ambiente, lidas por ml_prediction_api.py):
+    ML_CACHE_ENABLED=1          Ativa o cache (padrão: desativado)
+    ML_CACHE_SIZE=10000         Entradas do LRU local
+    ML_CACHE_TTL_S=300          Validade das entradas
+    ML_CACHE_KM_STEP=1          Passo de quantização do km
+    ML_CACHE_REDIS_URL=redis://localhost:6379/0   Cache compartilhado (opcional)
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Campos de parse_risk_input que formam a chave (km é quantizado)
+KEY_FIELDS = ['uf', 'br', 'km', 'hour', 'day_of_week', 'month',
+              'clima_categoria', 'fase_dia_categoria', 'tipo_pista_categoria']
+
+# Prefixo das chaves no cache compartilhado
+SHARED_PREFIX = 'sompo:predict'
+
+# Tempo sem consultar o cache compartilhado após uma falha
+SHARED_RETRY_S = 30
+
+
+class SharedCache:
+    """
+    Cache compartilhado em um servidor Redis (ou compatível)
+
+    Valores são gravados em JSON com expiração no próprio servidor.
+
+    Args:
+        url: URL do servidor (ex.: redis://localhost:6379/0)
+        ttl_s: Validade das entradas em segundos
+        timeout_s: Timeout de conexão e de cada comando
+    """
+
+    def __init__(self, url, ttl_s, timeout_s=0.05):
+        # Importado só com ML_CACHE_REDIS_URL: o pacote atrasa a inicialização da API
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("Pacote redis não instalado (pip install redis)") from None
+        self.ttl_s = ttl_s
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(key, json.dumps(value, ensure_ascii=False), ex=max(1, int(self.ttl_s)))
+
+
+class PredictionCache:
+    """
+    LRU com TTL de resultados de /predict
+
+    Args:
+        max_entries: Número máximo de entradas locais
+        ttl_s: Validade de cada entrada em segundos
+        km_step: Passo de quantização do km (0 = km exato)
+        shared: SharedCache opcional consultado após o LRU local
+    """
+
+    def __init__(self, max_entries=10000, ttl_s=300, km_step=1.0, shared=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = ttl_s
+        self.km_step = km_step
+        self.shared = shared
+        self.model_version = None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared_down_until = 0.0
+
+        # Métricas
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._shared_hits = 0
+        self._shared_errors = 0
+
+    def quantize_km(self, km):
+        """km arredondado ao múltiplo de km_step mais próximo"""
+        if not self.km_step:
+            return km
+        return round(math.floor(km / self.km_step + 0.5) * self.km_step, 6)
+
+    def make_key(self, row):
+        """Chave normalizada de uma linha de parse_risk_input"""
+        return tuple(
+            self.quantize_km(row[field]) if field == 'km' else row[field]
+            for field in KEY_FIELDS
+        )
+
+    def _shared_key(self, key):
+        return ':'.join([SHARED_PREFIX, str(self.model_version)] + [str(part) for part in key])
+
+    def get(self, key):
+        """Resultado em cache para a chave, ou None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expirations += 1
+
+        value = self._shared_get(key, now)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._shared_hits += 1
+        self._store(key, value, now)
+        return value
+
+    def put(self, key, value, model_version=None):
+        """
+        Guarda o resultado no LRU local e no cache compartilhado
+
+        Com model_version (versão do modelo que calculou o resultado),
+        resultados de um modelo já substituído são descartados.
+        """
+        if model_version is not None and model_version != self.model_version:
+            return
+        now = time.monotonic()
+        self._store(key, value, now)
+        if self.shared is not None and now >= self._shared_down_until:
+            try:
+                self.shared.set(self._shared_key(key), value)
+            except Exception as e:
+                self._shared_failed(e, now)
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _shared_get(self, key, now):
+        if self.shared is None or now < self._shared_down_until:
+            return None
+        try:
+            return self.shared.get(self._shared_key(key))
+        except Exception as e:
+            self._shared_failed(e, now)
+            return None
+
+    def _shared_failed(self, error, now):
+        with self._lock:
+            self._shared_errors += 1
+            self._shared_down_until = now + SHARED_RETRY_S
+        logger.warning(f"⚠️  Cache compartilhado indisponível ({error}); "
+                       f"usando só o cache local por {SHARED_RETRY_S}s")
+
+    def set_model_version(self, version):
+        """Troca a versão do modelo: descarta o cache local se ela mudou"""
+        previous, self.model_version = self.model_version, version
+        if previous is not None and version != previous:
+            self.clear()
+
+    def clear(self):
+        """Descarta todas as entradas locais"""
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Contadores de acerto, falta, remoção e expiração"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': True,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl_s,
+                'km_step': self.km_step,
+                'model_version': self.model_version,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'shared': {
+                    'enabled': self.shared is not None,
+                    'hits': self._shared_hits,
+                    'errors': self._shared_errors,
+                    'available': self.shared is not None and time.monotonic() >= self._shared_down_until,
+                },
+            }
@@ -0,0 +1,435 @@
+"""
+Métricas de Latência por Etapa e /metrics - Sompo
+=================================================
+
+Instrumentação das APIs Flask (ml_prediction_api.py, classification_api.py
+e ensemble_api.py), exposta em GET /metrics no formato texto do Prometheus:
+
+- sompo_stage_duration_seconds{endpoint, stage}: histograma de cada etapa
+  da requisição, na ordem: parse (leitura do JSON), validation, encoding,
+  inference (modelo; inclui a espera do micro-batching), postprocess
+  (score, nível, recomendações e montagem do resultado) e serialization
+  (jsonify até a resposta sair da view)
+- sompo_request_duration_seconds{endpoint}: histograma do tempo total
+- sompo_requests_total{endpoint, status}: requisições por status HTTP
+- sompo_errors_total{endpoint, type}: erros por tipo de exceção (inclui
+  itens inválidos dos lotes)
+- sompo_batch_rows{endpoint}: histograma de linhas por chamada ao modelo
+- sompo_model_requests_total{model, version, status}: requisições por
+  versão do modelo que as atendeu
+- sompo_model_info{model, version}: versão ativa de cada modelo (1)
+
+As views marcam o fim de cada etapa com mark('etapa'); o tempo desde a
+marca anterior entra no histograma da etapa. As marcas ficam na
+requisição (contextvars) e vão para o registro com um único lock no fim.
+Só as requisições sorteadas (ML_METRICS_SAMPLE_RATE) medem etapas; nas
+demais, e fora de uma requisição Flask, mark() não faz nada. Contadores
+de requisições, erros e lotes valem para todas.
+
+Nas rotas em streaming (ndjson_stream.py) a requisição é contada quando a
+resposta começa, e cada bloco processado entra nas etapas do endpoint.
+
+Com ML_API_WORKERS > 1 cada worker grava um resumo das suas métricas em
+ML_METRICS_DIR/<service>/ a cada segundo, e /metrics soma os resumos dos
+workers do mesmo serviço (o scrape pode cair em qualquer um). Cada API usa
+o seu subdiretório, então as APIs podem compartilhar ML_METRICS_DIR.
+
+Configuração:
+    ML_METRICS_SAMPLE_RATE=1   Fração das requisições com tempo por etapa (0 desliga)
+    ML_METRICS_DIR=...         Diretório dos resumos por worker (padrão: temporário)
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.environ.get('ML_METRICS_SAMPLE_RATE', '1'))
+
+# Limites dos buckets (segundos e linhas)
+DURATION_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+# Intervalo de gravação do resumo de cada worker
+FLUSH_INTERVAL_S = 1.0
+
+PREFIX = 'sompo'
+
+# Descrição e tipo de cada métrica (ordem de exposição)
+METRICS = {
+    'stage_duration_seconds': ('histogram', 'Duração de cada etapa da requisição', DURATION_BUCKETS),
+    'request_duration_seconds': ('histogram', 'Duração total da requisição', DURATION_BUCKETS),
+    'requests_total': ('counter', 'Requisições por endpoint e status HTTP', None),
+    'errors_total': ('counter', 'Erros por endpoint e tipo de exceção', None),
+    'batch_rows': ('histogram', 'Linhas por chamada ao modelo', BATCH_BUCKETS),
+    'model_requests_total': ('counter', 'Requisições por modelo, versão e status HTTP', None),
+    'model_info': ('gauge', 'Versão ativa de cada modelo', None),
+}
+
+
+class RequestTimer:
+    """Marcas de etapa de uma requisição (sampled=False: só identifica o endpoint)"""
+
+    __slots__ = ('endpoint', 'sampled', 'start', 'last', 'stages', 'models')
+
+    def __init__(self, endpoint, sampled):
+        self.endpoint = endpoint
+        self.sampled = sampled
+        self.start = self.last = time.perf_counter() if sampled else 0.0
+        self.stages = []
+        self.models = []
+
+    def mark(self, stage):
+        if self.sampled:
+            now = time.perf_counter()
+            self.stages.append((stage, now - self.last))
+            self.last = now
+
+
+# Sem requisição Flask (scripts, testes): marcas descartadas
+_NO_REQUEST = RequestTimer(None, False)
+_current = contextvars.ContextVar('sompo_request_timer', default=_NO_REQUEST)
+
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas do processo
+
+    Séries indexadas por (métrica, labels); histogramas guardam a contagem
+    de cada bucket (não acumulada) e a soma.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.service = None
+        self.root = None  # ML_METRICS_DIR (ou temporário); None = processo único
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._changed = False
+        self._flusher = None
+
+    @property
+    def directory(self):
+        """Diretório dos resumos dos workers deste serviço"""
+        if self.root is None:
+            return None
+        return Path(self.root) / (self.service or 'default')
+
+    def reset(self):
+        """
+        Zera contadores e histogramas (versões dos modelos são mantidas)
+
+        Chamado no processo pai antes do fork: também descarta os resumos
+        de uma execução anterior deste serviço (os das outras APIs ficam).
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._changed = True
+        directory = self.directory
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            for stale in directory.glob('*.json'):
+                stale.unlink(missing_ok=True)
+
+    # Registro
+
+    def _count(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        series = self._histograms.get(key)
+        if series is None:
+            series = self._histograms[key] = [[0] * (len(METRICS[name][2]) + 1), 0.0]
+        series[0][bisect.bisect_left(METRICS[name][2], value)] += 1
+        series[1] += value
+
+    def commit(self, timer, status):
+        """Fecha uma requisição: status, etapas medidas e tempo total"""
+        endpoint = timer.endpoint
+        with self._lock:
+            self._count('requests_total', (('endpoint', endpoint), ('status', str(status))))
+            for model, version in timer.models:
+                self._count('model_requests_total',
+                            (('model', model), ('version', str(version)), ('status', str(status))))
+            if timer.sampled:
+                for stage, seconds in timer.stages:
+                    self._observe('stage_duration_seconds', (('endpoint', endpoint), ('stage', stage)), seconds)
+                self._observe('request_duration_seconds', (('endpoint', endpoint),),
+                              time.perf_counter() - timer.start)
+            self._changed = True
+
+    def commit_stages(self, timer):
+        """Etapas de um bloco de resposta em streaming (a requisição já foi contada)"""
+        if not timer.sampled:
+            return
+        with self._lock:
+            for stage, seconds in timer.stages:
+                self._observe('stage_duration_seconds', (('endpoint', timer.endpoint), ('stage', stage)), seconds)
+            self._changed = True
+
+    def error(self, endpoint, kind, count=1):
+        with self._lock:
+            self._count('errors_total', (('endpoint', endpoint), ('type', kind)), count)
+            self._changed = True
+
+    def batch(self, endpoint, rows):
+        with self._lock:
+            self._observe('batch_rows', (('endpoint', endpoint),), rows)
+            self._changed = True
+
+    def set_model_version(self, model, version):
+        with self._lock:
+            for key in [key for key in self._gauges if key[1][0] == ('model', model)]:
+                del self._gauges[key]
+            self._gauges[('model_info', (('model', model), ('version', str(version))))] = 1
+            self._changed = True
+
+    # Resumos por worker
+
+    def snapshot(self):
+        """Estado serializável (contadores e histogramas)"""
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, list(counts), total]
+                               for (name, labels), (counts, total) in self._histograms.items()],
+            }
+
+    def flush(self):
+        """Grava o resumo deste worker em self.directory (gravação atômica)"""
+        if self.directory is None:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            self._changed = False
+        path = self.directory / f'{os.getpid()}.json'
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start(self):
+        """Thread de gravação do resumo (chamar em cada worker, após o fork)"""
+        if self.directory is None or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(FLUSH_INTERVAL_S)
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"⚠️  Métricas: falha ao gravar o resumo: {e}")
+
+        self._flusher = threading.Thread(target=run, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def _merged(self):
+        """Estado deste processo somado aos resumos dos demais workers"""
+        counters = {}
+        histograms = {}
+
+        def add(state):
+            for name, labels, value in state['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total in state['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                series = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+
+        add(self.snapshot())
+        directory = self.directory
+        if directory is not None:
+            own = f'{os.getpid()}.json'
+            for path in directory.glob('*.json'):
+                if path.name == own:
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        add(json.load(f))
+                except (OSError, ValueError):
+                    continue  # resumo sendo substituído: entra no próximo scrape
+        return counters, histograms
+
+    # Exposição
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (0.0.4)"""
+        counters, histograms = self._merged()
+        with self._lock:
+            gauges = dict(self._gauges)
+
+        service = (('service', self.service),) if self.service else ()
+        lines = []
+
+        def labels_text(labels, extra=()):
+            pairs = service + labels + extra
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+        for name, (kind, description, buckets) in METRICS.items():
+            full_name = f'{PREFIX}_{name}'
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            if kind == 'histogram':
+                for (metric, labels), (counts, total) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + ('+Inf',), counts):
+                        cumulative += count
+                        lines.append(f'{full_name}_bucket{labels_text(labels, (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{full_name}_sum{labels_text(labels)} {total:.9g}')
+                    lines.append(f'{full_name}_count{labels_text(labels)} {cumulative}')
+            else:
+                series = counters if kind == 'counter' else gauges
+                for (metric, labels), value in sorted(series.items()):
+                    if metric == name:
+                        lines.append(f'{full_name}{labels_text(labels)} {value}')
+
+        lines.append(f'# HELP {PREFIX}_metrics_sample_rate Fração das requisições com tempo por etapa')
+        lines.append(f'# TYPE {PREFIX}_metrics_sample_rate gauge')
+        lines.append(f'{PREFIX}_metrics_sample_rate{labels_text(())} {self.sample_rate:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def mark(stage):
+    """Fim de uma etapa da requisição atual (nada fora de requisição ou sem amostragem)"""
+    _current.get().mark(stage)
+
+
+def error(exc_or_kind, count=1):
+    """Conta um erro da requisição atual pelo tipo da exceção (ou nome do tipo)"""
+    endpoint = _current.get().endpoint
+    if endpoint is None:
+        return
+    kind = exc_or_kind if isinstance(exc_or_kind, str) else type(exc_or_kind).__name__
+    registry.error(endpoint, kind, count)
+
+
+def use_model(model, version):
+    """Modelo e versão que atendem a requisição atual"""
+    timer = _current.get()
+    if timer.endpoint is not None:
+        timer.models.append((model, version))
+
+
+def batch(rows):
+    """Linhas de uma chamada ao modelo na requisição atual"""
+    endpoint = _current.get().endpoint
+    if endpoint is None or not rows:
+        return
+    registry.batch(endpoint, rows)
+
+
+def set_model_version(model, version):
+    registry.set_model_version(model, version)
+
+
+def _sampled(rate):
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def start_chunk(endpoint):
+    """
+    Temporizador de um bloco de uma resposta em streaming
+
+    O corpo de uma resposta em streaming é gerado depois do after_request:
+    cada bloco ganha o seu temporizador, e as marcas, erros e lotes dele
+    entram nas métricas do endpoint (sem contar outra requisição).
+    """
+    timer = RequestTimer(endpoint, _sampled(registry.sample_rate))
+    _current.set(timer)
+    return timer
+
+
+def finish_chunk(timer):
+    """Registra as etapas de um bloco iniciado com start_chunk"""
+    _current.set(_NO_REQUEST)
+    registry.commit_stages(timer)
+
+
+def _metrics_directory():
+    """Diretório dos resumos quando a API sobe com vários workers (criado antes do fork)"""
+    from serving import get_worker_count
+
+    if get_worker_count() <= 1 or not hasattr(os, 'fork'):
+        return None
+    directory = os.environ.get('ML_METRICS_DIR')
+    if directory:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        return directory
+
+    directory = tempfile.mkdtemp(prefix='sompo-metrics-')
+    owner = os.getpid()
+    atexit.register(lambda: os.getpid() == owner and shutil.rmtree(directory, ignore_errors=True))
+    return directory
+
+
+def install(app, service):
+    """
+    Instrumenta um app Flask: temporizador por requisição e GET /metrics
+
+    Args:
+        app: Aplicação Flask
+        service: Valor do label service (último app instalado no processo)
+    """
+    from flask import Response, request
+
+    registry.service = service
+    rate = registry.sample_rate
+
+    @app.before_request
+    def _start_timer():
+        rule = request.url_rule
+        _current.set(RequestTimer(rule.rule if rule is not None else 'unmatched', _sampled(rate)))
+
+    @app.after_request
+    def _commit_timer(response):
+        timer = _current.get()
+        if timer.endpoint is not None and timer.endpoint != '/metrics':
+            if response.status_code < 400:
+                timer.mark('serialization')
+            registry.commit(timer, response.status_code)
+        _current.set(_NO_REQUEST)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Métricas no formato de exposição do Prometheus"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    if registry.root is None:
+        registry.root = _metrics_directory()
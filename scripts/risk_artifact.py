@@ -0,0 +1,449 @@
+"""
+Artefato Binário de Scores de Risco - Sompo
+===========================================
+
+Formato compacto e mapeável em memória para os scores pré-calculados
+(alternativa a backend/risk_scores.json):
+
+    [cabeçalho fixo 40 bytes]
+        magic      8s   b'SOMPORSK'
+        version    u32
+        n_segments u32
+        n_contexts u32
+        header_len u32  tamanho do cabeçalho JSON
+        keys_off   u64  offset do índice de segmentos
+        scores_off u64  offset da matriz de scores
+    [cabeçalho JSON]   metadata, contexts, ufs, segment_km, highways,
+                       score_dtype, score_scale, grid, fingerprints (opcionais)
+    [índice]           uint64 little-endian, ordenado (UF, BR, KM)
+    [scores]           float32 little-endian (ou uint8), n_segments x n_contexts
+    [fingerprints]     uint64 little-endian por segmento, alinhado após os
+                       scores (só com fingerprints=true; usado por risk_refresh.py)
+
+Cada segmento é codificado como (índice da UF << 32) | (BR << 20) | KM,
+então o índice ordenado agrupa os segmentos por UF e BR com KM crescente e
+a busca é um np.searchsorted. O leitor mapeia o arquivo com mmap e expõe
+índice e matriz como arrays NumPy sem cópia. A tabela highways do cabeçalho
+guarda, por (UF, BR), o intervalo [início, fim) de linhas da rodovia: os KMs
+dessas linhas já estão ordenados (usado por segment_index.py).
+
+Scores são arredondados a 2 casas na geração; float32 preserva isso com
+folga na faixa 0-100 (o leitor arredonda de volta ao devolver escalares).
+Com score_dtype='uint8' (cubos de contexto de context_grid.py) cada score
+é quantizado como round(score * SCORE_SCALE): 1 byte por célula, passo de
+0,4 ponto e erro máximo de 0,2 ponto; os limiares de nível (40/60/80) são
+representados exatamente.
+
+Uso:
+    from risk_artifact import RiskScoreArtifact
+    with RiskScoreArtifact("backend/risk_scores.bin") as artifact:
+        artifact.lookup('SP', 116, 230, 'noite_chuvoso')
+
+    python scripts/risk_artifact.py backend/risk_scores.bin SP 116 230
+    python scripts/risk_artifact.py backend/risk_scores.bin --export-json risk_scores.json
+    python scripts/risk_artifact.py backend/risk_scores.bin --from-json backend/risk_scores.json
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+ARTIFACT_MAGIC = b'SOMPORSK'
+ARTIFACT_VERSION = 2
+
+# Versão 1: sem score_dtype (sempre float32)
+SUPPORTED_VERSIONS = (1, 2)
+
+# Quantização uint8: score 0-100 -> 0-250
+SCORE_SCALE = 2.5
+SCORE_DTYPES = {'float32': '<f4', 'uint8': 'u1'}
+
+# Linhas de scores por escrita
+WRITE_CHUNK_ROWS = 65_536
+
+# magic, version, n_segments, n_contexts, header_len, keys_off, scores_off
+HEADER_STRUCT = struct.Struct('<8sIIIIQQ')
+
+# Alinhamento dos blocos de dados
+ALIGNMENT = 64
+
+BR_SHIFT = 20
+UF_SHIFT = 32
+MAX_BR = (1 << (UF_SHIFT - BR_SHIFT)) - 1
+MAX_KM = (1 << BR_SHIFT) - 1
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode_segments(uf_indexes, brs, kms):
+    """Codifica (índice da UF, BR, KM) em chaves uint64 ordenáveis"""
+    uf_indexes = np.asarray(uf_indexes, dtype=np.uint64)
+    brs = np.asarray(brs, dtype=np.uint64)
+    kms = np.asarray(kms, dtype=np.uint64)
+    return (uf_indexes << np.uint64(UF_SHIFT)) | (brs << np.uint64(BR_SHIFT)) | kms
+
+
+def decode_segments(keys):
+    """Inverso de encode_segments: (índices de UF, BRs, KMs)"""
+    keys = np.asarray(keys, dtype=np.uint64)
+    return (
+        (keys >> np.uint64(UF_SHIFT)).astype(np.int64),
+        ((keys >> np.uint64(BR_SHIFT)) & np.uint64(MAX_BR)).astype(np.int64),
+        (keys & np.uint64(MAX_KM)).astype(np.int64),
+    )
+
+
+def highway_ranges(keys):
+    """
+    Intervalos de linhas de cada rodovia (UF, BR) no índice ordenado
+
+    Returns:
+        Tupla (inícios, fins) com um elemento por rodovia
+    """
+    highway_ids = np.asarray(keys, dtype=np.uint64) >> np.uint64(BR_SHIFT)
+    if len(highway_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(highway_ids)) + 1])
+    stops = np.append(starts[1:], len(highway_ids))
+    return starts.astype(np.int64), stops.astype(np.int64)
+
+
+def quantize_scores(scores):
+    """Scores 0-100 -> uint8 (round(score * SCORE_SCALE))"""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.clip(np.round(scores * SCORE_SCALE), 0, 100 * SCORE_SCALE).astype(np.uint8)
+
+
+def write_risk_artifact(path, ufs, brs, kms, scores, contexts, metadata=None, segment_km=10,
+                        score_dtype='float32', grid=None, fingerprints=None):
+    """
+    Grava o artefato binário (escrita atômica via arquivo temporário)
+
+    Args:
+        path: Arquivo de saída (ex.: backend/risk_scores.bin)
+        ufs, brs, kms: Sequências com UF, BR e KM de cada segmento
+        scores: Matriz segmentos x contextos (aceita np.memmap)
+        contexts: Nomes dos contextos (colunas de scores)
+        metadata: Dict com a metadata do treinamento
+        segment_km: Comprimento dos segmentos em km
+        score_dtype: 'float32' ou 'uint8' (quantizado, ver SCORE_SCALE);
+            com 'uint8', scores já quantizados (dtype uint8) são gravados como estão
+        grid: Eixos do grid de contextos (context_grid.py), se houver
+        fingerprints: uint64 por segmento com o estado dos dados que
+            geraram o score (risk_refresh.segment_fingerprints), se houver
+
+    Returns:
+        Tamanho do arquivo em bytes
+    """
+    if score_dtype not in SCORE_DTYPES:
+        raise ValueError(f"score_dtype deve ser um de {list(SCORE_DTYPES)}")
+
+    path = Path(path)
+    ufs = np.asarray([str(uf) for uf in ufs])
+    brs = np.asarray(brs, dtype=np.float64).astype(np.int64)
+    kms = np.asarray(kms, dtype=np.float64).astype(np.int64)
+    scores = np.asarray(scores)
+    if score_dtype == 'uint8' and scores.dtype != np.uint8:
+        scores = quantize_scores(scores)
+    scores = scores.reshape(len(ufs), len(contexts))
+
+    if len(brs) and (brs.min() < 0 or brs.max() > MAX_BR or kms.min() < 0 or kms.max() > MAX_KM):
+        raise ValueError(f"BR deve estar em 0-{MAX_BR} e KM em 0-{MAX_KM}")
+
+    uf_names, uf_indexes = np.unique(ufs, return_inverse=True)
+    keys = encode_segments(uf_indexes, brs, kms)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if len(keys) > 1 and (np.diff(keys) == 0).any():
+        raise ValueError("Segmentos duplicados no artefato de risco")
+    if fingerprints is not None:
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)[order]
+
+    starts, stops = highway_ranges(keys)
+    highway_ufs, highway_brs, _ = decode_segments(keys[starts])
+    highways = [
+        [uf_names[uf].item(), br, start, stop]
+        for uf, br, start, stop in zip(highway_ufs.tolist(), highway_brs.tolist(),
+                                       starts.tolist(), stops.tolist())
+    ]
+
+    header = json.dumps({
+        'metadata': metadata or {},
+        'contexts': list(contexts),
+        'ufs': uf_names.tolist(),
+        'segment_km': segment_km,
+        'highways': highways,
+        'score_dtype': score_dtype,
+        'score_scale': SCORE_SCALE if score_dtype == 'uint8' else None,
+        'grid': grid,
+        'fingerprints': fingerprints is not None,
+    }, ensure_ascii=False).encode('utf-8')
+
+    keys_offset = _align(HEADER_STRUCT.size + len(header))
+    scores_offset = _align(keys_offset + keys.nbytes)
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER_STRUCT.pack(
+            ARTIFACT_MAGIC, ARTIFACT_VERSION, len(keys), len(contexts),
+            len(header), keys_offset, scores_offset
+        ))
+        f.write(header)
+        f.write(b'\0' * (keys_offset - f.tell()))
+        f.write(keys.astype('<u8').tobytes())
+        f.write(b'\0' * (scores_offset - f.tell()))
+        # Linhas reordenadas em blocos: com scores em np.memmap (risk_shards.py)
+        # a matriz nunca é copiada inteira para a memória
+        for start in range(0, len(order), WRITE_CHUNK_ROWS):
+            rows = scores[order[start:start + WRITE_CHUNK_ROWS]]
+            f.write(rows.astype(SCORE_DTYPES[score_dtype]).tobytes())
+        if fingerprints is not None:
+            f.write(b'\0' * (_align(f.tell()) - f.tell()))
+            f.write(fingerprints.astype('<u8').tobytes())
+
+    # Substituição atômica: leitores com o arquivo antigo mapeado não são afetados
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def convert_json(json_path, path):
+    """Gera o artefato binário a partir de um risk_scores.json existente"""
+    with open(json_path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    contexts = data['metadata']['contexts']
+    keys = list(data['scores'])
+    parts = [key.split('_') for key in keys]
+    scores = [[data['scores'][key][context] for context in contexts] for key in keys]
+
+    return write_risk_artifact(
+        path,
+        [p[0] for p in parts], [int(p[1]) for p in parts], [int(p[2]) for p in parts],
+        scores, contexts, data['metadata']
+    )
+
+
+class RiskScoreArtifact:
+    """
+    Leitor do artefato binário com mmap (sem cópia)
+
+    Attributes:
+        keys: Índice ordenado de segmentos (uint64, view do arquivo)
+        scores: Matriz segmentos x contextos (float32 ou uint8 quantizado,
+            view do arquivo; ver decode_scores)
+        contexts: Nomes dos contextos
+        metadata: Metadata do treinamento
+        segment_km: Comprimento dos segmentos em km
+        highways: Dict (UF, BR) -> (linha inicial, linha final) da rodovia
+        score_scale: Escala da quantização (None para float32)
+        grid: Eixos do grid de contextos, ou None
+        fingerprints: uint64 por segmento (view do arquivo), ou None
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, n_segments, n_contexts,
+         header_len, keys_offset, scores_offset) = HEADER_STRUCT.unpack_from(self._mmap, 0)
+
+        if magic != ARTIFACT_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Arquivo não é um artefato de risco: {self.path}")
+        if version not in SUPPORTED_VERSIONS:
+            self._mmap.close()
+            raise ValueError(f"Versão de artefato não suportada: {version}")
+
+        header = json.loads(
+            self._mmap[HEADER_STRUCT.size:HEADER_STRUCT.size + header_len].decode('utf-8')
+        )
+        self.metadata = header['metadata']
+        self.contexts = header['contexts']
+        self.ufs = header['ufs']
+        self.segment_km = header.get('segment_km', 10)
+        score_dtype = header.get('score_dtype', 'float32')
+        self.score_scale = header.get('score_scale')
+        self.grid = header.get('grid')
+
+        self._context_index = {name: i for i, name in enumerate(self.contexts)}
+        self._uf_index = {uf: i for i, uf in enumerate(self.ufs)}
+
+        self.keys = np.frombuffer(self._mmap, dtype='<u8', count=n_segments, offset=keys_offset)
+        self.scores = np.frombuffer(
+            self._mmap, dtype=SCORE_DTYPES[score_dtype],
+            count=n_segments * n_contexts, offset=scores_offset
+        ).reshape(n_segments, n_contexts)
+
+        self.fingerprints = None
+        if header.get('fingerprints'):
+            fingerprints_offset = _align(scores_offset + self.scores.nbytes)
+            self.fingerprints = np.frombuffer(
+                self._mmap, dtype='<u8', count=n_segments, offset=fingerprints_offset
+            )
+
+        if 'highways' in header:
+            self.highways = {
+                (uf, br): (start, stop) for uf, br, start, stop in header['highways']
+            }
+        else:
+            # Artefatos gerados antes da tabela de rodovias
+            starts, stops = highway_ranges(self.keys)
+            uf_indexes, brs, _ = decode_segments(self.keys[starts])
+            self.highways = {
+                (self.ufs[uf], br): (start, stop)
+                for uf, br, start, stop in zip(uf_indexes.tolist(), brs.tolist(),
+                                               starts.tolist(), stops.tolist())
+            }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Libera o mapeamento (arrays obtidos deste artefato deixam de ser válidos)"""
+        self.keys = self.scores = self.fingerprints = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Ainda há views vivas; o mapeamento é liberado quando forem coletadas
+            pass
+
+    def context_index(self, context):
+        """Coluna do contexto na matriz de scores"""
+        try:
+            return self._context_index[context]
+        except KeyError:
+            raise KeyError(f"Contexto desconhecido: {context}") from None
+
+    def decode_scores(self, values):
+        """Scores 0-100 a partir de valores da matriz (desfaz a quantização uint8)"""
+        if self.score_scale is None:
+            return values
+        return np.asarray(values, dtype=np.float64) / self.score_scale
+
+    def _key(self, uf, br, km):
+        uf_index = self._uf_index.get(str(uf).upper())
+        br, km = int(br), int(km)
+        if uf_index is None or not (0 <= br <= MAX_BR) or not (0 <= km <= MAX_KM):
+            return None
+        return (uf_index << UF_SHIFT) | (br << BR_SHIFT) | km
+
+    def find(self, uf, br, km):
+        """Linha do segmento na matriz, ou -1 se não existir"""
+        key = self._key(uf, br, km)
+        if key is None:
+            return -1
+        key = np.uint64(key)
+        row = int(np.searchsorted(self.keys, key))
+        return row if row < len(self.keys) and self.keys[row] == key else -1
+
+    def __contains__(self, segment):
+        return self.find(*segment) >= 0
+
+    def segment_scores(self, uf, br, km):
+        """Scores de todos os contextos do segmento ou None"""
+        row = self.find(uf, br, km)
+        return self.decode_scores(self.scores[row]) if row >= 0 else None
+
+    def lookup(self, uf, br, km, context):
+        """Score do segmento no contexto, ou None se o segmento não existir"""
+        row = self.find(uf, br, km)
+        if row < 0:
+            return None
+        return round(float(self.decode_scores(self.scores[row, self.context_index(context)])), 2)
+
+    def find_batch(self, ufs, brs, kms):
+        """Linhas de vários segmentos de uma vez (-1 para os inexistentes)"""
+        uf_indexes = np.array([self._uf_index.get(str(uf).upper(), -1) for uf in ufs], dtype=np.int64)
+        brs = np.asarray(brs, dtype=np.int64)
+        kms = np.asarray(kms, dtype=np.int64)
+
+        known = (uf_indexes >= 0) & (brs >= 0) & (brs <= MAX_BR) & (kms >= 0) & (kms <= MAX_KM)
+        keys = encode_segments(np.where(known, uf_indexes, 0), np.where(known, brs, 0),
+                               np.where(known, kms, 0))
+        rows = np.searchsorted(self.keys, keys)
+        in_range = rows < len(self.keys)
+        found = known & in_range
+        found[found] = self.keys[rows[found]] == keys[found]
+        return np.where(found, rows, -1)
+
+    def lookup_batch(self, ufs, brs, kms, context):
+        """Scores de vários segmentos em um contexto (NaN para os inexistentes)"""
+        rows = self.find_batch(ufs, brs, kms)
+        column = self.context_index(context)
+        result = np.full(len(rows), np.nan, dtype=np.float64)
+        found = rows >= 0
+        values = self.decode_scores(self.scores[rows[found], column])
+        result[found] = np.round(np.asarray(values, dtype=np.float64), 2)
+        return result
+
+    def segment_keys(self):
+        """Chaves "UF_BR_KM" no formato de risk_scores.json, na ordem do índice"""
+        uf_indexes, brs, kms = decode_segments(self.keys)
+        return [
+            f"{self.ufs[uf]}_{str(br).zfill(3)}_{km}"
+            for uf, br, km in zip(uf_indexes.tolist(), brs.tolist(), kms.tolist())
+        ]
+
+    def to_json_dict(self):
+        """Conteúdo no formato de risk_scores.json (metadata + scores)"""
+        rounded = np.round(np.asarray(self.decode_scores(self.scores), dtype=np.float64), 2).tolist()
+        return {
+            'metadata': self.metadata,
+            'scores': {
+                key: dict(zip(self.contexts, row))
+                for key, row in zip(self.segment_keys(), rounded)
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta o artefato binário de scores de risco')
+    parser.add_argument('path', help='Arquivo .bin (ex.: backend/risk_scores.bin)')
+    parser.add_argument('segment', nargs='*', help='UF BR KM [contexto]')
+    parser.add_argument('--export-json', help='Exporta o conteúdo para um risk_scores.json')
+    parser.add_argument('--from-json', help='Gera o artefato a partir de um risk_scores.json')
+    args = parser.parse_args()
+
+    if args.from_json:
+        size = convert_json(args.from_json, args.path)
+        print(f"   ✅ Artefato gerado a partir de {args.from_json}: {size / 1024:.0f} KB")
+
+    with RiskScoreArtifact(args.path) as artifact:
+        print(f"📦 {args.path}: {len(artifact):,} segmentos × {len(artifact.contexts)} contextos")
+
+        if args.export_json:
+            with open(args.export_json, 'w', encoding='utf-8') as f:
+                json.dump(artifact.to_json_dict(), f, indent=2, ensure_ascii=False)
+            print(f"   ✅ JSON exportado: {args.export_json}")
+
+        if len(args.segment) >= 3:
+            uf, br, km = args.segment[:3]
+            km_segment = int(float(km)) // artifact.segment_km * artifact.segment_km
+            scores = artifact.segment_scores(uf, br, km_segment)
+            if scores is None:
+                print(f"   ⚠️  Segmento {uf}/BR-{br} KM {km_segment} não encontrado")
+            else:
+                contexts = args.segment[3:] or artifact.contexts
+                for context in contexts:
+                    print(f"   {context:<18} {artifact.lookup(uf, br, km_segment, context):6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Geração Vetorizada do Mapa de Risco - Sompo
+===========================================
+
+Monta o produto cartesiano segmentos × contextos em uma única matriz de
+features, pontua tudo com predict_proba (em blocos) e combina score do
+modelo e score histórico com operações vetoriais.
+
+Usado por train_risk_model.py (STEP 5) para gerar backend/risk_scores.json.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from inference_engine import FEATURE_COLUMNS, compile_encoders, encode_column, encode_value
+
+# Condições contextuais para gerar scores
+CONTEXTOS = [
+    {'nome': 'dia_claro', 'clima': 'claro', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
+    {'nome': 'dia_nublado', 'clima': 'nublado', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
+    {'nome': 'dia_chuvoso', 'clima': 'chuvoso', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
+    {'nome': 'noite_claro', 'clima': 'claro', 'fase': 'noite', 'hora': 22, 'dia_semana': 2},
+    {'nome': 'noite_chuvoso', 'clima': 'chuvoso', 'fase': 'noite', 'hora': 22, 'dia_semana': 2},
+    {'nome': 'amanhecer_claro', 'clima': 'claro', 'fase': 'amanhecer', 'hora': 6, 'dia_semana': 1},
+    {'nome': 'anoitecer_claro', 'clima': 'claro', 'fase': 'anoitecer', 'hora': 18, 'dia_semana': 5},
+    {'nome': 'fds_noite_claro', 'clima': 'claro', 'fase': 'noite', 'hora': 23, 'dia_semana': 6},
+]
+
+# Mês médio e tipo de pista dos contextos que não definem 'mes' / 'tipo_pista'
+CONTEXT_MONTH = 6
+CONTEXT_ROAD_TYPE = 'simples'
+
+# Pesos da combinação (60% ML, 40% histórico)
+ML_WEIGHT = 0.6
+BASE_WEIGHT = 0.4
+
+# Comprimento dos segmentos (km)
+SEGMENT_KM = 10
+
+# Linhas por chamada de predict_proba
+CHUNK_ROWS = 250_000
+
+
+def aggregate_segments(df_clean):
+    """
+    Agrupa acidentes por segmento (UF, BR, KM em intervalos de SEGMENT_KM)
+
+    Returns:
+        DataFrame com uf, br, km, total_acidentes, gravidade_media,
+        total_mortos, total_feridos_graves, total_feridos_leves
+    """
+    df_clean['km_segment'] = (df_clean['km'] // SEGMENT_KM) * SEGMENT_KM
+
+    # observed=True: com uf categórica, agrupa só as combinações existentes
+    segments = df_clean.groupby(['uf', 'br', 'km_segment'], observed=True).agg({
+        'gravidade': ['count', 'mean'],
+        'mortos': 'sum',
+        'feridos_graves': 'sum',
+        'feridos_leves': 'sum',
+    }).reset_index()
+
+    segments.columns = ['uf', 'br', 'km', 'total_acidentes', 'gravidade_media',
+                        'total_mortos', 'total_feridos_graves', 'total_feridos_leves']
+    return segments
+
+
+def segment_keys(segments):
+    """Chaves "UF_BR_KM" (BR com 3 dígitos, KM inteiro) na ordem dos segmentos"""
+    return [
+        f"{uf}_{str(int(br)).zfill(3)}_{int(km)}"
+        for uf, br, km in zip(segments['uf'], segments['br'], segments['km'])
+    ]
+
+
+def base_scores(segments):
+    """
+    Score histórico 0-100 de cada segmento
+
+    Considera densidade (max 30 pontos por 10 acidentes) e gravidade média
+    (max 70 pontos)
+    """
+    total = segments['total_acidentes'].to_numpy(dtype=np.float64)
+    gravidade = segments['gravidade_media'].to_numpy(dtype=np.float64)
+    return np.minimum((total / 10) * 30 + (gravidade / 2) * 70, 100)
+
+
+def round_base_scores(scores):
+    """
+    Arredonda scores históricos com round() do Python (decimal exato)
+
+    O score do modelo é arredondado com np.round; o histórico sempre foi
+    calculado em float do Python, e round() pode diferir de np.round na
+    segunda casa (ex.: 86.475).
+    """
+    return np.array([[round(value, 2) for value in row] for row in scores.tolist()],
+                    dtype=np.float64).reshape(scores.shape)
+
+
+def build_feature_matrix(segments, contextos, le_dict):
+    """
+    Matriz de features do produto segmentos × contextos
+
+    Linha i * len(contextos) + j corresponde ao segmento i no contexto j.
+
+    Returns:
+        Tupla (matriz float64 (S*C) x 9, máscara de segmentos válidos,
+        lista de (índice do segmento, motivo) para os inválidos)
+    """
+    tables = compile_encoders(le_dict)
+    n_segments = len(segments)
+    n_contexts = len(contextos)
+
+    uf_values = [str(uf) for uf in segments['uf']]
+    uf_codes, uf_known = encode_column(tables['uf'], uf_values)
+    br = pd.to_numeric(segments['br'], errors='coerce').to_numpy(dtype=np.float64)
+    km = pd.to_numeric(segments['km'], errors='coerce').to_numpy(dtype=np.float64)
+
+    valid = uf_known & np.isfinite(br) & np.isfinite(km)
+    failures = []
+    for i in np.flatnonzero(~valid):
+        if not uf_known[i]:
+            failures.append((int(i), f"UF desconhecida pelo encoder: '{uf_values[i]}'"))
+        else:
+            failures.append((int(i), f"BR/KM inválido: br={segments['br'].iloc[i]}, km={segments['km'].iloc[i]}"))
+
+    context_block = np.array([
+        [
+            ctx['hora'],
+            ctx['dia_semana'],
+            ctx.get('mes', CONTEXT_MONTH),
+            encode_value(tables, 'clima_categoria', ctx['clima']),
+            encode_value(tables, 'fase_dia_categoria', ctx['fase']),
+            encode_value(tables, 'tipo_pista_categoria', ctx.get('tipo_pista', CONTEXT_ROAD_TYPE)),
+        ]
+        for ctx in contextos
+    ], dtype=np.float64)
+
+    matrix = np.empty((n_segments * n_contexts, len(FEATURE_COLUMNS)), dtype=np.float64)
+    matrix[:, 0] = np.repeat(uf_codes, n_contexts)
+    matrix[:, 1] = np.repeat(np.trunc(br), n_contexts)
+    matrix[:, 2] = np.repeat(np.trunc(km), n_contexts)
+    matrix[:, 3:] = np.tile(context_block, (n_segments, 1))
+
+    return matrix, valid, failures
+
+
+def predict_scores(model, matrix, chunk_rows=CHUNK_ROWS):
+    """Score ML 0-100 (feridos*50 + mortos*100) com predict_proba em blocos"""
+    scores = np.empty(len(matrix), dtype=np.float64)
+    for start in range(0, len(matrix), chunk_rows):
+        chunk = pd.DataFrame(matrix[start:start + chunk_rows], columns=FEATURE_COLUMNS)
+        proba = model.predict_proba(chunk)
+        scores[start:start + chunk_rows] = proba[:, 1] * 50 + proba[:, 2] * 100
+    return scores
+
+
+def score_risk_map(model, le_dict, segments, contextos, chunk_rows=CHUNK_ROWS):
+    """
+    Scores finais (segmentos × contextos) com o modelo treinado
+
+    Segmentos que não podem ser pontuados pelo modelo caem no score
+    histórico e são reportados em failures.
+
+    Returns:
+        Tupla (matriz S x C de scores arredondados, failures, tempos em s)
+    """
+    timings = {}
+    n_contexts = len(contextos)
+
+    start = time.perf_counter()
+    base = base_scores(segments)
+    matrix, valid, failures = build_feature_matrix(segments, contextos, le_dict)
+    timings['features'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows_valid = np.repeat(valid, n_contexts)
+    ml_scores = np.zeros(len(matrix), dtype=np.float64)
+    if rows_valid.any():
+        ml_scores[rows_valid] = predict_scores(model, matrix[rows_valid], chunk_rows)
+    timings['predict'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ml_scores = ml_scores.reshape(len(segments), n_contexts)
+    final = np.round(ml_scores * ML_WEIGHT + base[:, None] * BASE_WEIGHT, 2)
+    if not valid.all():
+        fallback = np.repeat(base[~valid, None], n_contexts, axis=1)
+        final[~valid] = round_base_scores(fallback)
+    timings['blend'] = time.perf_counter() - start
+
+    return final, failures, timings
+
+
+def statistical_risk_map(segments, contextos):
+    """
+    Scores finais (segmentos × contextos) sem modelo: score histórico
+    ajustado por contexto
+    """
+    base = base_scores(segments)
+    final = np.repeat(base[:, None], len(contextos), axis=1)
+
+    for j, ctx in enumerate(contextos):
+        column = final[:, j]
+        if ctx['fase'] == 'noite':
+            column *= 1.3
+        if ctx['clima'] == 'chuvoso':
+            column *= 1.4
+        if ctx['clima'] == 'neblina':
+            column *= 1.5
+        if ctx['dia_semana'] in [5, 6]:  # Fim de semana
+            column *= 1.2
+
+    return round_base_scores(np.minimum(final, 100))
+
+
+def to_risk_scores_dict(segments, contextos, scores):
+    """Converte a matriz de scores para o formato de risk_scores.json"""
+    names = [ctx['nome'] for ctx in contextos]
+    return {
+        key: dict(zip(names, row))
+        for key, row in zip(segment_keys(segments), scores.tolist())
+    }
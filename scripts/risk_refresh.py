@@ -0,0 +1,303 @@
+"""
+Atualização Incremental do Mapa de Risco - Sompo
+================================================
+
+Atualiza backend/risk_scores.bin (e risk_cube.bin / risk_scores.json, se
+existirem) sem retreinar o modelo e sem repontuar todos os segmentos:
+
+1. Recalcula os agregados por segmento (risk_map.aggregate_segments)
+2. Compara o fingerprint de cada segmento (contagem, gravidade média,
+   mortos e feridos) com o gravado no artefato pelo último treinamento
+3. Pontua só os segmentos novos ou com estatísticas alteradas, com o
+   modelo salvo em backend/models/; os demais mantêm o score gravado
+4. Regrava os artefatos (escrita atômica) com metadata.revision + 1
+
+Se o modelo salvo mudou desde a geração (model_sha256 na metadata), todos
+os segmentos são repontuados, ainda sem retreinar.
+
+Uso (a partir da raiz do projeto, após um train_risk_model.py completo):
+    python scripts/risk_refresh.py
+    python scripts/risk_refresh.py --data DadosReais/dados_acidentes.xlsx --force
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from context_grid import ContextGrid, generate_risk_cube
+from data_cache import load_dataset
+from feature_engineering import engineer_features
+from risk_artifact import RiskScoreArtifact, write_risk_artifact
+from risk_map import (
+    CONTEXTOS,
+    aggregate_segments,
+    score_risk_map,
+    statistical_risk_map,
+    to_risk_scores_dict,
+)
+
+DATA_PATH = Path("DadosReais/dados_acidentes.xlsx")
+ARTIFACT_PATH = Path("backend/risk_scores.bin")
+CUBE_PATH = Path("backend/risk_cube.bin")
+JSON_PATH = Path("backend/risk_scores.json")
+MODEL_PATH = Path("backend/models/risk_model.joblib")
+ENCODERS_PATH = Path("backend/models/label_encoders.joblib")
+
+# Estatísticas de aggregate_segments que determinam o score do segmento
+STAT_COLUMNS = ['total_acidentes', 'gravidade_media', 'total_mortos',
+                'total_feridos_graves', 'total_feridos_leves']
+
+
+def segment_fingerprints(segments):
+    """
+    Fingerprint uint64 das estatísticas de cada segmento
+
+    Os valores são convertidos para float64 antes do hash para que o
+    fingerprint não dependa do dtype das colunas (ex.: com ou sem o cache
+    de data_cache.py).
+    """
+    stats = segments[STAT_COLUMNS].astype(np.float64)
+    return pd.util.hash_pandas_object(stats, index=False).to_numpy(dtype=np.uint64)
+
+
+def file_fingerprint(*paths):
+    """SHA-256 do conteúdo dos arquivos (modelo + encoders)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_refresh(artifact, segments, fingerprints, force=False):
+    """
+    Compara os segmentos atuais com os do artefato
+
+    Returns:
+        Tupla (linha no artefato de cada segmento ou -1, máscara dos
+        segmentos a repontuar, número de segmentos removidos)
+    """
+    rows = artifact.find_batch(segments['uf'], segments['br'], segments['km'])
+    existing = rows >= 0
+    removed = len(artifact) - int(np.count_nonzero(existing))
+
+    if force or artifact.fingerprints is None:
+        return rows, np.ones(len(rows), dtype=bool), removed
+
+    changed = ~existing
+    changed[existing] = artifact.fingerprints[rows[existing]] != fingerprints[existing]
+    return rows, changed, removed
+
+
+def _contexts_by_name(names):
+    known = {ctx['nome']: ctx for ctx in CONTEXTOS}
+    missing = [name for name in names if name not in known]
+    if missing:
+        raise ValueError(f"Contextos fora de risk_map.CONTEXTOS: {missing[:3]}; "
+                         f"execute o treinamento completo")
+    return [known[name] for name in names]
+
+
+def score_segments(artifact, segments, model, le_dict):
+    """Pontua segmentos nos contextos do artefato (mapa de risco ou cubo)"""
+    if artifact.grid is not None:
+        cube, _, _ = generate_risk_cube(model, le_dict, segments, ContextGrid(artifact.grid))
+        return cube
+
+    contexts = _contexts_by_name(artifact.contexts)
+    if model is None:
+        return statistical_risk_map(segments, contexts)
+    scores, _, _ = score_risk_map(model, le_dict, segments, contexts)
+    return scores
+
+
+def refresh_artifact(path, segments, fingerprints, model, le_dict, metadata, force=False):
+    """
+    Repontua os segmentos alterados e regrava o artefato
+
+    Args:
+        path: Artefato (risk_scores.bin ou risk_cube.bin)
+        segments: DataFrame atual de aggregate_segments
+        fingerprints: segment_fingerprints(segments)
+        model: Modelo salvo (None para o score estatístico)
+        le_dict: LabelEncoders do treinamento
+        metadata: Metadata gravada no novo artefato
+        force: Repontua todos os segmentos
+
+    Returns:
+        Tupla (scores na ordem de segments, dict com rescored, unchanged,
+        removed, seconds e size). Scores float64 para o mapa de risco,
+        uint8 quantizado para o cubo.
+    """
+    start = time.perf_counter()
+
+    with RiskScoreArtifact(path) as artifact:
+        rows, changed, removed = plan_refresh(artifact, segments, fingerprints, force)
+        quantized = artifact.score_scale is not None
+
+        merged = np.empty((len(segments), len(artifact.contexts)),
+                          dtype=np.uint8 if quantized else np.float64)
+        kept = ~changed
+        if quantized:
+            merged[kept] = artifact.scores[rows[kept]]
+        else:
+            merged[kept] = np.round(artifact.scores[rows[kept]].astype(np.float64), 2)
+
+        if changed.any():
+            subset = segments[changed].reset_index(drop=True)
+            merged[changed] = score_segments(artifact, subset, model, le_dict)
+
+        contexts = list(artifact.contexts)
+        grid = artifact.grid
+        segment_km = artifact.segment_km
+
+    size = write_risk_artifact(
+        path,
+        segments['uf'], segments['br'], segments['km'],
+        merged, contexts, metadata,
+        segment_km=segment_km,
+        score_dtype='uint8' if quantized else 'float32',
+        grid=grid,
+        fingerprints=fingerprints,
+    )
+
+    return merged, {
+        'rescored': int(np.count_nonzero(changed)),
+        'unchanged': int(np.count_nonzero(kept)),
+        'removed': removed,
+        'seconds': time.perf_counter() - start,
+        'size': size,
+    }
+
+
+def _load_saved_model(previous):
+    """
+    Modelo e encoders salvos (o modo incremental nunca treina)
+
+    Returns:
+        Tupla (modelo, encoders, hash dos arquivos); tudo None no modo estatístico
+    """
+    if previous.get('model_type') == 'Statistical':
+        return None, None, None
+    if not MODEL_PATH.exists() or not ENCODERS_PATH.exists():
+        print(f"❌ ERRO: Modelo ou encoders não encontrados em {MODEL_PATH.parent}")
+        sys.exit(1)
+    return joblib.load(MODEL_PATH), joblib.load(ENCODERS_PATH), file_fingerprint(MODEL_PATH, ENCODERS_PATH)
+
+
+def _load_segments(data_path):
+    """Carrega a planilha e agrega os segmentos: (registros, segmentos, fingerprints)"""
+    print(f"📖 [1/3] Carregando {data_path}...")
+    try:
+        df_clean = engineer_features(load_dataset(data_path), target_column='gravidade')
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ ERRO: {e}")
+        sys.exit(1)
+    df_clean = df_clean.dropna(subset=['uf', 'br', 'km', 'latitude', 'longitude'])
+    print(f"   ✅ {len(df_clean):,} registros")
+    print()
+
+    print("🔍 [2/3] Comparando segmentos...")
+    segments = aggregate_segments(df_clean)
+    fingerprints = segment_fingerprints(segments)
+    print(f"   📍 {len(segments):,} segmentos")
+    print()
+    return df_clean, segments, fingerprints
+
+
+def _refresh_targets(previous):
+    """Artefatos a atualizar: o mapa e, se for da mesma revisão, o cubo de contextos"""
+    targets = [ARTIFACT_PATH]
+    if CUBE_PATH.exists():
+        with RiskScoreArtifact(CUBE_PATH) as cube:
+            if cube.metadata.get('revision') == previous.get('revision'):
+                targets.append(CUBE_PATH)
+            else:
+                print(f"   ⚠️  {CUBE_PATH} é de outra revisão; regenere com train_risk_model.py")
+    return targets
+
+
+def _write_targets(targets, segments, fingerprints, model, le_dict, metadata, force):
+    """Atualiza cada artefato e regrava risk_scores.json junto com o mapa"""
+    for path in targets:
+        merged, stats = refresh_artifact(path, segments, fingerprints, model, le_dict, metadata, force)
+        print(f"   ✅ {path}: {stats['rescored']:,} repontuados, {stats['unchanged']:,} mantidos, "
+              f"{stats['removed']:,} removidos ({stats['seconds']:.2f}s, {stats['size'] / 1024 / 1024:.2f} MB)")
+
+        if path == ARTIFACT_PATH and os.environ.get('RISK_SCORES_JSON', '1').lower() not in ('0', 'false', 'no'):
+            contexts = _contexts_by_name(metadata['contexts'])
+            with open(JSON_PATH, 'w', encoding='utf-8') as f:
+                json.dump({'metadata': metadata, 'scores': to_risk_scores_dict(segments, contexts, merged)},
+                          f, indent=2, ensure_ascii=False)
+            print(f"   ✅ {JSON_PATH} regravado")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Atualiza o mapa de risco sem retreinar o modelo')
+    parser.add_argument('--data', default=str(DATA_PATH), help='Planilha de acidentes')
+    parser.add_argument('--force', action='store_true', help='Repontua todos os segmentos')
+    args = parser.parse_args()
+
+    total_start = time.perf_counter()
+
+    if not ARTIFACT_PATH.exists():
+        print(f"❌ ERRO: {ARTIFACT_PATH} não encontrado. Execute train_risk_model.py primeiro.")
+        sys.exit(1)
+
+    with RiskScoreArtifact(ARTIFACT_PATH) as artifact:
+        previous = dict(artifact.metadata)
+        if artifact.fingerprints is None:
+            print("⚠️  Artefato sem fingerprints (gerado antes do modo incremental): "
+                  "todos os segmentos serão repontuados")
+
+    model, le_dict, model_sha256 = _load_saved_model(previous)
+
+    force = args.force
+    if model_sha256 != previous.get('model_sha256'):
+        print("⚠️  Modelo diferente do usado na última geração: todos os segmentos serão repontuados")
+        force = True
+
+    df_clean, segments, fingerprints = _load_segments(args.data)
+
+    metadata = dict(previous)
+    metadata.update({
+        'updated_at': datetime.now().isoformat(),
+        'revision': previous.get('revision', 1) + 1,
+        'total_segments': len(segments),
+        'total_accidents_analyzed': len(df_clean),
+        'model_sha256': model_sha256,
+    })
+
+    print("💾 [3/3] Atualizando artefatos...")
+    with RiskScoreArtifact(ARTIFACT_PATH) as artifact:
+        rows, changed, removed = plan_refresh(artifact, segments, fingerprints, force)
+    if not changed.any() and removed == 0:
+        print(f"   ✅ Nenhum segmento mudou; revisão {previous.get('revision', 1)} mantida")
+        sys.exit(0)
+    metadata['refresh'] = {
+        'rescored': int(np.count_nonzero(changed)),
+        'unchanged': int(np.count_nonzero(~changed)),
+        'removed': removed,
+    }
+
+    _write_targets(_refresh_targets(previous), segments, fingerprints, model, le_dict, metadata, force)
+
+    print()
+    print(f"✅ Revisão {metadata['revision']} gerada em {time.perf_counter() - total_start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Geração Paralela do Mapa de Risco em Shards - Sompo
+===================================================
+
+Divide os segmentos em shards de até SHARD_ROWS linhas de features
+(segmentos × contextos) e pontua cada shard em um pool de processos:
+
+1. O processo principal cria uma matriz de rascunho em disco (np.memmap)
+   com uma linha por segmento
+2. Cada worker pontua um shard (risk_map.score_risk_map, ou o score
+   estatístico sem modelo) e grava o resultado parcial nas linhas do shard
+3. Ao final, o artefato de risk_artifact.py é escrito a partir do
+   rascunho, em blocos de linhas
+
+A memória de cada worker é limitada pelo tamanho do shard e a do processo
+principal não cresce com o número de contextos: o rascunho fica em disco.
+O resultado é idêntico ao da geração em um único processo.
+
+Pool:
+- 'fork' quando disponível: os workers herdam modelo e encoders sem cópia.
+  O OpenMP do LightGBM não sobrevive ao fork de um processo que já usou
+  threads (o worker trava), então cada worker pontua com n_jobs=1 e o
+  paralelismo vem dos processos
+- 'spawn' nos demais sistemas (Windows): o modelo é enviado uma vez por
+  worker e cada um usa cpu_count / workers threads. O script chamador
+  precisa ser importável sem efeitos colaterais (train_risk_model.py não
+  é, e roda com 1 worker nesses sistemas)
+
+Uso:
+    from risk_shards import sharded_risk_map, write_sharded_artifact
+
+    scores, failures, timings = sharded_risk_map(model, le_dict, segments, CONTEXTOS, workers=4)
+    size, failures, timings = write_sharded_artifact(
+        "backend/risk_cube.bin", model, le_dict, segments, grid.contexts(),
+        score_dtype='uint8', grid=grid.to_header(), workers=4,
+    )
+
+    python scripts/train_risk_model.py --workers 4
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from data_cache import peak_rss_mb
+from risk_artifact import SCORE_DTYPES, quantize_scores, write_risk_artifact
+from risk_map import CHUNK_ROWS, SEGMENT_KM, score_risk_map, statistical_risk_map
+
+# Processos de geração (RISK_WORKERS ou --workers em train_risk_model.py)
+WORKERS = int(os.environ.get('RISK_WORKERS', '1'))
+
+# Linhas de features (segmentos × contextos) por shard: limita a memória de cada worker
+SHARD_ROWS = int(os.environ.get('RISK_SHARD_ROWS', str(4 * CHUNK_ROWS)))
+
+# Diretório da matriz de rascunho (padrão: o do artefato de saída)
+SCRATCH_DIR = os.environ.get('RISK_SCRATCH_DIR')
+
+FORK_AVAILABLE = 'fork' in multiprocessing.get_all_start_methods()
+
+# Modelo e encoders do worker (definidos por _init_worker)
+_worker_state = {}
+
+
+def plan_shards(n_segments, n_contexts, workers=1, shard_rows=SHARD_ROWS):
+    """
+    Intervalos [início, fim) de segmentos de cada shard
+
+    Cada shard tem até shard_rows linhas de features; com mais de um
+    worker, há pelo menos um shard por worker.
+    """
+    if n_segments == 0:
+        return []
+    per_shard = max(1, shard_rows // max(1, n_contexts))
+    if workers > 1:
+        per_shard = min(per_shard, -(-n_segments // workers))
+    return [(start, min(start + per_shard, n_segments)) for start in range(0, n_segments, per_shard)]
+
+
+def _init_worker(model, le_dict, threads):
+    if model is not None and threads is not None and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=threads)
+    _worker_state['model'] = model
+    _worker_state['le_dict'] = le_dict
+
+
+def _score_shard(task):
+    """Pontua um shard e grava o resultado parcial nas linhas do rascunho"""
+    start, segments, contexts, scratch_path, shape, dtype = task
+    model = _worker_state['model']
+
+    if model is None:
+        scores, failures, timings = statistical_risk_map(segments, contexts), [], {}
+    else:
+        scores, failures, timings = score_risk_map(model, _worker_state['le_dict'], segments, contexts)
+    if np.dtype(dtype) == np.uint8:
+        scores = quantize_scores(scores)
+
+    scratch = np.memmap(scratch_path, dtype=dtype, mode='r+', shape=shape)
+    scratch[start:start + len(scores)] = scores
+    scratch.flush()
+    del scratch
+
+    return [(start + i, reason) for i, reason in failures], timings, peak_rss_mb()
+
+
+def score_shards(model, le_dict, segments, contexts, scratch_path, dtype=np.float64,
+                 workers=WORKERS, shard_rows=SHARD_ROWS):
+    """
+    Pontua todos os segmentos em shards e grava a matriz em scratch_path
+
+    Args:
+        model: Modelo treinado (ou None para o score estatístico)
+        le_dict: LabelEncoders do treinamento
+        segments: DataFrame de risk_map.aggregate_segments
+        contexts: Lista de contextos (risk_map.CONTEXTOS ou ContextGrid.contexts())
+        scratch_path: Arquivo da matriz segmentos x contextos (criado aqui)
+        dtype: dtype da matriz (float64, float32 ou uint8 quantizado)
+        workers: Processos do pool (1 = no próprio processo)
+        shard_rows: Linhas de features por shard
+
+    Returns:
+        Tupla (failures, tempos somados dos shards em s, estatísticas com
+        shards, workers e pico de RSS dos workers em MB)
+    """
+    shape = (len(segments), len(contexts))
+    scratch = np.memmap(scratch_path, dtype=dtype, mode='w+', shape=shape)
+    del scratch
+
+    shards = plan_shards(len(segments), len(contexts), workers, shard_rows)
+    tasks = (
+        (start, segments.iloc[start:stop].reset_index(drop=True), contexts,
+         str(scratch_path), shape, np.dtype(dtype).str)
+        for start, stop in shards
+    )
+
+    if workers <= 1:
+        _init_worker(model, le_dict, None)
+        try:
+            results = list(map(_score_shard, tasks))
+        finally:
+            _worker_state.clear()
+    else:
+        if FORK_AVAILABLE:
+            context, threads = multiprocessing.get_context('fork'), 1
+        else:
+            context, threads = multiprocessing.get_context('spawn'), max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(model, le_dict, threads)) as executor:
+            results = list(executor.map(_score_shard, tasks))
+
+    failures = []
+    timings = {'features': 0.0, 'predict': 0.0, 'blend': 0.0}
+    peaks = []
+    for shard_failures, shard_timings, peak in results:
+        failures.extend(shard_failures)
+        for name, seconds in shard_timings.items():
+            timings[name] += seconds
+        if peak is not None:
+            peaks.append(peak)
+
+    stats = {
+        'shards': len(shards),
+        'workers': max(1, workers),
+        'worker_peak_rss_mb': max(peaks) if peaks else None,
+    }
+    return failures, timings, stats
+
+
+def sharded_risk_map(model, le_dict, segments, contexts, workers=WORKERS, shard_rows=SHARD_ROWS):
+    """
+    Mesmo resultado de risk_map.score_risk_map (ou statistical_risk_map,
+    sem modelo), gerado em shards
+
+    Returns:
+        Tupla (matriz S x C float64 em memória, failures, tempos em s)
+    """
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as workdir:
+        scratch_path = Path(workdir) / 'scores.scratch'
+        failures, timings, _ = score_shards(model, le_dict, segments, contexts, scratch_path,
+                                            np.float64, workers, shard_rows)
+        scratch = np.memmap(scratch_path, dtype=np.float64, mode='r', shape=(len(segments), len(contexts)))
+        scores = np.array(scratch)
+        del scratch
+    return scores, failures, timings
+
+
+def write_sharded_artifact(path, model, le_dict, segments, contexts, metadata=None,
+                           score_dtype='float32', grid=None, fingerprints=None,
+                           workers=WORKERS, shard_rows=SHARD_ROWS):
+    """
+    Gera e grava o artefato de risk_artifact.py sem montar a matriz em memória
+
+    A matriz de rascunho fica em um diretório temporário ao lado do
+    artefato (ou em RISK_SCRATCH_DIR) e é removida ao final.
+
+    Args:
+        path: Artefato de saída (ex.: backend/risk_cube.bin)
+        contexts: Contextos com 'nome' (colunas do artefato)
+        score_dtype: 'float32' ou 'uint8' (cubos de context_grid.py)
+        grid: Eixos do grid (ContextGrid.to_header()), se houver
+        Demais argumentos: ver score_shards e write_risk_artifact
+
+    Returns:
+        Tupla (tamanho do arquivo em bytes, failures, tempos em s,
+        estatísticas de score_shards)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dtype = np.dtype(SCORE_DTYPES[score_dtype])
+    shape = (len(segments), len(contexts))
+
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR or path.parent) as workdir:
+        scratch_path = Path(workdir) / 'scores.scratch'
+        failures, timings, stats = score_shards(model, le_dict, segments, contexts, scratch_path,
+                                                dtype, workers, shard_rows)
+
+        scratch = np.memmap(scratch_path, dtype=dtype, mode='r', shape=shape)
+        size = write_risk_artifact(
+            path,
+            segments['uf'], segments['br'], segments['km'],
+            scratch,
+            [ctx['nome'] for ctx in contexts],
+            metadata,
+            segment_km=SEGMENT_KM,
+            score_dtype=score_dtype,
+            grid=grid,
+            fingerprints=fingerprints,
+        )
+        # Fecha o mapeamento antes de remover o diretório (obrigatório no Windows)
+        del scratch
+
+    return size, failures, timings, stats
@@ -0,0 +1,337 @@
+"""
+Risco de Rota com Horário de Chegada - Sompo
+============================================
+
+Pontua uma viagem inteira em uma chamada (/predict-route de
+ml_prediction_api.py): os trechos (uf, br, km inicial -> km final) são
+expandidos em segmentos de SEGMENT_KM, cada um com o horário em que o
+caminhão passa por ele (saída + distância percorrida / velocidade média).
+Hora, dia da semana, mês e fase do dia (derivada da hora, como em
+context_grid.py) saem desse horário projetado, e não da hora de saída.
+
+Todos os segmentos são codificados com arrays NumPy e avaliados em uma
+única passada pelo modelo. Agregados da rota:
+- max: segmento de maior score
+- média ponderada pela distância de cada segmento
+- pior janela: trecho contínuo de window_km com a maior média ponderada
+
+Body de /predict-route:
+    {
+        "legs": [
+            {"uf": "SP", "br": 116, "kmStart": 100, "kmEnd": 400},
+            {"uf": "RJ", "br": 116, "kmStart": 0, "kmEnd": 230, "weatherCondition": "chuva"}
+        ],
+        "departureTime": "2025-10-14T06:30:00",   (padrão: agora)
+        "averageSpeedKmh": 70,                    (padrão: 60)
+        "weatherCondition": "claro",              (padrão dos trechos)
+        "roadType": "simples",
+        "segmentKm": 1,                           (padrão: SEGMENT_KM)
+        "windowKm": 50,                           (padrão: WINDOW_KM)
+        "includeSegments": true
+    }
+
+departureTime com fuso é usado no horário local informado (o fuso é
+descartado, não convertido).
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import request_metrics
+from inference_engine import (
+    FEATURE_COLUMNS,
+    ROAD_MAPPING,
+    WEATHER_MAPPING,
+    InputError,
+    day_phase_from_hour,
+    encode_value,
+    predict_with_proba,
+    risk_levels_for,
+    score_probabilities,
+)
+
+# Comprimento padrão de cada segmento pontuado (km)
+SEGMENT_KM = 1.0
+
+# Comprimento padrão da pior janela (km)
+WINDOW_KM = 50.0
+
+DEFAULT_SPEED_KMH = 60.0
+
+# Limite de segmentos por rota (ex.: 5.000 km com segmentos de 250 m)
+MAX_ROUTE_SEGMENTS = 20_000
+
+LEG_FIELDS = ['uf', 'br', 'kmStart', 'kmEnd']
+
+
+def _positive(data, field, default):
+    value = float(data.get(field, default))
+    if not value > 0:
+        raise InputError(f"Campo {field} deve ser maior que zero")
+    return value
+
+
+def parse_route_input(data):
+    """
+    Valida e padroniza uma requisição de /predict-route
+
+    Returns:
+        Dict com legs (lista de dicts uf, br, km_start, km_end,
+        clima_categoria, tipo_pista_categoria), departure, speed_kmh,
+        segment_km, window_km e include_segments
+
+    Raises:
+        InputError: Campo ausente ou inválido
+        ValueError/TypeError: Valor numérico inválido
+    """
+    if not isinstance(data, dict):
+        raise InputError('Body deve ser um objeto JSON')
+    legs_input = data.get('legs')
+    if not isinstance(legs_input, list) or not legs_input:
+        raise InputError('Campo legs deve ser uma lista não vazia de trechos')
+
+    weather = str(data.get('weatherCondition', 'claro')).lower()
+    road_type = str(data.get('roadType', 'simples')).lower()
+
+    legs = []
+    for i, leg in enumerate(legs_input):
+        if not isinstance(leg, dict):
+            raise InputError(f'Trecho {i} deve ser um objeto JSON')
+        for field in LEG_FIELDS:
+            if field not in leg:
+                raise InputError(f'Campo obrigatório ausente no trecho {i}: {field}')
+        legs.append({
+            'uf': str(leg['uf']).upper(),
+            'br': int(leg['br']),
+            'km_start': float(leg['kmStart']),
+            'km_end': float(leg['kmEnd']),
+            'clima_categoria': WEATHER_MAPPING.get(str(leg.get('weatherCondition', weather)).lower(), 'claro'),
+            'tipo_pista_categoria': ROAD_MAPPING.get(str(leg.get('roadType', road_type)).lower(), 'simples'),
+        })
+
+    departure = data.get('departureTime')
+    if departure is None:
+        departure = datetime.now()
+    else:
+        try:
+            departure = datetime.fromisoformat(str(departure))
+        except ValueError:
+            raise InputError(f"departureTime inválido (use ISO 8601): '{departure}'")
+
+    return {
+        'legs': legs,
+        'departure': departure.replace(tzinfo=None, microsecond=0),
+        'speed_kmh': _positive(data, 'averageSpeedKmh', DEFAULT_SPEED_KMH),
+        'segment_km': _positive(data, 'segmentKm', SEGMENT_KM),
+        'window_km': _positive(data, 'windowKm', WINDOW_KM),
+        'include_segments': bool(data.get('includeSegments', True)),
+    }
+
+
+def expand_route(route, encoding_tables):
+    """
+    Expande os trechos em segmentos com horário de passagem projetado
+
+    Cada segmento é pontuado no km onde começa; o horário é o do meio do
+    segmento.
+
+    Returns:
+        Dict de arrays por segmento: leg, km, km_end, distance_km, offset_km
+        (distância percorrida até o início), eta (datetime64[s]), hour,
+        day_of_week, month, day_phase, features (matriz n x 9)
+
+    Raises:
+        InputError: Valor desconhecido para os encoders ou rota longa demais
+    """
+    step = route['segment_km']
+    counts = [max(1, math.ceil(abs(leg['km_end'] - leg['km_start']) / step)) for leg in route['legs']]
+    n = sum(counts)
+    if n > MAX_ROUTE_SEGMENTS:
+        raise InputError(f"Rota com {n:,} segmentos excede o limite de {MAX_ROUTE_SEGMENTS:,}; "
+                         f"aumente segmentKm")
+
+    leg_index = np.repeat(np.arange(len(counts)), counts)
+    km = np.empty(n, dtype=np.float64)
+    km_end = np.empty(n, dtype=np.float64)
+    distance = np.empty(n, dtype=np.float64)
+    features = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+
+    start = 0
+    for leg, count in zip(route['legs'], counts):
+        part = slice(start, start + count)
+        length = abs(leg['km_end'] - leg['km_start'])
+        offsets = np.arange(count) * step
+        direction = 1.0 if leg['km_end'] >= leg['km_start'] else -1.0
+        distance[part] = np.minimum(step, length - offsets)
+        km[part] = leg['km_start'] + direction * offsets
+        km_end[part] = km[part] + direction * distance[part]
+
+        features[part, 0] = encode_value(encoding_tables, 'uf', leg['uf'])
+        features[part, 1] = leg['br']
+        features[part, 6] = encode_value(encoding_tables, 'clima_categoria', leg['clima_categoria'])
+        features[part, 8] = encode_value(encoding_tables, 'tipo_pista_categoria', leg['tipo_pista_categoria'])
+        start += count
+
+    # Horário de passagem: meio de cada segmento
+    offset_km = np.cumsum(distance) - distance
+    travel_s = np.rint((offset_km + distance / 2) / route['speed_kmh'] * 3600).astype(np.int64)
+    eta = np.datetime64(route['departure'], 's') + travel_s.astype('timedelta64[s]')
+    days = eta.astype('datetime64[D]')
+    hour = ((eta - days).astype(np.int64) // 3600).astype(np.int64)
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 foi quinta; 0 = segunda
+    month = eta.astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+    phases = np.array([day_phase_from_hour(h) for h in range(24)])
+    phase_codes = np.array([encode_value(encoding_tables, 'fase_dia_categoria', phase) for phase in phases],
+                           dtype=np.float64)
+
+    features[:, 2] = km
+    features[:, 3] = hour
+    features[:, 4] = day_of_week
+    features[:, 5] = month
+    features[:, 7] = phase_codes[hour]
+
+    return {
+        'leg': leg_index,
+        'km': km,
+        'km_end': km_end,
+        'distance_km': distance,
+        'offset_km': offset_km,
+        'eta': eta,
+        'hour': hour,
+        'day_of_week': day_of_week,
+        'month': month,
+        'day_phase': phases[hour],
+        'features': features,
+    }
+
+
+def worst_window(distance, scores, window_km):
+    """
+    Trecho contínuo de pelo menos window_km com a maior média ponderada
+
+    Rotas mais curtas que window_km formam uma única janela.
+
+    Returns:
+        Tupla (primeiro segmento, segmento após o último, média ponderada)
+    """
+    n = len(scores)
+    covered = np.concatenate([[0.0], np.cumsum(distance)])
+    weighted = np.concatenate([[0.0], np.cumsum(scores * distance)])
+    if covered[-1] <= window_km:
+        mean = weighted[-1] / covered[-1] if covered[-1] > 0 else float(scores.mean())
+        return 0, n, float(mean)
+
+    # Menor fim j com covered[j] - covered[i] >= window_km, para cada início i
+    ends = np.searchsorted(covered, covered[:-1] + window_km, side='left')
+    starts = np.flatnonzero(ends <= n)
+    ends = ends[starts]
+    means = (weighted[ends] - weighted[starts]) / (covered[ends] - covered[starts])
+    best = int(np.argmax(means))
+    return int(starts[best]), int(ends[best]), float(means[best])
+
+
+def score_route(model, encoding_tables, data):
+    """
+    Pontua uma rota inteira em uma passada pelo modelo
+
+    Args:
+        model: Classificador com predict_proba (LightGBM)
+        encoding_tables: Tabelas retornadas por compile_encoders
+        data: Body de /predict-route
+
+    Returns:
+        Tupla (payload 'data' de /predict-route, tempo do modelo em ms)
+
+    Raises:
+        InputError: Requisição inválida
+    """
+    route = parse_route_input(data)
+    request_metrics.mark('validation')
+    segments = expand_route(route, encoding_tables)
+    request_metrics.mark('encoding')
+    _, proba, model_time_ms = predict_with_proba(model, segments['features'])
+    request_metrics.mark('inference')
+    request_metrics.batch(len(proba))
+    risk_scores, risk_levels = score_probabilities(proba)
+    risk_scores = np.round(risk_scores, 2)
+
+    distance = segments['distance_km']
+    total_km = float(distance.sum())
+    if total_km > 0:
+        weighted_mean = float(np.dot(risk_scores, distance) / total_km)
+    else:
+        weighted_mean = float(risk_scores.mean())
+    peak = int(np.argmax(risk_scores))
+    first, stop, window_mean = worst_window(distance, risk_scores, route['window_km'])
+
+    legs = route['legs']
+    eta_text = np.datetime_as_string(segments['eta'], unit='m')
+
+    def describe(i, km_field='km'):
+        leg = legs[segments['leg'][i]]
+        return {'leg': int(segments['leg'][i]), 'uf': leg['uf'], 'br': leg['br'],
+                'km': round(float(segments[km_field][i]), 3), 'eta': str(eta_text[i])}
+
+    arrival = route['departure'] + timedelta(seconds=round(total_km / route['speed_kmh'] * 3600))
+    summary = {
+        'total_segments': len(risk_scores),
+        'total_distance_km': round(total_km, 3),
+        'departure_time': route['departure'].isoformat(),
+        'arrival_time': arrival.isoformat(),
+        'duration_h': round(total_km / route['speed_kmh'], 3),
+        'max_risk_score': float(risk_scores[peak]),
+        'max_risk_segment': describe(peak),
+        'weighted_mean_risk_score': round(weighted_mean, 2),
+        'overall_risk_level': str(risk_levels_for(np.array([weighted_mean]))[0]),
+        'worst_window': {
+            'window_km': route['window_km'],
+            'mean_risk_score': round(window_mean, 2),
+            'distance_km': round(float(distance[first:stop].sum()), 3),
+            'start': describe(first),
+            'end': describe(stop - 1, 'km_end'),
+        },
+        'segments_by_level': {
+            level: int(np.count_nonzero(risk_levels == level))
+            for level in ('critico', 'alto', 'moderado', 'baixo')
+        },
+    }
+
+    result = {'route_summary': summary}
+    if route['include_segments']:
+        leg_ids = segments['leg'].tolist()
+        result['segments'] = [
+            {
+                'leg': leg,
+                'uf': legs[leg]['uf'],
+                'br': legs[leg]['br'],
+                'km': km,
+                'distance_km': dist,
+                'eta': eta,
+                'hour': hour,
+                'day_of_week': dow,
+                'month': month,
+                'day_phase': phase,
+                'risk_score': score,
+                'risk_level': level,
+            }
+            for leg, km, dist, eta, hour, dow, month, phase, score, level in zip(
+                leg_ids,
+                np.round(segments['km'], 3).tolist(),
+                np.round(distance, 3).tolist(),
+                eta_text.tolist(),
+                segments['hour'].tolist(),
+                segments['day_of_week'].tolist(),
+                segments['month'].tolist(),
+                segments['day_phase'].tolist(),
+                risk_scores.tolist(),
+                risk_levels.tolist(),
+            )
+        ]
+    request_metrics.mark('postprocess')
+    return result, model_time_ms
@@ -0,0 +1,221 @@
+"""
+Índice de Segmentos por Rodovia - Sompo
+=======================================
+
+Consultas de vizinhança sobre o artefato de scores (risk_artifact.py) sem
+montar chaves "UF_BR_KM" para cada deslocamento: para cada rodovia (UF, BR)
+mantém a lista ordenada dos KMs iniciais dos segmentos e resolve as
+consultas com bisect (O(log n) por rodovia).
+
+- nearest / k_nearest: segmentos mais próximos de um KM (até max_distance)
+- segments_in_range: segmentos que cobrem um trecho [km_inicial, km_final]
+- interpolate: score ponderado pela distância entre os dois segmentos
+  vizinhos (um de cada lado do KM), suavizando a troca de segmento
+
+Distâncias são medidas entre o KM consultado e o centro do segmento
+(km inicial + segment_km / 2). Em empates, o segmento de KM menor vem
+primeiro.
+
+Uso:
+    from risk_artifact import RiskScoreArtifact
+    from segment_index import SegmentIndex
+
+    index = SegmentIndex(RiskScoreArtifact("backend/risk_scores.bin"))
+    index.k_nearest('SP', 116, 233, k=3)
+    index.interpolate('SP', 116, 233, 'noite_chuvoso')
+
+    python scripts/segment_index.py backend/risk_scores.bin SP 116 233 --context noite_chuvoso
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import argparse
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from risk_artifact import MAX_KM, RiskScoreArtifact
+
+# Segmento vizinho: KM inicial, distância (km) até o KM consultado e linha na matriz
+Neighbor = namedtuple('Neighbor', ['km', 'distance_km', 'row'])
+
+# Raio padrão de interpolação, em segmentos (2 x 10 km = ±20 km, como no backend)
+DEFAULT_RADIUS_SEGMENTS = 2
+
+
+class SegmentIndex:
+    """
+    KMs ordenados por rodovia sobre um RiskScoreArtifact
+
+    Attributes:
+        artifact: Artefato de scores de origem
+        segment_km: Comprimento dos segmentos em km
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.segment_km = artifact.segment_km
+        self._half = artifact.segment_km / 2
+
+        # (UF, BR) -> (KMs iniciais ordenados, primeira linha da rodovia)
+        self._highways = {}
+        for (uf, br), (start, stop) in artifact.highways.items():
+            kms = (artifact.keys[start:stop] & np.uint64(MAX_KM)).astype(np.int64).tolist()
+            self._highways[(uf, br)] = (kms, start)
+
+    def __len__(self):
+        return len(self._highways)
+
+    def _highway(self, uf, br):
+        return self._highways.get((str(uf).upper(), int(br)))
+
+    def highway_kms(self, uf, br):
+        """KMs iniciais ordenados dos segmentos da rodovia (lista vazia se não existir)"""
+        highway = self._highway(uf, br)
+        return list(highway[0]) if highway else []
+
+    def k_nearest(self, uf, br, km, k=3, max_distance=None):
+        """
+        Os k segmentos da rodovia mais próximos do KM
+
+        Args:
+            uf, br, km: Rodovia e posição consultada
+            k: Número máximo de segmentos
+            max_distance: Distância máxima (km) até o centro do segmento
+
+        Returns:
+            Lista de Neighbor, do mais próximo ao mais distante
+        """
+        highway = self._highway(uf, br)
+        if highway is None or k <= 0:
+            return []
+        kms, first_row = highway
+        km = float(km)
+
+        # Primeiro segmento cujo centro está em km ou depois
+        right = bisect_left(kms, km - self._half)
+        left = right - 1
+
+        neighbors = []
+        while len(neighbors) < k:
+            left_distance = km - (kms[left] + self._half) if left >= 0 else np.inf
+            right_distance = (kms[right] + self._half) - km if right < len(kms) else np.inf
+            if left_distance <= right_distance:
+                index, distance = left, left_distance
+                left -= 1
+            else:
+                index, distance = right, right_distance
+                right += 1
+
+            if distance == np.inf or (max_distance is not None and distance > max_distance):
+                break
+            neighbors.append(Neighbor(kms[index], distance, first_row + index))
+
+        return neighbors
+
+    def nearest(self, uf, br, km, max_distance=None):
+        """Segmento da rodovia mais próximo do KM (Neighbor) ou None"""
+        neighbors = self.k_nearest(uf, br, km, 1, max_distance)
+        return neighbors[0] if neighbors else None
+
+    def segments_in_range(self, uf, br, km_start, km_end):
+        """
+        Segmentos da rodovia que cobrem algum ponto de [km_start, km_end]
+
+        Returns:
+            Tupla (KMs iniciais, scores segmentos x contextos), ambos arrays
+            (em artefatos float32 a matriz é uma view do artefato)
+        """
+        highway = self._highway(uf, br)
+        if highway is None or km_end < km_start:
+            rows, kms = slice(0, 0), []
+        else:
+            kms, first_row = highway
+            low = bisect_right(kms, km_start - self.segment_km)
+            high = bisect_right(kms, km_end)
+            rows, kms = slice(first_row + low, first_row + high), kms[low:high]
+
+        scores = self.artifact.decode_scores(self.artifact.scores[rows])
+        return np.asarray(kms, dtype=np.int64), scores
+
+    def interpolate(self, uf, br, km, context, max_distance=None):
+        """
+        Score no KM interpolado entre os centros dos segmentos vizinhos
+
+        Com vizinhos dos dois lados dentro de max_distance, pondera cada um
+        pela distância ao outro (interpolação linear); com vizinho de um lado
+        só, usa o score dele. No centro de um segmento devolve o score do
+        próprio segmento.
+
+        Args:
+            uf, br, km: Rodovia e posição consultada
+            context: Contexto (coluna de scores)
+            max_distance: Distância máxima (padrão: 2 segmentos)
+
+        Returns:
+            Score arredondado a 2 casas, ou None sem vizinhos no raio
+        """
+        highway = self._highway(uf, br)
+        if highway is None:
+            return None
+        kms, first_row = highway
+        column = self.artifact.context_index(context)
+        decode = self.artifact.decode_scores
+        if max_distance is None:
+            max_distance = DEFAULT_RADIUS_SEGMENTS * self.segment_km
+        km = float(km)
+
+        # Vizinho à esquerda: último centro <= km; à direita: primeiro centro > km
+        right = bisect_right(kms, km - self._half)
+        left = right - 1
+
+        sides = []
+        if left >= 0 and km - (kms[left] + self._half) <= max_distance:
+            sides.append((left, km - (kms[left] + self._half)))
+        if right < len(kms) and (kms[right] + self._half) - km <= max_distance:
+            sides.append((right, (kms[right] + self._half) - km))
+
+        if not sides:
+            return None
+        if len(sides) == 1 or sides[0][1] == 0:
+            return round(float(decode(self.artifact.scores[first_row + sides[0][0], column])), 2)
+
+        (left, left_distance), (right, right_distance) = sides
+        left_score = float(decode(self.artifact.scores[first_row + left, column]))
+        right_score = float(decode(self.artifact.scores[first_row + right, column]))
+        total = left_distance + right_distance
+        return round((left_score * right_distance + right_score * left_distance) / total, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consulta segmentos próximos no artefato de scores')
+    parser.add_argument('path', help='Arquivo .bin (ex.: backend/risk_scores.bin)')
+    parser.add_argument('uf')
+    parser.add_argument('br', type=int)
+    parser.add_argument('km', type=float)
+    parser.add_argument('--context', default='dia_claro', help='Contexto do score')
+    parser.add_argument('-k', type=int, default=3, help='Número de vizinhos')
+    parser.add_argument('--max-distance', type=float, help='Distância máxima (km)')
+    args = parser.parse_args()
+
+    with RiskScoreArtifact(args.path) as artifact:
+        index = SegmentIndex(artifact)
+        column = artifact.context_index(args.context)
+        print(f"📍 {args.uf.upper()}/BR-{args.br:03d} KM {args.km:g} ({args.context})")
+
+        neighbors = index.k_nearest(args.uf, args.br, args.km, args.k, args.max_distance)
+        if not neighbors:
+            print("   ⚠️  Nenhum segmento próximo")
+        for neighbor in neighbors:
+            score = float(artifact.decode_scores(artifact.scores[neighbor.row, column]))
+            print(f"   KM {neighbor.km:>5}  distância {neighbor.distance_km:>6.1f} km  score {score:6.2f}")
+
+        score = index.interpolate(args.uf, args.br, args.km, args.context, args.max_distance)
+        if score is not None:
+            print(f"   Score interpolado: {score:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""
+Servidor Multi-processo para as APIs Flask - Sompo
+==================================================
+
+Modo de produção pre-fork: o processo pai carrega os modelos uma única
+vez, abre o socket e cria N workers com os.fork(). Os workers herdam os
+modelos já carregados (copy-on-write) e disputam o accept() no mesmo
+socket. Workers que morrem são recriados pelo pai.
+
+Configuração:
+    ML_API_WORKERS=4   Número de processos worker (padrão: 1 = processo único)
+
+Em sistemas sem os.fork (Windows) o servidor roda em processo único.
+
+Antes de abrir o socket, as APIs exercitam as rotas principais com
+requisições sintéticas (warm_up_routes) e registram o tempo de cada etapa
+da inicialização (log_startup): o /health só responde depois disso.
+
+Autor: Sistema Sompo
+Data: 2025-10-14
+"""
+
+import gc
+import logging
+import os
+import signal
+import time
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_count(default=1):
+    """Lê ML_API_WORKERS do ambiente"""
+    try:
+        return max(1, int(os.environ.get('ML_API_WORKERS', default)))
+    except ValueError:
+        logger.warning("⚠️  ML_API_WORKERS inválido, usando processo único")
+        return 1
+
+
+def warm_up_routes(app, calls):
+    """
+    Executa requisições sintéticas pelo cliente de teste do Flask
+
+    A primeira requisição de um processo paga a montagem do roteamento,
+    do parser de JSON e da serialização; feita aqui, antes do fork, os
+    workers já herdam tudo pronto.
+
+    Args:
+        app: App Flask
+        calls: Lista de (método, rota, corpo JSON)
+
+    Returns:
+        Tempo total em ms
+    """
+    start = time.perf_counter()
+    client = app.test_client()
+    for method, path, body in calls:
+        response = client.open(path, method=method, json=body)
+        if response.status_code >= 500:
+            logger.warning(f"⚠️  Aquecimento de {method} {path} retornou HTTP {response.status_code}")
+    return (time.perf_counter() - start) * 1000
+
+
+def process_uptime_ms():
+    """
+    Tempo em ms desde o início do processo (partida do Python incluída)
+
+    Chamada logo após os imports de uma API, dá o custo de partida e
+    imports sem marcar o relógio antes deles. Lido de /proc (Linux,
+    resolução de ~10 ms); None onde não existe.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # Campos depois do nome do processo; starttime é o 22º campo
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime_s = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, (uptime_s - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000)
+
+
+def log_startup(name, timings):
+    """
+    Registra o tempo de cada etapa da inicialização
+
+    Args:
+        name: Nome da API nos logs
+        timings: Dict etapa -> ms (imports_ms, model_load_ms, warmup_ms,
+            routes_warmup_ms, total_ms; None = não medido)
+    """
+    labels = {
+        'imports_ms': 'partida e imports',
+        'model_load_ms': 'carga do modelo',
+        'warmup_ms': 'aquecimento do modelo',
+        'routes_warmup_ms': 'aquecimento das rotas',
+        'total_ms': 'total',
+    }
+    parts = [f"{labels.get(key, key)} {ms:,.0f} ms" for key, ms in timings.items() if ms is not None]
+    logger.info(f"⏱️  Inicialização {name}: {' | '.join(parts)}")
+
+
+def _serve_single(app, host, port, post_fork=None):
+    """Processo único (servidor de desenvolvimento do Flask com threads)"""
+    if post_fork:
+        post_fork()
+    app.run(host=host, port=port, debug=False, threaded=True)
+
+
+def _spawn_worker(server, worker_id, post_fork=None):
+    """Cria um worker com os.fork(); no filho, serve até receber SIGTERM"""
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            if post_fork:
+                post_fork()
+            server.serve_forever()
+        finally:
+            os._exit(0)
+    logger.info(f"   👷 Worker {worker_id} iniciado (pid {pid})")
+    return pid
+
+
+def _forward_signals(children, state):
+    """SIGTERM/SIGINT no pai: marca o encerramento e repassa aos workers"""
+    def shutdown(signum, frame):
+        state['shutting_down'] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+
+def _supervise(server, children, state, post_fork=None):
+    """Aguarda os workers e recria os que morrem, até o encerramento"""
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        worker_id = children.pop(pid, None)
+        if worker_id is not None and not state['shutting_down']:
+            logger.warning(f"⚠️  Worker {worker_id} (pid {pid}) encerrou inesperadamente; recriando")
+            time.sleep(1)
+            children[_spawn_worker(server, worker_id, post_fork)] = worker_id
+
+
+def serve(app, host, port, workers=1, post_fork=None):
+    """
+    Serve o app Flask com N processos worker
+
+    Args:
+        app: App Flask (modelos já carregados no processo atual)
+        host: Endereço de bind
+        port: Porta
+        workers: Número de processos worker
+        post_fork: Callback executado em cada worker após o fork
+            (ex.: iniciar threads, que não sobrevivem ao fork)
+    """
+    if workers > 1 and not hasattr(os, 'fork'):
+        logger.warning("⚠️  os.fork indisponível nesta plataforma: usando processo único")
+        workers = 1
+
+    if workers <= 1:
+        _serve_single(app, host, port, post_fork)
+        return
+
+    server = make_server(host, port, app, threaded=True)
+
+    # Move os objetos já carregados (modelos, encoders) para a geração
+    # permanente do GC, evitando que coletas nos workers escrevam nos
+    # cabeçalhos desses objetos e quebrem o compartilhamento copy-on-write
+    gc.freeze()
+
+    # pid -> id do worker
+    children = {}
+    state = {'shutting_down': False}
+    _forward_signals(children, state)
+
+    logger.info(f"🚀 Servidor pre-fork com {workers} workers em {host}:{port} (pai pid {os.getpid()})")
+    for worker_id in range(workers):
+        children[_spawn_worker(server, worker_id, post_fork)] = worker_id
+
+    _supervise(server, children, state, post_fork)
+
+    server.server_close()
+    logger.info("🔴 Servidor pre-fork encerrado")
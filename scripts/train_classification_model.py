@@ -13,13 +13,16 @@ Data: 2025-10-14
 
 import pandas as pd
 import numpy as np
-import joblib
 from datetime import datetime
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, accuracy_score, confusion_matrix
+from data_cache import load_dataset
+from feature_engineering import engineer_features
+from compiled_forest import export_forest
+from model_reloader import dump_atomic
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -41,8 +44,8 @@ if not excel_path.exists():
     print("   Certifique-se de que o arquivo dados_acidentes.xlsx esta em DadosReais/")
     exit(1)
 
-# Ler Excel
-df = pd.read_excel(excel_path)
+# Ler Excel (via cache colunar em DadosReais/.cache/)
+df = load_dataset(excel_path)
 print(f"   OK {len(df):,} registros carregados")
 print(f"   Colunas: {list(df.columns)[:10]}...")
 print()
@@ -53,72 +56,13 @@ print()
 
 print("[2/5] Feature Engineering...")
 
-# Limpar e preparar dados
-df_clean = df.copy()
-
-# Converter data
-if 'data_inversa' in df_clean.columns:
-    df_clean['data'] = pd.to_datetime(df_clean['data_inversa'], errors='coerce')
-elif 'data' in df_clean.columns:
-    df_clean['data'] = pd.to_datetime(df_clean['data'], errors='coerce')
-else:
-    print("ERRO: Coluna de data nao encontrada")
+# Limpar e preparar dados (feature_engineering.py)
+try:
+    df_clean = engineer_features(df, target_column='classificacao')
+except ValueError as e:
+    print(f"ERRO: {e}")
     exit(1)
 
-# Extrair features temporais
-df_clean['hora'] = df_clean['horario'].apply(lambda x: x.hour if hasattr(x, 'hour') else 12)
-df_clean['dia_semana'] = df_clean['data'].dt.dayofweek  # 0=Monday, 6=Sunday
-df_clean['mes'] = df_clean['data'].dt.month
-
-# Mapear condições meteorológicas para categorias simplificadas
-weather_mapping = {
-    'Céu Claro': 'claro',
-    'Sol': 'claro',
-    'Nublado': 'nublado',
-    'Chuva': 'chuvoso',
-    'Garoa/Chuvisco': 'chuvoso',
-    'Nevoeiro/Neblina': 'neblina',
-    'Vento': 'vento',
-    'Ignorado': 'claro',
-}
-
-df_clean['clima_categoria'] = df_clean['condicao_metereologica'].map(weather_mapping).fillna('claro')
-
-# Mapear fase do dia
-day_phase_mapping = {
-    'Pleno dia': 'dia',
-    'Plena Noite': 'noite',
-    'Amanhecer': 'amanhecer',
-    'Anoitecer': 'anoitecer',
-}
-
-df_clean['fase_dia_categoria'] = df_clean['fase_dia'].map(day_phase_mapping).fillna('dia')
-
-# Mapear tipo de pista
-road_type_mapping = {
-    'Dupla': 'dupla',
-    'Simples': 'simples',
-    'Múltipla': 'multipla',
-}
-
-df_clean['tipo_pista_categoria'] = df_clean['tipo_pista'].map(road_type_mapping).fillna('simples')
-
-# Target: Classificação de gravidade
-# 0 = sem vítimas, 1 = com feridos, 2 = com mortos
-df_clean['mortos'] = df_clean['mortos'].fillna(0).astype(int)
-df_clean['feridos_graves'] = df_clean['feridos_graves'].fillna(0).astype(int)
-df_clean['feridos_leves'] = df_clean['feridos_leves'].fillna(0).astype(int)
-
-def classify_severity(row):
-    if row['mortos'] > 0:
-        return 2  # Com Vítimas Fatais
-    elif row['feridos_graves'] > 0 or row['feridos_leves'] > 0:
-        return 1  # Com Vítimas Feridas
-    else:
-        return 0  # Sem Vítimas
-
-df_clean['classificacao'] = df_clean.apply(classify_severity, axis=1)
-
 # Remover registros sem informações essenciais
 df_clean = df_clean.dropna(subset=['uf', 'br', 'km'])
 
@@ -226,13 +170,18 @@ print("[5/5] Salvando modelo e encoders...")
 # Salvar modelo
 model_save_path = Path("backend/models/modeloClassificacao.joblib")
 model_save_path.parent.mkdir(parents=True, exist_ok=True)
-joblib.dump(model, model_save_path)
+dump_atomic(model, model_save_path)
 print(f"   OK Modelo salvo em: {model_save_path}")
 print(f"   Tamanho: {model_save_path.stat().st_size / 1024:.2f} KB")
 
+# Floresta compilada para a API (arrays NumPy, verificada contra o sklearn)
+forest_path, forest_size = export_forest(model, model_save_path)
+print(f"   OK Floresta compilada em: {forest_path}")
+print(f"   Tamanho: {forest_size / 1024:.2f} KB")
+
 # Salvar encoders (reutilizar os mesmos do modelo de risco para compatibilidade)
 encoders_save_path = Path("backend/models/label_encoders.joblib")
-joblib.dump(le_dict, encoders_save_path)
+dump_atomic(le_dict, encoders_save_path)
 print(f"   OK Encoders salvos em: {encoders_save_path}")
 
 print()
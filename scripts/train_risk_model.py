@@ -11,15 +11,37 @@ Autor: Sistema Sompo
 Data: 2025-10-14
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import json
-import joblib
+import os
+import time
 from datetime import datetime
 from pathlib import Path
+from sklearn.preprocessing import LabelEncoder
+from data_cache import load_dataset
+from feature_engineering import engineer_features
+from model_reloader import dump_atomic
+from risk_artifact import write_risk_artifact
+from risk_map import (
+    CONTEXTOS as contextos,
+    SEGMENT_KM,
+    aggregate_segments,
+    statistical_risk_map,
+    to_risk_scores_dict,
+)
+from risk_refresh import ENCODERS_PATH, MODEL_PATH, file_fingerprint, segment_fingerprints
+from risk_shards import FORK_AVAILABLE, WORKERS, sharded_risk_map, write_sharded_artifact
 import warnings
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(description='Treina o modelo de risco e gera o mapa de risco pré-calculado')
+parser.add_argument('--workers', type=int, default=WORKERS,
+                    help='Processos da geração do mapa e do cubo (padrão: RISK_WORKERS ou 1)')
+args = parser.parse_args()
+workers = max(1, args.workers)
+
 print("=" * 80)
 print("  🚛 SOMPO - Treinamento de Modelo de Risco de Acidentes")
 print("=" * 80)
@@ -38,8 +60,8 @@ if not excel_path.exists():
     print("   Certifique-se de que o arquivo dados_acidentes.xlsx está em DadosReais/")
     exit(1)
 
-# Ler Excel
-df = pd.read_excel(excel_path)
+# Ler Excel (via cache colunar em DadosReais/.cache/)
+df = load_dataset(excel_path)
 print(f"   ✅ {len(df):,} registros carregados")
 print(f"   📊 Colunas: {list(df.columns)[:10]}...")
 print()
@@ -50,75 +72,13 @@ print()
 
 print("🔧 [2/6] Feature Engineering...")
 
-# Limpar e preparar dados
-df_clean = df.copy()
-
-# Converter data
-if 'data_inversa' in df_clean.columns:
-    df_clean['data'] = pd.to_datetime(df_clean['data_inversa'], errors='coerce')
-elif 'data' in df_clean.columns:
-    df_clean['data'] = pd.to_datetime(df_clean['data'], errors='coerce')
-else:
-    print("❌ ERRO: Coluna de data não encontrada")
+# Limpar e preparar dados (feature_engineering.py)
+try:
+    df_clean = engineer_features(df, target_column='gravidade')
+except ValueError as e:
+    print(f"❌ ERRO: {e}")
     exit(1)
 
-# Extrair features temporais
-# horario é datetime.time, converter para hora
-df_clean['hora'] = df_clean['horario'].apply(lambda x: x.hour if hasattr(x, 'hour') else 12)
-df_clean['dia_semana'] = df_clean['data'].dt.dayofweek  # 0=Monday, 6=Sunday
-df_clean['mes'] = df_clean['data'].dt.month
-
-# Mapear condições meteorológicas para categorias simplificadas
-weather_mapping = {
-    'Céu Claro': 'claro',
-    'Sol': 'claro',
-    'Nublado': 'nublado',
-    'Chuva': 'chuvoso',
-    'Garoa/Chuvisco': 'chuvoso',
-    'Nevoeiro/Neblina': 'neblina',
-    'Vento': 'vento',
-    'Ignorado': 'claro',
-}
-
-df_clean['clima_categoria'] = df_clean['condicao_metereologica'].map(weather_mapping).fillna('claro')
-
-# Mapear fase do dia
-day_phase_mapping = {
-    'Pleno dia': 'dia',
-    'Plena Noite': 'noite',
-    'Amanhecer': 'amanhecer',
-    'Anoitecer': 'anoitecer',
-}
-
-df_clean['fase_dia_categoria'] = df_clean['fase_dia'].map(day_phase_mapping).fillna('dia')
-
-# Mapear tipo de pista
-road_type_mapping = {
-    'Dupla': 'dupla',
-    'Simples': 'simples',
-    'Múltipla': 'multipla',
-}
-
-df_clean['tipo_pista_categoria'] = df_clean['tipo_pista'].map(road_type_mapping).fillna('simples')
-
-# Target: Classificação de gravidade
-# 0 = sem vítimas, 1 = com feridos, 2 = com mortos
-df_clean['mortos'] = df_clean['mortos'].fillna(0).astype(int)
-df_clean['feridos_graves'] = df_clean['feridos_graves'].fillna(0).astype(int)
-df_clean['feridos_leves'] = df_clean['feridos_leves'].fillna(0).astype(int)
-
-def classify_severity(row):
-    if row['mortos'] > 0:
-        return 2  # Grave (com mortos)
-    elif row['feridos_graves'] > 0:
-        return 1  # Moderado (feridos graves)
-    elif row['feridos_leves'] > 0:
-        return 1  # Moderado (feridos)
-    else:
-        return 0  # Leve (sem vítimas)
-
-df_clean['gravidade'] = df_clean.apply(classify_severity, axis=1)
-
 # Remover registros sem coordenadas ou informações essenciais
 df_clean = df_clean.dropna(subset=['uf', 'br', 'km', 'latitude', 'longitude'])
 
@@ -143,8 +103,6 @@ features = ['uf', 'br', 'km', 'hora', 'dia_semana', 'mes',
 df_model = df_clean[features + ['gravidade']].copy()
 
 # Encoding de features categóricas
-from sklearn.preprocessing import LabelEncoder
-
 le_dict = {}
 for col in ['uf', 'clima_categoria', 'fase_dia_categoria', 'tipo_pista_categoria']:
     le = LabelEncoder()
@@ -206,12 +164,12 @@ try:
     # Salvar modelo treinado
     model_save_path = Path("backend/models/risk_model.joblib")
     model_save_path.parent.mkdir(parents=True, exist_ok=True)
-    joblib.dump(model, model_save_path)
+    dump_atomic(model, model_save_path)
     print(f"   💾 Modelo salvo em: {model_save_path}")
     
     # Salvar também os encoders
     encoders_save_path = Path("backend/models/label_encoders.joblib")
-    joblib.dump(le_dict, encoders_save_path)
+    dump_atomic(le_dict, encoders_save_path)
     print(f"   💾 Encoders salvos em: {encoders_save_path}")
     print()
     
@@ -227,145 +185,131 @@ except ImportError:
 
 print("📊 [5/6] Gerando mapa de risco pré-calculado...")
 
-risk_scores = {}
+if workers > 1 and not FORK_AVAILABLE:
+    # Com 'spawn' cada worker reexecutaria este script (ver risk_shards.py)
+    print("   ⚠️  Pool de processos indisponível neste sistema para o treinamento; usando 1 worker")
+    workers = 1
 
 # Agrupar dados por segmentos (UF, BR, KM)
 # Agrupar KMs em intervalos de 10km para reduzir combinações
-df_clean['km_segment'] = (df_clean['km'] // 10) * 10
+segments = aggregate_segments(df_clean)
 
-# Obter segmentos únicos com estatísticas
-segments = df_clean.groupby(['uf', 'br', 'km_segment']).agg({
-    'gravidade': ['count', 'mean'],
-    'mortos': 'sum',
-    'feridos_graves': 'sum',
-    'feridos_leves': 'sum',
-}).reset_index()
+print(f"   📍 {len(segments):,} segmentos únicos identificados")
 
-segments.columns = ['uf', 'br', 'km', 'total_acidentes', 'gravidade_media', 
-                    'total_mortos', 'total_feridos_graves', 'total_feridos_leves']
+total_combinations = len(segments) * len(contextos)
+print(f"   🔢 Gerando {total_combinations:,} combinações de risco ({workers} worker(s))...")
 
-print(f"   📍 {len(segments):,} segmentos únicos identificados")
+step_start = time.perf_counter()
 
-# Condições contextuais para gerar scores
-contextos = [
-    {'nome': 'dia_claro', 'clima': 'claro', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
-    {'nome': 'dia_nublado', 'clima': 'nublado', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
-    {'nome': 'dia_chuvoso', 'clima': 'chuvoso', 'fase': 'dia', 'hora': 14, 'dia_semana': 2},
-    {'nome': 'noite_claro', 'clima': 'claro', 'fase': 'noite', 'hora': 22, 'dia_semana': 2},
-    {'nome': 'noite_chuvoso', 'clima': 'chuvoso', 'fase': 'noite', 'hora': 22, 'dia_semana': 2},
-    {'nome': 'amanhecer_claro', 'clima': 'claro', 'fase': 'amanhecer', 'hora': 6, 'dia_semana': 1},
-    {'nome': 'anoitecer_claro', 'clima': 'claro', 'fase': 'anoitecer', 'hora': 18, 'dia_semana': 5},
-    {'nome': 'fds_noite_claro', 'clima': 'claro', 'fase': 'noite', 'hora': 23, 'dia_semana': 6},
-]
+if has_model:
+    # Produto segmentos × contextos pontuado com predict_proba, em shards paralelos
+    scores_matrix, failures, timings = sharded_risk_map(model, le_dict, segments, contextos, workers)
 
-total_combinations = len(segments) * len(contextos)
-print(f"   🔢 Gerando {total_combinations:,} combinações de risco...")
+    if failures:
+        print(f"   ⚠️  {len(failures):,} segmentos sem predição do modelo (usando score histórico):")
+        for idx, reason in failures[:5]:
+            print(f"      - {segments['uf'].iloc[idx]}/BR-{segments['br'].iloc[idx]} KM {segments['km'].iloc[idx]}: {reason}")
+        if len(failures) > 5:
+            print(f"      ... e mais {len(failures) - 5:,}")
 
-processed = 0
+    print(f"   ⏱️  Features: {timings['features']:.2f}s | "
+          f"Predição: {timings['predict']:.2f}s | "
+          f"Combinação: {timings['blend']:.2f}s")
+else:
+    # Usar análise estatística ajustada por contexto
+    scores_matrix = statistical_risk_map(segments, contextos)
 
-for idx, segment in segments.iterrows():
-    uf = segment['uf']
-    br = str(int(segment['br'])).zfill(3)
-    km = int(segment['km'])
-    
-    # Chave do segmento
-    segment_key = f"{uf}_{br}_{km}"
-    
-    # Calcular score base do segmento (histórico)
-    total_acidentes = segment['total_acidentes']
-    gravidade_media = segment['gravidade_media']
-    
-    # Normalizar para 0-100
-    # Score base considera densidade e gravidade
-    score_base = min(
-        (total_acidentes / 10) * 30 +  # Densidade (max 30 pontos)
-        (gravidade_media / 2) * 70,     # Gravidade média (max 70 pontos)
-        100
-    )
-    
-    segment_scores = {}
-    
-    for contexto in contextos:
-        if has_model:
-            # Usar modelo para prever
-            try:
-                # Preparar features
-                features_input = pd.DataFrame([{
-                    'uf_encoded': le_dict['uf'].transform([uf])[0],
-                    'br': int(segment['br']),
-                    'km': km,
-                    'hora': contexto['hora'],
-                    'dia_semana': contexto['dia_semana'],
-                    'mes': 6,  # Mês médio
-                    'clima_categoria_encoded': le_dict['clima_categoria'].transform([contexto['clima']])[0],
-                    'fase_dia_categoria_encoded': le_dict['fase_dia_categoria'].transform([contexto['fase']])[0],
-                    'tipo_pista_categoria_encoded': le_dict['tipo_pista_categoria'].transform(['simples'])[0],
-                }])
-                
-                # Prever probabilidade
-                proba = model.predict_proba(features_input)[0]
-                # Score = probabilidade ponderada (feridos*50 + mortos*100)
-                score_ml = proba[1] * 50 + proba[2] * 100
-                
-                # Combinar com score base (60% ML, 40% histórico)
-                score_final = score_ml * 0.6 + score_base * 0.4
-            except:
-                score_final = score_base
-        else:
-            # Usar análise estatística
-            score_final = score_base
-            
-            # Ajustar por contexto
-            if contexto['fase'] == 'noite':
-                score_final *= 1.3
-            if contexto['clima'] == 'chuvoso':
-                score_final *= 1.4
-            if contexto['clima'] == 'neblina':
-                score_final *= 1.5
-            if contexto['dia_semana'] in [5, 6]:  # Fim de semana
-                score_final *= 1.2
-            
-            score_final = min(score_final, 100)
-        
-        segment_scores[contexto['nome']] = round(score_final, 2)
-    
-    risk_scores[segment_key] = segment_scores
-    
-    processed += len(contextos)
-    if processed % 10000 == 0:
-        print(f"      Processado: {processed:,} / {total_combinations:,} ({processed/total_combinations*100:.1f}%)")
+risk_scores = to_risk_scores_dict(segments, contextos, scores_matrix)
+
+step_time = time.perf_counter() - step_start
+print(f"   ⏱️  Mapa gerado em {step_time:.2f}s "
+      f"({total_combinations / max(step_time, 1e-9):,.0f} combinações/s)")
 
 print(f"   ✅ {len(risk_scores):,} segmentos com scores gerados")
 print()
 
 # ============================================================================
-# STEP 6: Salvar JSON
+# STEP 6: Salvar scores (binário + JSON)
 # ============================================================================
 
 print("💾 [6/6] Salvando arquivo de risco...")
 
-output_path = Path("backend/risk_scores.json")
-output_path.parent.mkdir(exist_ok=True)
-
-# Adicionar metadata
-output_data = {
-    "metadata": {
-        "generated_at": datetime.now().isoformat(),
-        "total_segments": len(risk_scores),
-        "total_accidents_analyzed": len(df_clean),
-        "model_type": "LightGBM" if has_model else "Statistical",
-        "accuracy": f"{accuracy:.2%}" if has_model else "N/A",
-        "contexts": [c['nome'] for c in contextos],
-        "score_range": "0-100 (0=baixo risco, 100=alto risco)",
-    },
-    "scores": risk_scores
+metadata = {
+    "generated_at": datetime.now().isoformat(),
+    "total_segments": len(risk_scores),
+    "total_accidents_analyzed": len(df_clean),
+    "model_type": "LightGBM" if has_model else "Statistical",
+    "accuracy": f"{accuracy:.2%}" if has_model else "N/A",
+    "contexts": [c['nome'] for c in contextos],
+    "score_range": "0-100 (0=baixo risco, 100=alto risco)",
+    # Estado para risk_refresh.py (atualização incremental)
+    "revision": 1,
+    "model_sha256": file_fingerprint(MODEL_PATH, ENCODERS_PATH) if has_model else None,
 }
-
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-print(f"   ✅ Arquivo salvo: {output_path}")
-print(f"   📦 Tamanho: {output_path.stat().st_size / 1024 / 1024:.2f} MB")
+fingerprints = segment_fingerprints(segments)
+
+# Artefato binário mapeável em memória (risk_artifact.py)
+artifact_path = Path("backend/risk_scores.bin")
+artifact_path.parent.mkdir(exist_ok=True)
+artifact_size = write_risk_artifact(
+    artifact_path,
+    segments['uf'], segments['br'], segments['km'],
+    scores_matrix,
+    metadata['contexts'],
+    metadata,
+    segment_km=SEGMENT_KM,
+    fingerprints=fingerprints,
+)
+print(f"   ✅ Artefato binário salvo: {artifact_path} ({artifact_size / 1024 / 1024:.2f} MB)")
+
+# JSON (opcional: RISK_SCORES_JSON=0 desativa)
+json_written = os.environ.get('RISK_SCORES_JSON', '1').lower() not in ('0', 'false', 'no')
+if json_written:
+    output_path = Path("backend/risk_scores.json")
+
+    output_data = {
+        "metadata": metadata,
+        "scores": risk_scores
+    }
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+    print(f"   ✅ Arquivo salvo: {output_path}")
+    print(f"   📦 Tamanho: {output_path.stat().st_size / 1024 / 1024:.2f} MB")
+
+# Cubo de contextos quantizado (opcional: RISK_CONTEXT_GRID=default ou especificação do grid)
+grid_spec = os.environ.get('RISK_CONTEXT_GRID', '')
+if grid_spec and grid_spec.lower() not in ('0', 'false', 'no'):
+    from context_grid import ContextGrid
+
+    try:
+        grid, removed = ContextGrid.from_spec(grid_spec).restrict_to_encoders(le_dict)
+    except ValueError as e:
+        print(f"   ❌ Grid de contextos inválido: {e}")
+        grid = None
+
+    if grid is not None:
+        if removed:
+            print(f"   ⚠️  Valores ausentes no treino removidos do grid: "
+                  f"{', '.join(f'{axis}={value}' for axis, value in removed)}")
+        print(f"   🧊 Gerando cubo: {len(segments):,} segmentos × {len(grid):,} contextos {grid.shape} "
+              f"({workers} worker(s))...")
+
+        # Shards pontuados em paralelo e gravados direto no artefato (sem o cubo em memória)
+        cube_start = time.perf_counter()
+        cube_path = Path("backend/risk_cube.bin")
+        cube_size, cube_failures, cube_timings, cube_stats = write_sharded_artifact(
+            cube_path, model if has_model else None, le_dict, segments, grid.contexts(), metadata,
+            score_dtype='uint8', grid=grid.to_header(), fingerprints=fingerprints, workers=workers,
+        )
+        cube_time = time.perf_counter() - cube_start
+
+        cube_combinations = len(segments) * len(grid)
+        print(f"   ✅ Cubo salvo: {cube_path} ({cube_size / 1024 / 1024:.2f} MB) em {cube_time:.2f}s "
+              f"({cube_combinations / max(cube_time, 1e-9):,.0f} combinações/s, {cube_stats['shards']} shards)")
+        if cube_failures:
+            print(f"   ⚠️  {len(cube_failures):,} segmentos do cubo sem predição do modelo")
 print()
 
 # Estatísticas finais
@@ -392,8 +336,12 @@ print("  ✅ TREINAMENTO CONCLUÍDO COM SUCESSO!")
 print("=" * 80)
 print()
 print("📋 Próximos passos:")
-print("   1. O arquivo risk_scores.json foi gerado em backend/")
-print("   2. O backend irá carregar este arquivo automaticamente")
+if json_written:
+    print(f"   1. O artefato binário {artifact_path.name} e o risk_scores.json foram gerados em backend/")
+else:
+    print(f"   1. O artefato binário {artifact_path.name} foi gerado em backend/ "
+          "(risk_scores.json desativado: RISK_SCORES_JSON=0)")
+print(f"   2. O backend irá carregar {artifact_path.name} automaticamente (risk_scores.json só na falta dele)")
 print("   3. APIs agora usarão scores pré-calculados para predição rápida")
 print()
 